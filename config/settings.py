@@ -27,6 +27,13 @@ def get_resource_path(relative_path):
         base_path = Path(__file__).resolve().parent.parent
     return base_path / relative_path
 
+def _env_bool(nombre, defecto):
+    """Lee una variable de entorno booleana ("1", "true", "si", "sí" o "yes" = activa)"""
+    valor = os.getenv(nombre)
+    if valor is None:
+        return defecto
+    return valor.strip().lower() in ("1", "true", "si", "sí", "yes")
+
 def get_data_dir():
     """Obtiene el directorio de datos según el modo de ejecución"""
     if getattr(sys, 'frozen', False):
@@ -81,6 +88,7 @@ BACKUPS_DIR = DATA_DIR / "backups"
 CARNETS_DIR = DATA_DIR / "carnets"
 TEMPLATES_DIR = DATA_DIR / "templates_carnet"
 LOGS_DIR = DATA_DIR / "logs"
+TRACES_DIR = LOGS_DIR / "trazas"
 
 # Directorio de assets y logos (en carpeta de recursos internos)
 ASSETS_DIR = get_resource_path("assets")
@@ -95,6 +103,7 @@ BACKUPS_DIR.mkdir(parents=True, exist_ok=True)
 CARNETS_DIR.mkdir(parents=True, exist_ok=True)
 TEMPLATES_DIR.mkdir(parents=True, exist_ok=True)
 LOGS_DIR.mkdir(parents=True, exist_ok=True)
+TRACES_DIR.mkdir(parents=True, exist_ok=True)
 ASSETS_DIR.mkdir(parents=True, exist_ok=True)
 
 # Configuración de la aplicación
@@ -124,6 +133,116 @@ BARCODE_IMAGE_OPTIONS = {
     'write_text': False  # No mostrar el código de texto debajo del código de barras
 }
 
+# Motor de render de códigos: "python-barcode" (ImageWriter de la librería) o "numpy"
+# (rasterizador vectorizado, opcional: cambia el tamaño de las imágenes generadas)
+BARCODE_ENGINE = os.getenv("BARCODE_ENGINE", "python-barcode").strip().lower()
+# Resolución de destino del rasterizador NumPy (cada módulo ocupa un número entero de píxeles)
+BARCODE_RASTER_DPI = int(os.getenv("BARCODE_RASTER_DPI", "300"))
+# Salida vectorial: los carnets HTML y sus PDF incrustan el código como SVG en lugar del PNG
+BARCODE_VECTOR_OUTPUT = _env_bool("BARCODE_VECTOR_OUTPUT", True)
+# SVGs generados (se derivan de los datos y el formato, pueden borrarse sin perder nada)
+BARCODE_SVG_DIR = DATA_DIR / "cache" / "codigos_svg"
+# Validar primero comparando unas líneas de barrido con la codificación esperada (sin ZBar)
+BARCODE_SCANLINE_VERIFY = _env_bool("BARCODE_SCANLINE_VERIFY", True)
+
+# Backups automáticos de la base de datos
+# Ventana (segundos) en la que varias operaciones críticas comparten un mismo backup
+BACKUP_COALESCE_SECONDS = int(os.getenv("BACKUP_COALESCE_SECONDS", "300"))
+# Comprimir los backups automáticos con gzip (.db.gz)
+BACKUP_COMPRESS = _env_bool("BACKUP_COMPRESS", False)
+# Páginas copiadas por paso del API de backup en línea de SQLite
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+
+# Almacén de imágenes de códigos: niveles de subdirectorios por prefijo de hash
+# (1 = 256 carpetas, 2 = 65536). 0 mantiene todas las imágenes en IMAGES_DIR
+IMAGE_SHARD_DEPTH = int(os.getenv("IMAGE_SHARD_DEPTH", "1"))
+# Backend del almacén: "archivos" (un PNG por código) o "pack" (un único archivo SQLite con BLOBs)
+IMAGE_STORE_BACKEND = os.getenv("IMAGE_STORE_BACKEND", "archivos").strip().lower()
+# Archivo del almacén empaquetado y carpeta donde se materializan las imágenes que se piden por ruta
+IMAGE_PACK_PATH = DATA_DIR / "imagenes_pack.db"
+IMAGE_PACK_CACHE_DIR = DATA_DIR / "cache" / "imagenes_pack"
+# Tamaño máximo (MB) de las copias materializadas; se expulsan las menos usadas
+IMAGE_PACK_CACHE_MAX_MB = int(os.getenv("IMAGE_PACK_CACHE_MAX_MB", "64"))
+# Tamaño máximo (bytes) de la proyección en memoria (mmap) del pack
+IMAGE_PACK_MMAP_SIZE = int(os.getenv("IMAGE_PACK_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Caché de renders de códigos de barras (PNG final + resultado de validación)
+BARCODE_CACHE_ENABLED = _env_bool("BARCODE_CACHE_ENABLED", True)
+BARCODE_CACHE_PATH = DATA_DIR / "cache" / "codigos_render.db"
+# Tamaño máximo de la caché en MB (se expulsan primero las entradas menos usadas)
+BARCODE_CACHE_MAX_MB = int(os.getenv("BARCODE_CACHE_MAX_MB", "200"))
+
+# PDF de carnets con el sistema PIL: escribir textos, barras e imágenes como PDF vectorial
+# en lugar de rasterizar el carnet a 1200 DPI
+CARNET_PDF_VECTORIAL = _env_bool("CARNET_PDF_VECTORIAL", True)
+
+# Hojas de impresión: varios carnets por página en un único PDF, con sangrado y marcas de corte
+# Papel: "A4" o "LETTER"
+CARNET_HOJA_PAPEL = os.getenv("CARNET_HOJA_PAPEL", "A4").strip().upper()
+# Columnas y filas de la cuadrícula (0 = las que quepan en la hoja)
+CARNET_HOJA_COLUMNAS = int(os.getenv("CARNET_HOJA_COLUMNAS", "0"))
+CARNET_HOJA_FILAS = int(os.getenv("CARNET_HOJA_FILAS", "0"))
+# Margen de la hoja, separación entre carnets y sangrado, en milímetros
+CARNET_HOJA_MARGEN_MM = float(os.getenv("CARNET_HOJA_MARGEN_MM", "10"))
+CARNET_HOJA_SEPARACION_MM = float(os.getenv("CARNET_HOJA_SEPARACION_MM", "12"))
+CARNET_HOJA_SANGRADO_MM = float(os.getenv("CARNET_HOJA_SANGRADO_MM", "2"))
+CARNET_HOJA_MARCAS_CORTE = _env_bool("CARNET_HOJA_MARCAS_CORTE", True)
+# Resolución a la que se rasterizan los templates HTML para colocarlos en la hoja
+CARNET_HOJA_DPI_HTML = int(os.getenv("CARNET_HOJA_DPI_HTML", "600"))
+
+# Motor de PDF para templates HTML: "vectorial" (QWebEnginePage.printToPdf, con el render
+# raster como respaldo) o "raster" (captura a 1200 DPI incrustada en el PDF)
+HTML_PDF_ENGINE = os.getenv("HTML_PDF_ENGINE", "vectorial").strip().lower()
+
+# Exportación a ZIP en streaming: hilos de compresión deflate (0 = número de CPUs) y nivel
+# (los PNG y PDF se guardan sin recomprimir)
+ZIP_COMPRESSION_WORKERS = int(os.getenv("ZIP_COMPRESSION_WORKERS", "0"))
+ZIP_DEFLATE_LEVEL = int(os.getenv("ZIP_DEFLATE_LEVEL", "6"))
+
+# Caché de carnets generados: la generación masiva solo vuelve a renderizar los carnets
+# cuyas entradas (template, variables, imágenes, DPI, formato) cambiaron
+CARNET_CACHE_ENABLED = _env_bool("CARNET_CACHE_ENABLED", True)
+CARNET_CACHE_DIR = DATA_DIR / "cache" / "carnets"
+CARNET_CACHE_PATH = DATA_DIR / "cache" / "carnets_render.db"
+# Tamaño máximo de los archivos cacheados en MB (se expulsan primero los menos usados)
+CARNET_CACHE_MAX_MB = int(os.getenv("CARNET_CACHE_MAX_MB", "1024"))
+
+# Vista previa de carnets: milisegundos sin cambios antes de actualizarla y número de
+# vistas previas recientes (por empleado y configuración) que se conservan en memoria
+CARNET_PREVIEW_DEBOUNCE_MS = int(os.getenv("CARNET_PREVIEW_DEBOUNCE_MS", "150"))
+CARNET_PREVIEW_CACHE_SIZE = int(os.getenv("CARNET_PREVIEW_CACHE_SIZE", "16"))
+# Vista previa PIL: mostrar al instante un borrador a resolución de pantalla y renderizar
+# la versión final en segundo plano cuando los cambios se detienen
+CARNET_PREVIEW_DRAFT = _env_bool("CARNET_PREVIEW_DRAFT", True)
+
+# Caché de miniaturas e información de imagen de la vista previa de códigos y servicios
+THUMBNAIL_CACHE_ENABLED = _env_bool("THUMBNAIL_CACHE_ENABLED", True)
+THUMBNAIL_CACHE_PATH = DATA_DIR / "cache" / "miniaturas.db"
+# Tamaño máximo de las miniaturas en disco en MB (se expulsan primero las menos usadas)
+THUMBNAIL_CACHE_MAX_MB = int(os.getenv("THUMBNAIL_CACHE_MAX_MB", "50"))
+
+# Fotos de empleados normalizadas (orientación EXIF, recorte y tamaño de la caja del
+# template a cada DPI), cacheadas por el hash de la foto original
+PHOTO_CACHE_ENABLED = _env_bool("PHOTO_CACHE_ENABLED", True)
+PHOTO_CACHE_DIR = DATA_DIR / "cache" / "fotos"
+PHOTO_CACHE_PATH = DATA_DIR / "cache" / "fotos.db"
+PHOTO_CACHE_MAX_MB = int(os.getenv("PHOTO_CACHE_MAX_MB", "256"))
+# Resolución de la foto en los PDF vectoriales y lado máximo (px) en los templates HTML
+PHOTO_PDF_DPI = int(os.getenv("PHOTO_PDF_DPI", "600"))
+PHOTO_HTML_MAX_PX = int(os.getenv("PHOTO_HTML_MAX_PX", "1200"))
+
+# Eliminación lógica (tombstones) de códigos y servicios
+# Si está activa, eliminar solo marca deleted_at; la purga física se hace en segundo plano
+SOFT_DELETE_ENABLED = _env_bool("SOFT_DELETE_ENABLED", True)
+# Antigüedad mínima (segundos) de un registro eliminado antes de purgarlo (permite deshacer)
+PURGE_AFTER_SECONDS = int(os.getenv("PURGE_AFTER_SECONDS", str(7 * 24 * 3600)))
+# Registros purgados por transacción
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "500"))
+
+# Trazas de rendimiento (formato Chrome Trace, visibles en chrome://tracing o Perfetto)
+# Se activan con la variable de entorno TRACE_ENABLED=1
+TRACE_ENABLED = _env_bool("TRACE_ENABLED", False)
+
 # Caracteres inválidos para nombres de archivo
 INVALID_FILENAME_CHARS = ['/', '\\', ':', '*', '?', '"', '<', '>', '|']
 
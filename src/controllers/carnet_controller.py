@@ -1,35 +1,70 @@
 """
 Controlador para el editor de carnet
 """
-import zipfile
+import hashlib
+import json
 import tempfile
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
 from PyQt6.QtWidgets import QMessageBox, QApplication, QFileDialog
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PIL import Image
 
-from src.models.database import DatabaseManager
+from src.models.database import (
+    DatabaseManager, ITEM_COMPLETADO, TRABAJO_EN_CURSO, TRABAJO_CANCELADO,
+    TRABAJO_COMPLETADO, TRABAJO_ABANDONADO
+)
 from src.services.carnet_designer import CarnetDesigner
-from src.services.html_renderer import HTMLRenderer
+from src.services.carnet_pdf import CarnetPDFWriter, HojaCarnetsPDFWriter
+from src.services.carnet_cache import CarnetRenderCache, obtener_carnet_cache
+from src.services.vista_previa import PlantillaVistaPrevia, CacheVistasPrevias
+from src.services.html_renderer import obtener_html_renderer, MOTOR_PDF_VECTORIAL
+from src.services.image_store import obtener_image_store
+from src.services.barcode_service import BarcodeService
+from src.services.zip_stream import ZipStreamWriter, ruta_parcial
+from src.services.trabajador_segundo_plano import TrabajadorUltimaSolicitud
 from src.models.carnet_template import CarnetTemplate
-from config.settings import IMAGES_DIR, CARNETS_DIR
+from config.settings import (
+    CARNETS_DIR, BARCODE_VECTOR_OUTPUT, CARNET_PDF_VECTORIAL, HTML_PDF_ENGINE, CARNET_HOJA_DPI_HTML,
+    CARNET_CACHE_ENABLED, CARNET_PREVIEW_DEBOUNCE_MS, CARNET_PREVIEW_CACHE_SIZE, CARNET_PREVIEW_DRAFT
+)
+from src.utils.tracer import tracer
+from src.utils.html_parser import detectar_variables_en_html
+from src.utils.image_health import analizar_imagen
 from src.views.widgets.carnet_preview_panel import CarnetPreviewPanel
 from src.views.widgets.carnet_controls_panel import CarnetControlsPanel
 from src.views.widgets.carnet_employees_panel import CarnetEmployeesPanel
 
 # Importar OCRVerifier solo si está disponible
 try:
-    from src.services.ocr_verifier import OCRVerifier
+    from src.services.ocr_verifier import OCRVerifier, obtener_verificador_ocr
     OCR_DISPONIBLE = True
 except (ImportError, RuntimeError, OSError) as e:
     # Capturar errores de importación, inicialización o DLL
     OCRVerifier = None
+    obtener_verificador_ocr = None
     OCR_DISPONIBLE = False
     import logging
     logging.getLogger(__name__).warning(f"OCR no disponible: {e}")
 
+# Inicio del mensaje de un carnet que pasó la verificación OCR
+MENSAJE_OCR_VERIFICADO = "Carnet generado y verificado"
+
+
+def _ocr_verificado(mensaje_ocr: Optional[str]) -> bool:
+    """
+    Indica si el mensaje de _generar_carnet_con_verificacion_ocr corresponde a un
+    carnet verificado (el diario del trabajo y el recuento de errores OCR usan este criterio)
+    
+    Args:
+        mensaje_ocr: Mensaje devuelto por la generación
+        
+    Returns:
+        True si el carnet pasó la verificación OCR
+    """
+    return bool(mensaje_ocr) and mensaje_ocr.startswith(MENSAJE_OCR_VERIFICADO)
+
 
 class CarnetController:
     """Controlador para el editor de carnet"""
@@ -54,43 +89,42 @@ class CarnetController:
         
         self.db_manager = DatabaseManager()
         self.designer = CarnetDesigner()
-        self.html_renderer = HTMLRenderer()
+        # Renderizador compartido (precalentado en segundo plano por MainController)
+        self.html_renderer = obtener_html_renderer()
+        self.image_store = obtener_image_store()
+        self.barcode_service = BarcodeService()
         
-        # Inicializar OCR solo si está disponible
-        if OCR_DISPONIBLE:
-            try:
-                self.ocr_verifier = OCRVerifier()
-                self.usar_ocr = True
-                import logging
-                logging.getLogger(__name__).info("✓ Verificación OCR (Tesseract) habilitada")
-            except Exception as e:
-                self.ocr_verifier = None
-                self.usar_ocr = False
-                import logging
-                logger_ocr = logging.getLogger(__name__)
-                logger_ocr.warning("=" * 60)
-                logger_ocr.warning("⚠ OCR NO DISPONIBLE")
-                logger_ocr.warning("=" * 60)
-                logger_ocr.warning(f"Error: {e}")
-                logger_ocr.warning("")
-                logger_ocr.warning("SOLUCIÓN: Instala Visual C++ Redistributables:")
-                logger_ocr.warning("https://aka.ms/vs/17/release/vc_redist.x64.exe")
-                logger_ocr.warning("Luego reinicia la aplicación")
-                logger_ocr.warning("=" * 60)
-        else:
-            self.ocr_verifier = None
-            self.usar_ocr = False
-            import logging
-            logging.getLogger(__name__).warning("⚠ OCR no disponible - generación sin verificación. Instala 'pytesseract' y Tesseract OCR para habilitar verificación.")
+        # El verificador OCR se obtiene al primer uso: el sondeo de Tesseract sigue en
+        # segundo plano y esperar aquí bloquearía la ventana al abrir el editor
+        self._ocr_verifier = None
+        self._usar_ocr = False
+        self._ocr_resuelto = False
         
         self.empleado_actual = None
+        
+        # Vista previa: los cambios seguidos se agrupan en una sola actualización, la página
+        # HTML se parchea en lugar de recargarse y las últimas vistas previas se conservan
+        self._temporizador_vista_previa = QTimer()
+        self._temporizador_vista_previa.setSingleShot(True)
+        self._temporizador_vista_previa.setInterval(CARNET_PREVIEW_DEBOUNCE_MS)
+        self._temporizador_vista_previa.timeout.connect(self._ejecutar_vista_previa)
+        self._cache_vistas_previas = CacheVistasPrevias(CARNET_PREVIEW_CACHE_SIZE)
+        self._plantilla_vista_previa = None
+        self._firma_plantilla_vista_previa = None
+        self._variables_plantilla_vista_previa = set()
+        # Vista previa PIL: borrador inmediato a resolución de pantalla y render final en segundo plano
+        self._refinador_vista_previa = TrabajadorUltimaSolicitud("vista-previa")
+        self._refinador_vista_previa.terminado.connect(self._on_vista_previa_refinada)
+        self._clave_vista_previa_refinada = None
+        
         self._conectar_senales()
         self._cargar_empleados()
         # Establecer callback para actualización cuando cambien variables
         self.controls_panel.establecer_callback_actualizacion(self.actualizar_vista_previa)
         # Actualizar vista previa inicial después de un breve delay
-        from PyQt6.QtCore import QTimer
         QTimer.singleShot(500, self.actualizar_vista_previa)
+        # Asegurar que el template activo quede precargado en el motor de renderizado
+        QTimer.singleShot(1000, self._precalentar_template_actual)
     
     def _desempaquetar_empleado(self, empleado):
         """
@@ -221,6 +255,303 @@ class CarnetController:
         
         return resultado
     
+    def _codigo_barras_para_html(self, emp: dict, codigo_path: Path) -> Path:
+        """
+        Obtiene la imagen del código de barras a incrustar en un template HTML
+        
+        Con BARCODE_VECTOR_OUTPUT se usa el SVG del código, que el motor web dibuja
+        a la resolución de salida sin remuestrear; si no se puede generar se usa el PNG.
+        
+        Args:
+            emp: Datos del empleado desempaquetados
+            codigo_path: Ruta al PNG del código de barras
+            
+        Returns:
+            Ruta al SVG o al PNG del código
+        """
+        if BARCODE_VECTOR_OUTPUT and emp.get('codigo_barras') and emp.get('formato'):
+            ruta_svg = self.barcode_service.obtener_svg(emp['codigo_barras'], emp['formato'])
+            if ruta_svg is not None:
+                return ruta_svg
+        return codigo_path
+    
+    def _agregar_a_zip(self, zip_writer: ZipStreamWriter, ruta: Path,
+                       trabajo_id: Optional[int] = None, emp: Optional[dict] = None,
+                       mensaje_ocr: str = "", carnet_cache: Optional[CarnetRenderCache] = None,
+                       clave_cache: Optional[str] = None) -> None:
+        """
+        Agrega un archivo recién generado al ZIP en curso, elimina la copia temporal
+        y lo anota como completado en el diario del trabajo
+        
+        Args:
+            zip_writer: ZIP de la generación masiva
+            ruta: Archivo generado en el directorio temporal
+            trabajo_id: ID del trabajo en el diario (None = sin diario)
+            emp: Datos del empleado desempaquetados
+            mensaje_ocr: Resultado de la verificación OCR
+            carnet_cache: Caché de carnets donde guardar una copia (None = no cachear)
+            clave_cache: Clave del carnet en la caché (_clave_carnet)
+        """
+        verificado = _ocr_verificado(mensaje_ocr)
+        
+        # Al reanudar, el archivo puede estar ya en el ZIP aunque el diario no llegara a anotarlo
+        if ruta.name not in zip_writer:
+            with tracer.span("zip_agregar", "zip", archivo=ruta.name):
+                zip_writer.agregar_archivo(ruta, ruta.name)
+        if carnet_cache is not None and clave_cache:
+            with tracer.span("cache_guardar", "carnets"):
+                carnet_cache.guardar(clave_cache, ruta, verificado)
+        try:
+            ruta.unlink()
+        except OSError:
+            pass
+        
+        if trabajo_id is not None and emp is not None:
+            # El diario solo se actualiza cuando la entrada ya está en el archivo
+            zip_writer.vaciar()
+            self.db_manager.registrar_item_trabajo(
+                trabajo_id, emp['id_unico'], ITEM_COMPLETADO, ruta.name, verificado, mensaje_ocr or None
+            )
+    
+    def _base_clave_carnet(self, formato: str, dpi: int, html_base: Optional[str] = None,
+                           template: Optional[CarnetTemplate] = None) -> dict:
+        """
+        Reúne las entradas comunes a todos los carnets de una generación masiva para
+        calcular sus claves en la caché de carnets
+        
+        Args:
+            formato: Formato de salida ("png", "pdf")
+            dpi: Resolución del render
+            html_base: Contenido del template HTML (None con el sistema PIL)
+            template: Template PIL (None con templates HTML)
+            
+        Returns:
+            Diccionario de entradas para CarnetRenderCache.calcular_clave()
+        """
+        base = {"formato": formato, "dpi": dpi}
+        if html_base is not None:
+            base["html"] = hashlib.sha256(html_base.encode("utf-8")).hexdigest()
+            if formato == "pdf":
+                base["motor_pdf_html"] = HTML_PDF_ENGINE
+        elif template is not None:
+            base["template"] = template.to_dict()
+            # Las imágenes del template cuentan por su contenido, no por su ruta
+            base["logo"] = Path(template.logo_path) if template.logo_path else None
+            base["fondo"] = Path(template.fondo_imagen_path) if template.fondo_imagen_path else None
+            if formato == "pdf":
+                base["pdf_vectorial"] = CARNET_PDF_VECTORIAL
+        return base
+    
+    def _reutilizar_carnet(self, carnet_cache: Optional[CarnetRenderCache], clave: Optional[str],
+                           zip_writer: ZipStreamWriter, nombre_archivo: str,
+                           trabajo_id: Optional[int], emp: dict) -> bool:
+        """
+        Agrega al ZIP un carnet ya generado en una ejecución anterior con las mismas
+        entradas. Con OCR disponible solo se reutilizan carnets que pasaron la verificación.
+        
+        Args:
+            carnet_cache: Caché de carnets (None = desactivada)
+            clave: Clave del carnet (_clave_carnet)
+            zip_writer: ZIP de la generación masiva
+            nombre_archivo: Nombre del carnet dentro del ZIP
+            trabajo_id: ID del trabajo en el diario
+            emp: Datos del empleado desempaquetados
+            
+        Returns:
+            True si el carnet se tomó de la caché
+        """
+        if carnet_cache is None or not clave:
+            return False
+        ruta_cacheada = carnet_cache.obtener(clave, solo_verificados=bool(self.usar_ocr))
+        if ruta_cacheada is None:
+            return False
+        
+        try:
+            if nombre_archivo not in zip_writer:
+                with tracer.span("zip_agregar", "zip", archivo=nombre_archivo, cache=True):
+                    zip_writer.agregar_archivo(ruta_cacheada, nombre_archivo)
+        except OSError as e:
+            import logging
+            logger_cache = logging.getLogger(__name__)
+            logger_cache.warning(f"No se pudo reutilizar el carnet cacheado de {emp['id_unico']}: {e}")
+            return False
+        
+        if trabajo_id is not None:
+            zip_writer.vaciar()
+            mensaje = "Reutilizado de caché (verificado)" if self.usar_ocr else None
+            self.db_manager.registrar_item_trabajo(
+                trabajo_id, emp['id_unico'], ITEM_COMPLETADO, nombre_archivo, bool(self.usar_ocr), mensaje
+            )
+        return True
+    
+    def _huella_trabajo(self, tipo: str, empleados: list) -> str:
+        """
+        Calcula el hash de los parámetros de una generación masiva; dos ejecuciones con
+        la misma huella producen los mismos carnets y una puede continuar la otra
+        
+        Args:
+            tipo: Tipo de generación ("png", "pdf")
+            empleados: Empleados de la generación, en orden
+            
+        Returns:
+            Hash SHA-256 en hexadecimal
+        """
+        parametros = {
+            "tipo": tipo,
+            "empleados": [
+                emp['id_unico'] for emp in map(self._desempaquetar_empleado, empleados) if emp
+            ],
+            "ocr": bool(self.usar_ocr),
+            "pdf_vectorial": CARNET_PDF_VECTORIAL,
+            "motor_pdf_html": HTML_PDF_ENGINE,
+        }
+        if self.controls_panel.usar_template_html():
+            html_template = self.controls_panel.obtener_html_template()
+            if html_template and html_template.ruta_html:
+                parametros["html"] = hashlib.sha256(Path(html_template.ruta_html).read_bytes()).hexdigest()
+            parametros["variables"] = {
+                var: str(valor) for var, valor in self.controls_panel.obtener_variables_html().items()
+            }
+        else:
+            parametros["template"] = self.controls_panel.obtener_template_actualizado().to_dict()
+        contenido = json.dumps(parametros, sort_keys=True, default=str)
+        return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+    
+    def _ofrecer_reanudar_trabajo(self, tipo: str, huella: str):
+        """
+        Si hay una generación masiva interrumpida con los mismos parámetros, pregunta
+        si se reanuda, se guarda el ZIP parcial o se empieza de nuevo
+        
+        Args:
+            tipo: Tipo de generación ("png", "pdf")
+            huella: Hash de los parámetros (_huella_trabajo)
+            
+        Returns:
+            Tupla (accion, trabajo) con accion "nuevo", "reanudar", "terminado" (el ZIP
+            parcial ya se guardó) o "cancelar", y el trabajo a reanudar
+        """
+        trabajo = self.db_manager.obtener_trabajo_pendiente(tipo, huella)
+        if not trabajo:
+            return "nuevo", None
+        
+        ruta_zip = Path(trabajo['ruta_salida'])
+        if not ruta_parcial(ruta_zip).exists():
+            self.db_manager.actualizar_estado_trabajo(trabajo['id'], TRABAJO_ABANDONADO)
+            return "nuevo", None
+        
+        caja = QMessageBox(self.employees_panel)
+        caja.setIcon(QMessageBox.Icon.Question)
+        caja.setWindowTitle("Generación interrumpida")
+        caja.setText(
+            f"Hay una generación masiva interrumpida con esta misma configuración:\n"
+            f"{trabajo['completados']} de {trabajo['total']} carnet(s) ya generados en\n{ruta_zip}\n\n"
+            f"¿Qué desea hacer?"
+        )
+        boton_reanudar = caja.addButton("Reanudar", QMessageBox.ButtonRole.AcceptRole)
+        boton_guardar = caja.addButton("Guardar ZIP parcial", QMessageBox.ButtonRole.ActionRole)
+        boton_nuevo = caja.addButton("Empezar de nuevo", QMessageBox.ButtonRole.DestructiveRole)
+        caja.addButton(QMessageBox.StandardButton.Cancel)
+        caja.setDefaultButton(boton_reanudar)
+        caja.exec()
+        pulsado = caja.clickedButton()
+        
+        if pulsado == boton_reanudar:
+            return "reanudar", trabajo
+        if pulsado == boton_guardar:
+            try:
+                zip_writer = ZipStreamWriter(ruta_zip, reanudar=True)
+                archivos = zip_writer.entradas
+                zip_writer.cerrar()
+            except Exception as e:
+                QMessageBox.critical(self.employees_panel, "Error", f"No se pudo guardar el ZIP parcial:\n{e}")
+                return "cancelar", None
+            self.db_manager.actualizar_estado_trabajo(trabajo['id'], TRABAJO_COMPLETADO)
+            QMessageBox.information(
+                self.employees_panel,
+                "Resultado",
+                f"ZIP parcial guardado con {archivos} archivo(s) en:\n{ruta_zip}"
+            )
+            return "terminado", None
+        if pulsado == boton_nuevo:
+            try:
+                ruta_parcial(ruta_zip).unlink()
+            except OSError:
+                pass
+            self.db_manager.actualizar_estado_trabajo(trabajo['id'], TRABAJO_ABANDONADO)
+            return "nuevo", None
+        return "cancelar", None
+    
+    def _escribir_carnet_pdf_vectorial(self, template: CarnetTemplate, emp: dict,
+                                       codigo_path: Path, ruta_pdf: Path) -> bool:
+        """
+        Escribe el carnet de un empleado como PDF vectorial (sistema PIL)
+        
+        Args:
+            template: Plantilla de diseño
+            emp: Datos del empleado desempaquetados
+            codigo_path: Ruta al PNG del código de barras
+            ruta_pdf: Ruta del PDF de salida
+            
+        Returns:
+            True si el PDF se escribió correctamente
+        """
+        writer = CarnetPDFWriter()
+        writer.agregar_carnet(
+            template=template,
+            nombre_empleado=emp['nombre_empleado'] or "SIN NOMBRE",
+            codigo_barras_path=str(codigo_path),
+            empresa=template.empresa_texto if template.mostrar_empresa else None,
+            web=template.web_texto if template.mostrar_web else None,
+            patron_codigo=self.barcode_service.obtener_patron(emp['codigo_barras'], emp['formato'])
+        )
+        return writer.guardar(ruta_pdf)
+    
+    def _resolver_ocr(self):
+        """Obtiene el verificador OCR compartido la primera vez que se necesita"""
+        if self._ocr_resuelto:
+            return
+        self._ocr_resuelto = True
+        
+        # Inicializar OCR solo si está disponible
+        if OCR_DISPONIBLE:
+            try:
+                # Reutiliza el verificador sondeado en segundo plano tras el login
+                self._ocr_verifier = obtener_verificador_ocr()
+                if self._ocr_verifier is None:
+                    raise RuntimeError("No se pudo inicializar el verificador OCR")
+                self._usar_ocr = True
+                import logging
+                logging.getLogger(__name__).info("✓ Verificación OCR (Tesseract) habilitada")
+            except Exception as e:
+                self._ocr_verifier = None
+                self._usar_ocr = False
+                import logging
+                logger_ocr = logging.getLogger(__name__)
+                logger_ocr.warning("=" * 60)
+                logger_ocr.warning("⚠ OCR NO DISPONIBLE")
+                logger_ocr.warning("=" * 60)
+                logger_ocr.warning(f"Error: {e}")
+                logger_ocr.warning("")
+                logger_ocr.warning("SOLUCIÓN: Instala Visual C++ Redistributables:")
+                logger_ocr.warning("https://aka.ms/vs/17/release/vc_redist.x64.exe")
+                logger_ocr.warning("Luego reinicia la aplicación")
+                logger_ocr.warning("=" * 60)
+        else:
+            import logging
+            logging.getLogger(__name__).warning("⚠ OCR no disponible - generación sin verificación. Instala 'pytesseract' y Tesseract OCR para habilitar verificación.")
+    
+    @property
+    def ocr_verifier(self):
+        """Verificador OCR compartido (None si OCR no está disponible)"""
+        self._resolver_ocr()
+        return self._ocr_verifier
+    
+    @property
+    def usar_ocr(self) -> bool:
+        """Indica si los carnets se verifican con OCR"""
+        self._resolver_ocr()
+        return self._usar_ocr
+    
     def _conectar_senales(self):
         """Conecta las señales de los widgets"""
         # Controles que actualizan la vista previa
@@ -255,6 +586,7 @@ class CarnetController:
         self.employees_panel.boton_generar_masivo.clicked.connect(self.generar_carnets_masivos)
         self.employees_panel.boton_generar_individual_pdf.clicked.connect(self.generar_carnet_individual_pdf)
         self.employees_panel.boton_generar_masivo_pdf.clicked.connect(self.generar_carnets_masivos_pdf)
+        self.employees_panel.boton_generar_hojas_pdf.clicked.connect(self.generar_hojas_impresion_pdf)
         self.employees_panel.campo_busqueda.textChanged.connect(self.buscar_empleados)
     
     def _cargar_empleados(self):
@@ -284,7 +616,11 @@ class CarnetController:
             self.empleado_actual = empleado
             # Actualizar variables en el panel de controles con datos del empleado
             self._actualizar_variables_desde_empleado(empleado)
-            self.actualizar_vista_previa()
+            # Si la vista previa de este empleado está en caché se muestra sin esperar
+            if self._ejecutar_vista_previa(solo_cache=True):
+                self._temporizador_vista_previa.stop()
+            else:
+                self.actualizar_vista_previa()
     
     def _actualizar_variables_desde_empleado(self, empleado):
         """Actualiza las variables del panel con datos del empleado seleccionado"""
@@ -292,7 +628,7 @@ class CarnetController:
         if not emp:
             return
         
-        codigo_path = IMAGES_DIR / emp['nombre_archivo']
+        codigo_path = self.image_store.ruta(emp['nombre_archivo'])
         
         # Actualizar campos de variables dinámicamente
         if emp['nombre_empleado'] and "nombre" in self.controls_panel.campos_variables:
@@ -332,16 +668,84 @@ class CarnetController:
                 else:
                     campo_codigo["campo"].setText("No disponible")
     
+    def motor_html_listo(self) -> bool:
+        """
+        Indica si el motor de renderizado HTML ya está precalentado
+        
+        Returns:
+            True si la próxima generación HTML no pagará el costo de arranque
+        """
+        return self.html_renderer.esta_listo()
+    
+    def _precalentar_template_actual(self):
+        """Precarga el template HTML activo en el renderizador compartido"""
+        html_template = self.controls_panel.obtener_html_template()
+        if html_template and html_template.ruta_html:
+            self.html_renderer.precalentar(
+                Path(html_template.ruta_html),
+                html_template.ancho,
+                html_template.alto
+            )
+    
     def actualizar_vista_previa(self):
-        """Actualiza la vista previa del carnet"""
+        """
+        Programa la actualización de la vista previa del carnet. Los cambios que llegan
+        seguidos (teclear en un campo, mover un control) se agrupan en una sola
+        actualización tras CARNET_PREVIEW_DEBOUNCE_MS milisegundos sin cambios.
+        Con el sistema PIL se muestra antes un borrador a resolución de pantalla.
+        """
+        if CARNET_PREVIEW_DRAFT and not self.controls_panel.usar_template_html():
+            self._mostrar_borrador_pil()
+        self._temporizador_vista_previa.start()
+    
+    def _ejecutar_vista_previa(self, solo_cache: bool = False) -> bool:
+        """
+        Actualiza la vista previa del carnet
+        
+        Args:
+            solo_cache: Mostrarla solo si ya está en la caché de vistas previas
+            
+        Returns:
+            True si la vista previa se actualizó
+        """
         # Verificar si se está usando template HTML
         if self.controls_panel.usar_template_html():
-            self._actualizar_vista_previa_html()
-        else:
-            self._actualizar_vista_previa_pil()
+            return self._actualizar_vista_previa_html(solo_cache)
+        return self._actualizar_vista_previa_pil(solo_cache)
+    
+    def _obtener_plantilla_vista_previa(self, ruta_html: Path) -> PlantillaVistaPrevia:
+        """
+        Obtiene el template HTML marcado para la vista previa; solo se vuelve a leer
+        y a marcar si el archivo cambió
+        
+        Args:
+            ruta_html: Ruta del template HTML
+            
+        Returns:
+            Plantilla de la vista previa
+        """
+        estado = ruta_html.stat()
+        firma = (str(ruta_html), estado.st_mtime_ns, estado.st_size)
+        if self._plantilla_vista_previa is None or self._firma_plantilla_vista_previa != firma:
+            self._plantilla_vista_previa = PlantillaVistaPrevia(ruta_html.read_text(encoding='utf-8'))
+            self._firma_plantilla_vista_previa = firma
+            self._variables_plantilla_vista_previa = detectar_variables_en_html(
+                self._plantilla_vista_previa.html_base
+            )
+            # Los valores cacheados pertenecen a la plantilla anterior
+            self._cache_vistas_previas.limpiar()
+        return self._plantilla_vista_previa
     
-    def _actualizar_vista_previa_html(self):
-        """Actualiza la vista previa usando template HTML"""
+    def _actualizar_vista_previa_html(self, solo_cache: bool = False) -> bool:
+        """
+        Actualiza la vista previa usando template HTML
+        
+        Args:
+            solo_cache: Mostrarla solo si ya está en la caché de vistas previas
+            
+        Returns:
+            True si la vista previa se actualizó
+        """
         import logging
         logger = logging.getLogger(__name__)
         
@@ -349,25 +753,26 @@ class CarnetController:
         if not html_template:
             logger.warning("No hay template HTML disponible")
             self.preview_panel.label_preview.setText("Error: No hay template HTML cargado")
-            return
+            return False
         
         if not html_template.ruta_html:
             logger.warning("El template HTML no tiene ruta definida")
             self.preview_panel.label_preview.setText("Error: Template HTML sin ruta")
-            return
+            return False
         
         # Verificar que el archivo existe
         ruta_path = Path(html_template.ruta_html)
         if not ruta_path.exists():
             logger.error(f"El archivo HTML no existe: {html_template.ruta_html}")
             self.preview_panel.label_preview.setText(f"Error: Archivo HTML no encontrado: {ruta_path.name}")
-            return
+            return False
         
         # Obtener variables del panel de controles (editadas por usuario)
         variables_usuario = self.controls_panel.obtener_variables_html()
         
-        # Obtener todas las variables detectadas en el template
-        variables_template = html_template.detectar_variables()
+        # Obtener todas las variables detectadas en el template (leído solo si cambió)
+        plantilla = self._obtener_plantilla_vista_previa(ruta_path)
+        variables_template = self._variables_plantilla_vista_previa
         
         # Preparar variables (combinar datos del empleado con variables del usuario)
         variables = {}
@@ -376,10 +781,10 @@ class CarnetController:
         if self.empleado_actual:
             emp = self._desempaquetar_empleado(self.empleado_actual)
             if not emp:
-                return
+                return False
             
             nombre = emp['nombre_empleado'] or "SIN NOMBRE"
-            codigo_path = IMAGES_DIR / emp['nombre_archivo'] if emp['nombre_archivo'] else Path("")
+            codigo_path = self.image_store.ruta(emp['nombre_archivo']) if emp['nombre_archivo'] else Path("")
             
             # ID único siempre se obtiene del empleado
             if "id_unico" in variables_template:
@@ -392,7 +797,7 @@ class CarnetController:
             
             # Código de barras como imagen
             if "codigo_barras" in variables_template:
-                variables["codigo_barras"] = codigo_path if codigo_path and codigo_path.exists() else Path("")
+                variables["codigo_barras"] = self._codigo_barras_para_html(emp, codigo_path) if codigo_path and codigo_path.exists() else Path("")
                 # Actualizar campo en la UI si existe
                 if "codigo_barras" in self.controls_panel.campos_variables:
                     campo_codigo = self.controls_panel.campos_variables["codigo_barras"]
@@ -473,24 +878,27 @@ class CarnetController:
         try:
             import logging
             logger = logging.getLogger(__name__)
-            logger.info(f"Cargando HTML desde: {html_template.ruta_html}")
-            logger.info(f"Variables: {variables}")
             
-            # Leer HTML y inyectar variables
-            ruta_path = Path(html_template.ruta_html)
-            html_content = ruta_path.read_text(encoding='utf-8')
+            # Valores inyectables (imágenes en base64) de la caché o preparados ahora
+            id_empleado = emp['id_unico'] if self.empleado_actual else None
+            clave = ("html", id_empleado, CarnetRenderCache.calcular_clave(variables=variables))
+            valores = self._cache_vistas_previas.obtener(clave)
+            if valores is None:
+                if solo_cache:
+                    return False
+                valores = self.html_renderer.preparar_valores(variables)
+                self._cache_vistas_previas.guardar(clave, valores)
             
-            # Inyectar variables usando el renderizador
-            html_content = self.html_renderer._inyectar_variables(html_content, variables)
-            
-            # Mostrar HTML directamente en la vista previa
-            self.preview_panel.actualizar_preview_html(
-                html_content=html_content,
+            # Con la misma plantilla cargada solo se parchean las variables que cambiaron
+            self.preview_panel.mostrar_plantilla_html(
+                plantilla,
+                valores,
                 ancho=html_template.ancho,
                 alto=html_template.alto
             )
             
-            logger.info("HTML cargado en vista previa exitosamente")
+            logger.debug("Vista previa HTML actualizada")
+            return True
         except Exception as e:
             import logging
             logger = logging.getLogger(__name__)
@@ -498,41 +906,126 @@ class CarnetController:
             if hasattr(self.preview_panel, 'label_preview'):
                 self.preview_panel.label_preview.setText(f"Error: {str(e)}")
                 self.preview_panel.label_preview.show()
+            return False
     
-    def _actualizar_vista_previa_pil(self):
-        """Actualiza la vista previa usando template PIL (sistema antiguo)"""
+    def _entradas_vista_previa_pil(self):
+        """
+        Reúne las entradas de la vista previa PIL del empleado actual
+        
+        Returns:
+            Tupla (clave de caché, argumentos de renderizar_carnet), o None si los
+            datos del empleado están incompletos
+        """
         if not self.empleado_actual:
             nombre = "EJEMPLO"
             codigo_path = None
+            id_empleado = None
         else:
             emp = self._desempaquetar_empleado(self.empleado_actual)
             if not emp:
-                nombre = "SIN NOMBRE"
-                codigo_path = None
-                return
+                return None
             
             nombre = emp['nombre_empleado'] or "SIN NOMBRE"
-            codigo_path = IMAGES_DIR / emp['nombre_archivo']
+            codigo_path = self.image_store.ruta(emp['nombre_archivo'])
+            id_empleado = emp['id_unico']
         
         # Obtener template actualizado
         template = self.controls_panel.obtener_template_actualizado()
+        codigo_existente = codigo_path if codigo_path and codigo_path.exists() else None
+        
+        clave = ("pil", id_empleado, CarnetRenderCache.calcular_clave(
+            **self._base_clave_carnet("png", 300, template=template),
+            nombre=nombre, codigo=codigo_existente
+        ))
+        argumentos = {
+            "template": template,
+            "nombre_empleado": nombre,
+            "codigo_barras_path": str(codigo_existente) if codigo_existente else None,
+            "empresa": template.empresa_texto if template.mostrar_empresa else None,
+            "web": template.web_texto if template.mostrar_web else None,
+        }
+        return clave, argumentos
+    
+    def _mostrar_vista_previa_pil(self, imagen):
+        """Muestra una imagen PIL en la vista previa si no es la que ya se muestra"""
+        if self.preview_panel.usando_html or imagen is not self.preview_panel.imagen_actual:
+            self.preview_panel.actualizar_preview(imagen)
+    
+    def _mostrar_borrador_pil(self):
+        """
+        Muestra al instante un borrador de la vista previa PIL renderizado a la
+        resolución de pantalla con remuestreo rápido (o el render final si ya está en caché)
+        """
+        try:
+            entradas = self._entradas_vista_previa_pil()
+            if entradas is None:
+                return
+            clave, argumentos = entradas
+            imagen = self._cache_vistas_previas.obtener(clave)
+            if imagen is None:
+                # El render final pendiente ya no corresponde a estas entradas
+                self._refinador_vista_previa.cancelar()
+                escala = self.preview_panel.escala_borrador(argumentos["template"].ancho)
+                if escala >= 1.0:
+                    # Con zoom alto el borrador costaría lo mismo que el render final
+                    return
+                with tracer.span("vista_previa_borrador", "carnets"):
+                    imagen = self.designer.renderizar_carnet(**argumentos, escala=escala, borrador=True)
+            self._mostrar_vista_previa_pil(imagen)
+        except Exception as e:
+            import logging
+            logging.getLogger(__name__).warning(f"Error al generar el borrador de la vista previa: {e}")
+    
+    def _actualizar_vista_previa_pil(self, solo_cache: bool = False) -> bool:
+        """
+        Actualiza la vista previa usando template PIL (sistema antiguo). Con
+        CARNET_PREVIEW_DRAFT el render final se hace en segundo plano y sustituye al
+        borrador cuando termina.
         
-        # Renderizar carnet
+        Args:
+            solo_cache: Mostrarla solo si ya está en la caché de vistas previas
+            
+        Returns:
+            True si la vista previa se actualizó (o se encargó su render final)
+        """
+        # Renderizar carnet (o reutilizar el último render con las mismas entradas)
         try:
-            imagen = self.designer.renderizar_carnet(
-                template=template,
-                nombre_empleado=nombre,
-                codigo_barras_path=str(codigo_path) if codigo_path and codigo_path.exists() else None,
-                empresa=template.empresa_texto if template.mostrar_empresa else None,
-                web=template.web_texto if template.mostrar_web else None
-            )
-            self.preview_panel.actualizar_preview(imagen)
+            entradas = self._entradas_vista_previa_pil()
+            if entradas is None:
+                return False
+            clave, argumentos = entradas
+            imagen = self._cache_vistas_previas.obtener(clave)
+            if imagen is not None:
+                self._refinador_vista_previa.cancelar()
+                self._mostrar_vista_previa_pil(imagen)
+                return True
+            if solo_cache:
+                return False
+            
+            if CARNET_PREVIEW_DRAFT:
+                self._clave_vista_previa_refinada = clave
+                self._refinador_vista_previa.solicitar(lambda: self.designer.renderizar_carnet(**argumentos))
+                return True
+            
+            imagen = self.designer.renderizar_carnet(**argumentos)
+            self._cache_vistas_previas.guardar(clave, imagen)
+            self._mostrar_vista_previa_pil(imagen)
+            return True
         except Exception as e:
             QMessageBox.warning(
                 self.employees_panel,
                 "Error",
                 f"Error al generar vista previa: {str(e)}"
             )
+            return False
+    
+    def _on_vista_previa_refinada(self, turno: int, imagen):
+        """Sustituye el borrador por el render final si sigue correspondiendo a las entradas actuales"""
+        if imagen is None or not self._refinador_vista_previa.es_vigente(turno):
+            return
+        self._cache_vistas_previas.guardar(self._clave_vista_previa_refinada, imagen)
+        if not self.controls_panel.usar_template_html():
+            self._mostrar_vista_previa_pil(imagen)
     
     def mostrar_vista_previa_empleado(self):
         """Muestra la vista previa del empleado seleccionado"""
@@ -600,7 +1093,7 @@ class CarnetController:
         QApplication.processEvents()
         
         # Ruta del código de barras
-        codigo_path = IMAGES_DIR / emp['nombre_archivo']
+        codigo_path = self.image_store.ruta(emp['nombre_archivo'])
         if not codigo_path.exists():
             QMessageBox.warning(
                 self.employees_panel,
@@ -632,7 +1125,7 @@ class CarnetController:
                 if "id_unico" in variables_template:
                     variables["id_unico"] = emp['id_unico']
                 if "codigo_barras" in variables_template:
-                    variables["codigo_barras"] = codigo_path
+                    variables["codigo_barras"] = self._codigo_barras_para_html(emp, codigo_path)
                 if "nombre" in variables_template:
                     variables["nombre"] = variables_usuario.get("nombre", nombre) or nombre
                 if "nombres" in variables_template:
@@ -724,21 +1217,18 @@ class CarnetController:
                     # Verificar que la imagen no esté completamente en blanco
                     ancho_img, alto_img = imagen.size
                     if ancho_img > 100 and alto_img > 100:
-                        from PIL import ImageStat
-                        stat = ImageStat.Stat(imagen)
-                        if len(stat.mean) >= 3:
-                            media_r, media_g, media_b = stat.mean[0], stat.mean[1], stat.mean[2]
-                            # Si la media es muy cercana a 255 en todos los canales, está en blanco
-                            if media_r > 250 and media_g > 250 and media_b > 250:
-                                logger.warning(f"Intento {intento}: Imagen en blanco detectada (R:{media_r:.1f}, G:{media_g:.1f}, B:{media_b:.1f})")
-                                if intento < max_reintentos:
-                                    progress.actualizar_progreso(intento, max_reintentos, f"Imagen en blanco detectada, reintentando ({intento}/{max_reintentos})...")
-                                    QApplication.processEvents()
-                                    imagen = None  # Marcar para reintentar
-                                    continue
-                                else:
-                                    logger.error("Imagen en blanco después de todos los intentos")
-                                    break
+                        # Sobre una muestra reducida de la imagen, no sobre los píxeles a 1200 DPI
+                        salud = analizar_imagen(imagen)
+                        if salud['en_blanco']:
+                            logger.warning(f"Intento {intento}: Imagen en blanco detectada (contenido: {salud['fraccion_contenido']:.2%})")
+                            if intento < max_reintentos:
+                                progress.actualizar_progreso(intento, max_reintentos, f"Imagen en blanco detectada, reintentando ({intento}/{max_reintentos})...")
+                                QApplication.processEvents()
+                                imagen = None  # Marcar para reintentar
+                                continue
+                            else:
+                                logger.error("Imagen en blanco después de todos los intentos")
+                                break
                     
                     # Si llegamos aquí, la imagen es válida
                     logger.info(f"✓ Imagen renderizada correctamente en intento {intento}: {imagen.size}")
@@ -930,9 +1420,11 @@ class CarnetController:
         # Si OCR no está disponible o no se quiere verificar, simplemente generar
         if not verificar_ocr or not self.usar_ocr or not self.ocr_verifier:
             try:
-                imagen = funcion_generacion()
+                with tracer.span("render", "carnets"):
+                    imagen = funcion_generacion()
                 if imagen:
-                    imagen.save(ruta_salida, "PNG", dpi=(600, 600), optimize=False, compress_level=1)
+                    with tracer.span("codificar_png", "carnets"):
+                        imagen.save(ruta_salida, "PNG", dpi=(600, 600), optimize=False, compress_level=1)
                     return True, "Carnet generado exitosamente (sin verificación OCR)", ruta_salida
                 else:
                     return False, "Error al generar carnet", None
@@ -959,7 +1451,8 @@ class CarnetController:
                     return False, "Generación cancelada por el usuario", None
                 
                 # Generar imagen
-                imagen = funcion_generacion()
+                with tracer.span("render", "carnets", intento=intento):
+                    imagen = funcion_generacion()
                 
                 # Verificar cancelación después de generar
                 if progress_dialog and hasattr(progress_dialog, 'fue_cancelado') and progress_dialog.fue_cancelado():
@@ -974,7 +1467,8 @@ class CarnetController:
                     continue
                 
                 # Guardar imagen temporal para verificación
-                imagen.save(ruta_salida, "PNG", dpi=(600, 600), optimize=False, compress_level=1)
+                with tracer.span("codificar_png", "carnets", intento=intento):
+                    imagen.save(ruta_salida, "PNG", dpi=(600, 600), optimize=False, compress_level=1)
                 
                 # Preparar datos esperados para OCR
                 datos_esperados = {}
@@ -993,17 +1487,18 @@ class CarnetController:
                 if callback_progreso:
                     callback_progreso(f"Verificando con OCR (intento {intento}/{max_reintentos})...")
                 logger.info(f"Verificando carnet con OCR (intento {intento})...")
-                exito_ocr, mensaje_ocr, detalles = self.ocr_verifier.verificar_carnet(
-                    ruta_salida,
-                    datos_esperados,
-                    umbral_similitud=0.65  # Umbral más bajo para tolerar errores menores de OCR
-                )
+                with tracer.span("ocr", "carnets", intento=intento):
+                    exito_ocr, mensaje_ocr, detalles = self.ocr_verifier.verificar_carnet(
+                        ruta_salida,
+                        datos_esperados,
+                        umbral_similitud=0.65  # Umbral más bajo para tolerar errores menores de OCR
+                    )
                 
                 if exito_ocr:
                     logger.info(f"✓ Carnet verificado correctamente en intento {intento}")
                     if callback_progreso:
                         callback_progreso(f"✓ Verificado correctamente")
-                    return True, f"Carnet generado y verificado: {mensaje_ocr}", ruta_salida
+                    return True, f"{MENSAJE_OCR_VERIFICADO}: {mensaje_ocr}", ruta_salida
                 else:
                     logger.warning(f"✗ Intento {intento} falló verificación: {mensaje_ocr}")
                     logger.warning(f"Detalles de verificación: {detalles}")
@@ -1060,24 +1555,33 @@ class CarnetController:
         if respuesta != QMessageBox.StandardButton.Yes:
             return
         
-        # Pedir al usuario dónde guardar el ZIP
-        fecha_hora = datetime.now().strftime("%Y%m%d_%H%M%S")
-        nombre_zip_default = f"carnets_masivos_{fecha_hora}.zip"
+        # Un trabajo interrumpido con la misma configuración se puede reanudar
+        huella = self._huella_trabajo("png", empleados)
+        accion, trabajo = self._ofrecer_reanudar_trabajo("png", huella)
+        if accion in ("cancelar", "terminado"):
+            return
         
-        ruta_zip, _ = QFileDialog.getSaveFileName(
-            self.employees_panel,
-            "Guardar Carnets en ZIP",
-            nombre_zip_default,
-            "Archivos ZIP (*.zip);;Todos los archivos (*)"
-        )
+        if trabajo:
+            ruta_zip_path = Path(trabajo['ruta_salida'])
+        else:
+            # Pedir al usuario dónde guardar el ZIP
+            fecha_hora = datetime.now().strftime("%Y%m%d_%H%M%S")
+            nombre_zip_default = f"carnets_masivos_{fecha_hora}.zip"
         
-        if not ruta_zip:
-            return
+            ruta_zip, _ = QFileDialog.getSaveFileName(
+                self.employees_panel,
+                "Guardar Carnets en ZIP",
+                nombre_zip_default,
+                "Archivos ZIP (*.zip);;Todos los archivos (*)"
+            )
+        
+            if not ruta_zip:
+                return
         
-        # Asegurar que tenga extensión .zip
-        ruta_zip_path = Path(ruta_zip)
-        if ruta_zip_path.suffix.lower() != '.zip':
-            ruta_zip_path = ruta_zip_path.with_suffix('.zip')
+            # Asegurar que tenga extensión .zip
+            ruta_zip_path = Path(ruta_zip)
+            if ruta_zip_path.suffix.lower() != '.zip':
+                ruta_zip_path = ruta_zip_path.with_suffix('.zip')
         
         # Mostrar diálogo de progreso
         from src.views.widgets.progress_dialog import ProgressDialog
@@ -1091,14 +1595,33 @@ class CarnetController:
         errores = 0
         total = len(empleados)
         errores_ocr = 0  # Contador de errores de OCR
+        reutilizados = 0  # Carnets tomados de la caché sin volver a renderizar
         ocr_usado_exitosamente = False  # Flag para saber si OCR funcionó al menos una vez
         
-        # Crear directorio temporal para almacenar carnets antes de comprimir
+        # Cada archivo se agrega al ZIP en cuanto se genera; el directorio temporal solo
+        # contiene el archivo en curso (la verificación OCR trabaja sobre el archivo)
         directorio_temp = None
-        archivos_generados = []
+        zip_writer = None
+        trabajo_id = None
         
+        tracer.iniciar_sesion("carnets_masivos")
         try:
             directorio_temp = Path(tempfile.mkdtemp(prefix="carnets_temp_"))
+            zip_writer = ZipStreamWriter(ruta_zip_path, reanudar=trabajo is not None)
+            
+            # Diario del trabajo: al reanudar se saltan los empleados cuyo archivo ya está en el ZIP
+            if trabajo:
+                trabajo_id = trabajo['id']
+                completados = {
+                    id_unico: archivo
+                    for id_unico, archivo in self.db_manager.obtener_items_completados(trabajo_id).items()
+                    if archivo in zip_writer
+                }
+                self.db_manager.actualizar_estado_trabajo(trabajo_id, TRABAJO_EN_CURSO, total)
+            else:
+                trabajo_id = self.db_manager.crear_trabajo_masivo("png", huella, str(ruta_zip_path), total)
+                completados = {}
+            exitosos = len(completados)
             
             # Verificar si se está usando template HTML
             usar_html = self.controls_panel.usar_template_html()
@@ -1119,16 +1642,17 @@ class CarnetController:
                 
                 # Leer HTML base una sola vez
                 html_base = Path(html_template.ruta_html).read_text(encoding='utf-8')
-                
-                # Valores por defecto
-                valores_default = {
-                    "empresa": "Mi Empresa",
-                    "web": "www.ejemplo.com"
-                }
             else:
                 # Obtener template PIL
                 template = self.controls_panel.obtener_template_actualizado()
             
+            # Caché de carnets: solo se renderizan los empleados cuyas entradas cambiaron
+            carnet_cache = obtener_carnet_cache() if CARNET_CACHE_ENABLED else None
+            if usar_html:
+                base_clave = self._base_clave_carnet("png", 600, html_base=html_base)
+            else:
+                base_clave = self._base_clave_carnet("png", 300, template=template)
+            
             for indice, empleado in enumerate(empleados, 1):
                 # Verificar si se canceló
                 if progress.fue_cancelado():
@@ -1156,64 +1680,24 @@ class CarnetController:
                 if progress.fue_cancelado():
                     logger.info("Generación masiva cancelada por el usuario")
                     break
+                tracer.inicio("empleado", "carnets", indice=indice)
                 try:
                     # Desempaquetar usando función auxiliar
-                    emp = self._desempaquetar_empleado(empleado)
+                    with tracer.span("cargar_empleado", "carnets"):
+                        emp = self._desempaquetar_empleado(empleado)
                     if not emp:
                         errores += 1
                         continue
+                    if emp['id_unico'] in completados:
+                        continue
                     
-                    codigo_path = IMAGES_DIR / emp['nombre_archivo']
+                    codigo_path = self.image_store.ruta(emp['nombre_archivo'])
                     if not codigo_path.exists():
                         errores += 1
                         continue
                     
                     if usar_html:
-                        # Usar renderizado HTML
-                        variables = {}
-                        
-                        # Datos del empleado - EN GENERACIÓN MASIVA USAR SOLO DATOS DEL EMPLEADO, NO DE PANTALLA
-                        # IMPORTANTE: Usar directamente los datos del empleado actual, NO los de la pantalla
-                        nombre = emp['nombre_empleado'] or "SIN NOMBRE"
-                        if "id_unico" in variables_template:
-                            variables["id_unico"] = emp['id_unico'] or ""
-                        if "codigo_barras" in variables_template:
-                            variables["codigo_barras"] = codigo_path
-                        if "nombre" in variables_template:
-                            variables["nombre"] = nombre
-                        if "nombres" in variables_template:
-                            # FORZAR uso del nombre del empleado actual, no de pantalla
-                            variables["nombres"] = emp.get('nombres') or ""
-                        if "apellidos" in variables_template:
-                            # FORZAR uso del apellido del empleado actual, no de pantalla
-                            variables["apellidos"] = emp.get('apellidos') or ""
-                        if "descripcion" in variables_template:
-                            variables["descripcion"] = emp.get('descripcion') or ""
-                        
-                        # Logo y foto - ESTOS SÍ vienen de pantalla (son globales)
-                        if "logo" in variables_template:
-                            logo_path = variables_usuario.get("logo")
-                            if logo_path and isinstance(logo_path, Path) and logo_path.exists():
-                                variables["logo"] = logo_path
-                            else:
-                                variables["logo"] = Path("")
-                        if "foto" in variables_template:
-                            variables["foto"] = Path("")
-                        
-                        # Otras variables globales (empresa, web, cargo, etc.) - NO los datos del empleado
-                        for var in variables_template:
-                            if var not in {"id_unico", "codigo_barras", "foto", "logo", "nombre", "nombres", "apellidos", "descripcion"}:
-                                if var not in variables:
-                                    valor = variables_usuario.get(var, "")
-                                    if isinstance(valor, Path):
-                                        variables[var] = valor
-                                    else:
-                                        variables[var] = str(valor) or ""
-                        
-                        # Aplicar valores por defecto
-                        for var, default in valores_default.items():
-                            if var in variables_template and (not variables.get(var) or variables[var] == ""):
-                                variables[var] = default
+                        variables = self._variables_html_empleado(emp, codigo_path, variables_template, variables_usuario)
                         
                         # Logging para debug
                         import logging
@@ -1223,7 +1707,8 @@ class CarnetController:
                         logger_debug.info(f"Variables antes de inyectar: nombres={variables.get('nombres')}, apellidos={variables.get('apellidos')}, descripcion={variables.get('descripcion')}")
                         
                         # Inyectar variables en HTML
-                        html_content = self.html_renderer._inyectar_variables(html_base, variables)
+                        with tracer.span("inyectar_variables", "carnets"):
+                            html_content = self.html_renderer._inyectar_variables(html_base, variables)
                         
                         # Preparar nombre y ruta del carnet
                         from src.utils.file_utils import limpiar_nombre_archivo
@@ -1231,6 +1716,13 @@ class CarnetController:
                         nombre_archivo_carnet = f"carnet_{nombre_limpio}_{emp['id_unico']}.png"
                         ruta_carnet = directorio_temp / nombre_archivo_carnet
                         
+                        clave_cache = CarnetRenderCache.calcular_clave(**base_clave, variables=variables)
+                        if self._reutilizar_carnet(carnet_cache, clave_cache, zip_writer,
+                                                   nombre_archivo_carnet, trabajo_id, emp):
+                            exitosos += 1
+                            reutilizados += 1
+                            continue
+                        
                         # Función para generar el carnet (captura html_content del scope actual)
                         html_content_actual = html_content  # Capturar en variable local
                         def generar_carnet_html():
@@ -1264,16 +1756,14 @@ class CarnetController:
                         
                         # Rastrear estado de OCR
                         if self.usar_ocr:
-                            if "verificado" in mensaje_ocr.lower() or "verificación" in mensaje_ocr.lower():
-                                if "incompleta" not in mensaje_ocr.lower() and "error" not in mensaje_ocr.lower():
-                                    ocr_usado_exitosamente = True
-                                else:
-                                    errores_ocr += 1
-                            elif "error" in mensaje_ocr.lower() or "no disponible" in mensaje_ocr.lower():
+                            if _ocr_verificado(mensaje_ocr):
+                                ocr_usado_exitosamente = True
+                            else:
                                 errores_ocr += 1
                         
                         if exito and ruta_final:
-                            archivos_generados.append(ruta_final)
+                            self._agregar_a_zip(zip_writer, ruta_final, trabajo_id, emp, mensaje_ocr,
+                                                carnet_cache, clave_cache)
                             exitosos += 1
                         else:
                             errores += 1
@@ -1289,6 +1779,15 @@ class CarnetController:
                         nombre_archivo_carnet = f"carnet_{nombre_limpio}_{emp['id_unico']}.png"
                         ruta_carnet = directorio_temp / nombre_archivo_carnet
                         
+                        clave_cache = CarnetRenderCache.calcular_clave(
+                            **base_clave, nombre=emp['nombre_empleado'] or "SIN NOMBRE", codigo=codigo_path
+                        )
+                        if self._reutilizar_carnet(carnet_cache, clave_cache, zip_writer,
+                                                   nombre_archivo_carnet, trabajo_id, emp):
+                            exitosos += 1
+                            reutilizados += 1
+                            continue
+                        
                         # Función para generar el carnet
                         def generar_carnet_pil():
                             return self.designer.renderizar_carnet(
@@ -1333,16 +1832,14 @@ class CarnetController:
                         
                         # Rastrear estado de OCR
                         if self.usar_ocr:
-                            if "verificado" in mensaje_ocr.lower() or "verificación" in mensaje_ocr.lower():
-                                if "incompleta" not in mensaje_ocr.lower() and "error" not in mensaje_ocr.lower():
-                                    ocr_usado_exitosamente = True
-                                else:
-                                    errores_ocr += 1
-                            elif "error" in mensaje_ocr.lower() or "no disponible" in mensaje_ocr.lower():
+                            if _ocr_verificado(mensaje_ocr):
+                                ocr_usado_exitosamente = True
+                            else:
                                 errores_ocr += 1
                         
                         if exito and ruta_final:
-                            archivos_generados.append(ruta_final)
+                            self._agregar_a_zip(zip_writer, ruta_final, trabajo_id, emp, mensaje_ocr,
+                                                carnet_cache, clave_cache)
                             exitosos += 1
                         else:
                             errores += 1
@@ -1357,6 +1854,8 @@ class CarnetController:
                     except:
                         nombre_error = "desconocido"
                     logger.error(f"Error al generar carnet para {nombre_error}: {e}")
+                finally:
+                    tracer.fin("empleado", "carnets")
             
             # Verificar si se canceló antes de comprimir
             if progress.fue_cancelado():
@@ -1373,13 +1872,14 @@ class CarnetController:
                     "Generación Cancelada",
                     f"Generación cancelada por el usuario.\n\n"
                     f"Carnets generados hasta el momento: {exitosos}\n"
-                    f"Errores: {errores}"
+                    f"Errores: {errores}\n\n"
+                    "Vuelva a generar con la misma configuración para reanudar el trabajo."
                 )
                 return
             
-            # Crear archivo ZIP con todos los carnets generados
-            if archivos_generados:
-                progress.actualizar_progreso(total, total + 1, "Comprimiendo carnets en ZIP...")
+            # Terminar el ZIP con todos los carnets generados o reutilizados de la caché
+            if zip_writer.entradas:
+                progress.actualizar_progreso(total, total + 1, "Terminando ZIP de carnets...")
                 QApplication.processEvents()
                 
                 # Verificar cancelación antes de comprimir
@@ -1397,16 +1897,15 @@ class CarnetController:
                         "Generación Cancelada",
                         f"Generación cancelada por el usuario.\n\n"
                         f"Carnets generados hasta el momento: {exitosos}\n"
-                        f"Errores: {errores}"
+                        f"Errores: {errores}\n\n"
+                        "Vuelva a generar con la misma configuración para reanudar el trabajo."
                     )
                     return
                 
                 try:
-                    with zipfile.ZipFile(str(ruta_zip_path), 'w', zipfile.ZIP_DEFLATED) as zipf:
-                        for ruta_carnet in archivos_generados:
-                            if ruta_carnet.exists():
-                                # Agregar al ZIP con el nombre del archivo (sin la ruta completa)
-                                zipf.write(str(ruta_carnet), ruta_carnet.name)
+                    with tracer.span("zip_cerrar", "zip"):
+                        zip_writer.cerrar()
+                    self.db_manager.actualizar_estado_trabajo(trabajo_id, TRABAJO_COMPLETADO)
                     
                     progress.actualizar_progreso(total + 1, total + 1, "¡ZIP creado exitosamente!")
                     QApplication.processEvents()
@@ -1421,6 +1920,17 @@ class CarnetController:
                     )
                     return
         finally:
+            tracer.finalizar_sesion()
+            # Un ZIP sin terminar no se publica: si ya tiene carnets se conserva el .part
+            # para reanudar el trabajo; si no, se descarta
+            if zip_writer is not None and not zip_writer.cerrado:
+                if trabajo_id is not None and zip_writer.entradas:
+                    zip_writer.suspender()
+                    self.db_manager.actualizar_estado_trabajo(trabajo_id, TRABAJO_CANCELADO)
+                else:
+                    zip_writer.descartar()
+                    if trabajo_id is not None:
+                        self.db_manager.actualizar_estado_trabajo(trabajo_id, TRABAJO_ABANDONADO)
             # Limpiar directorio temporal
             if directorio_temp and directorio_temp.exists():
                 try:
@@ -1436,6 +1946,8 @@ class CarnetController:
         progress.close()
         
         mensaje = f"Generación completada:\n{exitosos} carnet(s) generado(s) y guardado(s) en:\n{ruta_zip_path}"
+        if reutilizados:
+            mensaje += f"\n({reutilizados} sin cambios, reutilizados de generaciones anteriores)"
         
         # Mensaje de OCR basado en el estado real
         if self.usar_ocr:
@@ -1506,7 +2018,7 @@ class CarnetController:
             )
             return
         
-        codigo_path = IMAGES_DIR / emp['nombre_archivo']
+        codigo_path = self.image_store.ruta(emp['nombre_archivo'])
         if not codigo_path.exists():
             progress.close()
             QMessageBox.warning(
@@ -1517,6 +2029,9 @@ class CarnetController:
             return
         
         try:
+            # Con el sistema PIL el carnet se escribe directamente como PDF vectorial
+            pdf_vectorial = CARNET_PDF_VECTORIAL and not self.controls_panel.usar_template_html()
+            
             # Verificar si se está usando template HTML
             if self.controls_panel.usar_template_html():
                 html_template = self.controls_panel.obtener_html_template()
@@ -1538,7 +2053,7 @@ class CarnetController:
                 if "id_unico" in variables_template:
                     variables["id_unico"] = emp['id_unico']
                 if "codigo_barras" in variables_template:
-                    variables["codigo_barras"] = codigo_path
+                    variables["codigo_barras"] = self._codigo_barras_para_html(emp, codigo_path)
                 if "nombre" in variables_template:
                     variables["nombre"] = variables_usuario.get("nombre", nombre) or nombre
                 if "nombres" in variables_template:
@@ -1581,67 +2096,76 @@ class CarnetController:
                 html_content = Path(html_template.ruta_html).read_text(encoding='utf-8')
                 html_content = self.html_renderer._inyectar_variables(html_content, variables)
                 
-                # Sistema de reintentos robusto para evitar imágenes en blanco
                 import logging
                 logger_pdf = logging.getLogger(__name__)
-                max_reintentos = 5
-                imagen = None
                 
-                for intento in range(1, max_reintentos + 1):
-                    # Verificar cancelación antes de cada intento
-                    if progress.fue_cancelado():
-                        logger_pdf.info("Generación individual PDF cancelada por el usuario")
-                        progress.close()
-                        return
-                    
-                    progress.actualizar_progreso(0, max_reintentos, f"Renderizando carnet PDF (intento {intento}/{max_reintentos})...")
+                # Motor vectorial: printToPdf escribe el PDF sin rasterizar el carnet
+                if HTML_PDF_ENGINE == MOTOR_PDF_VECTORIAL:
+                    progress.actualizar_progreso(0, 1, "Generando PDF vectorial...")
                     QApplication.processEvents()
+                    pdf_vectorial = self.html_renderer.renderizar_html_a_pdf(
+                        html_content, ruta_pdf_path, html_template.ancho, html_template.alto
+                    )
+                    if not pdf_vectorial:
+                        logger_pdf.warning("No se pudo generar el PDF vectorial, se usa el render raster")
+                
+                if not pdf_vectorial:
+                    # Sistema de reintentos robusto para evitar imágenes en blanco
+                    max_reintentos = 5
+                    imagen = None
+                
+                    for intento in range(1, max_reintentos + 1):
+                        # Verificar cancelación antes de cada intento
+                        if progress.fue_cancelado():
+                            logger_pdf.info("Generación individual PDF cancelada por el usuario")
+                            progress.close()
+                            return
                     
-                    # Verificar cancelación después de actualizar UI
-                    if progress.fue_cancelado():
-                        logger_pdf.info("Generación individual PDF cancelada por el usuario")
-                        progress.close()
-                        return
-                    
-                    # Asegurar que el widget esté completamente inicializado
-                    if not self.html_renderer._inicializado:
-                        logger_pdf.info("Inicializando widget HTML...")
-                        from PyQt6.QtCore import QTimer
-                        QTimer.singleShot(500, lambda: None)
+                        progress.actualizar_progreso(0, max_reintentos, f"Renderizando carnet PDF (intento {intento}/{max_reintentos})...")
                         QApplication.processEvents()
                     
-                    # Esperar antes de renderizar (más tiempo en los primeros intentos)
-                    if intento > 1:
-                        tiempo_espera = 1500 if intento == 2 else (1000 if intento == 3 else 800)
-                        from PyQt6.QtCore import QTimer
-                        QTimer.singleShot(tiempo_espera, lambda: None)
-                        QApplication.processEvents()
+                        # Verificar cancelación después de actualizar UI
+                        if progress.fue_cancelado():
+                            logger_pdf.info("Generación individual PDF cancelada por el usuario")
+                            progress.close()
+                            return
                     
-                    # Renderizar a máxima calidad (1200 DPI para PDF de super mega calidad)
-                    imagen = self.html_renderer.renderizar_html_a_imagen(
-                        html_content=html_content,
-                        ancho=html_template.ancho,
-                        alto=html_template.alto,
-                        dpi=1200  # Super mega calidad para PDF
-                    )
+                        # Asegurar que el widget esté completamente inicializado
+                        if not self.html_renderer._inicializado:
+                            logger_pdf.info("Inicializando widget HTML...")
+                            from PyQt6.QtCore import QTimer
+                            QTimer.singleShot(500, lambda: None)
+                            QApplication.processEvents()
                     
-                    if not imagen:
-                        logger_pdf.warning(f"Intento {intento}: No se generó imagen")
-                        if intento < max_reintentos:
-                            continue
-                        else:
-                            break
+                        # Esperar antes de renderizar (más tiempo en los primeros intentos)
+                        if intento > 1:
+                            tiempo_espera = 1500 if intento == 2 else (1000 if intento == 3 else 800)
+                            from PyQt6.QtCore import QTimer
+                            QTimer.singleShot(tiempo_espera, lambda: None)
+                            QApplication.processEvents()
                     
-                    # Verificar que la imagen no esté completamente en blanco
-                    ancho_img, alto_img = imagen.size
-                    if ancho_img > 100 and alto_img > 100:
-                        from PIL import ImageStat
-                        stat = ImageStat.Stat(imagen)
-                        if len(stat.mean) >= 3:
-                            media_r, media_g, media_b = stat.mean[0], stat.mean[1], stat.mean[2]
-                            # Si la media es muy cercana a 255 en todos los canales, está en blanco
-                            if media_r > 250 and media_g > 250 and media_b > 250:
-                                logger_pdf.warning(f"Intento {intento}: Imagen en blanco detectada (R:{media_r:.1f}, G:{media_g:.1f}, B:{media_b:.1f})")
+                        # Renderizar a máxima calidad (1200 DPI para PDF de super mega calidad)
+                        imagen = self.html_renderer.renderizar_html_a_imagen(
+                            html_content=html_content,
+                            ancho=html_template.ancho,
+                            alto=html_template.alto,
+                            dpi=1200  # Super mega calidad para PDF
+                        )
+                    
+                        if not imagen:
+                            logger_pdf.warning(f"Intento {intento}: No se generó imagen")
+                            if intento < max_reintentos:
+                                continue
+                            else:
+                                break
+                    
+                        # Verificar que la imagen no esté completamente en blanco
+                        ancho_img, alto_img = imagen.size
+                        if ancho_img > 100 and alto_img > 100:
+                            # Sobre una muestra reducida de la imagen, no sobre los píxeles a 1200 DPI
+                            salud = analizar_imagen(imagen)
+                            if salud['en_blanco']:
+                                logger_pdf.warning(f"Intento {intento}: Imagen en blanco detectada (contenido: {salud['fraccion_contenido']:.2%})")
                                 if intento < max_reintentos:
                                     progress.actualizar_progreso(intento, max_reintentos, f"Imagen en blanco detectada, reintentando ({intento}/{max_reintentos})...")
                                     QApplication.processEvents()
@@ -1651,17 +2175,31 @@ class CarnetController:
                                     logger_pdf.error("Imagen en blanco después de todos los intentos")
                                     break
                     
-                    # Si llegamos aquí, la imagen es válida
-                    logger_pdf.info(f"✓ Imagen renderizada correctamente en intento {intento}: {imagen.size}")
-                    break
+                        # Si llegamos aquí, la imagen es válida
+                        logger_pdf.info(f"✓ Imagen renderizada correctamente en intento {intento}: {imagen.size}")
+                        break
                 
-                if not imagen:
+                    if not imagen:
+                        progress.close()
+                        QMessageBox.warning(
+                            self.employees_panel,
+                            "Error",
+                            f"No se pudo renderizar el carnet PDF después de {max_reintentos} intentos.\n\n"
+                            "Intente generar nuevamente o verifique el template HTML."
+                        )
+                        return
+            elif pdf_vectorial:
+                # Sistema PIL: el template se escribe como PDF vectorial, sin rasterizar
+                template = self.controls_panel.obtener_template_actualizado()
+                progress.actualizar_progreso(0, 1, "Generando PDF vectorial...")
+                QApplication.processEvents()
+                
+                if not self._escribir_carnet_pdf_vectorial(template, emp, codigo_path, ruta_pdf_path):
                     progress.close()
                     QMessageBox.warning(
                         self.employees_panel,
                         "Error",
-                        f"No se pudo renderizar el carnet PDF después de {max_reintentos} intentos.\n\n"
-                        "Intente generar nuevamente o verifique el template HTML."
+                        "No se pudo generar el PDF del carnet"
                     )
                     return
             else:
@@ -1684,30 +2222,32 @@ class CarnetController:
                 nuevo_alto = int(imagen.size[1] * factor_calidad)
                 imagen = imagen.resize((nuevo_ancho, nuevo_alto), Image.Resampling.LANCZOS)
             
-            if not imagen:
-                progress.close()
-                QMessageBox.warning(
-                    self.employees_panel,
-                    "Error",
-                    "No se pudo renderizar el carnet"
+            # El PDF vectorial ya está escrito; los demás caminos guardan la imagen renderizada
+            if not pdf_vectorial:
+                if not imagen:
+                    progress.close()
+                    QMessageBox.warning(
+                        self.employees_panel,
+                        "Error",
+                        "No se pudo renderizar el carnet"
+                    )
+                    return
+                
+                progress.actualizar_progreso(0, 1, "Guardando PDF en alta calidad...")
+                QApplication.processEvents()
+                
+                # Guardar como PDF con máxima calidad
+                # Convertir a RGB si es necesario (PDF requiere RGB)
+                if imagen.mode != 'RGB':
+                    imagen = imagen.convert('RGB')
+                
+                # Guardar PDF con máxima calidad
+                imagen.save(
+                    ruta_pdf_path,
+                    "PDF",
+                    resolution=1200.0,  # 1200 DPI para super mega calidad
+                    quality=100
                 )
-                return
-            
-            progress.actualizar_progreso(0, 1, "Guardando PDF en alta calidad...")
-            QApplication.processEvents()
-            
-            # Guardar como PDF con máxima calidad
-            # Convertir a RGB si es necesario (PDF requiere RGB)
-            if imagen.mode != 'RGB':
-                imagen = imagen.convert('RGB')
-            
-            # Guardar PDF con máxima calidad
-            imagen.save(
-                ruta_pdf_path,
-                "PDF",
-                resolution=1200.0,  # 1200 DPI para super mega calidad
-                quality=100
-            )
             
             # Verificar cancelación antes de verificar con OCR
             if progress.fue_cancelado():
@@ -1801,24 +2341,33 @@ class CarnetController:
         if respuesta != QMessageBox.StandardButton.Yes:
             return
         
-        # Pedir al usuario dónde guardar el ZIP
-        fecha_hora = datetime.now().strftime("%Y%m%d_%H%M%S")
-        nombre_zip_default = f"carnets_pdf_masivos_{fecha_hora}.zip"
+        # Un trabajo interrumpido con la misma configuración se puede reanudar
+        huella = self._huella_trabajo("pdf", empleados)
+        accion, trabajo = self._ofrecer_reanudar_trabajo("pdf", huella)
+        if accion in ("cancelar", "terminado"):
+            return
         
-        ruta_zip, _ = QFileDialog.getSaveFileName(
-            self.employees_panel,
-            "Guardar Carnets PDF en ZIP",
-            nombre_zip_default,
-            "Archivos ZIP (*.zip);;Todos los archivos (*)"
-        )
+        if trabajo:
+            ruta_zip_path = Path(trabajo['ruta_salida'])
+        else:
+            # Pedir al usuario dónde guardar el ZIP
+            fecha_hora = datetime.now().strftime("%Y%m%d_%H%M%S")
+            nombre_zip_default = f"carnets_pdf_masivos_{fecha_hora}.zip"
         
-        if not ruta_zip:
-            return
+            ruta_zip, _ = QFileDialog.getSaveFileName(
+                self.employees_panel,
+                "Guardar Carnets PDF en ZIP",
+                nombre_zip_default,
+                "Archivos ZIP (*.zip);;Todos los archivos (*)"
+            )
+        
+            if not ruta_zip:
+                return
         
-        # Asegurar que tenga extensión .zip
-        ruta_zip_path = Path(ruta_zip)
-        if ruta_zip_path.suffix.lower() != '.zip':
-            ruta_zip_path = ruta_zip_path.with_suffix('.zip')
+            # Asegurar que tenga extensión .zip
+            ruta_zip_path = Path(ruta_zip)
+            if ruta_zip_path.suffix.lower() != '.zip':
+                ruta_zip_path = ruta_zip_path.with_suffix('.zip')
         
         # Mostrar diálogo de progreso
         from src.views.widgets.progress_dialog import ProgressDialog
@@ -1832,14 +2381,33 @@ class CarnetController:
         errores = 0
         total = len(empleados)
         errores_ocr = 0  # Contador de errores de OCR
+        reutilizados = 0  # Carnets tomados de la caché sin volver a renderizar
         ocr_usado_exitosamente = False  # Flag para saber si OCR funcionó al menos una vez
         
-        # Crear directorio temporal para almacenar PDFs antes de comprimir
+        # Cada archivo se agrega al ZIP en cuanto se genera; el directorio temporal solo
+        # contiene el archivo en curso (la verificación OCR trabaja sobre el archivo)
         directorio_temp = None
-        archivos_generados = []
+        zip_writer = None
+        trabajo_id = None
         
+        tracer.iniciar_sesion("carnets_masivos_pdf")
         try:
             directorio_temp = Path(tempfile.mkdtemp(prefix="carnets_pdf_temp_"))
+            zip_writer = ZipStreamWriter(ruta_zip_path, reanudar=trabajo is not None)
+            
+            # Diario del trabajo: al reanudar se saltan los empleados cuyo archivo ya está en el ZIP
+            if trabajo:
+                trabajo_id = trabajo['id']
+                completados = {
+                    id_unico: archivo
+                    for id_unico, archivo in self.db_manager.obtener_items_completados(trabajo_id).items()
+                    if archivo in zip_writer
+                }
+                self.db_manager.actualizar_estado_trabajo(trabajo_id, TRABAJO_EN_CURSO, total)
+            else:
+                trabajo_id = self.db_manager.crear_trabajo_masivo("pdf", huella, str(ruta_zip_path), total)
+                completados = {}
+            exitosos = len(completados)
             
             # Verificar si se está usando template HTML
             usar_html = self.controls_panel.usar_template_html()
@@ -1857,14 +2425,16 @@ class CarnetController:
                 variables_usuario = self.controls_panel.obtener_variables_html()
                 variables_template = html_template.detectar_variables()
                 html_base = Path(html_template.ruta_html).read_text(encoding='utf-8')
-                
-                valores_default = {
-                    "empresa": "Mi Empresa",
-                    "web": "www.ejemplo.com"
-                }
             else:
                 template = self.controls_panel.obtener_template_actualizado()
             
+            # Caché de carnets: solo se renderizan los empleados cuyas entradas cambiaron
+            carnet_cache = obtener_carnet_cache() if CARNET_CACHE_ENABLED else None
+            if usar_html:
+                base_clave = self._base_clave_carnet("pdf", 1200, html_base=html_base)
+            else:
+                base_clave = self._base_clave_carnet("pdf", 1200, template=template)
+            
             for indice, empleado in enumerate(empleados, 1):
                 # Verificar si se canceló
                 if progress.fue_cancelado():
@@ -1892,14 +2462,18 @@ class CarnetController:
                     logger.info("Generación masiva PDF cancelada por el usuario")
                     break
                 
+                tracer.inicio("empleado", "carnets", indice=indice)
                 try:
                     # Desempaquetar datos usando función auxiliar
-                    emp = self._desempaquetar_empleado(empleado)
+                    with tracer.span("cargar_empleado", "carnets"):
+                        emp = self._desempaquetar_empleado(empleado)
                     if not emp:
                         errores += 1
                         continue
+                    if emp['id_unico'] in completados:
+                        continue
                     
-                    codigo_path = IMAGES_DIR / emp['nombre_archivo']
+                    codigo_path = self.image_store.ruta(emp['nombre_archivo'])
                     if not codigo_path.exists():
                         errores += 1
                         continue
@@ -1911,67 +2485,48 @@ class CarnetController:
                     ruta_pdf = directorio_temp / nombre_pdf
                     
                     if usar_html:
-                        # Preparar variables
-                        # IMPORTANTE: Usar directamente los datos del empleado actual, NO los de la pantalla
-                        variables = {}
-                        nombre = emp['nombre_empleado'] or "SIN NOMBRE"
-                        if "id_unico" in variables_template:
-                            variables["id_unico"] = emp['id_unico'] or ""
-                        if "codigo_barras" in variables_template:
-                            variables["codigo_barras"] = codigo_path
-                        if "nombre" in variables_template:
-                            variables["nombre"] = nombre
-                        if "nombres" in variables_template:
-                            # FORZAR uso del nombre del empleado actual, no de pantalla
-                            variables["nombres"] = emp.get('nombres') or ""
-                        if "apellidos" in variables_template:
-                            # FORZAR uso del apellido del empleado actual, no de pantalla
-                            variables["apellidos"] = emp.get('apellidos') or ""
-                        if "descripcion" in variables_template:
-                            variables["descripcion"] = emp.get('descripcion') or ""
-                        
-                        # Logo y foto
-                        if "logo" in variables_template:
-                            logo_path = variables_usuario.get("logo")
-                            if logo_path and isinstance(logo_path, Path) and logo_path.exists():
-                                variables["logo"] = logo_path
-                            else:
-                                variables["logo"] = Path("")
-                        if "foto" in variables_template:
-                            variables["foto"] = Path("")
-                        
-                        # Otras variables globales
-                        for var in variables_template:
-                            if var not in {"id_unico", "codigo_barras", "foto", "logo", "nombre", "nombres", "apellidos", "descripcion"}:
-                                if var not in variables:
-                                    valor = variables_usuario.get(var, "")
-                                    if isinstance(valor, Path):
-                                        variables[var] = valor
-                                    else:
-                                        variables[var] = str(valor) or ""
+                        variables = self._variables_html_empleado(emp, codigo_path, variables_template, variables_usuario)
                         
-                        # Aplicar valores por defecto
-                        for var, default in valores_default.items():
-                            if var in variables_template and (not variables.get(var) or variables[var] == ""):
-                                variables[var] = default
+                        clave_cache = CarnetRenderCache.calcular_clave(**base_clave, variables=variables)
+                        if self._reutilizar_carnet(carnet_cache, clave_cache, zip_writer,
+                                                   nombre_pdf, trabajo_id, emp):
+                            exitosos += 1
+                            reutilizados += 1
+                            continue
                         
                         # Inyectar variables y renderizar
-                        html_content = self.html_renderer._inyectar_variables(html_base, variables)
-                        
-                        # Función para generar el carnet
-                        def generar_carnet_html():
-                            return self.html_renderer.renderizar_html_a_imagen(
-                            html_content=html_content,
-                            ancho=html_template.ancho,
-                            alto=html_template.alto,
-                                dpi=1200
-                            )
+                        with tracer.span("inyectar_variables", "carnets"):
+                            html_content = self.html_renderer._inyectar_variables(html_base, variables)
                         
                         # Verificar cancelación antes de generar
                         if progress.fue_cancelado():
                             logger.info("Generación cancelada antes de generar carnet PDF HTML")
                             break
                         
+                        # Motor vectorial sin OCR: el PDF se imprime directamente desde el HTML
+                        pdf_vectorial = HTML_PDF_ENGINE == MOTOR_PDF_VECTORIAL
+                        if pdf_vectorial and not self.usar_ocr:
+                            with tracer.span("codificar_pdf", "carnets"):
+                                if self.html_renderer.generar_pdf(
+                                    html_content, ruta_pdf, html_template.ancho, html_template.alto
+                                ):
+                                    self._agregar_a_zip(zip_writer, ruta_pdf, trabajo_id, emp,
+                                                        carnet_cache=carnet_cache, clave_cache=clave_cache)
+                                    exitosos += 1
+                                else:
+                                    errores += 1
+                            continue
+                        
+                        # Función para generar el carnet. Con el motor vectorial la imagen solo
+                        # se usa para la verificación OCR, que no necesita 1200 DPI
+                        def generar_carnet_html():
+                            return self.html_renderer.renderizar_html_a_imagen(
+                                html_content=html_content,
+                                ancho=html_template.ancho,
+                                alto=html_template.alto,
+                                dpi=600 if pdf_vectorial else 1200
+                            )
+                        
                         # Generar PNG temporal para verificación OCR
                         ruta_png_temp = ruta_pdf.with_suffix('.png')
                         exito, mensaje_ocr, ruta_png_final = self._generar_carnet_con_verificacion_ocr(
@@ -1990,30 +2545,35 @@ class CarnetController:
                         
                         # Rastrear estado de OCR
                         if self.usar_ocr:
-                            if "verificado" in mensaje_ocr.lower() or "verificación" in mensaje_ocr.lower():
-                                if "incompleta" not in mensaje_ocr.lower() and "error" not in mensaje_ocr.lower():
-                                    ocr_usado_exitosamente = True
-                                else:
-                                    errores_ocr += 1
-                            elif "error" in mensaje_ocr.lower() or "no disponible" in mensaje_ocr.lower():
+                            if _ocr_verificado(mensaje_ocr):
+                                ocr_usado_exitosamente = True
+                            else:
                                 errores_ocr += 1
                         
                         if not exito or not ruta_png_final:
                             errores += 1
                             continue
                         
-                        # Convertir PNG verificado a PDF
+                        # Generar el PDF vectorial o convertir el PNG verificado a PDF
                         try:
-                            imagen = Image.open(ruta_png_final)
-                            if imagen.mode != 'RGB':
-                                imagen = imagen.convert('RGB')
-                            imagen.save(
-                                ruta_pdf,
-                                "PDF",
-                                resolution=1200.0,
-                                quality=100
-                            )
-                            archivos_generados.append(ruta_pdf)
+                            with tracer.span("codificar_pdf", "carnets"):
+                                if pdf_vectorial:
+                                    if not self.html_renderer.generar_pdf(
+                                        html_content, ruta_pdf, html_template.ancho, html_template.alto
+                                    ):
+                                        raise RuntimeError("No se pudo generar el PDF del template HTML")
+                                else:
+                                    imagen = Image.open(ruta_png_final)
+                                    if imagen.mode != 'RGB':
+                                        imagen = imagen.convert('RGB')
+                                    imagen.save(
+                                        ruta_pdf,
+                                        "PDF",
+                                        resolution=1200.0,
+                                        quality=100
+                                    )
+                            self._agregar_a_zip(zip_writer, ruta_pdf, trabajo_id, emp, mensaje_ocr,
+                                                carnet_cache, clave_cache)
                             exitosos += 1
                             
                             # Eliminar PNG temporal
@@ -2026,6 +2586,15 @@ class CarnetController:
                             logging.getLogger(__name__).error(f"Error al convertir PNG a PDF: {e_pdf}")
                             errores += 1
                     else:
+                        clave_cache = CarnetRenderCache.calcular_clave(
+                            **base_clave, nombre=emp['nombre_empleado'] or "SIN NOMBRE", codigo=codigo_path
+                        )
+                        if self._reutilizar_carnet(carnet_cache, clave_cache, zip_writer,
+                                                   nombre_pdf, trabajo_id, emp):
+                            exitosos += 1
+                            reutilizados += 1
+                            continue
+                        
                         # Función para generar carnet con sistema PIL
                         def generar_carnet_pil():
                             img = self.designer.renderizar_carnet(
@@ -2035,8 +2604,8 @@ class CarnetController:
                                 empresa=template.empresa_texto if template.mostrar_empresa else None,
                                 web=template.web_texto if template.mostrar_web else None
                             )
-                            # Escalar para alta calidad
-                            if img:
+                            # Escalar para alta calidad (el PDF vectorial no usa esta imagen salvo para OCR)
+                            if img and not CARNET_PDF_VECTORIAL:
                                 factor_calidad = 1200 / 300.0
                                 nuevo_ancho = int(img.size[0] * factor_calidad)
                                 nuevo_alto = int(img.size[1] * factor_calidad)
@@ -2048,6 +2617,17 @@ class CarnetController:
                             logger.info("Generación cancelada antes de generar carnet PDF PIL")
                             break
                         
+                        # PDF vectorial sin OCR: se escribe directamente, sin rasterizar el carnet
+                        if CARNET_PDF_VECTORIAL and not self.usar_ocr:
+                            with tracer.span("codificar_pdf", "carnets"):
+                                if self._escribir_carnet_pdf_vectorial(template, emp, codigo_path, ruta_pdf):
+                                    self._agregar_a_zip(zip_writer, ruta_pdf, trabajo_id, emp,
+                                                        carnet_cache=carnet_cache, clave_cache=clave_cache)
+                                    exitosos += 1
+                                else:
+                                    errores += 1
+                            continue
+                        
                         # Generar PNG temporal para verificación OCR
                         ruta_png_temp = ruta_pdf.with_suffix('.png')
                         exito, mensaje_ocr, ruta_png_final = self._generar_carnet_con_verificacion_ocr(
@@ -2066,30 +2646,33 @@ class CarnetController:
                         
                         # Rastrear estado de OCR
                         if self.usar_ocr:
-                            if "verificado" in mensaje_ocr.lower() or "verificación" in mensaje_ocr.lower():
-                                if "incompleta" not in mensaje_ocr.lower() and "error" not in mensaje_ocr.lower():
-                                    ocr_usado_exitosamente = True
-                                else:
-                                    errores_ocr += 1
-                            elif "error" in mensaje_ocr.lower() or "no disponible" in mensaje_ocr.lower():
+                            if _ocr_verificado(mensaje_ocr):
+                                ocr_usado_exitosamente = True
+                            else:
                                 errores_ocr += 1
                         
                         if not exito or not ruta_png_final:
                             errores += 1
                             continue
                     
-                        # Convertir PNG verificado a PDF
+                        # Escribir el PDF vectorial o convertir el PNG verificado a PDF
                         try:
-                            imagen = Image.open(ruta_png_final)
-                            if imagen.mode != 'RGB':
-                                imagen = imagen.convert('RGB')
-                            imagen.save(
-                                ruta_pdf,
-                                "PDF",
-                                resolution=1200.0,
-                                quality=100
-                            )
-                            archivos_generados.append(ruta_pdf)
+                            with tracer.span("codificar_pdf", "carnets"):
+                                if CARNET_PDF_VECTORIAL:
+                                    if not self._escribir_carnet_pdf_vectorial(template, emp, codigo_path, ruta_pdf):
+                                        raise RuntimeError("No se pudo escribir el PDF vectorial")
+                                else:
+                                    imagen = Image.open(ruta_png_final)
+                                    if imagen.mode != 'RGB':
+                                        imagen = imagen.convert('RGB')
+                                    imagen.save(
+                                        ruta_pdf,
+                                        "PDF",
+                                        resolution=1200.0,
+                                        quality=100
+                                    )
+                            self._agregar_a_zip(zip_writer, ruta_pdf, trabajo_id, emp, mensaje_ocr,
+                                                carnet_cache, clave_cache)
                             exitosos += 1
                             
                             # Eliminar PNG temporal
@@ -2112,6 +2695,8 @@ class CarnetController:
                     except:
                         nombre_error = "desconocido"
                     logger.error(f"Error al generar PDF para {nombre_error}: {e}")
+                finally:
+                    tracer.fin("empleado", "carnets")
             
             # Verificar si se canceló antes de comprimir
             if progress.fue_cancelado():
@@ -2128,13 +2713,14 @@ class CarnetController:
                     "Generación Cancelada",
                     f"Generación cancelada por el usuario.\n\n"
                     f"PDFs generados hasta el momento: {exitosos}\n"
-                    f"Errores: {errores}"
+                    f"Errores: {errores}\n\n"
+                    "Vuelva a generar con la misma configuración para reanudar el trabajo."
                 )
                 return
             
-            # Crear archivo ZIP con todos los PDFs generados
-            if archivos_generados:
-                progress.actualizar_progreso(total, total + 1, "Comprimiendo PDFs en ZIP...")
+            # Terminar el ZIP con todos los PDFs generados o reutilizados de la caché
+            if zip_writer.entradas:
+                progress.actualizar_progreso(total, total + 1, "Terminando ZIP de PDFs...")
                 QApplication.processEvents()
                 
                 # Verificar cancelación antes de comprimir
@@ -2152,16 +2738,15 @@ class CarnetController:
                         "Generación Cancelada",
                         f"Generación cancelada por el usuario.\n\n"
                         f"PDFs generados hasta el momento: {exitosos}\n"
-                        f"Errores: {errores}"
+                        f"Errores: {errores}\n\n"
+                        "Vuelva a generar con la misma configuración para reanudar el trabajo."
                     )
                     return
                 
                 try:
-                    with zipfile.ZipFile(str(ruta_zip_path), 'w', zipfile.ZIP_DEFLATED) as zipf:
-                        for ruta_pdf in archivos_generados:
-                            if ruta_pdf.exists():
-                                # Agregar al ZIP con el nombre del archivo (sin la ruta completa)
-                                zipf.write(str(ruta_pdf), ruta_pdf.name)
+                    with tracer.span("zip_cerrar", "zip"):
+                        zip_writer.cerrar()
+                    self.db_manager.actualizar_estado_trabajo(trabajo_id, TRABAJO_COMPLETADO)
                     
                     progress.actualizar_progreso(total + 1, total + 1, "¡ZIP creado exitosamente!")
                     QApplication.processEvents()
@@ -2176,6 +2761,17 @@ class CarnetController:
                     )
                     return
         finally:
+            tracer.finalizar_sesion()
+            # Un ZIP sin terminar no se publica: si ya tiene carnets se conserva el .part
+            # para reanudar el trabajo; si no, se descarta
+            if zip_writer is not None and not zip_writer.cerrado:
+                if trabajo_id is not None and zip_writer.entradas:
+                    zip_writer.suspender()
+                    self.db_manager.actualizar_estado_trabajo(trabajo_id, TRABAJO_CANCELADO)
+                else:
+                    zip_writer.descartar()
+                    if trabajo_id is not None:
+                        self.db_manager.actualizar_estado_trabajo(trabajo_id, TRABAJO_ABANDONADO)
             # Limpiar directorio temporal
             if directorio_temp and directorio_temp.exists():
                 try:
@@ -2192,6 +2788,8 @@ class CarnetController:
         progress.close()
         
         mensaje = f"Generación completada:\n{exitosos} PDF(s) generado(s) y guardado(s) en:\n{ruta_zip_path}"
+        if reutilizados:
+            mensaje += f"\n({reutilizados} sin cambios, reutilizados de generaciones anteriores)"
         
         # Mensaje de OCR basado en el estado real
         if self.usar_ocr:
@@ -2209,3 +2807,219 @@ class CarnetController:
         
         QMessageBox.information(self.employees_panel, "Resultado", mensaje)
 
+    
+    def _variables_html_empleado(self, emp: dict, codigo_path: Path, variables_template: set,
+                                 variables_usuario: dict) -> dict:
+        """
+        Prepara las variables de un template HTML para un empleado (generación masiva)
+        
+        Args:
+            emp: Datos del empleado desempaquetados
+            codigo_path: Ruta al PNG del código de barras
+            variables_template: Variables detectadas en el template
+            variables_usuario: Valores globales introducidos en el panel de controles
+            
+        Returns:
+            Diccionario de variables a inyectar
+        """
+        variables = {}
+        if "id_unico" in variables_template:
+            variables["id_unico"] = emp['id_unico'] or ""
+        if "codigo_barras" in variables_template:
+            variables["codigo_barras"] = self._codigo_barras_para_html(emp, codigo_path)
+        if "nombre" in variables_template:
+            variables["nombre"] = emp['nombre_empleado'] or "SIN NOMBRE"
+        if "nombres" in variables_template:
+            variables["nombres"] = emp.get('nombres') or ""
+        if "apellidos" in variables_template:
+            variables["apellidos"] = emp.get('apellidos') or ""
+        if "descripcion" in variables_template:
+            variables["descripcion"] = emp.get('descripcion') or ""
+        
+        if "logo" in variables_template:
+            logo_path = variables_usuario.get("logo")
+            if logo_path and isinstance(logo_path, Path) and logo_path.exists():
+                variables["logo"] = logo_path
+            else:
+                variables["logo"] = Path("")
+        if "foto" in variables_template:
+            variables["foto"] = Path("")
+        
+        for var in variables_template:
+            if var not in variables:
+                valor = variables_usuario.get(var, "")
+                variables[var] = valor if isinstance(valor, Path) else (str(valor) or "")
+        
+        valores_default = {
+            "empresa": "Mi Empresa",
+            "web": "www.ejemplo.com"
+        }
+        for var, default in valores_default.items():
+            if var in variables_template and not variables.get(var):
+                variables[var] = default
+        
+        return variables
+    
+    def generar_hojas_impresion_pdf(self):
+        """
+        Genera un único PDF con los carnets de todos los empleados colocados en hojas
+        A4/Carta (varios por hoja, con sangrado y marcas de corte) listo para imprenta
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        empleados = self.employees_panel.obtener_todos_empleados()
+        
+        if not empleados:
+            QMessageBox.warning(
+                self.employees_panel,
+                "Advertencia",
+                "No hay empleados en la lista para generar carnets"
+            )
+            return
+        
+        usar_html = self.controls_panel.usar_template_html()
+        if usar_html:
+            html_template = self.controls_panel.obtener_html_template()
+            if not html_template:
+                QMessageBox.warning(self.employees_panel, "Error", "No hay template HTML cargado")
+                return
+            ancho, alto = html_template.ancho, html_template.alto
+        else:
+            template = self.controls_panel.obtener_template_actualizado()
+            ancho, alto = template.ancho, template.alto
+        
+        fecha_hora = datetime.now().strftime("%Y%m%d_%H%M%S")
+        ruta_pdf, _ = QFileDialog.getSaveFileName(
+            self.employees_panel,
+            "Guardar Hojas de Impresión PDF",
+            f"carnets_hojas_{fecha_hora}.pdf",
+            "Archivos PDF (*.pdf);;Todos los archivos (*)"
+        )
+        
+        if not ruta_pdf:
+            return
+        
+        ruta_pdf_path = Path(ruta_pdf)
+        if ruta_pdf_path.suffix.lower() != '.pdf':
+            ruta_pdf_path = ruta_pdf_path.with_suffix('.pdf')
+        
+        try:
+            writer = HojaCarnetsPDFWriter(ruta_pdf_path, ancho, alto)
+        except (ValueError, OSError) as e:
+            QMessageBox.warning(self.employees_panel, "Error", f"No se pueden preparar las hojas de impresión:\n{e}")
+            return
+        
+        from src.views.widgets.progress_dialog import ProgressDialog
+        progress = ProgressDialog("Generando Hojas de Impresión", self.employees_panel)
+        progress.setWindowModality(Qt.WindowModality.ApplicationModal)
+        progress.set_cancelable(True)
+        progress.show()
+        QApplication.processEvents()
+        
+        if usar_html:
+            variables_usuario = self.controls_panel.obtener_variables_html()
+            variables_template = html_template.detectar_variables()
+            html_base = Path(html_template.ruta_html).read_text(encoding='utf-8')
+        
+        errores = 0
+        total = len(empleados)
+        cancelado = False
+        
+        tracer.iniciar_sesion("carnets_hojas_pdf")
+        try:
+            for indice, empleado in enumerate(empleados, 1):
+                if progress.fue_cancelado():
+                    cancelado = True
+                    break
+                
+                progress.actualizar_progreso(
+                    indice - 1,
+                    total,
+                    f"Colocando carnet {indice} de {total}\n"
+                    f"Hoja {writer.hojas + 1} ({writer.carnets_por_hoja} carnets por hoja)"
+                )
+                QApplication.processEvents()
+                
+                tracer.inicio("empleado", "carnets", indice=indice)
+                try:
+                    emp = self._desempaquetar_empleado(empleado)
+                    if not emp:
+                        errores += 1
+                        continue
+                    
+                    codigo_path = self.image_store.ruta(emp['nombre_archivo'])
+                    if not codigo_path.exists():
+                        errores += 1
+                        continue
+                    
+                    if usar_html:
+                        variables = self._variables_html_empleado(emp, codigo_path, variables_template, variables_usuario)
+                        html_content = self.html_renderer._inyectar_variables(html_base, variables)
+                        imagen = self.html_renderer.renderizar_html_a_imagen(
+                            html_content=html_content,
+                            ancho=ancho,
+                            alto=alto,
+                            dpi=CARNET_HOJA_DPI_HTML
+                        )
+                        if imagen is None:
+                            errores += 1
+                            continue
+                        with tracer.span("codificar_pdf", "carnets"):
+                            writer.agregar_imagen(imagen)
+                    else:
+                        with tracer.span("codificar_pdf", "carnets"):
+                            writer.agregar_carnet(
+                                template=template,
+                                nombre_empleado=emp['nombre_empleado'] or "SIN NOMBRE",
+                                codigo_barras_path=str(codigo_path),
+                                empresa=template.empresa_texto if template.mostrar_empresa else None,
+                                web=template.web_texto if template.mostrar_web else None,
+                                patron_codigo=self.barcode_service.obtener_patron(emp['codigo_barras'], emp['formato'])
+                            )
+                except Exception as e:
+                    errores += 1
+                    logger.error(f"Error al colocar el carnet {indice} en la hoja: {e}")
+                finally:
+                    tracer.fin("empleado", "carnets")
+            
+            if cancelado:
+                writer.descartar()
+            else:
+                progress.actualizar_progreso(total, total, "Guardando PDF...")
+                QApplication.processEvents()
+                guardado = writer.carnets > 0 and writer.guardar()
+                if not guardado:
+                    writer.descartar()
+        except Exception as e:
+            logger.error(f"Error al generar las hojas de impresión: {e}", exc_info=True)
+            writer.descartar()
+            progress.close()
+            QMessageBox.critical(self.employees_panel, "Error", f"Error al generar las hojas de impresión:\n{e}")
+            return
+        finally:
+            tracer.finalizar_sesion()
+        
+        progress.marcar_completado()
+        progress.close()
+        
+        if cancelado:
+            QMessageBox.information(self.employees_panel, "Generación Cancelada", "Generación cancelada por el usuario.")
+            return
+        
+        if not guardado:
+            QMessageBox.warning(
+                self.employees_panel,
+                "Error",
+                f"No se pudo generar el PDF de hojas de impresión ({errores} error(es))"
+            )
+            return
+        
+        mensaje = (
+            f"Generación completada:\n{writer.carnets} carnet(s) en {writer.hojas} hoja(s) "
+            f"({writer.columnas}x{writer.filas} por hoja) guardados en:\n{ruta_pdf_path}"
+        )
+        if errores > 0:
+            mensaje += f"\n\n{errores} error(es) durante la generación"
+        
+        QMessageBox.information(self.employees_panel, "Resultado", mensaje)
@@ -6,20 +6,23 @@ from pathlib import Path
 from typing import Optional
 from datetime import datetime
 from PyQt6.QtWidgets import QMessageBox, QFileDialog
+from PyQt6.QtCore import QTimer
 
-from config.settings import IMAGES_DIR
+from config.settings import SOFT_DELETE_ENABLED
 from src.models.database import DatabaseManager
 from src.models.barcode_model import BarcodeModel
 from src.services.barcode_service import BarcodeService
 from src.services.export_service import ExportService
 from src.services.excel_service import ExcelService
+from src.services.image_store import obtener_image_store
+from src.services.thumbnail_loader import CargadorMiniaturas
 from src.views.main_window import MainWindow
 from src.views.widgets.progress_dialog import ProgressDialog
 from src.utils.file_utils import obtener_ruta_imagen
 from src.utils.auth_utils import solicitar_autenticacion_admin
 from src.utils.id_generator import IDGenerator
 from src.utils.user_logger import user_logger
-from src.controllers.carnet_controller import CarnetController
+from src.utils.tracer import tracer
 from src.controllers.service_controller import ServiceController
 
 
@@ -42,6 +45,10 @@ class MainController:
         self.export_service = ExportService()
         self.excel_service = ExcelService(self.db_manager)
         
+        # Miniaturas de la vista previa: caché y generación en segundo plano
+        self.cargador_miniaturas = CargadorMiniaturas(self.barcode_service.obtener_informacion_imagen)
+        self.cargador_miniaturas.terminado.connect(self._on_miniatura_cargada)
+        
         # Obtener información completa del usuario
         usuario_data = self.db_manager.obtener_usuario_por_usuario(usuario)
         self.nombre_usuario = usuario_data['nombre'] if usuario_data else usuario
@@ -70,6 +77,32 @@ class MainController:
         
         self._conectar_senales()
         self._cargar_datos_iniciales()
+        
+        # Detectar Tesseract/Poppler en segundo plano una vez mostrada la ventana
+        QTimer.singleShot(0, self._iniciar_sondeo_ocr)
+        # Precalentar el motor HTML en tiempo ocioso para que el primer carnet no espere
+        QTimer.singleShot(1500, self._precalentar_renderer_html)
+        # Purgar físicamente los registros eliminados hace tiempo (hilo en segundo plano)
+        QTimer.singleShot(5000, self.db_manager.iniciar_purga_en_segundo_plano)
+    
+    def _precalentar_renderer_html(self):
+        """Inicializa el motor web, la vista reutilizable y el template por defecto"""
+        try:
+            from config.settings import TEMPLATES_DIR
+            from src.services.html_renderer import obtener_html_renderer
+            obtener_html_renderer().precalentar(TEMPLATES_DIR / "carnet_default.html")
+        except Exception as e:
+            import logging
+            logging.getLogger(__name__).warning(f"No se pudo precalentar el renderizador HTML: {e}")
+    
+    def _iniciar_sondeo_ocr(self):
+        """Lanza la detección de OCR en segundo plano (no bloquea la interfaz)"""
+        try:
+            from src.services.ocr_verifier import iniciar_sondeo_ocr
+            iniciar_sondeo_ocr()
+        except (ImportError, RuntimeError, OSError) as e:
+            import logging
+            logging.getLogger(__name__).warning(f"OCR no disponible: {e}")
     
     def _conectar_senales(self):
         """Conecta las señales de los widgets con los métodos del controlador"""
@@ -152,7 +185,7 @@ class MainController:
             )
             
             valido, mensaje_error = self.barcode_service.validar_codigo_barras(
-                ruta_imagen, id_unico_generado
+                ruta_imagen, id_unico_generado, formato
             )
             
             if not valido:
@@ -254,22 +287,48 @@ class MainController:
     
     def mostrar_imagen_seleccionada(self):
         """Muestra automáticamente la imagen del código seleccionado en la tabla"""
+        # Descartar la miniatura de la selección anterior que aún se esté cargando
+        self.cargador_miniaturas.cancelar()
         resultado = self.main_window.list_panel.obtener_fila_seleccionada()
         if resultado is None:
             # Si no hay selección, limpiar la vista previa
             return
         
         id_db, codigo_barras, id_unico, formato, nombre_archivo = resultado
-        ruta_imagen = IMAGES_DIR / nombre_archivo
+        ruta_imagen = obtener_image_store().ruta(nombre_archivo)
         
         if ruta_imagen.exists():
-            self.main_window.generation_panel.mostrar_vista_previa(str(ruta_imagen))
+            # Miniatura en caché: se muestra sin decodificar la imagen completa
+            entrada = self.cargador_miniaturas.obtener_inmediata(ruta_imagen)
+            if entrada is not None:
+                self.main_window.generation_panel.mostrar_miniatura(*entrada)
+            else:
+                self.main_window.generation_panel.label_vista_previa.setText("Cargando vista previa...")
+                self.cargador_miniaturas.solicitar(ruta_imagen)
         else:
             # Si la imagen no existe, mostrar mensaje en la vista previa
             self.main_window.generation_panel.label_vista_previa.setText(
                 f"Imagen no encontrada:\n{nombre_archivo}"
             )
     
+    def _on_miniatura_cargada(self, turno: int, resultado):
+        """
+        Muestra la miniatura generada en segundo plano si sigue seleccionada
+        
+        Args:
+            turno: Turno de la solicitud
+            resultado: Tupla (ruta de la imagen, entrada) con entrada = (PNG de la
+                       miniatura, información) o None si falló
+        """
+        if not self.cargador_miniaturas.es_vigente(turno) or resultado is None:
+            return
+        ruta_imagen, entrada = resultado
+        if entrada is not None:
+            self.main_window.generation_panel.mostrar_miniatura(*entrada)
+        else:
+            # Sin miniatura: cargar la imagen directamente como antes
+            self.main_window.generation_panel.mostrar_vista_previa(ruta_imagen)
+    
     def mostrar_detalle_codigo(self):
         """Muestra el detalle del código seleccionado (doble clic)"""
         self.mostrar_imagen_seleccionada()
@@ -366,51 +425,121 @@ class MainController:
             )
     
     def eliminar_codigo(self):
-        """Elimina un código de la base de datos"""
-        resultado = self.main_window.list_panel.obtener_fila_seleccionada()
-        if resultado is None:
+        """Elimina uno o varios códigos de la base de datos"""
+        codigos_seleccionados = self.main_window.list_panel.obtener_filas_seleccionadas()
+        if not codigos_seleccionados:
             QMessageBox.warning(
                 self.main_window, "Advertencia",
                 "Por favor seleccione un código de la tabla"
             )
             return
         
-        id_db, codigo_barras, id_unico, formato, nombre_archivo = resultado
+        cantidad = len(codigos_seleccionados)
         
         # Verificar autenticación de administrador antes de eliminar
+        accion = f"eliminar {cantidad} código(s)" if cantidad > 1 else "eliminar este código"
         if not solicitar_autenticacion_admin(
             self.main_window, 
-            "eliminar este código",
+            accion,
             self.usuario,
             self.rol
         ):
             return
         
+        # Preparar mensaje de confirmación
+        if cantidad == 1:
+            id_unico = codigos_seleccionados[0][2]
+            mensaje_confirmacion = (
+                f"¿Está seguro de que desea eliminar este código?\n"
+                f"ID Único: {id_unico}\n\n"
+                "Nota: La imagen también se eliminará del disco."
+            )
+        else:
+            ids_unicos = [c[2] for c in codigos_seleccionados[:5]]  # Primeros 5 IDs
+            mensaje_ids = "\n".join(f"- {id_unico}" for id_unico in ids_unicos)
+            if cantidad > 5:
+                mensaje_ids += f"\n... y {cantidad - 5} código(s) más"
+            mensaje_confirmacion = (
+                f"¿Está seguro de que desea eliminar {cantidad} código(s)?\n\n"
+                f"Códigos seleccionados:\n{mensaje_ids}\n\n"
+                "Nota: Las imágenes también se eliminarán del disco."
+            )
+        
         respuesta = QMessageBox.question(
             self.main_window, "Confirmar Eliminación",
-            f"¿Está seguro de que desea eliminar este código?\n"
-            f"ID Único: {id_unico}\n\n"
-            "Nota: La imagen también se eliminará del disco.",
+            mensaje_confirmacion,
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
         )
         
-        if respuesta == QMessageBox.StandardButton.Yes:
-            if self.db_manager.eliminar_codigo(id_db, eliminar_imagen=True):
+        if respuesta != QMessageBox.StandardButton.Yes:
+            return
+        
+        # Un solo backup y una sola transacción para toda la selección
+        resultados = self.db_manager.eliminar_codigos_lote(
+            [c[0] for c in codigos_seleccionados], eliminar_imagenes=True
+        )
+        
+        eliminados = 0
+        errores = []
+        for id_db, codigo_barras, id_unico, formato, nombre_empleado, nombre_archivo in codigos_seleccionados:
+            if resultados.get(id_db):
+                eliminados += 1
                 # Registrar acción
                 user_logger.log_eliminar_codigo(self.usuario, id_db)
-                
-                QMessageBox.information(
-                    self.main_window, "Éxito",
-                    "Código e imagen eliminados correctamente.\n\n"
-                    "Nota: Se creó un backup automático antes de la eliminación."
-                )
-                self.cargar_codigos()
-                self.actualizar_estadisticas()
             else:
-                QMessageBox.warning(
-                    self.main_window, "Error",
-                    "No se pudo eliminar el código"
-                )
+                errores.append(f"{id_unico} (ID: {id_db})")
+        
+        # Mostrar resultado
+        if eliminados == cantidad and SOFT_DELETE_ENABLED:
+            self._ofrecer_deshacer_eliminacion([c[0] for c in codigos_seleccionados])
+        elif eliminados == cantidad:
+            QMessageBox.information(
+                self.main_window, "Éxito",
+                f"{eliminados} código(s) e imagen(es) eliminados correctamente.\n\n"
+                "Nota: Se creó un backup automático antes de la eliminación."
+            )
+        elif eliminados > 0:
+            mensaje_parcial = f"Se eliminaron {eliminados} de {cantidad} código(s).\n\n"
+            mensaje_parcial += "No se pudieron eliminar:\n" + "\n".join(errores[:10])
+            if len(errores) > 10:
+                mensaje_parcial += f"\n... y {len(errores) - 10} más"
+            QMessageBox.warning(
+                self.main_window, "Eliminación Parcial",
+                mensaje_parcial
+            )
+        else:
+            QMessageBox.warning(
+                self.main_window, "Error",
+                "No se pudo eliminar el código"
+            )
+        
+        self.cargar_codigos()
+        self.actualizar_estadisticas()
+    
+    def _ofrecer_deshacer_eliminacion(self, ids: list):
+        """
+        Informa de una eliminación lógica y permite deshacerla
+        
+        Args:
+            ids: IDs de los códigos eliminados
+        """
+        mensaje = QMessageBox(self.main_window)
+        mensaje.setIcon(QMessageBox.Icon.Information)
+        mensaje.setWindowTitle("Éxito")
+        mensaje.setText(
+            f"{len(ids)} código(s) eliminado(s) correctamente.\n\n"
+            "Las imágenes se borrarán del disco en la próxima purga automática."
+        )
+        mensaje.addButton(QMessageBox.StandardButton.Ok)
+        boton_deshacer = mensaje.addButton("Deshacer", QMessageBox.ButtonRole.ActionRole)
+        mensaje.exec()
+        
+        if mensaje.clickedButton() is boton_deshacer:
+            restaurados = sum(self.db_manager.restaurar_codigos(ids).values())
+            QMessageBox.information(
+                self.main_window, "Eliminación deshecha",
+                f"{restaurados} código(s) restaurado(s)"
+            )
     
     def limpiar_base_datos(self):
         """Limpia toda la base de datos"""
@@ -527,6 +656,8 @@ class MainController:
         
         # Inicializar controlador de carnet si no está inicializado
         if self.carnet_controller is None:
+            # Importación diferida: arrastra QtWebEngine y el verificador OCR
+            from src.controllers.carnet_controller import CarnetController
             self.carnet_controller = CarnetController(
                 preview_panel=self.main_window.carnet_panel.preview_panel,
                 controls_panel=self.main_window.carnet_panel.controls_panel,
@@ -644,6 +775,7 @@ class MainController:
                 return
             
             ruta_path = Path(ruta_archivo)
+            tracer.iniciar_sesion("importar_excel")
             
             # Crear diálogo de progreso
             progress_dialog = ProgressDialog("Importando Datos desde Excel", self.main_window)
@@ -777,13 +909,14 @@ class MainController:
                     formato = "Code128"
                 
                 # Verificar si ya existe (buscar por código de empleado en descripcion)
-                todos_codigos = self.db_manager.obtener_todos_codigos()
-                codigo_existente = None
-                for codigo in todos_codigos:
-                    # codigo es: (id, codigo_barras, id_unico, fecha_creacion, nombres, apellidos, descripcion, formato, nombre_archivo)
-                    if len(codigo) >= 7 and codigo[6] == codigo_empleado:  # descripcion es índice 6
-                        codigo_existente = codigo
-                        break
+                with tracer.span("buscar_existente", "excel", fila=row_idx):
+                    todos_codigos = self.db_manager.obtener_todos_codigos()
+                    codigo_existente = None
+                    for codigo in todos_codigos:
+                        # codigo es: (id, codigo_barras, id_unico, fecha_creacion, nombres, apellidos, descripcion, formato, nombre_archivo)
+                        if len(codigo) >= 7 and codigo[6] == codigo_empleado:  # descripcion es índice 6
+                            codigo_existente = codigo
+                            break
                 
                 if codigo_existente:
                     # Formato: (id, codigo_barras, id_unico, fecha_creacion, nombres, apellidos, descripcion, formato, nombre_archivo)
@@ -799,9 +932,9 @@ class MainController:
                     
                     # Si hay código inválido y el usuario quiere regenerarlo
                     if regenerar_invalidos and nombre_archivo:
-                        ruta_imagen = IMAGES_DIR / nombre_archivo
+                        ruta_imagen = obtener_image_store().ruta(nombre_archivo)
                         if ruta_imagen.exists():
-                            valido, _ = self.barcode_service.validar_codigo_barras(ruta_imagen, id_unico)
+                            valido, _ = self.barcode_service.validar_codigo_barras(ruta_imagen, id_unico, formato_existente)
                             if not valido:
                                 # Eliminar el código existente y regenerar
                                 self.db_manager.eliminar_codigo(id_db)
@@ -812,6 +945,7 @@ class MainController:
                         continue  # Ya existe, saltar
                 
                 # Generar código de barras
+                tracer.inicio("fila", "excel", fila=row_idx)
                 try:
                     # Generar ID único
                     id_unico_generado = IDGenerator.generar_id_personalizado(
@@ -822,14 +956,16 @@ class MainController:
                         verificar_duplicado=self.db_manager.verificar_codigo_existe
                     )
                     
-                    codigo_barras, id_unico_archivo, ruta_imagen = self.barcode_service.generar_codigo_barras(
-                        id_unico_generado, formato, id_unico_generado, nombres, apellidos
-                    )
+                    with tracer.span("generar_codigo", "excel"):
+                        codigo_barras, id_unico_archivo, ruta_imagen = self.barcode_service.generar_codigo_barras(
+                            id_unico_generado, formato, id_unico_generado, nombres, apellidos
+                        )
                     
                     # Validar código generado
-                    valido, mensaje_error = self.barcode_service.validar_codigo_barras(
-                        ruta_imagen, id_unico_generado
-                    )
+                    with tracer.span("validar_codigo", "excel"):
+                        valido, mensaje_error = self.barcode_service.validar_codigo_barras(
+                            ruta_imagen, id_unico_generado, formato
+                        )
                     
                     if not valido:
                         if ruta_imagen.exists():
@@ -842,10 +978,11 @@ class MainController:
                     nombre_archivo = ruta_imagen.name
                     
                     # Guardar en base de datos
-                    exito = self.db_manager.insertar_codigo(
-                        codigo_barras, id_unico_generado, formato, 
-                        nombres, apellidos, codigo_empleado, nombre_archivo
-                    )
+                    with tracer.span("insertar_bd", "excel"):
+                        exito = self.db_manager.insertar_codigo(
+                            codigo_barras, id_unico_generado, formato, 
+                            nombres, apellidos, codigo_empleado, nombre_archivo
+                        )
                     
                     if not exito:
                         if ruta_imagen.exists():
@@ -860,6 +997,8 @@ class MainController:
                     errores_final.append(
                         f"Fila {row_idx} ({nombre_completo}): {str(e)}"
                     )
+                finally:
+                    tracer.fin("fila", "excel")
             
             progress_dialog.close()
             
@@ -900,6 +1039,8 @@ class MainController:
                 "Error",
                 f"Error inesperado al importar: {str(e)}"
             )
+        finally:
+            tracer.finalizar_sesion()
     
     def mostrar_vista_generacion(self):
         """Cambia a la vista de generación de códigos"""
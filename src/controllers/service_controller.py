@@ -2,16 +2,18 @@
 Controlador para la gestión de códigos de barras de servicio
 """
 import logging
-import zipfile
 from pathlib import Path
 from typing import Optional, Tuple, List
 from datetime import datetime
 from PyQt6.QtWidgets import QMessageBox, QFileDialog
 
-from config.settings import IMAGES_DIR
+from config.settings import SOFT_DELETE_ENABLED
 from src.models.database import DatabaseManager
 from src.services.barcode_service import BarcodeService
 from src.services.excel_service import ExcelService
+from src.services.image_store import obtener_image_store
+from src.services.thumbnail_loader import CargadorMiniaturas
+from src.services.zip_stream import ZipStreamWriter
 from src.utils.id_generator import IDGenerator
 from src.utils.file_utils import obtener_ruta_imagen
 from src.utils.auth_utils import solicitar_autenticacion_admin
@@ -38,6 +40,10 @@ class ServiceController:
         self.barcode_service = BarcodeService()
         self.excel_service = ExcelService(db_manager)
         self.servicio_seleccionado = None
+        
+        # Miniaturas de la vista previa: caché y generación en segundo plano
+        self.cargador_miniaturas = CargadorMiniaturas(self.barcode_service.obtener_informacion_imagen)
+        self.cargador_miniaturas.terminado.connect(self._on_miniatura_cargada)
         self.usuario = usuario
         self.rol = rol
         
@@ -80,6 +86,8 @@ class ServiceController:
     
     def mostrar_imagen_seleccionada(self):
         """Muestra automáticamente la imagen del servicio seleccionado en la tabla"""
+        # Descartar la miniatura de la selección anterior que aún se esté cargando
+        self.cargador_miniaturas.cancelar()
         resultado = self.service_panel.obtener_fila_seleccionada()
         if resultado is None:
             self.service_panel.boton_descargar_individual.setEnabled(False)
@@ -97,12 +105,16 @@ class ServiceController:
         nombre_archivo = servicio_completo[6] if len(servicio_completo) > 6 else None
         
         if nombre_archivo:
-            from config.settings import IMAGES_DIR
-            ruta_imagen = IMAGES_DIR / nombre_archivo
+            ruta_imagen = obtener_image_store().ruta(nombre_archivo)
             
             if ruta_imagen.exists():
-                informacion_imagen = self.barcode_service.obtener_informacion_imagen(ruta_imagen)
-                self.service_panel.mostrar_vista_previa(str(ruta_imagen), informacion_imagen)
+                # Miniatura e información en caché: se muestran sin decodificar la imagen completa
+                entrada = self.cargador_miniaturas.obtener_inmediata(ruta_imagen)
+                if entrada is not None:
+                    self.service_panel.mostrar_miniatura(*entrada)
+                else:
+                    self.service_panel.label_vista_previa.setText("Cargando vista previa...")
+                    self.cargador_miniaturas.solicitar(ruta_imagen)
                 
                 # Actualizar servicio seleccionado
                 self.servicio_seleccionado = {
@@ -122,6 +134,24 @@ class ServiceController:
             self.service_panel.label_vista_previa.setText("Servicio sin imagen")
             self.service_panel.boton_descargar_individual.setEnabled(False)
     
+    def _on_miniatura_cargada(self, turno: int, resultado):
+        """
+        Muestra la miniatura generada en segundo plano si sigue seleccionada
+        
+        Args:
+            turno: Turno de la solicitud
+            resultado: Tupla (ruta de la imagen, entrada) con entrada = (PNG de la
+                       miniatura, información) o None si falló
+        """
+        if not self.cargador_miniaturas.es_vigente(turno) or resultado is None:
+            return
+        ruta_imagen, entrada = resultado
+        if entrada is not None:
+            self.service_panel.mostrar_miniatura(*entrada)
+        else:
+            # Sin miniatura: cargar la imagen directamente como antes
+            self.service_panel.mostrar_vista_previa(ruta_imagen)
+    
     def actualizar_id_preview(self):
         """Actualiza la vista previa del ID que se generará"""
         try:
@@ -160,7 +190,7 @@ class ServiceController:
             )
             
             valido, mensaje_error = self.barcode_service.validar_codigo_barras(
-                ruta_imagen, id_unico_generado
+                ruta_imagen, id_unico_generado, formato
             )
             
             if not valido:
@@ -247,7 +277,7 @@ class ServiceController:
         try:
             servicio = self.servicio_seleccionado
             nombre_archivo = servicio['nombre_archivo']
-            ruta_imagen = IMAGES_DIR / nombre_archivo
+            ruta_imagen = obtener_image_store().ruta(nombre_archivo)
             
             if not ruta_imagen.exists():
                 QMessageBox.warning(
@@ -335,11 +365,13 @@ class ServiceController:
             servicios_verificados = 0
             servicios_fallidos = 0
             
-            with zipfile.ZipFile(ruta_zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            # Los PNG se escriben en el ZIP a medida que se procesan, sin recomprimir
+            with ZipStreamWriter(ruta_zip_path) as zipf:
                 total = len(servicios)
                 
                 for indice, servicio in enumerate(servicios, 1):
                     if progress.fue_cancelado():
+                        zipf.descartar()
                         break
                     
                     progress.actualizar_progreso(
@@ -359,7 +391,7 @@ class ServiceController:
                             errores.append(f"Servicio {nombre_servicio}: Sin archivo de imagen")
                             continue
                         
-                        ruta_imagen = IMAGES_DIR / nombre_archivo
+                        ruta_imagen = obtener_image_store().ruta(nombre_archivo)
                         
                         if not ruta_imagen.exists():
                             errores.append(f"Servicio {nombre_servicio}: Imagen no encontrada")
@@ -368,7 +400,7 @@ class ServiceController:
                         nombre_servicio_limpio = nombre_servicio.replace(" ", "_")
                         nombre_en_zip = f"{nombre_servicio_limpio}_{id_unico}.png"
                         
-                        zipf.write(ruta_imagen, nombre_en_zip)
+                        zipf.agregar_archivo(ruta_imagen, nombre_en_zip)
                         
                         valido, mensaje_validacion = self.barcode_service.validar_codigo_barras(
                             ruta_imagen,
@@ -390,8 +422,6 @@ class ServiceController:
             progress.close()
             
             if progress.fue_cancelado():
-                if ruta_zip_path.exists():
-                    ruta_zip_path.unlink()
                 QMessageBox.information(
                     self.service_panel, "Cancelado",
                     "La descarga masiva fue cancelada."
@@ -520,17 +550,24 @@ class ServiceController:
         )
         
         if respuesta == QMessageBox.StandardButton.Yes:
+            # Un solo backup y una sola transacción para toda la selección
+            resultados = self.db_manager.eliminar_servicios_lote(
+                [s[0] for s in servicios_seleccionados], eliminar_imagenes=True
+            )
+            
             eliminados = 0
             errores = []
             
             for id_db, codigo_barras, id_unico, nombre_servicio, formato in servicios_seleccionados:
-                if self.db_manager.eliminar_servicio(id_db, eliminar_imagen=True):
+                if resultados.get(id_db):
                     eliminados += 1
                 else:
                     errores.append(f"{nombre_servicio} (ID: {id_db})")
             
             # Mostrar resultado
-            if eliminados == cantidad:
+            if eliminados == cantidad and SOFT_DELETE_ENABLED:
+                self._ofrecer_deshacer_eliminacion([s[0] for s in servicios_seleccionados])
+            elif eliminados == cantidad:
                 mensaje_exito = (
                     f"{eliminados} servicio(s) eliminado(s) correctamente.\n\n"
                     "Nota: Se creó un backup automático antes de la eliminación."
@@ -563,6 +600,31 @@ class ServiceController:
             self.service_panel.label_vista_previa.setText("La vista previa aparecerá aquí")
             self.service_panel.boton_descargar_individual.setEnabled(False)
     
+    def _ofrecer_deshacer_eliminacion(self, ids: List[int]):
+        """
+        Informa de una eliminación lógica y permite deshacerla
+        
+        Args:
+            ids: IDs de los servicios eliminados
+        """
+        mensaje = QMessageBox(self.service_panel)
+        mensaje.setIcon(QMessageBox.Icon.Information)
+        mensaje.setWindowTitle("Éxito")
+        mensaje.setText(
+            f"{len(ids)} servicio(s) eliminado(s) correctamente.\n\n"
+            "Las imágenes se borrarán del disco en la próxima purga automática."
+        )
+        mensaje.addButton(QMessageBox.StandardButton.Ok)
+        boton_deshacer = mensaje.addButton("Deshacer", QMessageBox.ButtonRole.ActionRole)
+        mensaje.exec()
+        
+        if mensaje.clickedButton() is boton_deshacer:
+            restaurados = sum(self.db_manager.restaurar_servicios(ids).values())
+            QMessageBox.information(
+                self.service_panel, "Eliminación deshecha",
+                f"{restaurados} servicio(s) restaurado(s)"
+            )
+    
     def importar_servicios_excel(self):
         """Importa servicios desde un archivo Excel y genera códigos de barras"""
         try:
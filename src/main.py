@@ -2,13 +2,25 @@
 Punto de entrada principal de la aplicación
 """
 import sys
+import time
+
+# Instante de arranque (referencia para --profile-startup)
+_INICIO_ARRANQUE = time.perf_counter()
+
+# Activar el perfilado antes de cualquier importación pesada
+PERFILAR_ARRANQUE = "--profile-startup" in sys.argv
+if PERFILAR_ARRANQUE:
+    sys.argv.remove("--profile-startup")
+    from src.utils.startup_profiler import perfilador_arranque
+    perfilador_arranque.activar(_INICIO_ARRANQUE)
+
 import logging
 from PyQt6.QtWidgets import QApplication, QMessageBox
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QCoreApplication, QTimer
 
+# Solo la ventana de login se importa al arrancar; el controlador principal
+# (QtWebEngine, numpy, pyzbar, openpyxl, OCR) se carga después del login
 from src.views.login_window import LoginWindow
-from src.views.register_window import RegisterWindow
-from src.controllers.main_controller import MainController
 
 # Configurar logging básico
 logging.basicConfig(
@@ -23,6 +35,8 @@ logging.basicConfig(
 def main():
     """Función principal de la aplicación"""
     try:
+        # Requerido para poder importar QtWebEngine después de crear la QApplication
+        QCoreApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
         app = QApplication(sys.argv)
         app.setStyle("Fusion")
         
@@ -41,6 +55,7 @@ def main():
             try:
                 # Crear controlador con el rol del usuario
                 logging.info("Creando MainController...")
+                from src.controllers.main_controller import MainController
                 controller = MainController(usuario=usuario, rol=rol)
                 controller_ref[0] = controller  # Guardar referencia
                 logging.info("MainController creado exitosamente")
@@ -77,6 +92,7 @@ def main():
                 mostrando_registro[0] = True
                 
                 try:
+                    from src.views.register_window import RegisterWindow
                     register_window = RegisterWindow()
                     current_window_ref[0] = register_window
                     
@@ -135,6 +151,13 @@ def main():
         login_window.raise_()
         login_window.activateWindow()
         
+        if PERFILAR_ARRANQUE:
+            def reportar_arranque():
+                perfilador_arranque.marcar("Ventana de login visible")
+                logging.info("\n" + perfilador_arranque.generar_reporte())
+            # Se ejecuta en la primera vuelta del event loop, con la ventana ya pintada
+            QTimer.singleShot(0, reportar_arranque)
+        
         # Conectar señal de login exitoso
         login_window.login_exitoso.connect(on_login_exitoso)
         
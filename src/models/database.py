@@ -3,23 +3,42 @@ Gestión de base de datos SQLite - Optimizada y normalizada
 """
 import sqlite3
 import random
-import shutil
 import logging
-from datetime import datetime
-from typing import Optional, List, Tuple, ContextManager
+import threading
+from typing import Optional, List, Tuple, ContextManager, Dict, Iterable
 from pathlib import Path
 from contextlib import contextmanager
 
-from config.settings import DB_PATH, BACKUPS_DIR, IMAGES_DIR
+from config.settings import (
+    DB_PATH, BACKUPS_DIR,
+    SOFT_DELETE_ENABLED, PURGE_AFTER_SECONDS, PURGE_BATCH_SIZE
+)
 from src.utils.constants import ID_CHARACTERS, ID_LENGTH, MAX_ID_GENERATION_ATTEMPTS
+from src.services.backup_service import BackupService
+from src.services.image_store import obtener_image_store
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# Tablas que admiten eliminación lógica (columna deleted_at)
+TABLAS_ELIMINACION_LOGICA = ("codigos_barras", "servicios")
+
+# Estados de los trabajos de generación masiva (diario de reanudación)
+TRABAJO_EN_CURSO = "en_curso"
+TRABAJO_CANCELADO = "cancelado"
+TRABAJO_COMPLETADO = "completado"
+TRABAJO_ABANDONADO = "abandonado"
+# Estados por empleado dentro de un trabajo
+ITEM_COMPLETADO = "completado"
+ITEM_ERROR = "error"
+
 
 class DatabaseManager:
     """Gestor de base de datos para códigos de barras - Optimizado"""
     
+    # Evita dos purgas simultáneas sobre la misma BD (varios DatabaseManager en la app)
+    _lock_purga = threading.Lock()
+    
     def __init__(self, db_path: Optional[Path] = None):
         """
         Inicializa el gestor de base de datos
@@ -29,6 +48,8 @@ class DatabaseManager:
         """
         self.db_path = db_path or DB_PATH
         self.backups_dir = BACKUPS_DIR
+        self.backup_service = BackupService(self.db_path, self.backups_dir)
+        self.image_store = obtener_image_store()
         self.init_database()
         # Limpiar backups antiguos al inicializar (mantener solo los 10 más recientes)
         self.limpiar_backups_antiguos(mantener_ultimos=10)
@@ -103,6 +124,34 @@ class DatabaseManager:
                 )
             """)
             
+            # Diario de trabajos de generación masiva: permite reanudar una ejecución
+            # interrumpida sin regenerar los carnets ya terminados
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS trabajos_masivos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tipo TEXT NOT NULL,
+                    huella TEXT NOT NULL,
+                    ruta_salida TEXT NOT NULL,
+                    estado TEXT NOT NULL DEFAULT 'en_curso',
+                    total INTEGER NOT NULL DEFAULT 0,
+                    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS trabajos_masivos_items (
+                    trabajo_id INTEGER NOT NULL,
+                    id_unico TEXT NOT NULL,
+                    estado TEXT NOT NULL,
+                    verificado INTEGER NOT NULL DEFAULT 0,
+                    archivo TEXT,
+                    mensaje TEXT,
+                    fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (trabajo_id, id_unico)
+                )
+            """)
+            
             # Migraciones: agregar columnas si no existen
             columnas_existentes = self._obtener_columnas_tabla(cursor)
             
@@ -172,6 +221,14 @@ class DatabaseManager:
                     except sqlite3.OperationalError:
                         pass
             
+            # Migración: columna deleted_at para eliminación lógica (tombstones)
+            for tabla in TABLAS_ELIMINACION_LOGICA:
+                if 'deleted_at' not in self._obtener_columnas_tabla(cursor, tabla):
+                    try:
+                        cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN deleted_at TIMESTAMP")
+                    except sqlite3.OperationalError:
+                        pass
+            
             # Crear índices para mejorar el rendimiento
             cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_codigo_barras 
@@ -230,47 +287,74 @@ class DatabaseManager:
                 ON servicios(nombre_servicio)
             """)
             
+            # Búsqueda de trabajos reanudables con la misma configuración
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_trabajos_pendientes 
+                ON trabajos_masivos(tipo, huella) WHERE estado IN ('en_curso', 'cancelado')
+            """)
+            
+            # Índices parciales: listados sin tombstones y búsqueda de candidatos a purgar
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_codigos_activos_fecha 
+                ON codigos_barras(fecha_creacion DESC) WHERE deleted_at IS NULL
+            """)
+            
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_codigos_eliminados 
+                ON codigos_barras(deleted_at) WHERE deleted_at IS NOT NULL
+            """)
+            
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_servicios_activos_fecha 
+                ON servicios(fecha_creacion DESC) WHERE deleted_at IS NULL
+            """)
+            
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_servicios_eliminados 
+                ON servicios(deleted_at) WHERE deleted_at IS NOT NULL
+            """)
+            
             conn.commit()
             logger.info("Base de datos inicializada correctamente")
     
-    def _obtener_columnas_tabla(self, cursor: sqlite3.Cursor) -> List[str]:
+    def _obtener_columnas_tabla(self, cursor: sqlite3.Cursor, tabla: str = "codigos_barras") -> List[str]:
         """
-        Obtiene la lista de columnas de la tabla codigos_barras
+        Obtiene la lista de columnas de una tabla
         
         Args:
             cursor: Cursor de la base de datos
+            tabla: Nombre de la tabla (por defecto codigos_barras)
             
         Returns:
             Lista de nombres de columnas
         """
-        cursor.execute("PRAGMA table_info(codigos_barras)")
+        cursor.execute(f"PRAGMA table_info({tabla})")
         return [row[1] for row in cursor.fetchall()]
     
-    def crear_backup_automatico(self, razon: str = "operacion_critica") -> Optional[Path]:
+    def crear_backup_automatico(self, razon: str = "operacion_critica", forzar: bool = False) -> Optional[Path]:
         """
-        Crea un backup automático de la base de datos
+        Crea un backup automático de la base de datos (API de backup en línea)
+        
+        Varias operaciones dentro de la ventana BACKUP_COALESCE_SECONDS, o dentro
+        de un mismo lote_backup(), comparten un único backup.
         
         Args:
             razon: Razón del backup (para el nombre del archivo)
+            forzar: Si True, crea un snapshot aunque haya uno reciente
             
         Returns:
-            Path del archivo de backup creado, None si falla
+            Path del archivo de backup, None si falla
         """
-        if not self.db_path.exists():
-            logger.warning("No se puede crear backup: la base de datos no existe")
-            return None
+        return self.backup_service.crear_backup(razon, forzar=forzar)
+    
+    def lote_backup(self):
+        """
+        Context manager para operaciones en lote que deben compartir un solo backup
         
-        try:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            nombre_backup = f"backup_{razon}_{timestamp}.db"
-            ruta_backup = self.backups_dir / nombre_backup
-            
-            shutil.copy2(str(self.db_path), str(ruta_backup))
-            logger.info(f"Backup automático creado: {ruta_backup.name}")
-            return ruta_backup
-        except Exception as e:
-            logger.error(f"Error al crear backup automático: {e}")
-            return None
+        Returns:
+            Context manager del servicio de backups
+        """
+        return self.backup_service.lote()
     
     def verificar_codigo_existe(self, codigo_barras: str) -> bool:
         """
@@ -400,6 +484,7 @@ class DatabaseManager:
                 SELECT id, codigo_barras, id_unico, fecha_creacion, 
                        nombres, apellidos, descripcion, formato, nombre_archivo
                 FROM codigos_barras
+                WHERE deleted_at IS NULL
                 ORDER BY fecha_creacion DESC
             """)
             return cursor.fetchall()
@@ -407,7 +492,8 @@ class DatabaseManager:
     def eliminar_codigo(self, codigo_id: int, eliminar_imagen: bool = True) -> bool:
         """
         Elimina un código de barras por su ID
-        Crea backup automático antes de eliminar
+        Con SOFT_DELETE_ENABLED solo lo marca como eliminado (la imagen se borra al purgar);
+        si no, crea backup automático antes de eliminar
         
         Args:
             codigo_id: ID del código a eliminar
@@ -416,6 +502,9 @@ class DatabaseManager:
         Returns:
             True si se eliminó correctamente, False en caso contrario
         """
+        if SOFT_DELETE_ENABLED:
+            return self._marcar_eliminados("codigos_barras", [codigo_id]).get(int(codigo_id), False)
+        
         # Obtener información del código antes de eliminarlo
         nombre_archivo = None
         if eliminar_imagen:
@@ -443,16 +532,165 @@ class DatabaseManager:
                 
                 # Eliminar imagen si existe y se solicitó
                 if eliminar_imagen and nombre_archivo:
-                    ruta_imagen = IMAGES_DIR / nombre_archivo
-                    if ruta_imagen.exists():
-                        try:
-                            ruta_imagen.unlink()
+                    try:
+                        if self.image_store.eliminar(nombre_archivo):
                             logger.info(f"Imagen eliminada: {nombre_archivo}")
-                        except Exception as e:
-                            logger.warning(f"No se pudo eliminar la imagen {nombre_archivo}: {e}")
+                    except Exception as e:
+                        logger.warning(f"No se pudo eliminar la imagen {nombre_archivo}: {e}")
             
             return filas_afectadas > 0
     
+    def _eliminar_registros_lote(
+        self, tabla: str, ids: Iterable[int], eliminar_imagenes: bool, razon_backup: str
+    ) -> Dict[int, bool]:
+        """
+        Elimina varios registros de una tabla con un solo backup y una sola transacción.
+        Con SOFT_DELETE_ENABLED solo los marca como eliminados, sin backup.
+        
+        Args:
+            tabla: Tabla de la que eliminar ('codigos_barras' o 'servicios')
+            ids: IDs de los registros a eliminar
+            eliminar_imagenes: Si True, elimina también las imágenes asociadas
+            razon_backup: Razón del backup (para el nombre del archivo)
+            
+        Returns:
+            Diccionario {id: eliminado} con el resultado de cada ID solicitado
+        """
+        if tabla not in TABLAS_ELIMINACION_LOGICA:
+            raise ValueError(f"Tabla no soportada para eliminación en lote: {tabla}")
+        
+        if SOFT_DELETE_ENABLED:
+            return self._marcar_eliminados(tabla, ids)
+        
+        ids_unicos = list(dict.fromkeys(int(id_registro) for id_registro in ids))
+        resultados = {id_registro: False for id_registro in ids_unicos}
+        if not ids_unicos:
+            return resultados
+        
+        # Un único snapshot para toda la operación
+        self.crear_backup_automatico(razon_backup)
+        
+        archivos = []
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            self._cargar_ids_temporales(cursor, ids_unicos)
+            cursor.execute(f"""
+                SELECT t.id, t.nombre_archivo
+                FROM {tabla} t
+                JOIN ids_eliminar e ON e.id = t.id
+            """)
+            existentes = cursor.fetchall()
+            
+            cursor.execute(f"DELETE FROM {tabla} WHERE id IN (SELECT id FROM ids_eliminar)")
+            conn.commit()
+            
+            for fila in existentes:
+                resultados[fila[0]] = True
+                if fila[1]:
+                    archivos.append(fila[1])
+        
+        logger.info(f"Eliminados {len(existentes)} de {len(ids_unicos)} registro(s) de {tabla}")
+        
+        if eliminar_imagenes and archivos:
+            self._eliminar_imagenes_paralelo(archivos)
+        
+        return resultados
+    
+    def _cargar_ids_temporales(self, cursor: sqlite3.Cursor, ids: List[int]) -> None:
+        """
+        Carga los IDs en la tabla temporal ids_eliminar de la conexión actual.
+        Evita el límite de parámetros de "IN (?, ?, ...)" con selecciones grandes.
+        
+        Args:
+            cursor: Cursor de la conexión donde se usará la tabla
+            ids: IDs a cargar
+        """
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS ids_eliminar (id INTEGER PRIMARY KEY)")
+        cursor.execute("DELETE FROM ids_eliminar")
+        cursor.executemany(
+            "INSERT OR IGNORE INTO ids_eliminar (id) VALUES (?)",
+            [(id_registro,) for id_registro in ids]
+        )
+    
+    def _marcar_eliminados(self, tabla: str, ids: Iterable[int], restaurar: bool = False) -> Dict[int, bool]:
+        """
+        Marca (o desmarca) registros como eliminados con un único UPDATE
+        
+        Args:
+            tabla: Tabla afectada ('codigos_barras' o 'servicios')
+            ids: IDs de los registros
+            restaurar: Si True, quita la marca deleted_at (deshacer eliminación)
+            
+        Returns:
+            Diccionario {id: modificado} con el resultado de cada ID solicitado
+        """
+        if tabla not in TABLAS_ELIMINACION_LOGICA:
+            raise ValueError(f"Tabla no soportada para eliminación lógica: {tabla}")
+        
+        ids_unicos = list(dict.fromkeys(int(id_registro) for id_registro in ids))
+        resultados = {id_registro: False for id_registro in ids_unicos}
+        if not ids_unicos:
+            return resultados
+        
+        condicion = "deleted_at IS NOT NULL" if restaurar else "deleted_at IS NULL"
+        nuevo_valor = "NULL" if restaurar else "CURRENT_TIMESTAMP"
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            self._cargar_ids_temporales(cursor, ids_unicos)
+            filtro = f"id IN (SELECT id FROM ids_eliminar) AND {condicion}"
+            cursor.execute(f"SELECT id FROM {tabla} WHERE {filtro}")
+            afectados = [fila[0] for fila in cursor.fetchall()]
+            cursor.execute(f"UPDATE {tabla} SET deleted_at = {nuevo_valor} WHERE {filtro}")
+            conn.commit()
+        
+        for id_registro in afectados:
+            resultados[id_registro] = True
+        
+        accion = "Restaurados" if restaurar else "Marcados como eliminados"
+        logger.info(f"{accion} {len(afectados)} de {len(ids_unicos)} registro(s) de {tabla}")
+        return resultados
+    
+    def restaurar_codigos(self, ids: Iterable[int]) -> Dict[int, bool]:
+        """
+        Deshace la eliminación lógica de códigos aún no purgados
+        
+        Args:
+            ids: IDs de los códigos a restaurar
+            
+        Returns:
+            Diccionario {id: restaurado} con el resultado de cada ID
+        """
+        return self._marcar_eliminados("codigos_barras", ids, restaurar=True)
+    
+    def _eliminar_imagenes_paralelo(self, nombres_archivo: List[str]) -> int:
+        """
+        Elimina imágenes del almacén (en paralelo o en una sola transacción según el backend)
+        
+        Args:
+            nombres_archivo: Nombres de archivo del almacén de imágenes
+            
+        Returns:
+            Número de imágenes eliminadas
+        """
+        eliminadas = self.image_store.eliminar_varios(nombres_archivo)
+        
+        logger.info(f"Imágenes eliminadas: {eliminadas} de {len(nombres_archivo)}")
+        return eliminadas
+    
+    def eliminar_codigos_lote(self, ids: Iterable[int], eliminar_imagenes: bool = True) -> Dict[int, bool]:
+        """
+        Elimina varios códigos de barras con un solo backup y una sola transacción
+        
+        Args:
+            ids: IDs de los códigos a eliminar
+            eliminar_imagenes: Si True, elimina también las imágenes asociadas
+            
+        Returns:
+            Diccionario {id: eliminado} con el resultado de cada ID
+        """
+        return self._eliminar_registros_lote("codigos_barras", ids, eliminar_imagenes, "antes_eliminar_lote")
+    
     def buscar_codigo(self, termino: str) -> List[Tuple]:
         """
         Busca códigos de barras por término de búsqueda
@@ -472,11 +710,12 @@ class DatabaseManager:
                 SELECT id, codigo_barras, id_unico, fecha_creacion, 
                        nombres, apellidos, descripcion, formato, nombre_archivo
                 FROM codigos_barras
-                WHERE codigo_barras LIKE ? 
+                WHERE deleted_at IS NULL
+                  AND (codigo_barras LIKE ? 
                    OR id_unico LIKE ? 
                    OR nombres LIKE ? 
                    OR apellidos LIKE ?
-                   OR descripcion LIKE ?  -- Código de empleado
+                   OR descripcion LIKE ?)  -- Código de empleado
                 ORDER BY fecha_creacion DESC
             """, (termino_busqueda, termino_busqueda, termino_busqueda, termino_busqueda, termino_busqueda))
             
@@ -538,6 +777,7 @@ class DatabaseManager:
                     COUNT(*) as total_codigos,
                     COUNT(DISTINCT formato) as formatos_diferentes
                 FROM codigos_barras
+                WHERE deleted_at IS NULL
             """)
             
             resultado = cursor.fetchone()
@@ -558,7 +798,7 @@ class DatabaseManager:
             True si se limpió correctamente, False en caso contrario
         """
         # Crear backup automático antes de limpiar
-        backup_path = self.crear_backup_automatico("antes_limpiar_todo")
+        backup_path = self.crear_backup_automatico("antes_limpiar_todo", forzar=True)
         
         if not backup_path:
             logger.error("No se pudo crear backup antes de limpiar la base de datos")
@@ -580,15 +820,7 @@ class DatabaseManager:
                 
                 # Eliminar imágenes asociadas
                 if eliminar_imagenes and archivos_a_eliminar:
-                    eliminadas = 0
-                    for nombre_archivo in archivos_a_eliminar:
-                        ruta_imagen = IMAGES_DIR / nombre_archivo
-                        if ruta_imagen.exists():
-                            try:
-                                ruta_imagen.unlink()
-                                eliminadas += 1
-                            except Exception as e:
-                                logger.warning(f"No se pudo eliminar {nombre_archivo}: {e}")
+                    eliminadas = self.image_store.eliminar_varios(archivos_a_eliminar)
                     logger.info(f"Imágenes eliminadas: {eliminadas}/{len(archivos_a_eliminar)}")
                 
                 logger.info(f"Base de datos limpiada: {filas_eliminadas} registros eliminados")
@@ -605,16 +837,7 @@ class DatabaseManager:
         Returns:
             Lista de paths de backups ordenados por fecha (más reciente primero)
         """
-        if not self.backups_dir.exists():
-            return []
-        
-        backups = sorted(
-            self.backups_dir.glob("backup_*.db"),
-            key=lambda p: p.stat().st_mtime,
-            reverse=True
-        )
-        
-        return backups
+        return self.backup_service.obtener_backups()
     
     def limpiar_backups_antiguos(self, mantener_ultimos: int = 10) -> int:
         """
@@ -647,13 +870,18 @@ class DatabaseManager:
     def obtener_archivos_imagenes_bd(self) -> set:
         """
         Obtiene el conjunto de nombres de archivos de imágenes que están en la BD
+        (incluye los registros eliminados pendientes de purga, que aún pueden restaurarse)
         
         Returns:
-            Set con los nombres de archivos de imágenes registradas en la BD
+            Set con los nombres de archivos de imágenes registradas en la BD (códigos y servicios)
         """
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT nombre_archivo FROM codigos_barras WHERE nombre_archivo IS NOT NULL")
+            cursor.execute("""
+                SELECT nombre_archivo FROM codigos_barras WHERE nombre_archivo IS NOT NULL
+                UNION
+                SELECT nombre_archivo FROM servicios WHERE nombre_archivo IS NOT NULL
+            """)
             return {row[0] for row in cursor.fetchall() if row[0]}
     
     def limpiar_imagenes_huerfanas(self) -> Tuple[int, int]:
@@ -663,31 +891,18 @@ class DatabaseManager:
         Returns:
             Tupla con (imagenes_eliminadas, errores)
         """
-        if not IMAGES_DIR.exists():
-            return 0, 0
-        
         # Obtener archivos de imágenes en la BD
         archivos_bd = self.obtener_archivos_imagenes_bd()
         
-        # Obtener todos los archivos PNG en el directorio
-        archivos_directorio = set(IMAGES_DIR.glob("*.png"))
-        nombres_archivos_directorio = {archivo.name for archivo in archivos_directorio}
-        
-        # Encontrar imágenes huérfanas (están en el directorio pero no en la BD)
-        imagenes_huerfanas = nombres_archivos_directorio - archivos_bd
+        # Encontrar imágenes huérfanas (están en el almacén pero no en la BD);
+        # con el backend "pack" se consultan y eliminan en bloque
+        imagenes_huerfanas = self.image_store.nombres() - archivos_bd
+        if not imagenes_huerfanas:
+            return 0, 0
         
-        eliminadas = 0
-        errores = 0
-        
-        for nombre_archivo in imagenes_huerfanas:
-            ruta_imagen = IMAGES_DIR / nombre_archivo
-            try:
-                ruta_imagen.unlink()
-                eliminadas += 1
-                logger.info(f"Imagen huérfana eliminada: {nombre_archivo}")
-            except Exception as e:
-                errores += 1
-                logger.error(f"Error al eliminar imagen huérfana {nombre_archivo}: {e}")
+        eliminadas = self.image_store.eliminar_varios(imagenes_huerfanas)
+        errores = len(imagenes_huerfanas) - eliminadas
+        logger.info(f"Imágenes huérfanas eliminadas: {eliminadas} de {len(imagenes_huerfanas)}")
         
         return eliminadas, errores
     
@@ -780,6 +995,7 @@ class DatabaseManager:
             cursor.execute("""
                 SELECT id, codigo_barras, id_unico, nombre_servicio, fecha_creacion, formato, nombre_archivo
                 FROM servicios
+                WHERE deleted_at IS NULL
                 ORDER BY fecha_creacion DESC
             """)
             return cursor.fetchall()
@@ -802,9 +1018,10 @@ class DatabaseManager:
             cursor.execute("""
                 SELECT id, codigo_barras, id_unico, nombre_servicio, fecha_creacion, formato, nombre_archivo
                 FROM servicios
-                WHERE codigo_barras LIKE ? 
+                WHERE deleted_at IS NULL
+                  AND (codigo_barras LIKE ? 
                    OR id_unico LIKE ? 
-                   OR nombre_servicio LIKE ?
+                   OR nombre_servicio LIKE ?)
                 ORDER BY fecha_creacion DESC
             """, (termino_busqueda, termino_busqueda, termino_busqueda))
             
@@ -826,7 +1043,7 @@ class DatabaseManager:
             cursor.execute("""
                 SELECT id, codigo_barras, id_unico, nombre_servicio, fecha_creacion, formato, nombre_archivo
                 FROM servicios
-                WHERE id = ?
+                WHERE id = ? AND deleted_at IS NULL
             """, (servicio_id,))
             
             return cursor.fetchone()
@@ -834,7 +1051,8 @@ class DatabaseManager:
     def eliminar_servicio(self, servicio_id: int, eliminar_imagen: bool = True) -> bool:
         """
         Elimina un servicio por su ID
-        Crea backup automático antes de eliminar
+        Con SOFT_DELETE_ENABLED solo lo marca como eliminado (la imagen se borra al purgar);
+        si no, crea backup automático antes de eliminar
         
         Args:
             servicio_id: ID del servicio a eliminar
@@ -843,6 +1061,9 @@ class DatabaseManager:
         Returns:
             True si se eliminó correctamente, False en caso contrario
         """
+        if SOFT_DELETE_ENABLED:
+            return self._marcar_eliminados("servicios", [servicio_id]).get(int(servicio_id), False)
+        
         nombre_archivo = None
         if eliminar_imagen:
             with self.get_connection() as conn:
@@ -867,16 +1088,39 @@ class DatabaseManager:
                 logger.info(f"Servicio eliminado: ID {servicio_id}")
                 
                 if eliminar_imagen and nombre_archivo:
-                    ruta_imagen = IMAGES_DIR / nombre_archivo
-                    if ruta_imagen.exists():
-                        try:
-                            ruta_imagen.unlink()
+                    try:
+                        if self.image_store.eliminar(nombre_archivo):
                             logger.info(f"Imagen eliminada: {nombre_archivo}")
-                        except Exception as e:
-                            logger.warning(f"No se pudo eliminar la imagen {nombre_archivo}: {e}")
+                    except Exception as e:
+                        logger.warning(f"No se pudo eliminar la imagen {nombre_archivo}: {e}")
             
             return filas_afectadas > 0
     
+    def eliminar_servicios_lote(self, ids: Iterable[int], eliminar_imagenes: bool = True) -> Dict[int, bool]:
+        """
+        Elimina varios servicios con un solo backup y una sola transacción
+        
+        Args:
+            ids: IDs de los servicios a eliminar
+            eliminar_imagenes: Si True, elimina también las imágenes asociadas
+            
+        Returns:
+            Diccionario {id: eliminado} con el resultado de cada ID
+        """
+        return self._eliminar_registros_lote("servicios", ids, eliminar_imagenes, "antes_eliminar_servicios_lote")
+    
+    def restaurar_servicios(self, ids: Iterable[int]) -> Dict[int, bool]:
+        """
+        Deshace la eliminación lógica de servicios aún no purgados
+        
+        Args:
+            ids: IDs de los servicios a restaurar
+            
+        Returns:
+            Diccionario {id: restaurado} con el resultado de cada ID
+        """
+        return self._marcar_eliminados("servicios", ids, restaurar=True)
+    
     def obtener_estadisticas_servicios(self) -> dict:
         """
         Obtiene estadísticas de servicios
@@ -886,11 +1130,257 @@ class DatabaseManager:
         """
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM servicios")
+            cursor.execute("SELECT COUNT(*) FROM servicios WHERE deleted_at IS NULL")
             return {
                 "total_servicios": cursor.fetchone()[0]
             }
     
+    # ==================== TRABAJOS DE GENERACIÓN MASIVA ====================
+    
+    def crear_trabajo_masivo(self, tipo: str, huella: str, ruta_salida: str, total: int) -> int:
+        """
+        Registra un nuevo trabajo de generación masiva
+        
+        Args:
+            tipo: Tipo de generación ("png", "pdf")
+            huella: Hash de los parámetros (template, variables, OCR...)
+            ruta_salida: Ruta del ZIP de salida
+            total: Número de empleados a procesar
+            
+        Returns:
+            ID del trabajo
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO trabajos_masivos (tipo, huella, ruta_salida, estado, total)
+                VALUES (?, ?, ?, ?, ?)
+            """, (tipo, huella, ruta_salida, TRABAJO_EN_CURSO, total))
+            conn.commit()
+            return cursor.lastrowid
+    
+    def obtener_trabajo_pendiente(self, tipo: str, huella: str) -> Optional[dict]:
+        """
+        Busca el último trabajo sin terminar (en curso o cancelado) con los mismos parámetros
+        
+        Args:
+            tipo: Tipo de generación
+            huella: Hash de los parámetros
+            
+        Returns:
+            Diccionario con id, ruta_salida, total, estado, fecha_actualizacion y
+            completados, o None si no hay ninguno
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT t.id, t.ruta_salida, t.total, t.estado, t.fecha_actualizacion,
+                       (SELECT COUNT(*) FROM trabajos_masivos_items i
+                        WHERE i.trabajo_id = t.id AND i.estado = ?) AS completados
+                FROM trabajos_masivos t
+                WHERE t.tipo = ? AND t.huella = ? AND t.estado IN (?, ?)
+                ORDER BY t.id DESC
+                LIMIT 1
+            """, (ITEM_COMPLETADO, tipo, huella, TRABAJO_EN_CURSO, TRABAJO_CANCELADO))
+            fila = cursor.fetchone()
+            return dict(fila) if fila else None
+    
+    def registrar_item_trabajo(self, trabajo_id: int, id_unico: str, estado: str,
+                               archivo: Optional[str] = None, verificado: bool = False,
+                               mensaje: Optional[str] = None) -> None:
+        """
+        Anota el resultado de un empleado dentro de un trabajo (sustituye el anterior)
+        
+        Args:
+            trabajo_id: ID del trabajo
+            id_unico: ID único del empleado
+            estado: ITEM_COMPLETADO o ITEM_ERROR
+            archivo: Nombre del archivo dentro del ZIP
+            verificado: Si el carnet pasó la verificación OCR
+            mensaje: Detalle del resultado
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT OR REPLACE INTO trabajos_masivos_items
+                    (trabajo_id, id_unico, estado, verificado, archivo, mensaje, fecha)
+                VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            """, (trabajo_id, id_unico, estado, int(verificado), archivo, mensaje))
+            cursor.execute(
+                "UPDATE trabajos_masivos SET fecha_actualizacion = CURRENT_TIMESTAMP WHERE id = ?",
+                (trabajo_id,)
+            )
+            conn.commit()
+    
+    def obtener_items_completados(self, trabajo_id: int) -> Dict[str, str]:
+        """
+        Obtiene los empleados ya completados de un trabajo
+        
+        Args:
+            trabajo_id: ID del trabajo
+            
+        Returns:
+            Diccionario {id_unico: nombre del archivo en el ZIP}
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id_unico, archivo FROM trabajos_masivos_items
+                WHERE trabajo_id = ? AND estado = ?
+            """, (trabajo_id, ITEM_COMPLETADO))
+            return {fila[0]: fila[1] for fila in cursor.fetchall()}
+    
+    def actualizar_estado_trabajo(self, trabajo_id: int, estado: str, total: Optional[int] = None) -> None:
+        """
+        Cambia el estado de un trabajo. Al terminarlo o abandonarlo se borra su diario por empleado
+        
+        Args:
+            trabajo_id: ID del trabajo
+            estado: Nuevo estado (TRABAJO_*)
+            total: Nuevo número de empleados a procesar (opcional)
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE trabajos_masivos
+                SET estado = ?, total = COALESCE(?, total), fecha_actualizacion = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (estado, total, trabajo_id))
+            if estado in (TRABAJO_COMPLETADO, TRABAJO_ABANDONADO):
+                cursor.execute("DELETE FROM trabajos_masivos_items WHERE trabajo_id = ?", (trabajo_id,))
+            conn.commit()
+    
+    # ==================== PURGA DE REGISTROS ELIMINADOS ====================
+    
+    def contar_eliminados_pendientes(self) -> dict:
+        """
+        Cuenta los registros marcados como eliminados que aún no se han purgado
+        
+        Returns:
+            Diccionario con el número de tombstones por tabla
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            pendientes = {}
+            for tabla in TABLAS_ELIMINACION_LOGICA:
+                cursor.execute(f"SELECT COUNT(*) FROM {tabla} WHERE deleted_at IS NOT NULL")
+                pendientes[tabla] = cursor.fetchone()[0]
+            return pendientes
+    
+    def purgar_eliminados(self, antiguedad_segundos: int = PURGE_AFTER_SECONDS,
+                          tamano_lote: int = PURGE_BATCH_SIZE,
+                          compactar: bool = True) -> dict:
+        """
+        Elimina físicamente, por lotes, los registros marcados como eliminados
+        hace más de antiguedad_segundos, junto con sus imágenes
+        
+        Args:
+            antiguedad_segundos: Antigüedad mínima de la marca deleted_at (0 = todos)
+            tamano_lote: Registros eliminados por transacción
+            compactar: Si True, compacta la BD cuando queda mucho espacio libre
+            
+        Returns:
+            Diccionario con registros purgados por tabla e imágenes eliminadas
+        """
+        resultado = {tabla: 0 for tabla in TABLAS_ELIMINACION_LOGICA}
+        resultado["imagenes"] = 0
+        
+        if not self._lock_purga.acquire(blocking=False):
+            logger.info("Purga de eliminados ya en curso, se omite")
+            return resultado
+        
+        try:
+            limite = f"-{max(0, int(antiguedad_segundos))} seconds"
+            tamano_lote = max(1, tamano_lote)
+            backup_creado = False
+            
+            for tabla in TABLAS_ELIMINACION_LOGICA:
+                while True:
+                    with self.get_connection() as conn:
+                        cursor = conn.cursor()
+                        cursor.execute(f"""
+                            SELECT id, nombre_archivo FROM {tabla}
+                            WHERE deleted_at IS NOT NULL AND deleted_at <= datetime('now', ?)
+                            LIMIT ?
+                        """, (limite, tamano_lote))
+                        filas = cursor.fetchall()
+                        if not filas:
+                            break
+                        
+                        # La purga es el único paso destructivo: un backup por ejecución
+                        if not backup_creado:
+                            self.crear_backup_automatico("antes_purgar_eliminados")
+                            backup_creado = True
+                        
+                        self._cargar_ids_temporales(cursor, [fila[0] for fila in filas])
+                        cursor.execute(f"""
+                            DELETE FROM {tabla}
+                            WHERE id IN (SELECT id FROM ids_eliminar) AND deleted_at IS NOT NULL
+                        """)
+                        resultado[tabla] += cursor.rowcount
+                        conn.commit()
+                    
+                    archivos = [fila[1] for fila in filas if fila[1]]
+                    if archivos:
+                        resultado["imagenes"] += self._eliminar_imagenes_paralelo(archivos)
+                    
+                    if len(filas) < tamano_lote:
+                        break
+            
+            total = sum(resultado[tabla] for tabla in TABLAS_ELIMINACION_LOGICA)
+            if total:
+                logger.info(f"Purga de eliminados completada: {resultado}")
+                if compactar:
+                    self.compactar_base_datos()
+            return resultado
+        except sqlite3.Error as e:
+            logger.error(f"Error al purgar registros eliminados: {e}")
+            return resultado
+        finally:
+            self._lock_purga.release()
+    
+    def compactar_base_datos(self, proporcion_minima_libre: float = 0.25) -> bool:
+        """
+        Ejecuta VACUUM si las páginas libres superan la proporción indicada
+        
+        Args:
+            proporcion_minima_libre: Fracción de páginas libres a partir de la cual compactar
+            
+        Returns:
+            True si se compactó la base de datos
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("PRAGMA page_count")
+                paginas = cursor.fetchone()[0]
+                cursor.execute("PRAGMA freelist_count")
+                libres = cursor.fetchone()[0]
+                
+                if not paginas or libres / paginas < proporcion_minima_libre:
+                    return False
+                
+                cursor.execute("VACUUM")
+                logger.info(f"Base de datos compactada: {libres} de {paginas} páginas libres recuperadas")
+                return True
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo compactar la base de datos: {e}")
+            return False
+    
+    def iniciar_purga_en_segundo_plano(self) -> Optional[threading.Thread]:
+        """
+        Lanza purgar_eliminados() en un hilo daemon para no bloquear la interfaz
+        
+        Returns:
+            Hilo de la purga, o None si la eliminación lógica está desactivada
+        """
+        if not SOFT_DELETE_ENABLED:
+            return None
+        
+        hilo = threading.Thread(target=self.purgar_eliminados, name="purga-eliminados", daemon=True)
+        hilo.start()
+        return hilo
+    
     # ==================== MÉTODOS DE GESTIÓN DE USUARIOS ====================
     
     def existe_usuario(self, usuario: str) -> bool:
@@ -0,0 +1,270 @@
+"""
+Servicio de backups de la base de datos SQLite
+
+Usa el API de backup en línea de SQLite (copia por páginas, consistente aunque
+otra conexión esté escribiendo), agrupa backups por ventana de tiempo o por
+operación en lote, comprime opcionalmente y evita duplicar snapshots sin cambios.
+"""
+import gzip
+import hashlib
+import logging
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config.settings import (
+    DB_PATH, BACKUPS_DIR, BACKUP_COALESCE_SECONDS, BACKUP_COMPRESS, BACKUP_PAGES_PER_STEP
+)
+
+logger = logging.getLogger(__name__)
+
+# Patrones de los backups automáticos (sin comprimir y comprimidos)
+PATRONES_BACKUP = ("backup_*.db", "backup_*.db.gz")
+
+# Longitud del hash de contenido incluido en el nombre del archivo
+LONGITUD_HASH = 12
+
+
+class BackupService:
+    """Motor de backups en línea con agrupación y deduplicación"""
+
+    # Estado compartido entre instancias: en la app se crean varios DatabaseManager
+    # sobre la misma BD y todos deben respetar la misma ventana de agrupación
+    _estado: Dict[str, dict] = {}
+    _lock = threading.RLock()
+
+    def __init__(
+        self,
+        db_path: Optional[Path] = None,
+        backups_dir: Optional[Path] = None,
+        ventana_segundos: int = BACKUP_COALESCE_SECONDS,
+        comprimir: bool = BACKUP_COMPRESS,
+        paginas_por_paso: int = BACKUP_PAGES_PER_STEP
+    ):
+        """
+        Inicializa el servicio de backups
+
+        Args:
+            db_path: Ruta de la base de datos (por defecto DB_PATH)
+            backups_dir: Directorio de backups (por defecto BACKUPS_DIR)
+            ventana_segundos: Ventana en la que se reutiliza el último backup (0 = nunca)
+            comprimir: Si True, guarda los backups como .db.gz
+            paginas_por_paso: Páginas copiadas en cada paso del backup en línea
+        """
+        self.db_path = Path(db_path or DB_PATH)
+        self.backups_dir = Path(backups_dir or BACKUPS_DIR)
+        self.ventana_segundos = ventana_segundos
+        self.comprimir = comprimir
+        self.paginas_por_paso = max(1, paginas_por_paso)
+
+    def _estado_bd(self) -> dict:
+        """Estado de agrupación asociado a esta base de datos"""
+        clave = str(self.db_path.resolve())
+        if clave not in self._estado:
+            self._estado[clave] = {
+                "ultimo": None, "instante": 0.0, "version": None, "monitor": None,
+                "lote": 0, "backup_lote": None
+            }
+        return self._estado[clave]
+
+    def _version_datos(self, estado: dict) -> Optional[int]:
+        """
+        Versión de los datos según PRAGMA data_version de una conexión de solo lectura
+        propia: cambia cada vez que otra conexión confirma cambios en la BD
+
+        Args:
+            estado: Estado de agrupación de la BD (guarda la conexión)
+
+        Returns:
+            Versión actual o None si no se pudo consultar
+        """
+        try:
+            if estado["monitor"] is None:
+                estado["monitor"] = sqlite3.connect(str(self.db_path), timeout=10.0, check_same_thread=False)
+            return estado["monitor"].execute("PRAGMA data_version").fetchone()[0]
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo consultar la versión de la base de datos: {e}")
+            return None
+
+    @contextmanager
+    def lote(self):
+        """
+        Agrupa todas las operaciones del bloque bajo un único backup.
+        El primer crear_backup() del bloque hace el snapshot y los demás lo reutilizan.
+        """
+        with self._lock:
+            estado = self._estado_bd()
+            estado["lote"] += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                estado["lote"] -= 1
+                if estado["lote"] == 0:
+                    estado["backup_lote"] = None
+
+    def crear_backup(self, razon: str = "operacion_critica", forzar: bool = False) -> Optional[Path]:
+        """
+        Crea un backup de la base de datos o reutiliza uno reciente
+
+        Args:
+            razon: Razón del backup (para el nombre del archivo)
+            forzar: Si True, ignora la ventana de agrupación (el contenido igual se deduplica)
+
+        Returns:
+            Path del backup que protege el estado actual, None si falla
+        """
+        if not self.db_path.exists():
+            logger.warning("No se puede crear backup: la base de datos no existe")
+            return None
+
+        with self._lock:
+            estado = self._estado_bd()
+
+            # Dentro de un lote: un solo backup para toda la operación
+            if estado["lote"] and estado["backup_lote"] and Path(estado["backup_lote"]).exists():
+                return estado["backup_lote"]
+
+            # Versión leída antes de copiar: un cambio durante la copia obliga a otro snapshot
+            version = self._version_datos(estado)
+
+            # Fuera de un lote: reutilizar el último si está dentro de la ventana y la BD
+            # no cambió desde que se tomó (si no, no protegería los cambios posteriores)
+            if (not forzar and not estado["lote"] and self.ventana_segundos > 0
+                    and estado["ultimo"] and Path(estado["ultimo"]).exists()
+                    and time.monotonic() - estado["instante"] < self.ventana_segundos
+                    and version is not None and version == estado["version"]):
+                logger.debug(f"Backup reutilizado (ventana de {self.ventana_segundos}s): {Path(estado['ultimo']).name}")
+                return estado["ultimo"]
+
+            ruta = self._crear_snapshot(razon)
+            if ruta:
+                estado["ultimo"] = ruta
+                estado["instante"] = time.monotonic()
+                estado["version"] = version
+                if estado["lote"]:
+                    estado["backup_lote"] = ruta
+            return ruta
+
+    def _crear_snapshot(self, razon: str) -> Optional[Path]:
+        """
+        Copia la BD con el API de backup en línea y la guarda si su contenido es nuevo
+
+        Args:
+            razon: Razón del backup
+
+        Returns:
+            Path del backup nuevo o del existente con el mismo contenido
+        """
+        self.backups_dir.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        ruta_temporal = self.backups_dir / f".tmp_backup_{timestamp}_{threading.get_ident()}.db"
+
+        try:
+            if not self.copiar_en_linea(ruta_temporal):
+                return None
+
+            hash_contenido = self._calcular_hash(ruta_temporal)[:LONGITUD_HASH]
+
+            # Deduplicación: si ya hay un backup con el mismo contenido, reutilizarlo
+            existente = self._buscar_por_hash(hash_contenido)
+            if existente:
+                existente.touch()  # Mantenerlo entre los más recientes
+                logger.info(f"Backup sin cambios, se reutiliza: {existente.name}")
+                return existente
+
+            nombre_base = f"backup_{razon}_{timestamp}_{hash_contenido}.db"
+            if self.comprimir:
+                ruta_backup = self.backups_dir / f"{nombre_base}.gz"
+                with open(ruta_temporal, "rb") as origen, gzip.open(ruta_backup, "wb", compresslevel=6) as destino:
+                    shutil.copyfileobj(origen, destino, length=1024 * 1024)
+            else:
+                ruta_backup = self.backups_dir / nombre_base
+                ruta_temporal.replace(ruta_backup)
+
+            logger.info(f"Backup automático creado: {ruta_backup.name}")
+            return ruta_backup
+        except Exception as e:
+            logger.error(f"Error al crear backup automático: {e}")
+            return None
+        finally:
+            if ruta_temporal.exists():
+                try:
+                    ruta_temporal.unlink()
+                except OSError:
+                    pass
+
+    def copiar_en_linea(self, ruta_destino: Path) -> bool:
+        """
+        Copia la BD a ruta_destino con sqlite3.Connection.backup, por páginas
+        y cediendo el bloqueo entre pasos para no frenar a otras conexiones
+
+        Args:
+            ruta_destino: Archivo .db de destino
+
+        Returns:
+            True si la copia terminó correctamente
+        """
+        origen = None
+        destino = None
+        try:
+            origen = sqlite3.connect(str(self.db_path), timeout=10.0)
+            destino = sqlite3.connect(str(ruta_destino))
+            origen.backup(destino, pages=self.paginas_por_paso, sleep=0.005)
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error en backup en línea: {e}")
+            return False
+        finally:
+            if destino is not None:
+                destino.close()
+            if origen is not None:
+                origen.close()
+
+    def _calcular_hash(self, ruta: Path) -> str:
+        """
+        Hash SHA-256 del snapshot, ignorando los contadores de cambios de la
+        cabecera SQLite (bytes 24-27 y 92-99) que varían sin cambios de datos
+
+        Args:
+            ruta: Archivo .db a resumir
+
+        Returns:
+            Hash hexadecimal
+        """
+        sha = hashlib.sha256()
+        with open(ruta, "rb") as f:
+            cabecera = bytearray(f.read(100))
+            if len(cabecera) == 100:
+                cabecera[24:28] = b"\x00" * 4
+                cabecera[92:100] = b"\x00" * 8
+            sha.update(cabecera)
+            for bloque in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(bloque)
+        return sha.hexdigest()
+
+    def _buscar_por_hash(self, hash_contenido: str) -> Optional[Path]:
+        """Busca un backup existente cuyo nombre termine con el hash de contenido"""
+        for patron in (f"backup_*_{hash_contenido}.db", f"backup_*_{hash_contenido}.db.gz"):
+            for ruta in self.backups_dir.glob(patron):
+                return ruta
+        return None
+
+    def obtener_backups(self) -> List[Path]:
+        """
+        Obtiene los backups automáticos disponibles
+
+        Returns:
+            Lista de paths ordenados por fecha (más reciente primero)
+        """
+        if not self.backups_dir.exists():
+            return []
+        backups = set()
+        for patron in PATRONES_BACKUP:
+            backups.update(self.backups_dir.glob(patron))
+        return sorted(backups, key=lambda p: p.stat().st_mtime, reverse=True)
@@ -0,0 +1,154 @@
+"""
+Caché de renders de códigos de barras direccionada por contenido
+
+La clave es un hash de todas las entradas del render (datos, formato, texto,
+tamaño de fuente y BARCODE_IMAGE_OPTIONS). Cada entrada guarda el PNG final y,
+una vez validado, el valor leído del código, de modo que repetir una
+generación idéntica no vuelve a dibujar, optimizar ni validar la imagen.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Any, Optional
+
+from config.settings import BARCODE_CACHE_PATH, BARCODE_CACHE_MAX_MB
+from src.services.cache_sqlite import CacheSQLite, InstanciaCompartida
+
+logger = logging.getLogger(__name__)
+
+# Cambiar al modificar el pipeline de render para invalidar las entradas antiguas
+VERSION_RENDER = 2
+
+
+class BarcodeRenderCache(CacheSQLite):
+    """Caché LRU en SQLite de PNGs de códigos de barras y sus validaciones"""
+
+    TABLA = "renders"
+    COLUMNAS = """
+                hash_png TEXT NOT NULL,
+                png BLOB NOT NULL,
+                valor_validado TEXT"""
+    INDICES = {"idx_renders_hash": "hash_png"}
+    DESCRIPCION = "Caché de códigos"
+
+    def __init__(self, ruta: Optional[Path] = None, max_mb: int = BARCODE_CACHE_MAX_MB):
+        """
+        Inicializa la caché
+
+        Args:
+            ruta: Archivo SQLite de la caché (por defecto BARCODE_CACHE_PATH)
+            max_mb: Tamaño máximo de los PNG almacenados, en MB
+        """
+        super().__init__(ruta or BARCODE_CACHE_PATH, max_mb)
+
+    @staticmethod
+    def calcular_clave(**entradas: Any) -> str:
+        """
+        Calcula la clave de un render a partir de todas sus entradas
+
+        Args:
+            **entradas: Parámetros del render (datos, formato, texto_debajo, opciones...)
+
+        Returns:
+            Hash SHA-256 hexadecimal
+        """
+        contenido = json.dumps(
+            {"version": VERSION_RENDER, **entradas}, sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def calcular_hash_png(png: bytes) -> str:
+        """Hash SHA-256 del contenido de un PNG"""
+        return hashlib.sha256(png).hexdigest()
+
+    def obtener(self, clave: str) -> Optional[bytes]:
+        """
+        Obtiene el PNG de un render cacheado
+
+        Args:
+            clave: Clave calculada con calcular_clave()
+
+        Returns:
+            Bytes del PNG o None si no está en caché
+        """
+        with self._lock:
+            fila = self._conn.execute("SELECT png FROM renders WHERE clave = ?", (clave,)).fetchone()
+            if fila is None:
+                return None
+            self._marcar_acceso(clave)
+            return fila[0]
+
+    def guardar(self, clave: str, png: bytes) -> None:
+        """
+        Guarda el PNG final de un render y expulsa entradas si se supera el tamaño máximo
+
+        Args:
+            clave: Clave calculada con calcular_clave()
+            png: Bytes del PNG final
+        """
+        try:
+            with self._lock:
+                self._insertar(clave, len(png), hash_png=self.calcular_hash_png(png), png=sqlite3.Binary(png))
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo guardar el render en caché: {e}")
+
+    def esta_validado(self, hash_png: str, valor_esperado: str) -> bool:
+        """
+        Indica si un PNG cacheado ya se leyó correctamente con el valor esperado
+
+        Args:
+            hash_png: Hash del contenido del PNG
+            valor_esperado: Valor que se esperaba leer
+
+        Returns:
+            True si hay una validación correcta registrada
+        """
+        with self._lock:
+            fila = self._conn.execute("""
+                SELECT 1 FROM renders WHERE hash_png = ? AND valor_validado = ? LIMIT 1
+            """, (hash_png, valor_esperado)).fetchone()
+        return fila is not None
+
+    def guardar_validacion(self, hash_png: str, valor_esperado: str, valido: bool) -> None:
+        """
+        Registra el resultado de validación de un PNG cacheado (no-op si no está en caché).
+        Un PNG que no valida se descarta, para que un reintento vuelva a dibujarlo.
+
+        Args:
+            hash_png: Hash del contenido del PNG
+            valor_esperado: Valor que se esperaba leer
+            valido: Resultado de la validación
+        """
+        try:
+            with self._lock:
+                if valido:
+                    self._conn.execute(
+                        "UPDATE renders SET valor_validado = ? WHERE hash_png = ?",
+                        (valor_esperado, hash_png)
+                    )
+                else:
+                    liberado = self._conn.execute(
+                        "SELECT COALESCE(SUM(tamano), 0) FROM renders WHERE hash_png = ?", (hash_png,)
+                    ).fetchone()[0]
+                    self._conn.execute("DELETE FROM renders WHERE hash_png = ?", (hash_png,))
+                    self._total_bytes -= liberado
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo guardar la validación en caché: {e}")
+
+
+# Caché compartida por la aplicación (se crea al primer uso)
+_cache_compartida: InstanciaCompartida[BarcodeRenderCache] = InstanciaCompartida(BarcodeRenderCache)
+
+
+def obtener_barcode_cache() -> BarcodeRenderCache:
+    """
+    Obtiene la caché de renders compartida por la aplicación
+
+    Returns:
+        Instancia única de BarcodeRenderCache
+    """
+    return _cache_compartida.obtener()
@@ -0,0 +1,128 @@
+"""
+Verificación de códigos de barras por líneas de barrido
+
+Conociendo la simbología y el valor esperado, basta con comparar la secuencia
+de anchos de barras y espacios de unas pocas filas horizontales con la
+codificación esperada. Es mucho más barato que un escaneo completo con ZBar y
+se usa como primer nivel de validación; si no coincide se recurre a pyzbar.
+"""
+import logging
+from typing import Iterable, Optional
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Alturas relativas (0-1) de las filas que se comparan. Quedan en la mitad superior
+# porque el texto opcional se dibuja debajo de las barras
+FILAS_BARRIDO = (0.2, 0.3, 0.4)
+
+# Un píxel es barra si su gris es menor que este umbral
+UMBRAL_BARRA = 128
+
+# Desviación máxima (en módulos) del ancho de cada barra o espacio
+TOLERANCIA_MODULO = 0.5
+
+
+def patron_a_anchos(patron: str) -> np.ndarray:
+    """
+    Convierte un patrón de módulos en la secuencia de anchos de barras y espacios
+
+    Args:
+        patron: Cadena de '1' (barra) y '0' (espacio)
+
+    Returns:
+        Anchos en módulos, empezando por una barra
+    """
+    fila = np.frombuffer(patron.strip("0").encode("ascii"), dtype=np.uint8) == ord("1")
+    return _longitudes_de_tramos(fila)
+
+
+def _longitudes_de_tramos(fila: np.ndarray) -> np.ndarray:
+    """
+    Codifica por longitud de tramos una fila booleana (True = barra) recortada a sus barras
+
+    Args:
+        fila: Fila de píxeles o módulos
+
+    Returns:
+        Longitudes de los tramos alternos barra/espacio, empezando por una barra
+    """
+    barras = np.flatnonzero(fila)
+    if barras.size == 0:
+        return np.empty(0, dtype=np.int64)
+    fila = fila[barras[0]:barras[-1] + 1]
+    cambios = np.flatnonzero(fila[1:] != fila[:-1]) + 1
+    limites = np.concatenate(([0], cambios, [fila.size]))
+    return np.diff(limites)
+
+
+def coincide_fila(fila: np.ndarray, anchos_esperados: np.ndarray) -> bool:
+    """
+    Compara una fila de píxeles con la secuencia de anchos esperada
+
+    Args:
+        fila: Fila booleana de píxeles (True = barra)
+        anchos_esperados: Anchos en módulos obtenidos con patron_a_anchos()
+
+    Returns:
+        True si cada tramo coincide con su ancho esperado dentro de la tolerancia
+    """
+    anchos = _longitudes_de_tramos(fila)
+    if anchos.size != anchos_esperados.size or anchos.size == 0:
+        return False
+
+    # Ancho del módulo estimado con la fila completa: absorbe el redondeo de cada barra
+    px_modulo = anchos.sum() / anchos_esperados.sum()
+    if px_modulo < 1:
+        return False
+    return bool(np.all(np.abs(anchos / px_modulo - anchos_esperados) <= TOLERANCIA_MODULO))
+
+
+def verificar_imagen(imagen: Image.Image, patron: str,
+                     filas: Iterable[float] = FILAS_BARRIDO) -> bool:
+    """
+    Verifica que una imagen contiene exactamente el patrón de módulos esperado
+
+    Args:
+        imagen: Imagen del código de barras
+        patron: Patrón de módulos esperado ('1' barra, '0' espacio)
+        filas: Alturas relativas de las filas a comparar
+
+    Returns:
+        True si todas las filas coinciden con el patrón
+    """
+    anchos_esperados = patron_a_anchos(patron)
+    if anchos_esperados.size == 0:
+        return False
+
+    alto = imagen.height
+    indices = sorted({min(alto - 1, int(alto * f)) for f in filas})
+    for indice in indices:
+        # Solo se convierten a gris las filas que se comparan
+        fila = np.asarray(imagen.crop((0, indice, imagen.width, indice + 1)).convert("L"))[0]
+        if not coincide_fila(fila < UMBRAL_BARRA, anchos_esperados):
+            return False
+    return True
+
+
+def obtener_patron_esperado(clase_barcode, valor: str) -> Optional[str]:
+    """
+    Calcula el patrón de módulos que debe tener el código de un valor
+
+    Args:
+        clase_barcode: Clase de python-barcode (Code128, Code39, EAN13, EAN8)
+        valor: Valor que un lector debe devolver
+
+    Returns:
+        Patrón de módulos, o None si la simbología no puede representar el valor tal
+        cual (p. ej. Code39 añade un carácter de control que el lector devolvería)
+    """
+    try:
+        codigo = clase_barcode(valor)
+    except Exception:
+        return None
+    if codigo.get_fullcode() != valor:
+        return None
+    return "".join(codigo.build())
@@ -6,17 +6,56 @@ from barcode.writer import ImageWriter
 from barcode import Code128, EAN13, EAN8, Code39
 from typing import Optional, Tuple, Dict
 from pathlib import Path
-from PIL import Image, ImageStat
-from pyzbar import pyzbar
-import numpy as np
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
 import logging
 import os
+import threading
 
-from config.settings import IMAGES_DIR, BARCODE_FORMATS, BARCODE_IMAGE_OPTIONS
+from config.settings import (
+    IMAGES_DIR, BARCODE_FORMATS, BARCODE_IMAGE_OPTIONS, BARCODE_CACHE_ENABLED,
+    BARCODE_ENGINE, BARCODE_RASTER_DPI, BARCODE_SCANLINE_VERIFY, BARCODE_SVG_DIR
+)
 from src.utils.file_utils import limpiar_nombre_archivo, obtener_ruta_imagen, crear_directorio_si_no_existe
+from src.services.image_store import ImageStore, obtener_image_store
+from src.services.barcode_cache import BarcodeRenderCache, obtener_barcode_cache
+from src.services.barcode_rasterizer import rasterizar_codigo, obtener_patron_modulos
+from src.services.barcode_scanline import verificar_imagen, obtener_patron_esperado
+from src.services.barcode_vector import generar_svg_codigo
 
 logger = logging.getLogger(__name__)
 
+# Los códigos se guardan en 1 bit; se pasan a RGB solo al componer el carnet
+MODO_BILEVEL = "1"
+UMBRAL_BILEVEL = 128
+# En imágenes de 1 bit el nivel máximo de zlib apenas cuesta tiempo
+NIVEL_COMPRESION_PNG = 9
+
+# Motores de render disponibles para generar_codigo_barras
+MOTOR_NUMPY = "numpy"
+MOTOR_PYTHON_BARCODE = "python-barcode"
+MOTORES_RENDER = (MOTOR_NUMPY, MOTOR_PYTHON_BARCODE)
+
+
+@lru_cache(maxsize=16)
+def _cargar_fuente_texto(tamano: int):
+    """
+    Carga la fuente del texto bajo el código (Arial o alternativas comunes)
+    
+    Args:
+        tamano: Tamaño de la fuente en píxeles
+        
+    Returns:
+        Fuente de PIL
+    """
+    for fuente in ("arial.ttf", "C:/Windows/Fonts/arial.ttf",
+                   "C:/Windows/Fonts/calibri.ttf", "C:/Windows/Fonts/tahoma.ttf"):
+        try:
+            return ImageFont.truetype(fuente, tamano)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
 
 class BarcodeService:
     """Servicio para generar y validar códigos de barras"""
@@ -34,17 +73,28 @@ class BarcodeService:
         
         Args:
             directorio_imagenes: Directorio donde se guardarán las imágenes. 
-                               Si es None, usa el directorio por defecto
+                               Si es None, usa el directorio y el almacén por defecto
         """
         self.directorio_imagenes = directorio_imagenes or IMAGES_DIR
         crear_directorio_si_no_existe(self.directorio_imagenes)
+        self.image_store = ImageStore(directorio_imagenes) if directorio_imagenes else obtener_image_store()
+        
+        # Caché de renders: peticiones idénticas devuelven el PNG final sin volver a dibujarlo
+        self.cache = None
+        if BARCODE_CACHE_ENABLED:
+            try:
+                self.cache = obtener_barcode_cache()
+            except Exception as e:
+                logger.warning(f"Caché de códigos de barras no disponible: {e}")
     
     def generar_codigo_barras(self, datos: str, formato: str = "Code128",
                               id_unico: Optional[str] = None,
                               nombres: Optional[str] = None,
                               apellidos: Optional[str] = None,
                               texto_debajo: Optional[str] = None,
-                              tamano_fuente_texto: Optional[int] = None) -> Tuple[str, str, Path]:
+                              tamano_fuente_texto: Optional[int] = None,
+                              motor: Optional[str] = None,
+                              dpi: Optional[int] = None) -> Tuple[str, str, Path]:
         """
         Genera un código de barras y lo guarda como imagen
         
@@ -56,30 +106,51 @@ class BarcodeService:
             apellidos: Apellidos del empleado (opcional)
             texto_debajo: Texto a mostrar debajo del código de barras (opcional)
             tamano_fuente_texto: Tamaño de fuente en píxeles para el texto debajo (opcional, por defecto 20)
+            motor: Motor de render, "numpy" o "python-barcode" (opcional, por defecto BARCODE_ENGINE)
+            dpi: Resolución del rasterizador NumPy (opcional, por defecto BARCODE_RASTER_DPI)
             
         Returns:
             Tupla con (datos, id_unico, ruta_imagen)
             
         Raises:
-            ValueError: Si el formato no es soportado
+            ValueError: Si el formato o el motor no son soportados
             Exception: Si hay un error al generar el código
         """
         if formato not in self.FORMATOS_DISPONIBLES:
             raise ValueError(f"Formato {formato} no soportado")
         
+        motor = motor or BARCODE_ENGINE
+        if motor not in MOTORES_RENDER:
+            raise ValueError(f"Motor de render {motor} no soportado")
+        dpi = dpi or BARCODE_RASTER_DPI
+        
         clase_barcode = self.FORMATOS_DISPONIBLES[formato]
         
         try:
-            codigo = clase_barcode(datos, writer=ImageWriter())
-            
             # Crear nombre completo para el archivo
             nombre_completo = f"{nombres or ''} {apellidos or ''}".strip() or "sin_nombre"
             
-            ruta_imagen = obtener_ruta_imagen(
+            nombre_archivo = obtener_ruta_imagen(
                 nombre_completo,
                 datos,
                 self.directorio_imagenes
-            )
+            ).name
+            ruta_imagen = self.image_store.ruta_destino(nombre_archivo)
+            
+            # Reutilizar el PNG final si ya se dibujó con exactamente las mismas entradas
+            clave_cache = None
+            if self.cache is not None:
+                clave_cache = self.cache.calcular_clave(
+                    datos=datos, formato=formato, texto_debajo=texto_debajo,
+                    tamano_fuente_texto=tamano_fuente_texto, opciones=BARCODE_IMAGE_OPTIONS,
+                    motor=motor, dpi=dpi if motor == MOTOR_NUMPY else None
+                )
+                png_cacheado = self.cache.obtener(clave_cache)
+                if png_cacheado is not None:
+                    ruta_imagen.write_bytes(png_cacheado)
+                    if self.image_store.guardar(ruta_imagen.name, ruta_imagen):
+                        logger.debug(f"Código de barras servido desde caché: {ruta_imagen.name}")
+                        return datos, id_unico or datos, self.image_store.ruta(nombre_archivo)
             
             # Configurar opciones de imagen
             opciones_imagen = {**BARCODE_IMAGE_OPTIONS.copy()}
@@ -88,119 +159,174 @@ class BarcodeService:
             # Lo agregaremos manualmente después para tener mejor control
             opciones_imagen['write_text'] = False
             
-            # Guardar el código de barras sin texto
-            codigo.save(str(ruta_imagen.with_suffix('')), options=opciones_imagen)
-            
-            # Asegurar que la extensión .png esté presente
-            ruta_imagen_final = ruta_imagen.with_suffix('.png')
-            if ruta_imagen != ruta_imagen_final:
-                # Si el archivo se guardó sin extensión, renombrarlo
-                temp_path = ruta_imagen.with_suffix('')
-                if temp_path.exists():
-                    temp_path.rename(ruta_imagen_final)
-                    ruta_imagen = ruta_imagen_final
+            # Renderizar en memoria y en 1 bit; la imagen se codifica una sola vez al final
+            if motor == MOTOR_NUMPY:
+                imagen = rasterizar_codigo(clase_barcode(datos), opciones_imagen, dpi)
+            else:
+                codigo = clase_barcode(datos, writer=ImageWriter(mode=MODO_BILEVEL))
+                imagen = codigo.render(opciones_imagen)
             
             # Si se proporciona texto, agregarlo manualmente con PIL para mejor control
             if texto_debajo:
                 try:
-                    with Image.open(ruta_imagen) as img:
-                        from PIL import ImageDraw, ImageFont
-                        
-                        # Convertir a RGB si es necesario
-                        if img.mode != 'RGB':
-                            img = img.convert('RGB')
-                        
-                        ancho_original = img.width
-                        alto_original = img.height
-                        
-                        # Usar el tamaño de fuente proporcionado o un valor por defecto
-                        font_size = tamano_fuente_texto if tamano_fuente_texto else 50
-                        
-                        # Crear un draw temporal para calcular el ancho del texto
-                        temp_img = Image.new('RGB', (1, 1), 'white')
-                        temp_draw = ImageDraw.Draw(temp_img)
-                        
-                        # Intentar usar una fuente más grande y legible
-                        try:
-                            try:
-                                font = ImageFont.truetype("arial.ttf", font_size)
-                            except:
-                                try:
-                                    font = ImageFont.truetype("C:/Windows/Fonts/arial.ttf", font_size)
-                                except:
-                                    # Si no encuentra Arial, intentar con otras fuentes comunes
-                                    try:
-                                        font = ImageFont.truetype("C:/Windows/Fonts/calibri.ttf", font_size)
-                                    except:
-                                        try:
-                                            font = ImageFont.truetype("C:/Windows/Fonts/tahoma.ttf", font_size)
-                                        except:
-                                            font = ImageFont.load_default()
-                        except:
-                            font = ImageFont.load_default()
-                        
-                        # Calcular el ancho necesario para el texto
-                        bbox_texto = temp_draw.textbbox((0, 0), texto_debajo, font=font)
-                        ancho_texto = bbox_texto[2] - bbox_texto[0]
-                        
-                        # Agregar padding horizontal al texto (márgenes izquierdo y derecho)
-                        padding_horizontal = 40
-                        ancho_texto_con_padding = ancho_texto + padding_horizontal
-                        
-                        # Calcular el ancho final de la imagen (el mayor entre el código y el texto con padding)
-                        ancho_final = max(ancho_original, ancho_texto_con_padding)
-                        
-                        # Calcular espacio necesario para el texto (aumentado para fuente más grande)
-                        espacio_texto = max(35, font_size + 15)  # Al menos 35px o fuente + 15px
-                        nueva_altura = alto_original + espacio_texto
-                        
-                        # Crear nueva imagen con fondo blanco (con ancho suficiente para el texto)
-                        nueva_imagen = Image.new('RGB', (ancho_final, nueva_altura), 'white')
-                        
-                        # Centrar el código de barras horizontalmente si la imagen es más ancha
-                        x_codigo = (ancho_final - ancho_original) // 2
-                        nueva_imagen.paste(img, (x_codigo, 0))
-                        
-                        # Agregar texto debajo del código de barras
-                        draw = ImageDraw.Draw(nueva_imagen)
-                        
-                        # Calcular posición del texto (centrado horizontalmente, cerca del código)
-                        x_texto = (ancho_final - ancho_texto) // 2
-                        y_texto = alto_original + 8  # Aumentado a 8px para mejor separación con fuente más grande
-                        
-                        # Dibujar el texto
-                        draw.text((x_texto, y_texto), texto_debajo, fill='black', font=font)
-                        
-                        # Guardar la imagen modificada
-                        nueva_imagen.save(ruta_imagen, 'PNG', optimize=True)
-                        logger.debug(f"Texto agregado manualmente debajo del código de barras: '{texto_debajo}'")
+                    imagen = self._agregar_texto_debajo(imagen, texto_debajo, tamano_fuente_texto)
+                    logger.debug(f"Texto agregado manualmente debajo del código de barras: '{texto_debajo}'")
                 except Exception as e:
                     logger.warning(f"No se pudo agregar texto manualmente al código de barras: {e}")
                     # Continuar sin el texto si falla
             
+            self._guardar_bilevel(imagen, ruta_imagen, dpi if motor == MOTOR_NUMPY else None)
+            
             # Verificar integridad de la imagen guardada
             if not self._verificar_integridad_imagen(ruta_imagen):
                 raise Exception("La imagen generada está corrupta o no se guardó correctamente")
             
-            # Optimizar imagen automáticamente (compresión inteligente)
-            self._optimizar_imagen(ruta_imagen)
-            
             # Validar calidad de la imagen
             calidad_info = self._validar_calidad_imagen(ruta_imagen)
             if not calidad_info['es_valida']:
                 logger.warning(f"Advertencia de calidad en imagen {ruta_imagen.name}: {calidad_info['mensaje']}")
             
-            return datos, id_unico or datos, ruta_imagen
+            if clave_cache is not None:
+                self.cache.guardar(clave_cache, ruta_imagen.read_bytes())
+            
+            # Confirmar en el almacén (con el backend "pack" se incorpora al archivo único
+            # y el archivo escrito se borra; la ruta de lectura se materializa a demanda)
+            if not self.image_store.guardar(ruta_imagen.name, ruta_imagen):
+                raise Exception("No se pudo guardar la imagen en el almacén de imágenes")
+            
+            return datos, id_unico or datos, self.image_store.ruta(nombre_archivo)
         except Exception as e:
             raise Exception(f"Error al generar código de barras: {str(e)}")
     
-    def validar_codigo_barras(self, ruta_imagen: Path, valor_esperado: str) -> Tuple[bool, Optional[str]]:
+    def _agregar_texto_debajo(self, imagen: Image.Image, texto: str,
+                              tamano_fuente: Optional[int] = None) -> Image.Image:
+        """
+        Agrega un texto centrado debajo del código de barras
+        
+        Args:
+            imagen: Imagen del código de barras
+            texto: Texto a dibujar
+            tamano_fuente: Tamaño de fuente en píxeles (por defecto 50)
+            
+        Returns:
+            Nueva imagen en escala de grises con el texto
+        """
+        ancho_original = imagen.width
+        alto_original = imagen.height
+        
+        # Usar el tamaño de fuente proporcionado o un valor por defecto
+        font_size = tamano_fuente if tamano_fuente else 50
+        font = _cargar_fuente_texto(font_size)
+        
+        # Calcular el ancho necesario para el texto
+        bbox_texto = font.getbbox(texto)
+        ancho_texto = bbox_texto[2] - bbox_texto[0]
+        
+        # Agregar padding horizontal al texto (márgenes izquierdo y derecho)
+        padding_horizontal = 40
+        ancho_texto_con_padding = ancho_texto + padding_horizontal
+        
+        # Calcular el ancho final de la imagen (el mayor entre el código y el texto con padding)
+        ancho_final = max(ancho_original, ancho_texto_con_padding)
+        
+        # Calcular espacio necesario para el texto (aumentado para fuente más grande)
+        espacio_texto = max(35, font_size + 15)  # Al menos 35px o fuente + 15px
+        nueva_altura = alto_original + espacio_texto
+        
+        # Componer en escala de grises; se reduce a 1 bit al guardar
+        nueva_imagen = Image.new('L', (ancho_final, nueva_altura), 255)
+        
+        # Centrar el código de barras horizontalmente si la imagen es más ancha
+        x_codigo = (ancho_final - ancho_original) // 2
+        nueva_imagen.paste(imagen.convert('L'), (x_codigo, 0))
+        
+        # Calcular posición del texto (centrado horizontalmente, cerca del código)
+        x_texto = (ancho_final - ancho_texto) // 2
+        y_texto = alto_original + 8  # Aumentado a 8px para mejor separación con fuente más grande
+        
+        ImageDraw.Draw(nueva_imagen).text((x_texto, y_texto), texto, fill=0, font=font)
+        return nueva_imagen
+    
+    def _guardar_bilevel(self, imagen: Image.Image, ruta_imagen: Path, dpi: Optional[int] = None) -> None:
+        """
+        Guarda la imagen como PNG de 1 bit (umbral, sin tramado)
+        
+        Args:
+            imagen: Imagen a guardar
+            ruta_imagen: Ruta de destino
+            dpi: Resolución a registrar en el PNG (opcional)
+        """
+        if imagen.mode != MODO_BILEVEL:
+            imagen = imagen.convert('L').point(lambda p: 255 if p >= UMBRAL_BILEVEL else 0, mode=MODO_BILEVEL)
+        opciones_png = {'compress_level': NIVEL_COMPRESION_PNG}
+        if dpi:
+            opciones_png['dpi'] = (dpi, dpi)
+        imagen.save(ruta_imagen, 'PNG', **opciones_png)
+    
+    def obtener_patron(self, datos: str, formato: str = "Code128") -> Optional[str]:
+        """
+        Obtiene el patrón de módulos de un código para dibujarlo como vectores
+        
+        Args:
+            datos: Datos codificados en el código de barras
+            formato: Formato del código (Code128, EAN13, EAN8, Code39)
+            
+        Returns:
+            Cadena de '1' (barra) y '0' (espacio), o None si los datos no son válidos
+        """
+        if not datos or formato not in self.FORMATOS_DISPONIBLES:
+            return None
+        try:
+            return obtener_patron_modulos(self.FORMATOS_DISPONIBLES[formato](datos))
+        except Exception as e:
+            logger.warning(f"No se pudo codificar {datos} en {formato}: {e}")
+            return None
+    
+    def obtener_svg(self, datos: str, formato: str = "Code128") -> Optional[Path]:
+        """
+        Obtiene la versión vectorial (SVG) de un código de barras, generándola si no existe.
+        El SVG depende solo de los datos, el formato y las opciones de imagen, así que se
+        guarda en BARCODE_SVG_DIR con un nombre derivado de esas entradas.
+        
+        Args:
+            datos: Datos codificados en el código de barras
+            formato: Formato del código (Code128, EAN13, EAN8, Code39)
+            
+        Returns:
+            Ruta al SVG o None si no se pudo generar
+        """
+        if not datos or formato not in self.FORMATOS_DISPONIBLES:
+            return None
+        
+        clave = BarcodeRenderCache.calcular_clave(
+            datos=datos, formato=formato, salida="svg", opciones=BARCODE_IMAGE_OPTIONS
+        )
+        ruta_svg = Path(BARCODE_SVG_DIR) / f"{clave}.svg"
+        if ruta_svg.exists():
+            return ruta_svg
+        
+        try:
+            svg = generar_svg_codigo(self.FORMATOS_DISPONIBLES[formato](datos), BARCODE_IMAGE_OPTIONS)
+            crear_directorio_si_no_existe(ruta_svg.parent)
+            # Escritura atómica: otro hilo puede estar leyendo el mismo SVG
+            ruta_temporal = ruta_svg.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            ruta_temporal.write_text(svg, encoding="utf-8")
+            os.replace(ruta_temporal, ruta_svg)
+            return ruta_svg
+        except Exception as e:
+            logger.warning(f"No se pudo generar el SVG del código {datos}: {e}")
+            return None
+    
+    def validar_codigo_barras(self, ruta_imagen: Path, valor_esperado: str,
+                              formato: Optional[str] = None) -> Tuple[bool, Optional[str]]:
         """
         Valida un código de barras leyendo la imagen y comparando con el valor esperado
         
         Args:
             ruta_imagen: Ruta a la imagen del código de barras
             valor_esperado: Valor que se espera leer del código
+            formato: Formato del código (opcional). Si se omite, la verificación
+                     por líneas de barrido prueba todos los formatos disponibles
             
         Returns:
             Tupla con (es_valido, mensaje_error)
@@ -209,8 +335,73 @@ class BarcodeService:
             if not ruta_imagen.exists():
                 return False, f"La imagen no existe: {ruta_imagen}"
             
+            # Un PNG idéntico ya leído correctamente no se vuelve a escanear
+            hash_png = None
+            if self.cache is not None:
+                hash_png = self.cache.calcular_hash_png(ruta_imagen.read_bytes())
+                if self.cache.esta_validado(hash_png, valor_esperado):
+                    return True, None
+            
+            # Nivel rápido: comparar unas filas con la codificación esperada; si no coincide, ZBar
+            if self._verificar_por_lineas(ruta_imagen, valor_esperado, formato):
+                valido, mensaje = True, None
+            else:
+                valido, mensaje = self._validar_con_pyzbar(ruta_imagen, valor_esperado)
+            
+            if hash_png is not None:
+                self.cache.guardar_validacion(hash_png, valor_esperado, valido)
+            
+            return valido, mensaje
+        except Exception as e:
+            return False, f"Error al validar el código de barras: {str(e)}"
+    
+    def _verificar_por_lineas(self, ruta_imagen: Path, valor_esperado: str,
+                              formato: Optional[str] = None) -> bool:
+        """
+        Compara unas líneas de barrido de la imagen con la codificación esperada del valor
+        
+        Args:
+            ruta_imagen: Ruta a la imagen del código de barras
+            valor_esperado: Valor que se espera leer del código
+            formato: Formato del código (opcional, si se omite se prueban todos)
+            
+        Returns:
+            True si la imagen contiene exactamente la codificación esperada. False no
+            implica que el código sea inválido, solo que hay que escanearlo con pyzbar
+        """
+        if not BARCODE_SCANLINE_VERIFY:
+            return False
+        
+        formatos = [formato] if formato in self.FORMATOS_DISPONIBLES else list(self.FORMATOS_DISPONIBLES)
+        try:
+            with Image.open(str(ruta_imagen)) as imagen:
+                for nombre_formato in formatos:
+                    patron = obtener_patron_esperado(self.FORMATOS_DISPONIBLES[nombre_formato], valor_esperado)
+                    if patron and verificar_imagen(imagen, patron):
+                        return True
+        except Exception as e:
+            logger.debug(f"Verificación por líneas no disponible para {ruta_imagen.name}: {e}")
+        return False
+    
+    def _validar_con_pyzbar(self, ruta_imagen: Path, valor_esperado: str) -> Tuple[bool, Optional[str]]:
+        """
+        Lee el código con pyzbar y lo compara con el valor esperado
+        
+        Args:
+            ruta_imagen: Ruta a la imagen del código de barras
+            valor_esperado: Valor que se espera leer del código
+            
+        Returns:
+            Tupla con (es_valido, mensaje_error)
+        """
+        try:
             imagen = Image.open(str(ruta_imagen))
-            imagen_array = np.array(imagen)
+            # numpy y pyzbar solo se necesitan al validar; se cargan al primer uso
+            import numpy as np
+            from pyzbar import pyzbar
+            
+            # ZBar necesita 8 bits por píxel; los PNG de 1 bit se expanden a escala de grises
+            imagen_array = np.array(imagen.convert('L'))
             
             codigos_leidos = pyzbar.decode(imagen_array)
             
@@ -303,7 +494,7 @@ class BarcodeService:
     
     def _optimizar_imagen(self, ruta_imagen: Path, calidad: int = 95) -> bool:
         """
-        Optimiza la imagen del código de barras mediante compresión inteligente
+        Optimiza la imagen del código de barras recodificándola como PNG de 1 bit
         
         Args:
             ruta_imagen: Ruta a la imagen a optimizar
@@ -319,20 +510,10 @@ class BarcodeService:
             # Obtener tamaño original
             tamano_original = ruta_imagen.stat().st_size
             
-            # Abrir imagen
+            # Recodificar como PNG de 1 bit (imágenes antiguas guardadas en RGB)
             with Image.open(ruta_imagen) as img:
-                # Convertir a RGB si es necesario (para códigos de barras en escala de grises)
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Guardar con optimización
-                # Usar compress_level=6 para un buen balance entre tamaño y velocidad
-                img.save(
-                    ruta_imagen,
-                    'PNG',
-                    optimize=True,
-                    compress_level=6
-                )
+                img.load()
+            self._guardar_bilevel(img, ruta_imagen)
             
             # Obtener tamaño optimizado
             tamano_optimizado = ruta_imagen.stat().st_size
@@ -383,17 +564,13 @@ class BarcodeService:
                 # para una buena legibilidad
                 resolucion_efectiva = ancho / 2.0  # Aproximación
                 
-                # Verificar contraste (importante para códigos de barras)
+                # Verificar contraste (importante para códigos de barras) sobre una muestra
+                # reducida de la imagen; numpy se carga al primer uso, como en la validación
                 if img.mode == 'RGB':
-                    stat = ImageStat.Stat(img)
-                    # Calcular diferencia promedio entre canales (indicador de contraste)
-                    diferencia_promedio = (
-                        abs(stat.mean[0] - stat.mean[1]) +
-                        abs(stat.mean[1] - stat.mean[2]) +
-                        abs(stat.mean[0] - stat.mean[2])
-                    ) / 3
+                    from src.utils.image_health import analizar_imagen
+                    # Diferencia promedio entre canales (indicador de contraste)
+                    diferencia_promedio = analizar_imagen(img)['diferencia_canales']
                 else:
-                    stat = ImageStat.Stat(img)
                     diferencia_promedio = 0
                 
                 # Verificar que la imagen tenga suficiente ancho para ser legible
@@ -0,0 +1,84 @@
+"""
+Salida vectorial (SVG) de códigos de barras
+
+Cada tramo de barras consecutivas se emite como un subcamino de un único
+<path>, en unidades de módulo, y el tamaño físico se declara en milímetros con
+la misma geometría que el PNG (ancho de módulo, alto y zona silenciosa de
+BARCODE_IMAGE_OPTIONS). El resultado ocupa unos cientos de bytes y se puede
+dibujar a cualquier resolución sin remuestrear.
+"""
+import logging
+from typing import Dict, Optional
+
+import numpy as np
+
+from config.settings import BARCODE_IMAGE_OPTIONS
+
+logger = logging.getLogger(__name__)
+
+
+def _formatear_numero(valor: float) -> str:
+    """Formatea un número sin ceros ni punto decimal sobrantes"""
+    return f"{valor:.4f}".rstrip("0").rstrip(".")
+
+
+def generar_svg(patron: str, opciones: Optional[Dict] = None) -> str:
+    """
+    Genera el SVG de un patrón de módulos
+
+    Args:
+        patron: Cadena de '1' (barra) y '0' (espacio)
+        opciones: module_width, module_height, quiet_zone (mm), background y
+                  foreground (por defecto BARCODE_IMAGE_OPTIONS)
+
+    Returns:
+        Documento SVG como texto
+
+    Raises:
+        ValueError: Si el patrón no contiene barras
+    """
+    opciones = opciones or BARCODE_IMAGE_OPTIONS
+    ancho_modulo = opciones.get("module_width", 0.2)
+    margen = opciones.get("quiet_zone", 6.5) / ancho_modulo
+    alto = opciones.get("module_height", 15.0) / ancho_modulo
+    fondo = opciones.get("background", "white")
+    color = opciones.get("foreground", "black")
+
+    # Inicio y longitud de cada tramo de barras
+    barras = np.frombuffer(patron.encode("ascii"), dtype=np.uint8) == ord("1")
+    if not barras.any():
+        raise ValueError("El patrón de módulos no contiene barras")
+    bordes = np.flatnonzero(np.diff(np.concatenate(([False], barras, [False])).astype(np.int8)))
+    inicios, finales = bordes[0::2], bordes[1::2]
+
+    alto_txt = _formatear_numero(alto)
+    trazos = "".join(
+        f"M{_formatear_numero(margen + inicio)} 0h{fin - inicio}v{alto_txt}h-{fin - inicio}z"
+        for inicio, fin in zip(inicios.tolist(), finales.tolist())
+    )
+
+    ancho_total = 2 * margen + barras.size
+    ancho_txt = _formatear_numero(ancho_total)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" '
+        f'width="{_formatear_numero(ancho_total * ancho_modulo)}mm" '
+        f'height="{_formatear_numero(alto * ancho_modulo)}mm" '
+        f'viewBox="0 0 {ancho_txt} {alto_txt}" shape-rendering="crispEdges">'
+        f'<rect width="{ancho_txt}" height="{alto_txt}" fill="{fondo}"/>'
+        f'<path fill="{color}" d="{trazos}"/>'
+        f'</svg>'
+    )
+
+
+def generar_svg_codigo(codigo, opciones: Optional[Dict] = None) -> str:
+    """
+    Genera el SVG de un código de python-barcode sin pasar por su writer
+
+    Args:
+        codigo: Instancia de Code128, Code39, EAN13 o EAN8
+        opciones: Opciones de geometría (por defecto BARCODE_IMAGE_OPTIONS)
+
+    Returns:
+        Documento SVG como texto
+    """
+    return generar_svg("".join(codigo.build()), opciones)
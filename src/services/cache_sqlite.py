@@ -0,0 +1,223 @@
+"""
+Base común de las cachés LRU en SQLite
+
+Las cachés de códigos de barras, carnets, fotos y miniaturas comparten la misma
+mecánica: una tabla indexada por clave con el tamaño de cada entrada y su último
+acceso, un total de bytes mantenido en memoria y la expulsión de las entradas
+menos usadas al superar el máximo. CacheSQLite implementa esa mecánica y cada
+caché define su tabla y sus columnas propias. InstanciaCompartida crea al primer
+uso la instancia única que la aplicación comparte de cada caché.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+# Al superar el límite se expulsa hasta quedar en esta fracción del máximo
+FRACCION_TRAS_EXPULSION = 0.9
+
+T = TypeVar("T")
+
+
+class CacheSQLite:
+    """
+    Caché LRU en SQLite con límite de tamaño
+
+    Las subclases definen TABLA, COLUMNAS (definición SQL de las columnas propias,
+    además de clave, tamano y ultimo_acceso) y opcionalmente INDICES
+    ({nombre_indice: columna}) y COLUMNAS_ASOCIADAS: columnas que _al_expulsar()
+    recibe de cada entrada que sale de la caché, p. ej. el archivo que hay que
+    borrar del disco.
+    """
+
+    TABLA = ""
+    COLUMNAS = ""
+    INDICES: Dict[str, str] = {}
+    COLUMNAS_ASOCIADAS: Sequence[str] = ()
+    # Nombre de la caché en los mensajes del log
+    DESCRIPCION = "caché"
+
+    def __init__(self, ruta: Path, max_mb: int):
+        """
+        Abre (o crea) la caché
+
+        Args:
+            ruta: Archivo SQLite de la caché
+            max_mb: Tamaño máximo de las entradas almacenadas, en MB
+        """
+        self.ruta = Path(ruta)
+        self.max_bytes = max(1, max_mb) * 1024 * 1024
+        self._lock = threading.Lock()
+        # Últimos accesos aún no escritos en la tabla: {clave: instante}
+        self._accesos_pendientes: Dict[str, float] = {}
+
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.ruta), timeout=10.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.TABLA} (
+                clave TEXT PRIMARY KEY,
+                {self.COLUMNAS},
+                tamano INTEGER NOT NULL,
+                ultimo_acceso REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{self.TABLA}_acceso ON {self.TABLA}(ultimo_acceso)"
+        )
+        for nombre_indice, columna in self.INDICES.items():
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {nombre_indice} ON {self.TABLA}({columna})")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            f"SELECT COALESCE(SUM(tamano), 0) FROM {self.TABLA}"
+        ).fetchone()[0]
+
+    def _marcar_acceso(self, clave: str) -> None:
+        """Actualiza el último acceso de una entrada (con el lock tomado)"""
+        self._conn.execute(
+            f"UPDATE {self.TABLA} SET ultimo_acceso = ? WHERE clave = ?", (time.time(), clave)
+        )
+        self._conn.commit()
+
+    def _marcar_acceso_diferido(self, clave: str) -> None:
+        """
+        Anota el acceso a una entrada sin escribir en la tabla (con el lock tomado).
+        Los accesos se escriben juntos en la siguiente inserción o expulsión, así una
+        lectura desde la interfaz no hace UPDATE ni commit.
+        """
+        self._accesos_pendientes[clave] = time.time()
+
+    def _registrar_accesos(self) -> None:
+        """Escribe en una sola transacción los accesos diferidos (con el lock tomado)"""
+        if not self._accesos_pendientes:
+            return
+        self._conn.executemany(
+            f"UPDATE {self.TABLA} SET ultimo_acceso = ? WHERE clave = ?",
+            [(instante, clave) for clave, instante in self._accesos_pendientes.items()]
+        )
+        self._accesos_pendientes.clear()
+
+    def _insertar(self, clave: str, tamano: int, **valores: Any) -> Optional[Tuple]:
+        """
+        Inserta o reemplaza una entrada y expulsa entradas si se supera el tamaño
+        máximo (con el lock tomado)
+
+        Args:
+            clave: Clave de la entrada
+            tamano: Bytes que ocupa la entrada
+            **valores: Columnas propias de la caché
+
+        Returns:
+            Columnas asociadas de la entrada reemplazada, o None si no existía
+        """
+        columnas_anterior = ", ".join(("tamano", *self.COLUMNAS_ASOCIADAS))
+        anterior = self._conn.execute(
+            f"SELECT {columnas_anterior} FROM {self.TABLA} WHERE clave = ?", (clave,)
+        ).fetchone()
+
+        self._accesos_pendientes.pop(clave, None)
+        self._registrar_accesos()
+        nombres = ["clave", *valores, "tamano", "ultimo_acceso"]
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO {self.TABLA} ({', '.join(nombres)}) "
+            f"VALUES ({', '.join('?' for _ in nombres)})",
+            (clave, *valores.values(), tamano, time.time())
+        )
+        self._conn.commit()
+        self._total_bytes += tamano - (anterior[0] if anterior else 0)
+        self._expulsar_si_excede()
+        return tuple(anterior[1:]) if anterior else None
+
+    def _eliminar(self, clave: str, tamano: int) -> None:
+        """Elimina una entrada cuyo tamaño ya se conoce (con el lock tomado)"""
+        self._conn.execute(f"DELETE FROM {self.TABLA} WHERE clave = ?", (clave,))
+        self._conn.commit()
+        self._total_bytes -= tamano
+
+    def _al_expulsar(self, asociadas: List[Tuple]) -> None:
+        """
+        Libera lo que las entradas expulsadas tienen fuera de la tabla (con el lock tomado)
+
+        Args:
+            asociadas: COLUMNAS_ASOCIADAS de cada entrada expulsada
+        """
+
+    def _expulsar_si_excede(self) -> None:
+        """Elimina las entradas menos usadas hasta volver por debajo del límite (con el lock tomado)"""
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        objetivo = int(self.max_bytes * FRACCION_TRAS_EXPULSION)
+        a_liberar = self._total_bytes - objetivo
+        columnas = ", ".join(("clave", "tamano", *self.COLUMNAS_ASOCIADAS))
+        claves = []
+        asociadas = []
+        liberado = 0
+        for fila in self._conn.execute(
+            f"SELECT {columnas} FROM {self.TABLA} ORDER BY ultimo_acceso ASC"
+        ):
+            claves.append((fila[0],))
+            asociadas.append(tuple(fila[2:]))
+            liberado += fila[1]
+            if liberado >= a_liberar:
+                break
+
+        self._conn.executemany(f"DELETE FROM {self.TABLA} WHERE clave = ?", claves)
+        self._conn.commit()
+        self._al_expulsar(asociadas)
+        self._total_bytes -= liberado
+        logger.info(f"{self.DESCRIPCION}: {len(claves)} entradas expulsadas ({liberado} bytes)")
+
+    def estadisticas(self) -> Dict[str, int]:
+        """
+        Obtiene el número de entradas y el tamaño total de la caché
+
+        Returns:
+            Diccionario con entradas y bytes
+        """
+        with self._lock:
+            entradas, total = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(tamano), 0) FROM {self.TABLA}"
+            ).fetchone()
+        return {"entradas": entradas, "bytes": total}
+
+    def limpiar(self) -> None:
+        """Vacía la caché"""
+        with self._lock:
+            if self.COLUMNAS_ASOCIADAS:
+                self._al_expulsar(self._conn.execute(
+                    f"SELECT {', '.join(self.COLUMNAS_ASOCIADAS)} FROM {self.TABLA}"
+                ).fetchall())
+            self._conn.execute(f"DELETE FROM {self.TABLA}")
+            self._conn.commit()
+            self._accesos_pendientes.clear()
+            self._total_bytes = 0
+
+
+class InstanciaCompartida(Generic[T]):
+    """Instancia única de un servicio, creada al primer uso desde cualquier hilo"""
+
+    def __init__(self, fabrica: Callable[[], T]):
+        """
+        Args:
+            fabrica: Función sin argumentos que crea la instancia
+        """
+        self._fabrica = fabrica
+        self._instancia: Optional[T] = None
+        self._lock = threading.Lock()
+
+    def obtener(self) -> T:
+        """
+        Obtiene la instancia, creándola la primera vez
+
+        Returns:
+            Instancia única
+        """
+        with self._lock:
+            if self._instancia is None:
+                self._instancia = self._fabrica()
+            return self._instancia
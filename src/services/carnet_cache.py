@@ -0,0 +1,199 @@
+"""
+Caché de carnets generados direccionada por contenido
+
+La clave es un hash de todas las entradas de un carnet: definición del template o
+HTML, valores de las variables inyectadas, contenido de las imágenes referenciadas
+(logo, fondo, foto, código de barras), DPI y formato de salida. Los archivos se
+guardan en disco y el índice en SQLite, de modo que una generación masiva repetida
+solo renderiza los empleados cuyas entradas cambiaron y reutiliza el resto.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+from config.settings import CARNET_CACHE_DIR, CARNET_CACHE_PATH, CARNET_CACHE_MAX_MB
+from src.services.cache_sqlite import CacheSQLite, InstanciaCompartida
+
+logger = logging.getLogger(__name__)
+
+# Cambiar al modificar el pipeline de render de carnets para invalidar las entradas antiguas
+VERSION_RENDER_CARNET = 2
+
+# Tamaño de bloque al calcular el hash de un archivo
+TAMANO_BLOQUE_HASH = 1024 * 1024
+
+
+@lru_cache(maxsize=4096)
+def _hash_contenido(ruta: str, modificado_ns: int, tamano: int) -> str:
+    """Hash SHA-256 de un archivo; la fecha y el tamaño forman parte de la clave del memo"""
+    resumen = hashlib.sha256()
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(TAMANO_BLOQUE_HASH), b""):
+            resumen.update(bloque)
+    return resumen.hexdigest()
+
+
+def hash_archivo(ruta: Path) -> str:
+    """
+    Calcula el hash del contenido de un archivo referenciado por un carnet.
+    Se memoriza por ruta, fecha de modificación y tamaño, así el logo o el fondo
+    comunes a todos los carnets se leen una sola vez por generación.
+
+    Args:
+        ruta: Ruta del archivo
+
+    Returns:
+        Hash SHA-256 hexadecimal, o cadena vacía si la ruta no es un archivo
+    """
+    try:
+        estado = os.stat(ruta)
+    except (OSError, ValueError):
+        return ""
+    if not os.path.isfile(ruta):
+        return ""
+    return _hash_contenido(str(ruta), estado.st_mtime_ns, estado.st_size)
+
+
+def _serializar(valor: Any) -> Any:
+    """Convierte las rutas en el hash de su contenido al serializar la clave"""
+    if isinstance(valor, Path):
+        return {"archivo": hash_archivo(valor) if str(valor) else ""}
+    return str(valor)
+
+
+class CarnetRenderCache(CacheSQLite):
+    """Caché LRU de carnets generados, con los archivos en disco y el índice en SQLite"""
+
+    TABLA = "carnets"
+    COLUMNAS = """
+                archivo TEXT NOT NULL,
+                verificado INTEGER NOT NULL DEFAULT 0"""
+    COLUMNAS_ASOCIADAS = ("archivo",)
+    DESCRIPCION = "Caché de carnets"
+
+    def __init__(self, directorio: Optional[Path] = None, ruta: Optional[Path] = None,
+                 max_mb: int = CARNET_CACHE_MAX_MB):
+        """
+        Inicializa la caché
+
+        Args:
+            directorio: Carpeta de los archivos cacheados (por defecto CARNET_CACHE_DIR)
+            ruta: Archivo SQLite del índice (por defecto CARNET_CACHE_PATH)
+            max_mb: Tamaño máximo de los archivos almacenados, en MB
+        """
+        self.directorio = Path(directorio or CARNET_CACHE_DIR)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        super().__init__(ruta or CARNET_CACHE_PATH, max_mb)
+
+    @staticmethod
+    def calcular_clave(**entradas: Any) -> str:
+        """
+        Calcula la clave de un carnet a partir de todas sus entradas. Los valores Path
+        se sustituyen por el hash de su contenido.
+
+        Args:
+            **entradas: Parámetros del carnet (template o HTML, variables, dpi, formato...)
+
+        Returns:
+            Hash SHA-256 hexadecimal
+        """
+        contenido = json.dumps(
+            {"version": VERSION_RENDER_CARNET, **entradas},
+            sort_keys=True, ensure_ascii=False, default=_serializar
+        )
+        return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+    def _ruta_archivo(self, clave: str, extension: str) -> Path:
+        """Ruta del archivo cacheado, repartido en subcarpetas por prefijo de la clave"""
+        return self.directorio / clave[:2] / f"{clave}{extension}"
+
+    def obtener(self, clave: str, solo_verificados: bool = False) -> Optional[Path]:
+        """
+        Obtiene el archivo de un carnet cacheado
+
+        Args:
+            clave: Clave calculada con calcular_clave()
+            solo_verificados: Ignorar las entradas que no pasaron la verificación OCR
+
+        Returns:
+            Ruta del archivo cacheado o None si no está en caché
+        """
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT archivo, tamano, verificado FROM carnets WHERE clave = ?", (clave,)
+            ).fetchone()
+            if fila is None:
+                return None
+            archivo, tamano, verificado = fila
+            if solo_verificados and not verificado:
+                return None
+
+            ruta = self.directorio / archivo
+            if not ruta.is_file():
+                # El archivo se borró fuera de la aplicación: la entrada ya no sirve
+                self._eliminar(clave, tamano)
+                return None
+
+            self._marcar_acceso(clave)
+            return ruta
+
+    def guardar(self, clave: str, ruta_origen: Path, verificado: bool = False) -> None:
+        """
+        Copia un carnet recién generado a la caché y expulsa entradas si se supera el
+        tamaño máximo
+
+        Args:
+            clave: Clave calculada con calcular_clave()
+            ruta_origen: Archivo generado (se conserva)
+            verificado: Si el carnet pasó la verificación OCR
+        """
+        ruta_origen = Path(ruta_origen)
+        destino = self._ruta_archivo(clave, ruta_origen.suffix.lower())
+        try:
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            temporal = destino.with_name(destino.name + ".tmp")
+            shutil.copyfile(ruta_origen, temporal)
+            os.replace(temporal, destino)
+            tamano = destino.stat().st_size
+
+            with self._lock:
+                anterior = self._insertar(
+                    clave, tamano,
+                    archivo=destino.relative_to(self.directorio).as_posix(), verificado=int(verificado)
+                )
+                if anterior and self.directorio / anterior[0] != destino:
+                    self._eliminar_archivo(anterior[0])
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"No se pudo guardar el carnet en caché: {e}")
+
+    def _eliminar_archivo(self, archivo: str) -> None:
+        """Elimina un archivo cacheado ignorando los que ya no existen"""
+        try:
+            (self.directorio / archivo).unlink()
+        except OSError:
+            pass
+
+    def _al_expulsar(self, asociadas: List[Tuple]) -> None:
+        """Elimina los archivos de las entradas expulsadas (con el lock tomado)"""
+        for (archivo,) in asociadas:
+            self._eliminar_archivo(archivo)
+
+
+# Caché compartida por la aplicación (se crea al primer uso)
+_cache_compartida: InstanciaCompartida[CarnetRenderCache] = InstanciaCompartida(CarnetRenderCache)
+
+
+def obtener_carnet_cache() -> CarnetRenderCache:
+    """
+    Obtiene la caché de carnets compartida por la aplicación
+
+    Returns:
+        Instancia única de CarnetRenderCache
+    """
+    return _cache_compartida.obtener()
@@ -3,14 +3,85 @@ Servicio para diseñar y renderizar carnets
 """
 from pathlib import Path
 from typing import Optional, Tuple
+from functools import lru_cache
 from PIL import Image, ImageDraw, ImageFont
 import logging
 
 from src.models.carnet_template import CarnetTemplate
+from src.services.photo_cache import DPI_TEMPLATE, normalizar_foto
 from config.settings import IMAGES_DIR
 
 logger = logging.getLogger(__name__)
 
+# Fuente usada si la del template no está instalada
+RUTA_FUENTE_ALTERNATIVA = "/System/Library/Fonts/Helvetica.ttc"
+
+
+@lru_cache(maxsize=64)
+def cargar_fuente(nombre_fuente: str, tamaño: int):
+    """
+    Carga la fuente de un campo del carnet (el archivo <nombre>.ttf o alternativas)
+    
+    Args:
+        nombre_fuente: Nombre de la fuente en el template (p. ej. "Arial")
+        tamaño: Tamaño en píxeles a 300 DPI
+        
+    Returns:
+        Fuente de PIL
+    """
+    for ruta in (f"{nombre_fuente.lower()}.ttf", RUTA_FUENTE_ALTERNATIVA):
+        try:
+            return ImageFont.truetype(ruta, tamaño)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+@lru_cache(maxsize=16)
+def _imagen_escalada(ruta: str, modificado_ns: int, tamaño: Tuple[int, int],
+                     remuestreo: Optional[int], borrador: bool) -> Image.Image:
+    """Decodifica y escala una imagen; la fecha de modificación invalida el memo"""
+    img = Image.open(ruta)
+    if borrador:
+        # Los JPEG se decodifican directamente a una fracción de su tamaño
+        img.draft("RGB", tamaño)
+    if remuestreo is None:
+        return img.resize(tamaño)
+    return img.resize(tamaño, remuestreo)
+
+
+def cargar_imagen_escalada(ruta: str, tamaño: Tuple[int, int], remuestreo: Optional[int] = None,
+                           borrador: bool = False) -> Image.Image:
+    """
+    Obtiene el logo, el fondo o la foto de un carnet ya escalados a su caja. Se
+    memorizan las últimas imágenes, así mover un control de la vista previa no vuelve
+    a decodificar el fondo ni el logo. La imagen devuelta es compartida: no modificarla.
+    
+    Args:
+        ruta: Ruta de la imagen
+        tamaño: Tamaño de destino en píxeles
+        remuestreo: Filtro de Image.Resampling (None = el de PIL por defecto)
+        borrador: Decodificar los JPEG a tamaño reducido
+        
+    Returns:
+        Imagen escalada
+    """
+    return _imagen_escalada(str(ruta), Path(ruta).stat().st_mtime_ns, tuple(tamaño), remuestreo, borrador)
+
+
+def numero_codigo_desde_archivo(codigo_barras_path: str) -> str:
+    """
+    Extrae el número del código desde el nombre del archivo (nombre_CODIGO.png)
+    
+    Args:
+        codigo_barras_path: Ruta a la imagen del código de barras
+        
+    Returns:
+        Número del código o un valor por defecto
+    """
+    stem = Path(codigo_barras_path).stem
+    return stem.split('_')[-1] if '_' in stem else "12345678"
+
 
 class CarnetDesigner:
     """Servicio para diseñar y renderizar carnets"""
@@ -32,7 +103,9 @@ class CarnetDesigner:
         cedula: Optional[str] = None,
         cargo: Optional[str] = None,
         empresa: Optional[str] = None,
-        web: Optional[str] = None
+        web: Optional[str] = None,
+        escala: float = 1.0,
+        borrador: bool = False
     ) -> Image.Image:
         """
         Renderiza un carnet con los datos proporcionados
@@ -46,19 +119,30 @@ class CarnetDesigner:
             cargo: Cargo del empleado
             empresa: Nombre de la empresa
             web: URL del sitio web
+            escala: Factor sobre las medidas del template (1.0 = 300 DPI)
+            borrador: Remuestreo rápido y decodificación reducida de JPEG, para
+                      vistas previas que luego se sustituyen por el render final
             
         Returns:
             Imagen PIL del carnet renderizado
         """
+        def px(valor: float) -> int:
+            """Convierte una medida del template a píxeles de la imagen"""
+            return int(round(valor * escala))
+        
+        remuestreo = Image.Resampling.BILINEAR if borrador else Image.Resampling.LANCZOS
+        
         # Crear imagen base
-        imagen = Image.new('RGB', (template.ancho, template.alto), template.fondo_color)
+        ancho, alto = px(template.ancho), px(template.alto)
+        imagen = Image.new('RGB', (ancho, alto), template.fondo_color)
         draw = ImageDraw.Draw(imagen)
         
         # Aplicar fondo con imagen si existe
         if template.fondo_imagen_path and Path(template.fondo_imagen_path).exists():
             try:
-                fondo_img = Image.open(template.fondo_imagen_path)
-                fondo_img = fondo_img.resize((template.ancho, template.alto))
+                fondo_img = cargar_imagen_escalada(
+                    template.fondo_imagen_path, (ancho, alto), remuestreo if borrador else None, borrador
+                )
                 
                 # Aplicar opacidad
                 if template.fondo_opacidad < 1.0:
@@ -76,67 +160,40 @@ class CarnetDesigner:
         # Cargar logo si existe
         if template.logo_path and Path(template.logo_path).exists():
             try:
-                logo = Image.open(template.logo_path)
-                logo = logo.resize((template.logo_ancho, template.logo_alto), Image.Resampling.LANCZOS)
-                imagen.paste(logo, (template.logo_x, template.logo_y), logo if logo.mode == 'RGBA' else None)
+                tamaño_logo = (px(template.logo_ancho), px(template.logo_alto))
+                logo = cargar_imagen_escalada(template.logo_path, tamaño_logo, remuestreo, borrador)
+                imagen.paste(logo, (px(template.logo_x), px(template.logo_y)), logo if logo.mode == 'RGBA' else None)
             except Exception as e:
                 logger.warning(f"Error al cargar logo: {e}")
         
         # Cargar y colocar foto del empleado
         if template.mostrar_foto and foto_path and Path(foto_path).exists():
             try:
-                foto = Image.open(foto_path)
-                foto = foto.resize((template.foto_ancho, template.foto_alto), Image.Resampling.LANCZOS)
+                tamaño_foto = (px(template.foto_ancho), px(template.foto_alto))
+                # Foto ya orientada, recortada y reducida a la caja (caché por contenido).
+                # Por debajo de 300 DPI (borradores con zoom) se reduce en memoria la versión
+                # de 300 DPI: así no se normaliza ni se cachea una foto por cada nivel de zoom
+                foto_normalizada = normalizar_foto(
+                    foto_path, (template.foto_ancho, template.foto_alto),
+                    max(DPI_TEMPLATE, round(DPI_TEMPLATE * escala))
+                )
+                foto = cargar_imagen_escalada(foto_normalizada, tamaño_foto, remuestreo, borrador)
                 # Crear máscara circular opcional (por ahora rectangular)
-                imagen.paste(foto, (template.foto_x, template.foto_y))
+                imagen.paste(foto, (px(template.foto_x), px(template.foto_y)))
             except Exception as e:
                 logger.warning(f"Error al cargar foto del empleado: {e}")
         
-        # Intentar cargar fuentes
-        try:
-            nombre_font = ImageFont.truetype(f"{template.nombre_fuente.lower()}.ttf", template.nombre_tamaño)
-        except:
-            try:
-                nombre_font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", template.nombre_tamaño)
-            except:
-                nombre_font = ImageFont.load_default()
-        
-        try:
-            cedula_font = ImageFont.truetype(f"{template.cedula_fuente.lower()}.ttf", template.cedula_tamaño)
-        except:
-            try:
-                cedula_font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", template.cedula_tamaño)
-            except:
-                cedula_font = ImageFont.load_default()
-        
-        try:
-            cargo_font = ImageFont.truetype(f"{template.cargo_fuente.lower()}.ttf", template.cargo_tamaño)
-        except:
-            try:
-                cargo_font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", template.cargo_tamaño)
-            except:
-                cargo_font = ImageFont.load_default()
-        
-        try:
-            empresa_font = ImageFont.truetype(f"{template.empresa_fuente.lower()}.ttf", template.empresa_tamaño)
-        except:
-            try:
-                empresa_font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", template.empresa_tamaño)
-            except:
-                empresa_font = ImageFont.load_default()
-        
-        try:
-            web_font = ImageFont.truetype(f"{template.web_fuente.lower()}.ttf", template.web_tamaño)
-        except:
-            try:
-                web_font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", template.web_tamaño)
-            except:
-                web_font = ImageFont.load_default()
+        # Cargar fuentes
+        nombre_font = cargar_fuente(template.nombre_fuente, max(1, px(template.nombre_tamaño)))
+        cedula_font = cargar_fuente(template.cedula_fuente, max(1, px(template.cedula_tamaño)))
+        cargo_font = cargar_fuente(template.cargo_fuente, max(1, px(template.cargo_tamaño)))
+        empresa_font = cargar_fuente(template.empresa_fuente, max(1, px(template.empresa_tamaño)))
+        web_font = cargar_fuente(template.web_fuente, max(1, px(template.web_tamaño)))
         
         # Dibujar nombre
         if template.mostrar_nombre and nombre_empleado:
             draw.text(
-                (template.nombre_x, template.nombre_y),
+                (px(template.nombre_x), px(template.nombre_y)),
                 nombre_empleado.upper(),
                 fill=template.nombre_color,
                 font=nombre_font
@@ -145,7 +202,7 @@ class CarnetDesigner:
         # Dibujar cédula
         if template.mostrar_cedula and cedula:
             draw.text(
-                (template.cedula_x, template.cedula_y),
+                (px(template.cedula_x), px(template.cedula_y)),
                 f"Cédula: {cedula}",
                 fill=template.cedula_color,
                 font=cedula_font
@@ -154,7 +211,7 @@ class CarnetDesigner:
         # Dibujar cargo
         if template.mostrar_cargo and cargo:
             draw.text(
-                (template.cargo_x, template.cargo_y),
+                (px(template.cargo_x), px(template.cargo_y)),
                 cargo,
                 fill=template.cargo_color,
                 font=cargo_font
@@ -163,7 +220,7 @@ class CarnetDesigner:
         # Dibujar información de empresa
         if template.mostrar_empresa and empresa:
             draw.text(
-                (template.empresa_x, template.empresa_y),
+                (px(template.empresa_x), px(template.empresa_y)),
                 empresa,
                 fill=template.empresa_color,
                 font=empresa_font
@@ -172,7 +229,7 @@ class CarnetDesigner:
         # Dibujar web
         if template.mostrar_web and web:
             draw.text(
-                (template.web_x, template.web_y),
+                (px(template.web_x), px(template.web_y)),
                 web,
                 fill=template.web_color,
                 font=web_font
@@ -181,27 +238,24 @@ class CarnetDesigner:
         # Colocar código de barras
         if codigo_barras_path and Path(codigo_barras_path).exists():
             try:
-                codigo_img = Image.open(codigo_barras_path)
+                # El código se guarda en 1 bit: se escala en escala de grises
+                # y se convierte al modo del carnet solo al componer
+                codigo_img = Image.open(codigo_barras_path).convert('L')
                 codigo_img = codigo_img.resize(
-                    (template.codigo_barras_ancho, template.codigo_barras_alto),
-                    Image.Resampling.LANCZOS
-                )
-                imagen.paste(codigo_img, (template.codigo_barras_x, template.codigo_barras_y))
+                    (px(template.codigo_barras_ancho), px(template.codigo_barras_alto)),
+                    remuestreo
+                ).convert(imagen.mode)
+                imagen.paste(codigo_img, (px(template.codigo_barras_x), px(template.codigo_barras_y)))
                 
                 # Mostrar número del código si está habilitado
                 if template.mostrar_numero_codigo:
-                    try:
-                        numero_font = ImageFont.truetype(f"{template.numero_codigo_fuente.lower()}.ttf", template.numero_codigo_tamaño)
-                    except:
-                        try:
-                            numero_font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", template.numero_codigo_tamaño)
-                        except:
-                            numero_font = ImageFont.load_default()
+                    numero_font = cargar_fuente(
+                        template.numero_codigo_fuente, max(1, px(template.numero_codigo_tamaño))
+                    )
                     
-                    # Extraer número del código desde el nombre del archivo o usar un valor por defecto
-                    numero_codigo = Path(codigo_barras_path).stem.split('_')[-1] if '_' in Path(codigo_barras_path).stem else "12345678"
+                    numero_codigo = numero_codigo_desde_archivo(codigo_barras_path)
                     draw.text(
-                        (template.codigo_barras_x, template.codigo_barras_y + template.codigo_barras_alto + 5),
+                        (px(template.codigo_barras_x), px(template.codigo_barras_y + template.codigo_barras_alto + 5)),
                         numero_codigo,
                         fill=template.numero_codigo_color,
                         font=numero_font
@@ -0,0 +1,902 @@
+"""
+Escritor PDF vectorial para carnets de CarnetTemplate
+
+En lugar de rasterizar el carnet con PIL y ampliarlo a 1200 DPI, cada
+elemento del template se escribe en su forma nativa: los textos como texto
+con la fuente TrueType incrustada, el código de barras como rectángulos
+vectoriales y el fondo, el logo y la foto como imágenes incrustadas una sola
+vez por documento (el escalado lo hace el visor, sin remuestrear).
+
+Las coordenadas del template (píxeles a 300 DPI con origen arriba a la
+izquierda) se usan directamente: una matriz inicial las convierte a puntos.
+
+HojaCarnetsPDFWriter coloca varios carnets por hoja A4/Carta (imposición) con
+sangrado y marcas de corte, en un único PDF que se escribe hoja a hoja.
+"""
+import hashlib
+import io
+import logging
+import os
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageColor, ImageFont
+
+from src.models.carnet_template import CarnetTemplate
+from src.services.carnet_designer import cargar_fuente, numero_codigo_desde_archivo
+from src.services.photo_cache import normalizar_foto
+from config.settings import (
+    BARCODE_IMAGE_OPTIONS,
+    CARNET_HOJA_PAPEL,
+    CARNET_HOJA_COLUMNAS,
+    CARNET_HOJA_FILAS,
+    CARNET_HOJA_MARGEN_MM,
+    CARNET_HOJA_SEPARACION_MM,
+    CARNET_HOJA_SANGRADO_MM,
+    CARNET_HOJA_MARCAS_CORTE,
+    PHOTO_PDF_DPI,
+)
+
+logger = logging.getLogger(__name__)
+
+# fontTools es opcional: permite incrustar solo los glifos usados en lugar de la fuente completa
+try:
+    from fontTools import subset as fonttools_subset
+    FONTTOOLS_DISPONIBLE = True
+except ImportError:
+    fonttools_subset = None
+    FONTTOOLS_DISPONIBLE = False
+
+# Resolución a la que están expresadas las medidas del template
+DPI_TEMPLATE = 300
+PUNTOS_POR_PULGADA = 72
+
+# Caracteres de la codificación WinAnsi (cp1252) incluidos en las fuentes simples
+PRIMER_CARACTER = 32
+ULTIMO_CARACTER = 255
+
+MILIMETROS_POR_PULGADA = 25.4
+
+# Tamaños de papel de las hojas de impresión, en milímetros (ancho, alto)
+TAMAÑOS_PAPEL_MM = {
+    "A4": (210.0, 297.0),
+    "LETTER": (215.9, 279.4),
+}
+
+# Marcas de corte: distancia desde el sangrado y longitud (mm), grosor (pt)
+DISTANCIA_MARCA_MM = 1.0
+LONGITUD_MARCA_MM = 3.0
+GROSOR_MARCA_PT = 0.25
+
+# Calidad JPEG de los carnets rasterizados (templates HTML) colocados en una hoja
+CALIDAD_JPEG_HOJA = 92
+
+# Fuente estándar de PDF usada cuando no hay un archivo TrueType que incrustar
+FUENTE_ESTANDAR = "Helvetica"
+ASCENSO_FUENTE_ESTANDAR = 0.718
+
+
+def _mm_a_puntos(milimetros: float) -> float:
+    """Convierte milímetros a puntos PDF"""
+    return milimetros * PUNTOS_POR_PULGADA / MILIMETROS_POR_PULGADA
+
+
+def _numero(valor: float) -> str:
+    """Formatea un número para el flujo de contenido PDF"""
+    return f"{valor:.3f}".rstrip("0").rstrip(".") or "0"
+
+
+def _color(color: str) -> str:
+    """Convierte un color CSS/hex en sus componentes RGB (0-1) para el operador rg"""
+    try:
+        r, g, b = ImageColor.getrgb(color)[:3]
+    except (ValueError, TypeError):
+        r, g, b = 0, 0, 0
+    return f"{_numero(r / 255)} {_numero(g / 255)} {_numero(b / 255)}"
+
+
+def _nombre_pdf(texto: str) -> str:
+    """Limpia un texto para usarlo como nombre PDF (/Nombre)"""
+    return "".join(c for c in texto if c.isascii() and c.isalnum()) or "Fuente"
+
+
+@lru_cache(maxsize=16)
+def _metricas_truetype(ruta_fuente: str) -> Tuple[str, List[int], int, int, Tuple[int, int, int, int]]:
+    """
+    Obtiene las métricas de una fuente TrueType en unidades de 1/1000 em
+
+    Args:
+        ruta_fuente: Ruta al archivo .ttf
+
+    Returns:
+        Tupla con (nombre PostScript, anchos de PRIMER_CARACTER a ULTIMO_CARACTER,
+        ascenso, descenso, caja envolvente)
+    """
+    fuente = ImageFont.truetype(ruta_fuente, 1000)
+    familia, estilo = fuente.getname()
+    nombre = _nombre_pdf(familia or "")
+    if estilo and estilo.lower() not in ("regular", "book", "normal"):
+        nombre = f"{nombre},{_nombre_pdf(estilo)}"
+
+    anchos = []
+    for codigo in range(PRIMER_CARACTER, ULTIMO_CARACTER + 1):
+        try:
+            anchos.append(int(round(fuente.getlength(bytes([codigo]).decode("cp1252")))))
+        except UnicodeDecodeError:
+            anchos.append(0)
+
+    ascenso, descenso = fuente.getmetrics()
+    izquierda, _, derecha, _ = fuente.getbbox("ÁÑWgjy|")
+    caja = (izquierda, -descenso, derecha, ascenso)
+    return nombre, anchos, ascenso, descenso, caja
+
+
+def _datos_truetype(ruta_fuente: str, caracteres: str) -> Tuple[bytes, bool]:
+    """
+    Obtiene el archivo TrueType a incrustar, reducido a los caracteres usados si hay fontTools
+
+    Args:
+        ruta_fuente: Ruta al archivo .ttf
+        caracteres: Caracteres que aparecen en el documento
+
+    Returns:
+        Tupla con (bytes de la fuente, es_subconjunto)
+    """
+    if FONTTOOLS_DISPONIBLE:
+        try:
+            opciones = fonttools_subset.Options()
+            opciones.hinting = False
+            opciones.notdef_outline = True
+            opciones.drop_tables += ["FFTM"]
+            fuente = fonttools_subset.load_font(ruta_fuente, opciones)
+            subsetter = fonttools_subset.Subsetter(opciones)
+            subsetter.populate(text=caracteres)
+            subsetter.subset(fuente)
+            buffer = io.BytesIO()
+            fonttools_subset.save_font(fuente, buffer, opciones)
+            return buffer.getvalue(), True
+        except Exception as e:
+            logger.warning(f"No se pudo reducir la fuente {ruta_fuente}, se incrusta completa: {e}")
+    return Path(ruta_fuente).read_bytes(), False
+
+
+class DocumentoPDF:
+    """
+    Constructor mínimo de documentos PDF con fuentes, imágenes y páginas compartidas
+
+    Cada objeto se escribe en la salida en cuanto se agrega; solo los objetos
+    reservados (árbol de páginas, recursos y fuentes) se escriben al guardar. Con
+    un destino en disco las páginas y las imágenes no se acumulan en memoria.
+    """
+
+    def __init__(self, destino: Optional[Path] = None):
+        """
+        Inicializa un documento vacío
+
+        Args:
+            destino: Archivo en el que escribir el documento a medida que se construye.
+                     Si es None se construye en memoria y se escribe en guardar()
+        """
+        self._destino = Path(destino) if destino is not None else None
+        self._salida = open(self._destino, "wb") if self._destino is not None else io.BytesIO()
+        self._salida.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._total_objetos = 0
+        self._desplazamientos: Dict[int, int] = {}
+        # Objetos reservados ya definidos que se escriben al guardar
+        self._pendientes: Dict[int, bytes] = {}
+        self._paginas: List[int] = []
+        self._fuentes: Dict[str, Tuple[str, int, float]] = {}
+        # Fuentes TrueType que se escriben al guardar, con los caracteres usados
+        self._truetype: Dict[str, Tuple[str, int, set]] = {}
+        self._imagenes: Dict[str, str] = {}
+        self._xobjects: Dict[str, int] = {}
+        self._estados_opacidad: Dict[str, float] = {}
+        self._num_paginas = self._reservar()
+        self._num_recursos = self._reservar()
+
+    def _reservar(self) -> int:
+        """Reserva un número de objeto para definirlo más tarde"""
+        self._total_objetos += 1
+        return self._total_objetos
+
+    def _definir(self, numero: int, contenido: bytes) -> None:
+        """Define el contenido de un objeto reservado"""
+        self._pendientes[numero] = contenido
+
+    def _escribir_objeto(self, numero: int, contenido: bytes) -> None:
+        """Escribe un objeto en la salida y anota su desplazamiento para la tabla xref"""
+        self._desplazamientos[numero] = self._salida.tell()
+        self._salida.write(f"{numero} 0 obj\n".encode("latin-1") + contenido + b"\nendobj\n")
+
+    def _agregar(self, contenido: bytes) -> int:
+        """Agrega un objeto, lo escribe en la salida y devuelve su número"""
+        numero = self._reservar()
+        self._escribir_objeto(numero, contenido)
+        return numero
+
+    @staticmethod
+    def _stream(diccionario: str, datos: bytes) -> bytes:
+        """Construye un objeto stream con su longitud"""
+        return f"<< {diccionario} /Length {len(datos)} >>\nstream\n".encode("latin-1") + datos + b"\nendstream"
+
+    def fuente(self, fuente_pil) -> Tuple[str, float]:
+        """
+        Registra (una sola vez) la fuente de un campo y devuelve su recurso
+
+        Args:
+            fuente_pil: Fuente cargada con cargar_fuente()
+
+        Returns:
+            Tupla con (nombre del recurso, ascenso en fracción de em)
+        """
+        ruta = getattr(fuente_pil, "path", None)
+        incrustable = isinstance(ruta, (str, bytes, os.PathLike)) and str(ruta).lower().endswith(".ttf")
+        clave = str(ruta) if incrustable else FUENTE_ESTANDAR
+        if clave in self._fuentes:
+            nombre, _, ascenso = self._fuentes[clave]
+            return nombre, ascenso
+
+        nombre = f"F{len(self._fuentes) + 1}"
+        if incrustable:
+            try:
+                ascenso = _metricas_truetype(str(ruta))[2] / 1000
+            except Exception as e:
+                logger.warning(f"No se pudo leer la fuente {ruta}, se usa {FUENTE_ESTANDAR}: {e}")
+                return self.fuente(None)
+            # El archivo se incrusta al guardar, cuando se conocen todos los caracteres usados
+            numero = self._reservar()
+            self._fuentes[clave] = (nombre, numero, ascenso)
+            self._truetype[nombre] = (str(ruta), numero, set())
+            return nombre, ascenso
+
+        numero = self._agregar(
+            f"<< /Type /Font /Subtype /Type1 /BaseFont /{FUENTE_ESTANDAR} "
+            f"/Encoding /WinAnsiEncoding >>".encode("latin-1")
+        )
+        self._fuentes[clave] = (nombre, numero, ASCENSO_FUENTE_ESTANDAR)
+        return nombre, ASCENSO_FUENTE_ESTANDAR
+
+    def registrar_texto(self, recurso: str, texto: str) -> None:
+        """
+        Anota los caracteres escritos con una fuente para incrustar solo sus glifos
+
+        Args:
+            recurso: Nombre del recurso devuelto por fuente()
+            texto: Texto escrito (ya limitado a WinAnsi)
+        """
+        if recurso in self._truetype:
+            self._truetype[recurso][2].update(texto)
+
+    def _incrustar_truetype(self, ruta_fuente: str, numero: int, caracteres: set) -> None:
+        """Incrusta un archivo TrueType como fuente simple WinAnsi en el objeto reservado"""
+        nombre_ps, anchos, ascenso, descenso, caja = _metricas_truetype(ruta_fuente)
+        datos, es_subconjunto = _datos_truetype(ruta_fuente, "".join(sorted(caracteres)))
+        if es_subconjunto:
+            # Las fuentes parciales llevan un prefijo de seis letras en el nombre
+            resumen = hashlib.sha1("".join(sorted(caracteres)).encode("utf-8")).digest()
+            nombre_ps = "".join(chr(ord("A") + b % 26) for b in resumen[:6]) + "+" + nombre_ps
+
+        num_archivo = self._agregar(self._stream(
+            f"/Length1 {len(datos)} /Filter /FlateDecode", zlib.compress(datos)
+        ))
+        num_descriptor = self._agregar((
+            f"<< /Type /FontDescriptor /FontName /{nombre_ps} /Flags 32 "
+            f"/FontBBox [{' '.join(str(v) for v in caja)}] /ItalicAngle 0 "
+            f"/Ascent {ascenso} /Descent {-descenso} /CapHeight {int(ascenso * 0.75)} "
+            f"/StemV 80 /FontFile2 {num_archivo} 0 R >>"
+        ).encode("latin-1"))
+        self._definir(numero, (
+            f"<< /Type /Font /Subtype /TrueType /BaseFont /{nombre_ps} "
+            f"/FirstChar {PRIMER_CARACTER} /LastChar {ULTIMO_CARACTER} "
+            f"/Widths [{' '.join(str(a) for a in anchos)}] /Encoding /WinAnsiEncoding "
+            f"/FontDescriptor {num_descriptor} 0 R >>"
+        ).encode("latin-1"))
+
+    def imagen(self, ruta_imagen: str) -> str:
+        """
+        Incrusta (una sola vez) una imagen y devuelve su recurso
+
+        Args:
+            ruta_imagen: Ruta al archivo de imagen
+
+        Returns:
+            Nombre del recurso XObject
+        """
+        clave = str(Path(ruta_imagen).resolve())
+        if clave in self._imagenes:
+            return self._imagenes[clave]
+
+        with Image.open(ruta_imagen) as img:
+            img.load()
+            if img.format == "JPEG" and img.mode in ("RGB", "L"):
+                # El JPEG se incrusta tal cual, sin decodificar ni recomprimir
+                nombre = self._incrustar_imagen(img, Path(ruta_imagen).read_bytes())
+            else:
+                nombre = self._incrustar_imagen(img)
+        self._imagenes[clave] = nombre
+        return nombre
+
+    def imagen_pil(self, img: Image.Image, calidad_jpeg: Optional[int] = None) -> str:
+        """
+        Incrusta una imagen en memoria (sin deduplicar) y devuelve su recurso
+
+        Args:
+            img: Imagen PIL
+            calidad_jpeg: Si se indica, las imágenes RGB se comprimen como JPEG con esa calidad
+
+        Returns:
+            Nombre del recurso XObject
+        """
+        if calidad_jpeg is not None and img.mode in ("RGB", "RGBA"):
+            buffer = io.BytesIO()
+            img.convert("RGB").save(buffer, "JPEG", quality=calidad_jpeg)
+            return self._incrustar_imagen(img.convert("RGB"), buffer.getvalue())
+        return self._incrustar_imagen(img)
+
+    def _incrustar_imagen(self, img: Image.Image, datos_jpeg: Optional[bytes] = None) -> str:
+        """
+        Escribe una imagen como XObject
+
+        Args:
+            img: Imagen PIL ya cargada
+            datos_jpeg: Bytes JPEG de la imagen para incrustarlos con DCTDecode
+
+        Returns:
+            Nombre del recurso XObject
+        """
+        ancho, alto = img.size
+        smask = ""
+        extra = ""
+        if datos_jpeg is not None:
+            datos = datos_jpeg
+            filtro = "/DCTDecode"
+            espacio = "/DeviceRGB" if img.mode == "RGB" else "/DeviceGray"
+            bits = 8
+        else:
+            if img.mode in ("P", "PA", "LA") or "transparency" in img.info:
+                img = img.convert("RGBA")
+            if img.mode == "RGBA":
+                alfa = img.getchannel("A")
+                num_mascara = self._agregar(self._stream(
+                    f"/Type /XObject /Subtype /Image /Width {ancho} /Height {alto} "
+                    f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode",
+                    zlib.compress(alfa.tobytes())
+                ))
+                smask = f" /SMask {num_mascara} 0 R"
+                img = img.convert("RGB")
+            if img.mode == "1":
+                # Códigos de barras en 1 bit: se conservan sin suavizado
+                espacio, bits, extra = "/DeviceGray", 1, " /Interpolate false"
+            elif img.mode == "L":
+                espacio, bits = "/DeviceGray", 8
+            else:
+                img = img.convert("RGB")
+                espacio, bits = "/DeviceRGB", 8
+            datos = zlib.compress(img.tobytes())
+            filtro = "/FlateDecode"
+
+        numero = self._agregar(self._stream(
+            f"/Type /XObject /Subtype /Image /Width {ancho} /Height {alto} /ColorSpace {espacio} "
+            f"/BitsPerComponent {bits} /Filter {filtro}{smask}{extra}",
+            datos
+        ))
+        nombre = f"Im{len(self._xobjects) + 1}"
+        self._xobjects[nombre] = numero
+        return nombre
+
+    def opacidad(self, valor: float) -> str:
+        """
+        Registra un estado gráfico con la opacidad indicada
+
+        Args:
+            valor: Opacidad entre 0 y 1
+
+        Returns:
+            Nombre del recurso ExtGState
+        """
+        for nombre, existente in self._estados_opacidad.items():
+            if existente == valor:
+                return nombre
+        nombre = f"GS{len(self._estados_opacidad) + 1}"
+        self._estados_opacidad[nombre] = valor
+        return nombre
+
+    def agregar_pagina(self, ancho_pt: float, alto_pt: float, contenido: str) -> None:
+        """
+        Agrega una página con su flujo de contenido
+
+        Args:
+            ancho_pt: Ancho de la página en puntos
+            alto_pt: Alto de la página en puntos
+            contenido: Operadores PDF de la página
+        """
+        num_contenido = self._agregar(self._stream(
+            "/Filter /FlateDecode", zlib.compress(contenido.encode("latin-1"))
+        ))
+        self._paginas.append(self._agregar((
+            f"<< /Type /Page /Parent {self._num_paginas} 0 R "
+            f"/MediaBox [0 0 {_numero(ancho_pt)} {_numero(alto_pt)}] "
+            f"/Resources {self._num_recursos} 0 R /Contents {num_contenido} 0 R >>"
+        ).encode("latin-1")))
+
+    def guardar(self, ruta_pdf: Optional[Path] = None) -> None:
+        """
+        Termina el documento: escribe los objetos reservados, la tabla xref y el trailer
+
+        Args:
+            ruta_pdf: Ruta del archivo PDF (solo para documentos construidos en memoria)
+        """
+        for ruta_fuente, numero, caracteres in self._truetype.values():
+            self._incrustar_truetype(ruta_fuente, numero, caracteres)
+        self._truetype.clear()
+
+        fuentes = " ".join(f"/{n} {num} 0 R" for n, num, _ in self._fuentes.values())
+        xobjects = " ".join(f"/{n} {num} 0 R" for n, num in self._xobjects.items())
+        estados = " ".join(
+            f"/{n} << /Type /ExtGState /ca {_numero(v)} /CA {_numero(v)} >>"
+            for n, v in self._estados_opacidad.items()
+        )
+        self._definir(self._num_recursos, (
+            f"<< /ProcSet [/PDF /Text /ImageB /ImageC] /Font << {fuentes} >> "
+            f"/XObject << {xobjects} >> /ExtGState << {estados} >> >>"
+        ).encode("latin-1"))
+        self._definir(self._num_paginas, (
+            f"<< /Type /Pages /Kids [{' '.join(f'{p} 0 R' for p in self._paginas)}] "
+            f"/Count {len(self._paginas)} >>"
+        ).encode("latin-1"))
+        num_catalogo = self._agregar(f"<< /Type /Catalog /Pages {self._num_paginas} 0 R >>".encode("latin-1"))
+
+        for numero in sorted(self._pendientes):
+            self._escribir_objeto(numero, self._pendientes[numero])
+        self._pendientes.clear()
+
+        inicio_xref = self._salida.tell()
+        tabla = [f"xref\n0 {self._total_objetos + 1}\n0000000000 65535 f \n"]
+        for numero in range(1, self._total_objetos + 1):
+            tabla.append(f"{self._desplazamientos[numero]:010d} 00000 n \n")
+        tabla.append(
+            f"trailer\n<< /Size {self._total_objetos + 1} /Root {num_catalogo} 0 R >>\n"
+            f"startxref\n{inicio_xref}\n%%EOF\n"
+        )
+        self._salida.write("".join(tabla).encode("latin-1"))
+
+        if self._destino is None:
+            Path(ruta_pdf).write_bytes(self._salida.getvalue())
+        self._salida.close()
+
+    def descartar(self) -> None:
+        """Cierra la salida sin terminar el documento y elimina el archivo parcial"""
+        if not self._salida.closed:
+            self._salida.close()
+        if self._destino is not None:
+            try:
+                self._destino.unlink()
+            except OSError:
+                pass
+
+
+class CarnetPDFWriter:
+    """Escribe carnets de CarnetTemplate como PDF vectorial (una página por carnet)"""
+
+    def __init__(self):
+        """Inicializa el escritor con un documento vacío"""
+        self.documento = DocumentoPDF()
+
+    def agregar_carnet(
+        self,
+        template: CarnetTemplate,
+        nombre_empleado: str,
+        codigo_barras_path: Optional[str] = None,
+        foto_path: Optional[str] = None,
+        cedula: Optional[str] = None,
+        cargo: Optional[str] = None,
+        empresa: Optional[str] = None,
+        web: Optional[str] = None,
+        patron_codigo: Optional[str] = None
+    ) -> None:
+        """
+        Agrega una página con el carnet, con la misma composición que CarnetDesigner.renderizar_carnet
+
+        Args:
+            template: Plantilla de diseño
+            nombre_empleado: Nombre del empleado
+            codigo_barras_path: Ruta a la imagen del código de barras
+            foto_path: Ruta a la foto del empleado
+            cedula: Número de cédula
+            cargo: Cargo del empleado
+            empresa: Nombre de la empresa
+            web: URL del sitio web
+            patron_codigo: Patrón de módulos del código ('1' barra, '0' espacio). Si se
+                           indica, las barras se dibujan como vectores; si no, se incrusta la imagen
+        """
+        escala = PUNTOS_POR_PULGADA / DPI_TEMPLATE
+        ancho_pt = template.ancho * escala
+        alto_pt = template.alto * escala
+
+        # Sistema de coordenadas del template: píxeles a 300 DPI con el eje Y hacia abajo
+        ops = [f"{_numero(escala)} 0 0 {_numero(-escala)} 0 {_numero(alto_pt)} cm"]
+        ops.extend(self._operaciones_carnet(
+            template, nombre_empleado, codigo_barras_path, foto_path,
+            cedula, cargo, empresa, web, patron_codigo
+        ))
+        self.documento.agregar_pagina(ancho_pt, alto_pt, "\n".join(ops))
+
+    def _operaciones_carnet(
+        self,
+        template: CarnetTemplate,
+        nombre_empleado: str,
+        codigo_barras_path: Optional[str] = None,
+        foto_path: Optional[str] = None,
+        cedula: Optional[str] = None,
+        cargo: Optional[str] = None,
+        empresa: Optional[str] = None,
+        web: Optional[str] = None,
+        patron_codigo: Optional[str] = None,
+        sangrado: float = 0
+    ) -> List[str]:
+        """
+        Genera los operadores PDF de un carnet en coordenadas del template
+
+        Args:
+            template: Plantilla de diseño
+            nombre_empleado: Nombre del empleado
+            codigo_barras_path: Ruta a la imagen del código de barras
+            foto_path: Ruta a la foto del empleado
+            cedula: Número de cédula
+            cargo: Cargo del empleado
+            empresa: Nombre de la empresa
+            web: URL del sitio web
+            patron_codigo: Patrón de módulos del código
+            sangrado: Píxeles del template que el fondo se extiende más allá del borde de corte
+
+        Returns:
+            Lista de operadores (píxeles a 300 DPI, eje Y hacia abajo)
+        """
+        ops = [
+            f"{_color(template.fondo_color)} rg {_numero(-sangrado)} {_numero(-sangrado)} "
+            f"{_numero(template.ancho + 2 * sangrado)} {_numero(template.alto + 2 * sangrado)} re f"
+        ]
+
+        if template.fondo_imagen_path and Path(template.fondo_imagen_path).exists():
+            opacidad = template.fondo_opacidad if template.fondo_opacidad < 1.0 else None
+            if sangrado:
+                # El fondo se amplía de forma uniforme hasta cubrir el sangrado, centrado en el carnet
+                factor = max((template.ancho + 2 * sangrado) / template.ancho,
+                             (template.alto + 2 * sangrado) / template.alto)
+                ancho_fondo = template.ancho * factor
+                alto_fondo = template.alto * factor
+                self._dibujar_imagen(ops, template.fondo_imagen_path,
+                                     (template.ancho - ancho_fondo) / 2, (template.alto - alto_fondo) / 2,
+                                     ancho_fondo, alto_fondo, "imagen de fondo", opacidad)
+            else:
+                self._dibujar_imagen(ops, template.fondo_imagen_path, 0, 0, template.ancho, template.alto,
+                                     "imagen de fondo", opacidad)
+
+        if template.logo_path and Path(template.logo_path).exists():
+            self._dibujar_imagen(ops, template.logo_path, template.logo_x, template.logo_y,
+                                 template.logo_ancho, template.logo_alto, "logo")
+
+        if template.mostrar_foto and foto_path and Path(foto_path).exists():
+            # Foto orientada y recortada a su caja a PHOTO_PDF_DPI, no la original de la cámara
+            foto_path = normalizar_foto(foto_path, (template.foto_ancho, template.foto_alto), PHOTO_PDF_DPI)
+            self._dibujar_imagen(ops, foto_path, template.foto_x, template.foto_y,
+                                 template.foto_ancho, template.foto_alto, "foto del empleado")
+
+        if template.mostrar_nombre and nombre_empleado:
+            self._dibujar_texto(ops, nombre_empleado.upper(), template.nombre_x, template.nombre_y,
+                                template.nombre_fuente, template.nombre_tamaño, template.nombre_color)
+        if template.mostrar_cedula and cedula:
+            self._dibujar_texto(ops, f"Cédula: {cedula}", template.cedula_x, template.cedula_y,
+                                template.cedula_fuente, template.cedula_tamaño, template.cedula_color)
+        if template.mostrar_cargo and cargo:
+            self._dibujar_texto(ops, cargo, template.cargo_x, template.cargo_y,
+                                template.cargo_fuente, template.cargo_tamaño, template.cargo_color)
+        if template.mostrar_empresa and empresa:
+            self._dibujar_texto(ops, empresa, template.empresa_x, template.empresa_y,
+                                template.empresa_fuente, template.empresa_tamaño, template.empresa_color)
+        if template.mostrar_web and web:
+            self._dibujar_texto(ops, web, template.web_x, template.web_y,
+                                template.web_fuente, template.web_tamaño, template.web_color)
+
+        if codigo_barras_path and Path(codigo_barras_path).exists():
+            caja = (template.codigo_barras_x, template.codigo_barras_y,
+                    template.codigo_barras_ancho, template.codigo_barras_alto)
+            if patron_codigo:
+                self._dibujar_barras(ops, patron_codigo, *caja)
+            else:
+                self._dibujar_imagen(ops, codigo_barras_path, *caja, "código de barras")
+
+            if template.mostrar_numero_codigo:
+                self._dibujar_texto(
+                    ops, numero_codigo_desde_archivo(codigo_barras_path),
+                    template.codigo_barras_x, template.codigo_barras_y + template.codigo_barras_alto + 5,
+                    template.numero_codigo_fuente, template.numero_codigo_tamaño, template.numero_codigo_color
+                )
+
+        return ops
+
+    def _dibujar_imagen(self, ops: List[str], ruta: str, x: float, y: float, ancho: float, alto: float,
+                        descripcion: str, opacidad: Optional[float] = None) -> None:
+        """Coloca una imagen estirada a la caja indicada (el escalado lo hace el visor)"""
+        try:
+            nombre = self.documento.imagen(ruta)
+        except Exception as e:
+            logger.warning(f"Error al cargar {descripcion}: {e}")
+            return
+        estado = f"/{self.documento.opacidad(opacidad)} gs " if opacidad is not None else ""
+        ops.append(
+            f"q {estado}{_numero(ancho)} 0 0 {_numero(-alto)} {_numero(x)} {_numero(y + alto)} cm /{nombre} Do Q"
+        )
+
+    def _dibujar_texto(self, ops: List[str], texto: str, x: int, y: int,
+                       nombre_fuente: str, tamaño: int, color: str) -> None:
+        """Escribe un texto con la fuente del template; (x, y) es la esquina superior izquierda como en PIL"""
+        recurso, ascenso = self.documento.fuente(cargar_fuente(nombre_fuente, tamaño))
+        linea_base = y + ascenso * tamaño
+        codificado = texto.encode("cp1252", errors="replace")
+        self.documento.registrar_texto(recurso, codificado.decode("cp1252"))
+        codificado = codificado.hex().upper()
+        ops.append(
+            f"BT {_color(color)} rg /{recurso} {tamaño} Tf "
+            f"1 0 0 -1 {x} {_numero(linea_base)} Tm <{codificado}> Tj ET"
+        )
+
+    @staticmethod
+    def _dibujar_barras(ops: List[str], patron: str, x: int, y: int, ancho: int, alto: int) -> None:
+        """Dibuja el código como rectángulos, con la zona silenciosa del PNG para conservar la composición"""
+        margen = BARCODE_IMAGE_OPTIONS.get("quiet_zone", 6.5) / BARCODE_IMAGE_OPTIONS.get("module_width", 0.2)
+        ancho_modulo = ancho / (len(patron) + 2 * margen)
+
+        rectangulos = []
+        inicio = None
+        for indice, modulo in enumerate(patron + "0"):
+            if modulo == "1" and inicio is None:
+                inicio = indice
+            elif modulo != "1" and inicio is not None:
+                rectangulos.append(
+                    f"{_numero(x + (margen + inicio) * ancho_modulo)} {y} "
+                    f"{_numero((indice - inicio) * ancho_modulo)} {alto} re"
+                )
+                inicio = None
+
+        ops.append(f"1 1 1 rg {x} {y} {ancho} {alto} re f")
+        if rectangulos:
+            ops.append("0 0 0 rg " + " ".join(rectangulos) + " f")
+
+    def guardar(self, ruta_pdf: Path) -> bool:
+        """
+        Escribe el PDF en disco
+
+        Args:
+            ruta_pdf: Ruta del archivo PDF
+
+        Returns:
+            True si se guardó correctamente
+        """
+        try:
+            self.documento.guardar(ruta_pdf)
+            return True
+        except Exception as e:
+            logger.error(f"Error al guardar PDF vectorial: {e}")
+            return False
+
+
+class HojaCarnetsPDFWriter(CarnetPDFWriter):
+    """
+    Coloca carnets en hojas A4/Carta (imposición) y los escribe en un único PDF
+
+    Cada hoja se escribe en el archivo en cuanto se llena, de modo que la memoria
+    no crece con el número de carnets; el logo, el fondo y las fuentes se
+    incrustan una sola vez y todas las hojas los comparten.
+    """
+
+    def __init__(
+        self,
+        ruta_pdf: Path,
+        ancho_carnet: int,
+        alto_carnet: int,
+        papel: str = CARNET_HOJA_PAPEL,
+        columnas: int = CARNET_HOJA_COLUMNAS,
+        filas: int = CARNET_HOJA_FILAS,
+        margen_mm: float = CARNET_HOJA_MARGEN_MM,
+        separacion_mm: float = CARNET_HOJA_SEPARACION_MM,
+        sangrado_mm: float = CARNET_HOJA_SANGRADO_MM,
+        marcas_corte: bool = CARNET_HOJA_MARCAS_CORTE
+    ):
+        """
+        Inicializa el escritor y calcula la cuadrícula de la hoja
+
+        Args:
+            ruta_pdf: Ruta del PDF de salida (se escribe a medida que se llenan las hojas)
+            ancho_carnet: Ancho del carnet en píxeles del template (300 DPI)
+            alto_carnet: Alto del carnet en píxeles del template (300 DPI)
+            papel: "A4" o "LETTER"
+            columnas: Columnas de la cuadrícula (0 = las que quepan)
+            filas: Filas de la cuadrícula (0 = las que quepan)
+            margen_mm: Margen mínimo de la hoja
+            separacion_mm: Separación entre carnets (al menos el doble del sangrado y,
+                con marcas de corte, de la distancia y longitud de las marcas)
+            sangrado_mm: Extensión del fondo más allá del borde de corte
+            marcas_corte: Dibujar marcas de corte en las esquinas de cada carnet
+
+        Raises:
+            ValueError: Si el papel no existe o la cuadrícula no cabe en la hoja
+        """
+        if papel not in TAMAÑOS_PAPEL_MM:
+            raise ValueError(f"Papel no soportado: {papel}. Use {', '.join(TAMAÑOS_PAPEL_MM)}")
+
+        escala = PUNTOS_POR_PULGADA / DPI_TEMPLATE
+        self.ancho_hoja, self.alto_hoja = (_mm_a_puntos(v) for v in TAMAÑOS_PAPEL_MM[papel])
+        self.ancho_carnet = ancho_carnet
+        self.alto_carnet = alto_carnet
+        self.sangrado_pt = _mm_a_puntos(max(0.0, sangrado_mm))
+        self.marcas_corte = marcas_corte
+
+        ancho_pt = ancho_carnet * escala
+        alto_pt = alto_carnet * escala
+        # Entre dos carnets caben el sangrado de ambos y, si se dibujan, sus marcas de corte
+        separacion_minima = 2 * self.sangrado_pt
+        if marcas_corte:
+            separacion_minima += 2 * _mm_a_puntos(DISTANCIA_MARCA_MM + LONGITUD_MARCA_MM)
+        separacion = max(_mm_a_puntos(separacion_mm), separacion_minima)
+        margen = _mm_a_puntos(margen_mm)
+
+        max_columnas = int((self.ancho_hoja - 2 * margen + separacion) // (ancho_pt + separacion))
+        max_filas = int((self.alto_hoja - 2 * margen + separacion) // (alto_pt + separacion))
+        self.columnas = columnas or max_columnas
+        self.filas = filas or max_filas
+        if self.columnas < 1 or self.filas < 1 or self.columnas > max_columnas or self.filas > max_filas:
+            raise ValueError(
+                f"Una cuadrícula de {self.columnas}x{self.filas} carnets no cabe en una hoja {papel} "
+                f"(máximo {max_columnas}x{max_filas})"
+            )
+
+        # La cuadrícula se centra en la hoja; las celdas se guardan como esquina superior izquierda
+        usado_x = self.columnas * ancho_pt + (self.columnas - 1) * separacion
+        usado_y = self.filas * alto_pt + (self.filas - 1) * separacion
+        inicio_x = (self.ancho_hoja - usado_x) / 2
+        inicio_y = (self.alto_hoja - usado_y) / 2
+        self._celdas = [
+            (inicio_x + columna * (ancho_pt + separacion), inicio_y + fila * (alto_pt + separacion))
+            for fila in range(self.filas)
+            for columna in range(self.columnas)
+        ]
+
+        self.documento = DocumentoPDF(ruta_pdf)
+        self._ops_hoja: List[str] = []
+        self._ocupadas = 0
+        self.hojas = 0
+        self.carnets = 0
+
+    @property
+    def carnets_por_hoja(self) -> int:
+        """Número de carnets que caben en cada hoja"""
+        return len(self._celdas)
+
+    def agregar_carnet(
+        self,
+        template: CarnetTemplate,
+        nombre_empleado: str,
+        codigo_barras_path: Optional[str] = None,
+        foto_path: Optional[str] = None,
+        cedula: Optional[str] = None,
+        cargo: Optional[str] = None,
+        empresa: Optional[str] = None,
+        web: Optional[str] = None,
+        patron_codigo: Optional[str] = None
+    ) -> None:
+        """
+        Coloca un carnet del sistema PIL en la siguiente celda libre (en vectorial)
+
+        Args:
+            template: Plantilla de diseño
+            nombre_empleado: Nombre del empleado
+            codigo_barras_path: Ruta a la imagen del código de barras
+            foto_path: Ruta a la foto del empleado
+            cedula: Número de cédula
+            cargo: Cargo del empleado
+            empresa: Nombre de la empresa
+            web: URL del sitio web
+            patron_codigo: Patrón de módulos del código ('1' barra, '0' espacio)
+        """
+        sangrado = self.sangrado_pt * DPI_TEMPLATE / PUNTOS_POR_PULGADA
+        self._colocar(self._operaciones_carnet(
+            template, nombre_empleado, codigo_barras_path, foto_path,
+            cedula, cargo, empresa, web, patron_codigo, sangrado
+        ))
+
+    def agregar_imagen(self, imagen: Image.Image) -> None:
+        """
+        Coloca un carnet ya rasterizado (p. ej. un template HTML) en la siguiente celda libre
+
+        La imagen ocupa exactamente la caja de corte: sin el diseño no hay fondo
+        que extender al sangrado.
+
+        Args:
+            imagen: Carnet renderizado a cualquier resolución
+        """
+        nombre = self.documento.imagen_pil(imagen, CALIDAD_JPEG_HOJA)
+        self._colocar([
+            f"q {self.ancho_carnet} 0 0 {-self.alto_carnet} 0 {self.alto_carnet} cm /{nombre} Do Q"
+        ])
+
+    def _colocar(self, ops_carnet: List[str]) -> None:
+        """Coloca los operadores de un carnet en la siguiente celda y cierra la hoja si se llena"""
+        escala = PUNTOS_POR_PULGADA / DPI_TEMPLATE
+        x, y = self._celdas[self._ocupadas]
+        sangrado = self.sangrado_pt / escala
+
+        # Coordenadas del template dentro de la celda, recortadas a la caja de sangrado
+        self._ops_hoja.append(
+            f"q {_numero(escala)} 0 0 {_numero(-escala)} {_numero(x)} {_numero(self.alto_hoja - y)} cm "
+            f"{_numero(-sangrado)} {_numero(-sangrado)} {_numero(self.ancho_carnet + 2 * sangrado)} "
+            f"{_numero(self.alto_carnet + 2 * sangrado)} re W n"
+        )
+        self._ops_hoja.extend(ops_carnet)
+        self._ops_hoja.append("Q")
+
+        self._ocupadas += 1
+        self.carnets += 1
+        if self._ocupadas == len(self._celdas):
+            self._cerrar_hoja()
+
+    def _marcas_de_corte(self) -> List[str]:
+        """Genera las marcas de corte de las celdas ocupadas de la hoja actual"""
+        escala = PUNTOS_POR_PULGADA / DPI_TEMPLATE
+        ancho = self.ancho_carnet * escala
+        alto = self.alto_carnet * escala
+        inicio = self.sangrado_pt + _mm_a_puntos(DISTANCIA_MARCA_MM)
+        fin = inicio + _mm_a_puntos(LONGITUD_MARCA_MM)
+
+        trazos = []
+        for x, y in self._celdas[:self._ocupadas]:
+            izquierda, derecha = x, x + ancho
+            arriba, abajo = self.alto_hoja - y, self.alto_hoja - y - alto
+            for borde_x, sentido_x in ((izquierda, -1), (derecha, 1)):
+                for borde_y, sentido_y in ((arriba, 1), (abajo, -1)):
+                    # Una marca horizontal y otra vertical en la prolongación de cada borde
+                    trazos.append(
+                        f"{_numero(borde_x + sentido_x * inicio)} {_numero(borde_y)} m "
+                        f"{_numero(borde_x + sentido_x * fin)} {_numero(borde_y)} l"
+                    )
+                    trazos.append(
+                        f"{_numero(borde_x)} {_numero(borde_y + sentido_y * inicio)} m "
+                        f"{_numero(borde_x)} {_numero(borde_y + sentido_y * fin)} l"
+                    )
+        return [f"q 0 0 0 RG {_numero(GROSOR_MARCA_PT)} w " + " ".join(trazos) + " S Q"]
+
+    def _cerrar_hoja(self) -> None:
+        """Escribe la hoja actual en el PDF"""
+        if not self._ocupadas:
+            return
+        if self.marcas_corte:
+            self._ops_hoja.extend(self._marcas_de_corte())
+        self.documento.agregar_pagina(self.ancho_hoja, self.alto_hoja, "\n".join(self._ops_hoja))
+        self._ops_hoja = []
+        self._ocupadas = 0
+        self.hojas += 1
+
+    def guardar(self, ruta_pdf: Optional[Path] = None) -> bool:
+        """
+        Escribe la última hoja y termina el PDF
+
+        Args:
+            ruta_pdf: Ignorado; el PDF se escribe en la ruta indicada al crear el escritor
+
+        Returns:
+            True si se guardó correctamente
+        """
+        try:
+            self._cerrar_hoja()
+            self.documento.guardar()
+            return True
+        except Exception as e:
+            logger.error(f"Error al guardar las hojas de impresión: {e}")
+            self.documento.descartar()
+            return False
+
+    def descartar(self) -> None:
+        """Abandona el PDF parcial (p. ej. al cancelar) y elimina el archivo"""
+        self.documento.descartar()
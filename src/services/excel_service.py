@@ -5,12 +5,9 @@ import logging
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime
-import openpyxl
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils import get_column_letter
 
 from src.models.database import DatabaseManager
+from src.utils.tracer import tracer
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +43,11 @@ class ExcelService:
                 return False, "No hay datos en la base de datos para exportar"
             
             # Crear workbook
+            # openpyxl se carga al primer uso para no penalizar el arranque
+            from openpyxl import Workbook
+            from openpyxl.styles import Font, PatternFill, Alignment
+            from openpyxl.utils import get_column_letter
+            
             wb = Workbook()
             ws = wb.active
             ws.title = "Códigos de Barras"
@@ -121,6 +123,11 @@ class ExcelService:
                 return False, "No hay servicios en la base de datos para exportar"
             
             # Crear workbook
+            # openpyxl se carga al primer uso para no penalizar el arranque
+            from openpyxl import Workbook
+            from openpyxl.styles import Font, PatternFill, Alignment
+            from openpyxl.utils import get_column_letter
+            
             wb = Workbook()
             ws = wb.active
             ws.title = "Servicios"
@@ -181,6 +188,11 @@ class ExcelService:
         """
         try:
             # Crear workbook
+            # openpyxl se carga al primer uso para no penalizar el arranque
+            from openpyxl import Workbook
+            from openpyxl.styles import Font, PatternFill, Alignment
+            from openpyxl.utils import get_column_letter
+            
             wb = Workbook()
             ws = wb.active
             ws.title = "Servicios"
@@ -246,6 +258,7 @@ class ExcelService:
             estadísticas: {'exitosos': int, 'errores': int, 'duplicados': int, 'total': int}
             errores: Lista de mensajes de error
         """
+        tracer.iniciar_sesion("importar_servicios_excel")
         try:
             import openpyxl
             from src.services.barcode_service import BarcodeService
@@ -255,7 +268,8 @@ class ExcelService:
                 return False, {}, ["El archivo Excel no existe"]
             
             # Cargar workbook
-            wb = openpyxl.load_workbook(str(ruta_archivo), data_only=True)
+            with tracer.span("cargar_excel", "excel"):
+                wb = openpyxl.load_workbook(str(ruta_archivo), data_only=True)
             ws = wb.active
             
             # Leer encabezados
@@ -313,8 +327,9 @@ class ExcelService:
                     continue
                 
                 # Verificar si el servicio ya existe (por nombre)
-                servicios_existentes = self.db_manager.obtener_todos_servicios()
-                servicio_duplicado = any(s[3] == nombre_servicio for s in servicios_existentes)
+                with tracer.span("buscar_duplicado", "excel", fila=row_idx):
+                    servicios_existentes = self.db_manager.obtener_todos_servicios()
+                    servicio_duplicado = any(s[3] == nombre_servicio for s in servicios_existentes)
                 
                 if servicio_duplicado:
                     estadisticas['duplicados'] += 1
@@ -337,6 +352,7 @@ class ExcelService:
                         f"Generando código para: {nombre_servicio}..."
                     )
                 
+                tracer.inicio("servicio", "excel", fila=row_idx)
                 try:
                     # Generar ID único
                     id_unico_generado = IDGenerator.generar_id_personalizado(
@@ -350,15 +366,17 @@ class ExcelService:
                     formato = "Code128"
                     
                     # Generar código de barras
-                    codigo_barras, id_unico_archivo, ruta_imagen = barcode_service.generar_codigo_barras(
-                        id_unico_generado, formato, id_unico_generado, None, None,
-                        texto_debajo=nombre_servicio, tamano_fuente_texto=tamano_fuente
-                    )
+                    with tracer.span("generar_codigo", "excel"):
+                        codigo_barras, id_unico_archivo, ruta_imagen = barcode_service.generar_codigo_barras(
+                            id_unico_generado, formato, id_unico_generado, None, None,
+                            texto_debajo=nombre_servicio, tamano_fuente_texto=tamano_fuente
+                        )
                     
                     # Validar código generado
-                    valido, mensaje_error = barcode_service.validar_codigo_barras(
-                        ruta_imagen, id_unico_generado
-                    )
+                    with tracer.span("validar_codigo", "excel"):
+                        valido, mensaje_error = barcode_service.validar_codigo_barras(
+                            ruta_imagen, id_unico_generado, formato
+                        )
                     
                     if not valido:
                         if ruta_imagen.exists():
@@ -371,9 +389,10 @@ class ExcelService:
                     nombre_archivo = ruta_imagen.name
                     
                     # Guardar en base de datos
-                    servicio_id = self.db_manager.insertar_servicio(
-                        codigo_barras, id_unico_generado, nombre_servicio, formato, nombre_archivo
-                    )
+                    with tracer.span("insertar_bd", "excel"):
+                        servicio_id = self.db_manager.insertar_servicio(
+                            codigo_barras, id_unico_generado, nombre_servicio, formato, nombre_archivo
+                        )
                     
                     if servicio_id:
                         exitosos_final += 1
@@ -389,6 +408,8 @@ class ExcelService:
                     errores_final.append(
                         f"Fila {row_idx} ({nombre_servicio}): Error inesperado - {str(e)}"
                     )
+                finally:
+                    tracer.fin("servicio", "excel")
             
             estadisticas['exitosos'] = exitosos_final
             estadisticas['errores'] += len(errores_final)
@@ -399,6 +420,8 @@ class ExcelService:
         except Exception as e:
             logger.error(f"Error al importar servicios desde Excel: {e}", exc_info=True)
             return False, {}, [f"Error al importar: {str(e)}"]
+        finally:
+            tracer.finalizar_sesion()
     
     def generar_excel_ejemplo(self, ruta_archivo: Path, formato_por_defecto: Optional[str] = None) -> Tuple[bool, str]:
         """
@@ -412,6 +435,11 @@ class ExcelService:
             Tupla (éxito, mensaje)
         """
         try:
+            # openpyxl se carga al primer uso para no penalizar el arranque
+            from openpyxl import Workbook
+            from openpyxl.styles import Font, PatternFill, Alignment
+            from openpyxl.utils import get_column_letter
+            
             wb = Workbook()
             ws = wb.active
             ws.title = "Datos de Empleados"
@@ -485,12 +513,16 @@ class ExcelService:
             estadísticas: {'exitosos': int, 'errores': int, 'duplicados': int, 'validacion_fallida': int}
             errores: Lista de mensajes de error
         """
+        tracer.iniciar_sesion("validar_excel")
         try:
+            import openpyxl
+            
             if not ruta_archivo.exists():
                 return False, {}, ["El archivo Excel no existe"]
             
             # Cargar workbook
-            wb = openpyxl.load_workbook(str(ruta_archivo), data_only=True)
+            with tracer.span("cargar_excel", "excel"):
+                wb = openpyxl.load_workbook(str(ruta_archivo), data_only=True)
             ws = wb.active
             
             # Leer encabezados
@@ -563,13 +595,14 @@ class ExcelService:
                 
                 # Verificar si el código de empleado ya existe (buscar por descripcion que es el código de empleado)
                 # La búsqueda puede retornar múltiples resultados, pero buscamos por descripción exacta
-                todos_codigos = self.db_manager.obtener_todos_codigos()
-                codigo_existente = None
-                for codigo in todos_codigos:
-                    # codigo es: (id, codigo_barras, id_unico, fecha_creacion, nombres, apellidos, descripcion, formato, nombre_archivo)
-                    if len(codigo) >= 7 and codigo[6] == codigo_empleado:  # descripcion es índice 6
-                        codigo_existente = codigo
-                        break
+                with tracer.span("buscar_duplicado", "excel", fila=row_idx):
+                    todos_codigos = self.db_manager.obtener_todos_codigos()
+                    codigo_existente = None
+                    for codigo in todos_codigos:
+                        # codigo es: (id, codigo_barras, id_unico, fecha_creacion, nombres, apellidos, descripcion, formato, nombre_archivo)
+                        if len(codigo) >= 7 and codigo[6] == codigo_empleado:  # descripcion es índice 6
+                            codigo_existente = codigo
+                            break
                 
                 if codigo_existente:
                     # Si existe, verificar si tiene código de barras válido
@@ -587,14 +620,13 @@ class ExcelService:
                     nombre_completo = f"{nombres} {apellidos}"
                     
                     # Verificar si el código de barras es válido
-                    from config.settings import IMAGES_DIR
                     from src.services.barcode_service import BarcodeService
                     barcode_service = BarcodeService()
                     
                     if nombre_archivo:
-                        ruta_imagen = IMAGES_DIR / nombre_archivo
+                        ruta_imagen = barcode_service.image_store.ruta(nombre_archivo)
                         if ruta_imagen.exists():
-                            valido, mensaje = barcode_service.validar_codigo_barras(ruta_imagen, id_unico)
+                            valido, mensaje = barcode_service.validar_codigo_barras(ruta_imagen, id_unico, formato_existente)
                             if not valido:
                                 estadisticas['validacion_fallida'] += 1
                                 errores.append(
@@ -619,4 +651,6 @@ class ExcelService:
         except Exception as e:
             logger.error(f"Error al importar desde Excel: {e}", exc_info=True)
             return False, {}, [f"Error al importar: {str(e)}"]
+        finally:
+            tracer.finalizar_sesion()
 
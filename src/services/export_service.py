@@ -1,14 +1,14 @@
 """
 Servicio para exportación de códigos de barras
 """
-import zipfile
-import shutil
 from datetime import datetime
 from pathlib import Path
 from typing import List, Tuple, Optional
 
 from config.settings import IMAGES_DIR, DB_PATH
 from src.utils.file_utils import obtener_ruta_imagen
+from src.services.image_store import ImageStore, obtener_image_store
+from src.services.zip_stream import ZipStreamWriter
 
 
 class ExportService:
@@ -20,9 +20,10 @@ class ExportService:
         
         Args:
             directorio_imagenes: Directorio donde están las imágenes. 
-                                Si es None, usa el directorio por defecto
+                                Si es None, usa el directorio y el almacén por defecto
         """
         self.directorio_imagenes = directorio_imagenes or IMAGES_DIR
+        self.image_store = ImageStore(directorio_imagenes) if directorio_imagenes else obtener_image_store()
     
     def exportar_seleccionados(self, codigos: List[Tuple], directorio_destino: Path) -> Tuple[int, int]:
         """
@@ -48,24 +49,23 @@ class ExportService:
                 nombre_archivo = None
             
             # Si tenemos nombre_archivo, usarlo directamente
-            if nombre_archivo:
-                ruta_imagen = self.directorio_imagenes / nombre_archivo
-            else:
-                # Fallback: generar ruta como antes
-                ruta_imagen = obtener_ruta_imagen(
+            if not nombre_archivo:
+                # Fallback: generar nombre como antes
+                nombre_archivo = obtener_ruta_imagen(
                     nombre_empleado or "sin_nombre",
                     codigo_barras,
                     self.directorio_imagenes
-                )
+                ).name
+            datos = self.image_store.leer_bytes(nombre_archivo)
             
-            if not ruta_imagen.exists():
+            if datos is None:
                 errores += 1
                 continue
             
-            ruta_destino = directorio_destino / ruta_imagen.name
+            ruta_destino = directorio_destino / nombre_archivo
             
             try:
-                shutil.copy2(str(ruta_imagen), str(ruta_destino))
+                ruta_destino.write_bytes(datos)
                 exportados += 1
             except Exception:
                 errores += 1
@@ -76,6 +76,9 @@ class ExportService:
         """
         Exporta todos los códigos a un archivo ZIP
         
+        Las imágenes se escriben en el ZIP a medida que se leen del almacén, sin
+        recomprimir los PNG.
+        
         Args:
             codigos: Lista de tuplas con los datos de los códigos
             ruta_zip: Ruta donde se guardará el archivo ZIP
@@ -87,7 +90,7 @@ class ExportService:
         errores = 0
         
         try:
-            with zipfile.ZipFile(str(ruta_zip), 'w', zipfile.ZIP_DEFLATED) as zipf:
+            with ZipStreamWriter(ruta_zip) as zipf:
                 for codigo in codigos:
                     if len(codigo) == 8:
                         id_db, codigo_barras, id_unico, fecha, nombre_empleado, descripcion, formato, nombre_archivo_db = codigo
@@ -99,10 +102,10 @@ class ExportService:
                             self.directorio_imagenes
                         ).name
                     
-                    ruta_imagen = self.directorio_imagenes / nombre_archivo_db
+                    datos = self.image_store.leer_bytes(nombre_archivo_db)
                     
-                    if ruta_imagen.exists():
-                        zipf.write(str(ruta_imagen), nombre_archivo_db)
+                    if datos is not None:
+                        zipf.agregar(nombre_archivo_db, datos)
                         agregados += 1
                     else:
                         errores += 1
@@ -123,8 +126,9 @@ class ExportService:
         """
         try:
             if DB_PATH.exists():
-                shutil.copy2(str(DB_PATH), str(ruta_backup))
-                return True
+                # Copia consistente aunque otra conexión esté escribiendo
+                from src.services.backup_service import BackupService
+                return BackupService(DB_PATH).copiar_en_linea(ruta_backup)
             return False
         except Exception:
             return False
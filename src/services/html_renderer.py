@@ -3,21 +3,106 @@ Servicio para renderizar HTML a imagen usando QWebEngineView
 """
 from pathlib import Path
 from typing import Optional, Dict, Any
-from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtCore import QUrl, QTimer, QSize, QEventLoop, pyqtSignal, QObject, Qt
 from PyQt6.QtGui import QImage, QPainter
 from PIL import Image
+import numpy as np
 import logging
 import json
 import base64
+from collections import OrderedDict
+
+from src.utils.tracer import tracer
+from src.utils.html_parser import inyectar_valores
+from src.utils.image_health import (
+    FRACCION_CONTENIDO_MINIMA, array_desde_buffer, fraccion_contenido, muestrear_array, son_estables
+)
+from src.services.photo_cache import normalizar_foto
+from config.settings import HTML_PDF_ENGINE, PHOTO_HTML_MAX_PX
 
 logger = logging.getLogger(__name__)
 
+# Estados de precalentamiento del motor de renderizado
+ESTADO_FRIO = "frio"
+ESTADO_CALENTANDO = "calentando"
+ESTADO_LISTO = "listo"
+
+# Motores de generación de PDF para templates HTML
+MOTOR_PDF_VECTORIAL = "vectorial"
+MOTOR_PDF_RASTER = "raster"
+
+# Los templates HTML se diseñan en píxeles a 300 DPI; CSS usa 96 px por pulgada
+DPI_TEMPLATE = 300
+PX_CSS_POR_PULGADA = 96
+MM_POR_PULGADA = 25.4
+
+# Estilo añadido al imprimir: página del tamaño del carnet, sin márgenes, con los
+# fondos del template y el contenido escalado de píxeles del template a píxeles CSS
+ESTILO_IMPRESION = (
+    "<style>"
+    "@page {{ size: {ancho_mm:.2f}mm {alto_mm:.2f}mm; margin: 0; }}"
+    "html {{ zoom: {zoom}; -webkit-print-color-adjust: exact; print-color-adjust: exact; }}"
+    "html, body {{ overflow: hidden; }}"
+    "</style>"
+)
+
+# Variables que se usan como src de imágenes y placeholder para las vacías
+VARIABLES_IMAGEN = ("foto", "codigo_barras", "logo")
+PIXEL_TRANSPARENTE = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+
+# Imágenes codificadas en base64 que se conservan en memoria (logo, fondo, códigos recientes)
+MAX_IMAGENES_BASE64 = 32
+
+# HTML mínimo usado para inicializar el motor web cuando no hay template
+HTML_PRUEBA = """
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <style>
+        body { margin: 0; padding: 0; background: white; }
+        div { width: 100px; height: 100px; background: #f0f0f0; }
+    </style>
+</head>
+<body>
+    <div></div>
+</body>
+</html>
+"""
+
+
+def qimage_a_pil(qimage: QImage) -> Optional[Image.Image]:
+    """
+    Convierte una QImage en imagen PIL RGB con una sola copia del fotograma.
+    La QImage se convierte en su sitio a RGB888 (el buffer BGRA se libera) y su
+    buffer se lee directamente, sin pasar por bytes intermedios; la copia final es
+    la que necesita la imagen PIL para sobrevivir a la QImage.
+    
+    Args:
+        qimage: Captura del motor web (se modifica)
+        
+    Returns:
+        Imagen PIL RGB o None si la QImage no tiene datos
+    """
+    if qimage.format() != QImage.Format.Format_RGB888:
+        qimage.convertTo(QImage.Format.Format_RGB888)
+    bits = qimage.constBits()
+    if bits is None:
+        return None
+    bits.setsize(qimage.sizeInBytes())
+    bytes_por_linea = qimage.bytesPerLine()
+    # Vista sin copia del buffer; el relleno de cada línea se salta con su paso
+    datos = np.frombuffer(bits, dtype=np.uint8, count=bytes_por_linea * qimage.height())
+    return Image.frombuffer(
+        "RGB", (qimage.width(), qimage.height()), datos, "raw", "RGB", bytes_por_linea, 1
+    )
+
 
 class HTMLRenderer(QObject):
     """Servicio para renderizar HTML a imagen"""
     
     finished = pyqtSignal(QImage)
+    estado_cambiado = pyqtSignal(str)
     
     def __init__(self):
         """Inicializa el renderizador HTML"""
@@ -26,6 +111,14 @@ class HTMLRenderer(QObject):
         self.parent_widget = None
         self.loop = None
         self._inicializado = False
+        self.estado = ESTADO_FRIO
+        self._templates_precalentados = set()
+        self._cache_base64 = OrderedDict()
+        # Precalentamiento en curso sobre la vista compartida y su bucle de espera de carga:
+        # un render real que llega mientras tanto lo cancela y usa la vista
+        self._precalentando = False
+        self._precalentamiento_cancelado = False
+        self._loop_precalentamiento: Optional[QEventLoop] = None
     
     def _inicializar_widgets(self):
         """Inicializa los widgets reutilizables una sola vez"""
@@ -33,6 +126,8 @@ class HTMLRenderer(QObject):
             return True
         
         from PyQt6.QtWidgets import QApplication, QWidget
+        # QtWebEngine es pesado: se importa al primer renderizado, no al iniciar la app
+        from PyQt6.QtWebEngineWidgets import QWebEngineView
         
         app = QApplication.instance()
         if app is None:
@@ -97,6 +192,172 @@ class HTMLRenderer(QObject):
         logger.info("Widgets de renderizado inicializados (reutilizables)")
         return True
     
+    def _cambiar_estado(self, estado: str):
+        """Actualiza el estado de precalentamiento y lo notifica"""
+        self.estado = estado
+        self.estado_cambiado.emit(estado)
+    
+    def esta_listo(self) -> bool:
+        """Indica si el motor ya está precalentado y el próximo renderizado será rápido"""
+        return self.estado == ESTADO_LISTO
+    
+    def _cargar_html_y_esperar(self, html_content: str, ancho: int, alto: int, timeout_ms: int = 3000) -> bool:
+        """
+        Carga HTML en la vista reutilizable a zoom 1.0 y espera a que termine
+        
+        Args:
+            html_content: HTML a cargar
+            ancho: Ancho del widget en píxeles
+            alto: Alto del widget en píxeles
+            timeout_ms: Tiempo máximo de espera de la carga
+            
+        Returns:
+            True si la carga terminó correctamente
+        """
+        from PyQt6.QtWidgets import QApplication
+        
+        self.parent_widget.setFixedSize(ancho, alto)
+        self.web_view.setFixedSize(ancho, alto)
+        self.web_view.setZoomFactor(1.0)
+        self.parent_widget.show()
+        self.parent_widget.lower()
+        self.web_view.show()
+        QApplication.processEvents()
+        
+        loop = QEventLoop()
+        cargado = False
+        
+        def on_load_finished(ok):
+            nonlocal cargado
+            cargado = ok
+            loop.quit()
+        
+        self.web_view.loadFinished.connect(on_load_finished)
+        self.web_view.setHtml(html_content, baseUrl=QUrl("file:///"))
+        
+        timer = QTimer()
+        timer.timeout.connect(loop.quit)
+        timer.setSingleShot(True)
+        timer.start(timeout_ms)
+        if self._precalentando and not self._precalentamiento_cancelado:
+            self._loop_precalentamiento = loop
+        loop.exec()
+        timer.stop()
+        if self._loop_precalentamiento is loop:
+            self._loop_precalentamiento = None
+        
+        try:
+            self.web_view.loadFinished.disconnect(on_load_finished)
+        except (TypeError, RuntimeError):
+            pass
+        return cargado
+    
+    def precalentar(self, ruta_template: Optional[Path] = None, ancho: int = 637, alto: int = 1013) -> bool:
+        """
+        Inicializa el perfil del motor web, la vista reutilizable y, si se indica,
+        el template (CSS, fuentes e imágenes) para que el primer renderizado real
+        sea tan rápido como los siguientes.
+        
+        Args:
+            ruta_template: Template HTML a precargar (opcional)
+            ancho: Ancho del template en píxeles (a 300 DPI)
+            alto: Alto del template en píxeles (a 300 DPI)
+            
+        Returns:
+            True si el motor quedó listo
+        """
+        if self._precalentando:
+            return False
+        
+        self._precalentando = True
+        self._precalentamiento_cancelado = False
+        try:
+            if self.estado != ESTADO_LISTO:
+                self._cambiar_estado(ESTADO_CALENTANDO)
+                try:
+                    if not self._inicializar_widgets():
+                        self._cambiar_estado(ESTADO_FRIO)
+                        return False
+                    with tracer.span("precalentar_motor", "render"):
+                        self._cargar_html_y_esperar(HTML_PRUEBA, 100, 100)
+                        # Una captura fuerza la inicialización del pipeline de pintado
+                        # (si un render real tomó la vista, ese render ya lo hizo)
+                        if not self._precalentamiento_cancelado:
+                            self.web_view.grab()
+                    logger.info("Motor de renderizado HTML precalentado")
+                except Exception as e:
+                    logger.error(f"Error al precalentar el motor de renderizado: {e}", exc_info=True)
+                    self._cambiar_estado(ESTADO_FRIO)
+                    return False
+                self._cambiar_estado(ESTADO_LISTO)
+            
+            if ruta_template is not None and not self._precalentamiento_cancelado:
+                self.precalentar_template(Path(ruta_template), ancho, alto)
+            return True
+        finally:
+            self._precalentando = False
+            self._loop_precalentamiento = None
+    
+    def precalentar_template(self, ruta_template: Path, ancho: int = 637, alto: int = 1013) -> bool:
+        """
+        Carga una vez el template con variables vacías para que el motor
+        cachee sus fuentes, estilos e imágenes
+        
+        Args:
+            ruta_template: Ruta del template HTML
+            ancho: Ancho del template en píxeles
+            alto: Alto del template en píxeles
+            
+        Returns:
+            True si el template se cargó
+        """
+        clave = str(ruta_template)
+        if clave in self._templates_precalentados:
+            return True
+        if not self._inicializado or not ruta_template.exists():
+            return False
+        
+        try:
+            from src.utils.html_parser import detectar_variables_en_html
+            html = ruta_template.read_text(encoding='utf-8')
+            variables = {var: "" for var in detectar_variables_en_html(html)}
+            html = self._inyectar_variables(html, variables)
+            with tracer.span("precalentar_template", "render", template=ruta_template.name):
+                cargado = self._cargar_html_y_esperar(html, ancho, alto, timeout_ms=5000)
+                # Si un render real tomó la vista, la página cargada ya no es la del template
+                cargado = cargado and not self._precalentamiento_cancelado
+                if cargado:
+                    self.web_view.grab()
+            if cargado:
+                self._templates_precalentados.add(clave)
+                logger.info(f"Template precalentado: {ruta_template.name}")
+            return cargado
+        except Exception as e:
+            logger.warning(f"No se pudo precalentar el template {ruta_template}: {e}")
+            return False
+    
+    def _tomar_vista(self) -> bool:
+        """
+        Prepara la vista compartida para un render real. Los renders se piden desde el
+        hilo de la interfaz, así que uno que llega durante un precalentamiento se ejecuta
+        dentro de su bucle de espera: el precalentamiento se cancela (su bucle termina al
+        volver el control y ya no toca la vista) y el render continúa sin esperarlo.
+        
+        Returns:
+            True si la vista está lista para renderizar
+        """
+        if self._precalentando:
+            self._precalentamiento_cancelado = True
+            if self._loop_precalentamiento is not None:
+                self._loop_precalentamiento.quit()
+            if self._inicializado:
+                logger.info("Precalentamiento cancelado por un renderizado")
+                return True
+        if self.estado != ESTADO_LISTO:
+            logger.info("Primer renderizado detectado, precalentando el motor...")
+            return self.precalentar()
+        return True
+    
     def renderizar_html_a_imagen(
         self,
         html_content: str,
@@ -126,74 +387,11 @@ class HTMLRenderer(QObject):
                 logger.error("No hay instancia de QApplication")
                 return None
             
-            # Inicializar widgets reutilizables si no están inicializados
-            es_primer_renderizado = not self._inicializado
-            if not self._inicializado:
-                if not self._inicializar_widgets():
-                    return None
-                
-                # Si es el primer renderizado, hacer un renderizado de prueba para inicializar completamente el widget
-                # Esto es crítico para evitar imágenes en blanco en el primer intento
-                if es_primer_renderizado:
-                    logger.info("Primer renderizado detectado, realizando renderizado de prueba...")
-                    # Esperar un momento para que el widget se inicialice completamente
-                    QTimer.singleShot(500, lambda: None)
-                    QApplication.processEvents()
-                    
-                    # Hacer un renderizado de prueba con HTML simple para inicializar el motor
-                    html_prueba = """
-                    <!DOCTYPE html>
-                    <html>
-                    <head>
-                        <meta charset="UTF-8">
-                        <style>
-                            body { margin: 0; padding: 0; background: white; }
-                            div { width: 100px; height: 100px; background: #f0f0f0; }
-                        </style>
-                    </head>
-                    <body>
-                        <div></div>
-                    </body>
-                    </html>
-                    """
-                    
-                    # Renderizar HTML de prueba en tamaño pequeño
-                    web_view_temp = self.web_view
-                    parent_widget_temp = self.parent_widget
-                    
-                    parent_widget_temp.setFixedSize(100, 100)
-                    web_view_temp.setFixedSize(100, 100)
-                    web_view_temp.setZoomFactor(1.0)
-                    parent_widget_temp.show()
-                    web_view_temp.show()
-                    QApplication.processEvents()
-                    
-                    # Cargar HTML de prueba
-                    loop_prueba = QEventLoop()
-                    cargado_prueba = False
-                    
-                    def on_load_finished_prueba(ok):
-                        nonlocal cargado_prueba
-                        if ok:
-                            cargado_prueba = True
-                        loop_prueba.quit()
-                    
-                    web_view_temp.loadFinished.connect(on_load_finished_prueba)
-                    web_view_temp.setHtml(html_prueba, baseUrl=QUrl("file:///"))
-                    
-                    timer_prueba = QTimer()
-                    timer_prueba.timeout.connect(loop_prueba.quit)
-                    timer_prueba.setSingleShot(True)
-                    timer_prueba.start(3000)
-                    
-                    loop_prueba.exec()
-                    timer_prueba.stop()
-                    
-                    # Esperar un momento adicional después del renderizado de prueba
-                    QTimer.singleShot(500, lambda: None)
-                    QApplication.processEvents()
-                    
-                    logger.info("Renderizado de prueba completado, widget inicializado")
+            # El primer renderizado necesita el motor precalentado (perfil, vista y fuentes).
+            # Normalmente MainController ya lo hizo en segundo plano tras el login.
+            es_primer_renderizado = self.estado != ESTADO_LISTO
+            if not self._tomar_vista():
+                return None
             
             # Reutilizar widgets existentes
             web_view = self.web_view
@@ -230,6 +428,7 @@ class HTMLRenderer(QObject):
             
             # Cargar HTML después de establecer el zoom
             logger.debug(f"Renderizando HTML: widget {ancho_render}x{alto_render}, HTML base {ancho}x{alto}, DPI: {dpi}, zoom: {web_view.zoomFactor()}")
+            tracer.inicio("html_cargar", "render")
             web_view.setHtml(html_content, baseUrl=QUrl("file:///"))
             
             # Esperar a que cargue completamente usando un loop de eventos
@@ -262,6 +461,7 @@ class HTMLRenderer(QObject):
             # Ejecutar loop de eventos
             loop.exec()
             timer.stop()
+            tracer.fin("html_cargar", "render")
             
             # Si no se cargó correctamente, retornar None
             if error_carga:
@@ -277,6 +477,7 @@ class HTMLRenderer(QObject):
             tiempo_espera = 1200 if es_primer_renderizado else 1000
             
             logger.debug(f"Esperando renderizado completo: {iteraciones_espera} iteraciones de {tiempo_espera}ms")
+            tracer.inicio("esperar_render", "render")
             
             for i in range(iteraciones_espera):
                 QApplication.processEvents()
@@ -304,41 +505,21 @@ class HTMLRenderer(QObject):
             # Verificar estabilidad del renderizado comparando dos capturas consecutivas
             # Si las capturas son idénticas, el renderizado está estable
             logger.debug("Verificando estabilidad del renderizado...")
-            captura_anterior = None
+            muestra_anterior = None
             intentos_estabilidad = 0
             max_intentos_estabilidad = 3
             
             while intentos_estabilidad < max_intentos_estabilidad:
                 QApplication.processEvents()
-                captura_actual = web_view.grab()
+                muestra_actual = self._muestra_captura(web_view.grab())
                 
-                if captura_anterior is not None and not captura_anterior.isNull() and not captura_actual.isNull():
-                    # Comparar las dos capturas
-                    img_anterior = captura_anterior.toImage()
-                    img_actual = captura_actual.toImage()
-                    
-                    if img_anterior.size() == img_actual.size():
-                        # Comparar algunos píxeles aleatorios para verificar estabilidad
-                        puntos_muestra = [
-                            (ancho_render // 4, alto_render // 4),
-                            (ancho_render // 2, alto_render // 2),
-                            (3 * ancho_render // 4, 3 * alto_render // 4)
-                        ]
-                        
-                        estable = True
-                        for x, y in puntos_muestra:
-                            if x < img_anterior.width() and y < img_anterior.height():
-                                color_anterior = img_anterior.pixelColor(x, y)
-                                color_actual = img_actual.pixelColor(x, y)
-                                if color_anterior != color_actual:
-                                    estable = False
-                                    break
-                        
-                        if estable:
-                            logger.debug("Renderizado estable detectado")
-                            break
+                # Comparar una cuadrícula de píxeles de las dos capturas
+                if muestra_anterior is not None and muestra_actual is not None:
+                    if son_estables(muestra_anterior, muestra_actual):
+                        logger.debug("Renderizado estable detectado")
+                        break
                 
-                captura_anterior = captura_actual
+                muestra_anterior = muestra_actual
                 intentos_estabilidad += 1
                 
                 if intentos_estabilidad < max_intentos_estabilidad:
@@ -349,12 +530,14 @@ class HTMLRenderer(QObject):
                     QApplication.processEvents()
             
             logger.debug(f"Verificación de estabilidad completada después de {intentos_estabilidad + 1} intentos")
+            tracer.fin("esperar_render", "render")
             
             # Capturar imagen con verificación de que no esté en blanco
             # Aumentar número de intentos para dar más oportunidades
             max_intentos = 5
             imagen = None
             
+            tracer.inicio("grab", "render")
             for intento in range(max_intentos):
                 QApplication.processEvents()
                 
@@ -376,31 +559,11 @@ class HTMLRenderer(QObject):
                     continue
                 
                 # Verificar que la imagen no esté completamente en blanco
-                qimage_temp = imagen.toImage()
-                if not qimage_temp.isNull():
-                    # Verificar más píxeles distribuidos por toda la imagen para asegurar que tenga contenido
-                    puntos_verificacion = [
-                        (10, 10),
-                        (ancho_render // 4, alto_render // 4),
-                        (ancho_render // 2, alto_render // 2),
-                        (3 * ancho_render // 4, 3 * alto_render // 4),
-                        (max(10, ancho_render - 10), max(10, alto_render - 10))
-                    ]
-                    
-                    sample_pixels = []
-                    for x, y in puntos_verificacion:
-                        if x < qimage_temp.width() and y < qimage_temp.height():
-                            pixel = qimage_temp.pixelColor(x, y)
-                            if pixel.isValid():
-                                sample_pixels.append(pixel)
+                muestra = self._muestra_captura(imagen)
+                if muestra is not None:
+                    en_blanco = fraccion_contenido(muestra) < FRACCION_CONTENIDO_MINIMA
                     
-                    # Verificar que no todos los píxeles sean blancos
-                    all_white = len(sample_pixels) > 0 and all(
-                        p.red() >= 250 and p.green() >= 250 and p.blue() >= 250 
-                        for p in sample_pixels
-                    )
-                    
-                    if all_white and ancho_render > 100 and alto_render > 100:
+                    if en_blanco and ancho_render > 100 and alto_render > 100:
                         logger.warning(f"Captura {intento + 1} parece estar en blanco, reintentando...")
                         if intento < max_intentos - 1:
                             # Esperar más tiempo entre reintentos, especialmente en los primeros intentos
@@ -419,22 +582,10 @@ class HTMLRenderer(QObject):
                         # Hacer una segunda captura rápida para verificar estabilidad
                         QTimer.singleShot(300, lambda: None)
                         QApplication.processEvents()
-                        imagen_verificacion = web_view.grab()
+                        muestra_verificacion = self._muestra_captura(web_view.grab())
                         
-                        if not imagen_verificacion.isNull():
-                            # Comparar algunos píxeles clave entre las dos capturas
-                            img_verif = imagen_verificacion.toImage()
-                            estable = True
-                            
-                            for x, y in puntos_verificacion[:3]:  # Solo verificar 3 puntos para velocidad
-                                if x < qimage_temp.width() and y < qimage_temp.height() and x < img_verif.width() and y < img_verif.height():
-                                    color1 = qimage_temp.pixelColor(x, y)
-                                    color2 = img_verif.pixelColor(x, y)
-                                    if color1 != color2:
-                                        estable = False
-                                        break
-                            
-                            if estable:
+                        if muestra_verificacion is not None:
+                            if son_estables(muestra, muestra_verificacion):
                                 logger.debug("Imagen estable confirmada")
                                 break
                             else:
@@ -452,6 +603,7 @@ class HTMLRenderer(QObject):
                         QTimer.singleShot(800, lambda: None)
                         QApplication.processEvents()
                         continue
+            tracer.fin("grab", "render")
             
             if imagen is None or imagen.isNull():
                 logger.error("No se pudo capturar la imagen del QWebEngineView después de múltiples intentos")
@@ -461,6 +613,8 @@ class HTMLRenderer(QObject):
             
             # Convertir QPixmap a QImage
             qimage = imagen.toImage()
+            # El QPixmap ya no se necesita: liberarlo antes de convertir
+            imagen = None
             
             if qimage.isNull():
                 logger.warning("La QImage es nula")
@@ -488,35 +642,14 @@ class HTMLRenderer(QObject):
                 logger.warning(f"Dimensiones inválidas: {width}x{height}")
                 return None
             
-            ptr = qimage.bits()
-            if ptr is None:
+            # El reescalado (si hizo falta) trabaja en 32 bits; qimage_a_pil pasa después
+            # a RGB888 en su sitio, una sola conversión sobre la imagen ya a su tamaño final
+            with tracer.span("convertir_qimage", "render"):
+                pil_image = qimage_a_pil(qimage)
+            del qimage
+            if pil_image is None:
                 logger.warning("No se pudo obtener los bits de la imagen")
                 return None
-                
-            ptr.setsize(qimage.sizeInBytes())
-            arr = ptr.asarray(width * height * 4)
-            
-            # Convertir RGBA a RGB usando frombytes (más compatible)
-            try:
-                # Convertir array a bytes
-                if hasattr(arr, 'tobytes'):
-                    arr_bytes = arr.tobytes()
-                else:
-                    arr_bytes = bytes(arr)
-                
-                pil_image = Image.frombytes(
-                    "RGBA", (width, height), arr_bytes, "raw", "BGRA", 0, 1
-                ).convert("RGB")
-            except Exception as e:
-                logger.warning(f"Error al convertir con frombytes, usando fallback: {e}")
-                # Fallback para versiones antiguas de PIL
-                try:
-                    pil_image = Image.frombuffer(
-                        "RGBA", (width, height), arr, "raw", "BGRA", 0, 1
-                    ).convert("RGB")
-                except Exception as e2:
-                    logger.error(f"Error al convertir imagen: {e2}")
-                    return None
             
             # La imagen ya está renderizada a la resolución correcta usando zoom nativo
             logger.debug(f"HTML renderizado exitosamente: {pil_image.size[0]}x{pil_image.size[1]} píxeles a {dpi} DPI")
@@ -562,53 +695,220 @@ class HTMLRenderer(QObject):
             logger.error(f"Error al renderizar HTML desde archivo: {e}")
             return None
     
-    def _inyectar_variables(self, html: str, variables: Dict[str, Any]) -> str:
+    def renderizar_html_a_pdf(
+        self,
+        html_content: str,
+        ruta_pdf: Path,
+        ancho: int,
+        alto: int,
+        timeout_ms: int = 10000
+    ) -> bool:
         """
-        Inyecta variables en el HTML usando sintaxis {{variable}}
+        Genera un PDF vectorial del HTML con QWebEnginePage.printToPdf
+        
+        La página mide lo mismo que el template (54x85.6 mm para el tamaño por defecto),
+        el texto queda como texto y las imágenes se incrustan sin rasterizar el carnet,
+        por lo que el coste no depende del DPI.
         
         Args:
-            html: Contenido HTML
-            variables: Diccionario con variables
+            html_content: Contenido HTML con las variables ya inyectadas
+            ruta_pdf: Ruta del PDF de salida
+            ancho: Ancho del template en píxeles (a 300 DPI)
+            alto: Alto del template en píxeles (a 300 DPI)
+            timeout_ms: Tiempo máximo de espera de la carga y de la impresión
             
         Returns:
-            HTML con variables reemplazadas
+            True si el PDF se generó correctamente
+        """
+        from PyQt6.QtWidgets import QApplication
+        from PyQt6.QtCore import QMarginsF, QSizeF
+        from PyQt6.QtGui import QPageLayout, QPageSize
+        
+        try:
+            if QApplication.instance() is None:
+                logger.error("No hay instancia de QApplication")
+                return False
+            
+            if not self._tomar_vista():
+                return False
+            
+            ancho_mm = ancho * MM_POR_PULGADA / DPI_TEMPLATE
+            alto_mm = alto * MM_POR_PULGADA / DPI_TEMPLATE
+            estilo = ESTILO_IMPRESION.format(
+                ancho_mm=ancho_mm, alto_mm=alto_mm, zoom=PX_CSS_POR_PULGADA / DPI_TEMPLATE
+            )
+            if "</head>" in html_content:
+                html_impresion = html_content.replace("</head>", f"{estilo}</head>", 1)
+            else:
+                html_impresion = estilo + html_content
+            
+            with tracer.span("html_cargar", "render"):
+                if not self._cargar_html_y_esperar(html_impresion, ancho, alto, timeout_ms):
+                    logger.warning("El HTML no se cargó correctamente para imprimir a PDF")
+                    return False
+            
+            layout = QPageLayout(
+                QPageSize(QSizeF(ancho_mm, alto_mm), QPageSize.Unit.Millimeter, "carnet"),
+                QPageLayout.Orientation.Portrait,
+                QMarginsF(0, 0, 0, 0),
+                QPageLayout.Unit.Millimeter
+            )
+            
+            page = self.web_view.page()
+            loop = QEventLoop()
+            resultado = {"ok": False}
+            
+            def on_pdf_terminado(ruta, ok):
+                resultado["ok"] = ok
+                loop.quit()
+            
+            page.pdfPrintingFinished.connect(on_pdf_terminado)
+            timer = QTimer()
+            timer.timeout.connect(loop.quit)
+            timer.setSingleShot(True)
+            timer.start(timeout_ms)
+            
+            with tracer.span("print_to_pdf", "render"):
+                page.printToPdf(str(ruta_pdf), layout)
+                loop.exec()
+            timer.stop()
+            
+            try:
+                page.pdfPrintingFinished.disconnect(on_pdf_terminado)
+            except (TypeError, RuntimeError):
+                pass
+            
+            ruta_pdf = Path(ruta_pdf)
+            if not resultado["ok"] or not ruta_pdf.exists() or ruta_pdf.stat().st_size == 0:
+                logger.warning(f"printToPdf no generó el PDF {ruta_pdf.name}")
+                return False
+            
+            logger.debug(f"PDF vectorial generado: {ruta_pdf.name} ({ancho_mm:.1f}x{alto_mm:.1f} mm)")
+            return True
+        except Exception as e:
+            logger.error(f"Error al imprimir HTML a PDF: {e}", exc_info=True)
+            return False
+    
+    def generar_pdf(
+        self,
+        html_content: str,
+        ruta_pdf: Path,
+        ancho: int,
+        alto: int,
+        dpi: int = 1200
+    ) -> bool:
+        """
+        Genera el PDF de un template HTML con el motor configurado (HTML_PDF_ENGINE).
+        Con el motor vectorial, si printToPdf falla se recurre al render raster.
+        
+        Args:
+            html_content: Contenido HTML con las variables ya inyectadas
+            ruta_pdf: Ruta del PDF de salida
+            ancho: Ancho del template en píxeles (a 300 DPI)
+            alto: Alto del template en píxeles (a 300 DPI)
+            dpi: DPI del render raster
+            
+        Returns:
+            True si el PDF se generó correctamente
+        """
+        if HTML_PDF_ENGINE == MOTOR_PDF_VECTORIAL:
+            if self.renderizar_html_a_pdf(html_content, ruta_pdf, ancho, alto):
+                return True
+            logger.warning("No se pudo generar el PDF vectorial, se usa el render raster")
+        
+        imagen = self.renderizar_html_a_imagen(html_content, ancho, alto, dpi)
+        if imagen is None:
+            return False
+        
+        try:
+            with tracer.span("codificar_pdf", "render"):
+                if imagen.mode != 'RGB':
+                    imagen = imagen.convert('RGB')
+                imagen.save(ruta_pdf, "PDF", resolution=float(dpi), quality=100)
+            return True
+        except Exception as e:
+            logger.error(f"Error al guardar el PDF raster: {e}")
+            return False
+    
+    @staticmethod
+    def _muestra_captura(captura) -> Optional[np.ndarray]:
+        """
+        Obtiene una cuadrícula de píxeles de una captura, leída directamente del
+        buffer de la QImage (sin copiar la captura completa)
+
+        Args:
+            captura: QPixmap obtenido con grab()
+
+        Returns:
+            Muestra BGRA de como mucho 256 x 256 píxeles, o None si la captura es nula
+        """
+        if captura is None or captura.isNull():
+            return None
+        qimage = captura.toImage()
+        if qimage.isNull():
+            return None
+        if qimage.depth() != 32:
+            qimage = qimage.convertToFormat(QImage.Format.Format_RGB32)
+        bits = qimage.constBits()
+        if bits is None:
+            return None
+        bits.setsize(qimage.sizeInBytes())
+        vista = array_desde_buffer(bits, qimage.width(), qimage.height(), qimage.bytesPerLine())
+        # Copia solo la muestra: la QImage se libera al salir
+        return muestrear_array(vista).copy()
+
+    def preparar_valores(self, variables: Dict[str, Any]) -> Dict[str, str]:
         """
-        import html as html_escape
+        Convierte las variables de un template en los textos que se inyectan: las rutas
+        de imagen pasan a data URI en base64 y las imágenes vacías a un píxel transparente
         
-        # Reemplazar variables {{variable}}
+        Args:
+            variables: Diccionario con variables
+            
+        Returns:
+            Diccionario variable -> valor sin escapar
+        """
+        valores = {}
         for key, value in variables.items():
-            placeholder = f"{{{{{key}}}}}"
             if value is None:
                 value = ""
             elif isinstance(value, Path):
                 # Si es una ruta de imagen, convertir a base64
-                if value.exists() and value.suffix.lower() in ['.png', '.jpg', '.jpeg', '.gif']:
+                if value.exists() and value.suffix.lower() in ['.png', '.jpg', '.jpeg', '.gif', '.svg']:
+                    if key == "foto":
+                        # Foto orientada y reducida una sola vez, no la original de la cámara
+                        value = normalizar_foto(value, lado_maximo=PHOTO_HTML_MAX_PX)
                     value = self._imagen_a_base64(value)
                 else:
                     # Si no existe, usar placeholder transparente para evitar errores
-                    value = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+                    value = PIXEL_TRANSPARENTE
             else:
                 value = str(value)
             
             # Para atributos src de imágenes, usar placeholder si está vacío
-            if key in ["foto", "codigo_barras", "logo"] and not value:
-                value = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
-            
-            # Escapar HTML para evitar problemas con JavaScript
-            # Pero no escapar si es una URL de imagen base64
-            if value.startswith("data:image"):
-                # Es una imagen base64, no escapar
-                html = html.replace(placeholder, value)
-            else:
-                # Escapar caracteres especiales HTML
-                value_escaped = html_escape.escape(value)
-                html = html.replace(placeholder, value_escaped)
+            if key in VARIABLES_IMAGEN and not value:
+                value = PIXEL_TRANSPARENTE
+            valores[key] = value
+        return valores
+    
+    def _inyectar_variables(self, html: str, variables: Dict[str, Any]) -> str:
+        """
+        Inyecta variables en el HTML usando sintaxis {{variable}}
         
-        return html
+        Args:
+            html: Contenido HTML
+            variables: Diccionario con variables
+            
+        Returns:
+            HTML con variables reemplazadas
+        """
+        return inyectar_valores(html, self.preparar_valores(variables))
     
     def _imagen_a_base64(self, ruta_imagen: Path) -> str:
         """
-        Convierte una imagen a base64 para usar en HTML
+        Convierte una imagen a base64 para usar en HTML. El resultado se memoriza por
+        ruta, fecha de modificación y tamaño: el logo o el fondo comunes a todos los
+        carnets se codifican una sola vez.
         
         Args:
             ruta_imagen: Ruta a la imagen
@@ -617,15 +917,43 @@ class HTMLRenderer(QObject):
             String base64 de la imagen
         """
         try:
-            import base64
+            estado = ruta_imagen.stat()
+            clave = (str(ruta_imagen), estado.st_mtime_ns, estado.st_size)
+            if clave in self._cache_base64:
+                self._cache_base64.move_to_end(clave)
+                return self._cache_base64[clave]
+            
             with open(ruta_imagen, 'rb') as f:
                 imagen_bytes = f.read()
                 base64_str = base64.b64encode(imagen_bytes).decode('utf-8')
                 extension = ruta_imagen.suffix.lower().replace('.', '')
                 if extension == 'jpg':
                     extension = 'jpeg'
-                return f"data:image/{extension};base64,{base64_str}"
+                elif extension == 'svg':
+                    # Imagen vectorial (códigos de barras): el motor web la dibuja al DPI de salida
+                    extension = 'svg+xml'
+            data_uri = f"data:image/{extension};base64,{base64_str}"
+            self._cache_base64[clave] = data_uri
+            if len(self._cache_base64) > MAX_IMAGENES_BASE64:
+                self._cache_base64.popitem(last=False)
+            return data_uri
         except Exception as e:
             logger.error(f"Error al convertir imagen a base64: {e}")
             return ""
 
+
+# Instancia compartida: el motor web y la vista reutilizable se precalientan una sola vez
+_renderer_compartido: Optional[HTMLRenderer] = None
+
+
+def obtener_html_renderer() -> HTMLRenderer:
+    """
+    Obtiene el renderizador HTML compartido por la aplicación
+    
+    Returns:
+        Instancia única de HTMLRenderer
+    """
+    global _renderer_compartido
+    if _renderer_compartido is None:
+        _renderer_compartido = HTMLRenderer()
+    return _renderer_compartido
@@ -0,0 +1,600 @@
+"""
+Almacén de imágenes de códigos de barras
+
+ImageStore reparte los PNG en subdirectorios según el prefijo del hash de su
+nombre (p. ej. codigos_generados/3f/Juan Pérez_ABC123.png) para que ningún
+directorio acumule cientos de miles de archivos. PackedImageStore guarda todas
+las imágenes como BLOBs en un único archivo SQLite. En ambos casos la base de
+datos sigue guardando solo el nombre del archivo.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from config.settings import (
+    IMAGES_DIR, IMAGE_SHARD_DEPTH, IMAGE_STORE_BACKEND,
+    IMAGE_PACK_PATH, IMAGE_PACK_CACHE_DIR, IMAGE_PACK_CACHE_MAX_MB, IMAGE_PACK_MMAP_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+# Caracteres hexadecimales por nivel de subdirectorio
+ANCHO_NIVEL = 2
+
+# Extensión de las imágenes gestionadas por el almacén
+EXTENSION_IMAGEN = ".png"
+
+# Hilos usados para borrar archivos en paralelo
+MAX_HILOS_ELIMINAR = 8
+
+# Subcarpeta de la caché del pack donde se escriben las imágenes antes de guardar()
+DIRECTORIO_PENDIENTES = ".pendientes"
+
+# Al superar el límite de la caché del pack se expulsa hasta quedar en esta fracción
+FRACCION_TRAS_EXPULSION = 0.9
+
+
+class ImageStore:
+    """Almacén de imágenes en subdirectorios por prefijo de hash"""
+
+    def __init__(self, directorio: Optional[Path] = None, niveles: int = IMAGE_SHARD_DEPTH):
+        """
+        Inicializa el almacén
+
+        Args:
+            directorio: Directorio raíz de las imágenes (por defecto IMAGES_DIR)
+            niveles: Niveles de subdirectorios (0 = sin subdirectorios)
+        """
+        self.directorio = Path(directorio or IMAGES_DIR)
+        self.niveles = max(0, niveles)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+
+    def _subdirectorio(self, nombre_archivo: str) -> Path:
+        """
+        Subdirectorio que corresponde a un nombre de archivo
+
+        Args:
+            nombre_archivo: Nombre del archivo (tal como se guarda en la BD)
+
+        Returns:
+            Path del subdirectorio (o el directorio raíz si niveles es 0)
+        """
+        if not self.niveles:
+            return self.directorio
+        resumen = hashlib.sha1(nombre_archivo.encode("utf-8")).hexdigest()
+        partes = [resumen[i * ANCHO_NIVEL:(i + 1) * ANCHO_NIVEL] for i in range(self.niveles)]
+        return self.directorio.joinpath(*partes)
+
+    def ruta_destino(self, nombre_archivo: str) -> Path:
+        """
+        Ruta donde debe escribirse una imagen nueva (crea el subdirectorio)
+
+        Args:
+            nombre_archivo: Nombre del archivo
+
+        Returns:
+            Path completo de escritura
+        """
+        subdirectorio = self._subdirectorio(nombre_archivo)
+        subdirectorio.mkdir(parents=True, exist_ok=True)
+        return subdirectorio / nombre_archivo
+
+    def ruta(self, nombre_archivo: str) -> Path:
+        """
+        Ruta de lectura de una imagen. Si aún no se migró, devuelve la
+        ubicación antigua en el directorio raíz.
+
+        Args:
+            nombre_archivo: Nombre del archivo (tal como se guarda en la BD)
+
+        Returns:
+            Path de la imagen (puede no existir)
+        """
+        ruta = self._subdirectorio(nombre_archivo) / nombre_archivo
+        if self.niveles and not ruta.exists():
+            ruta_plana = self.directorio / nombre_archivo
+            if ruta_plana.exists():
+                return ruta_plana
+        return ruta
+
+    def guardar(self, nombre_archivo: str, ruta_origen: Path) -> bool:
+        """
+        Confirma una imagen escrita en ruta_destino(). En este backend el
+        archivo ya está en su lugar, así que solo se comprueba que exista.
+
+        Args:
+            nombre_archivo: Nombre del archivo
+            ruta_origen: Archivo escrito
+
+        Returns:
+            True si la imagen quedó almacenada
+        """
+        return Path(ruta_origen).exists()
+
+    def leer_bytes(self, nombre_archivo: str) -> Optional[bytes]:
+        """
+        Lee el contenido de una imagen
+
+        Args:
+            nombre_archivo: Nombre del archivo
+
+        Returns:
+            Bytes del PNG o None si no existe
+        """
+        try:
+            return self.ruta(nombre_archivo).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def existe(self, nombre_archivo: str) -> bool:
+        """
+        Indica si la imagen existe
+
+        Args:
+            nombre_archivo: Nombre del archivo
+
+        Returns:
+            True si existe en el almacén
+        """
+        return bool(nombre_archivo) and self.ruta(nombre_archivo).exists()
+
+    def eliminar(self, nombre_archivo: str) -> bool:
+        """
+        Elimina una imagen del almacén
+
+        Args:
+            nombre_archivo: Nombre del archivo
+
+        Returns:
+            True si se eliminó, False si no existía
+        """
+        try:
+            self.ruta(nombre_archivo).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def eliminar_varios(self, nombres_archivo: Iterable[str]) -> int:
+        """
+        Elimina varias imágenes usando varios hilos
+
+        Args:
+            nombres_archivo: Nombres de los archivos
+
+        Returns:
+            Número de imágenes eliminadas
+        """
+        return len(self.eliminar_conjunto(nombres_archivo))
+
+    def eliminar_conjunto(self, nombres_archivo: Iterable[str]) -> Set[str]:
+        """
+        Elimina varias imágenes usando varios hilos
+
+        Args:
+            nombres_archivo: Nombres de los archivos
+
+        Returns:
+            Conjunto de nombres que se eliminaron
+        """
+        nombres = list({nombre for nombre in nombres_archivo if nombre})
+        if not nombres:
+            return set()
+
+        def eliminar(nombre_archivo: str) -> bool:
+            try:
+                return self.eliminar(nombre_archivo)
+            except OSError as e:
+                logger.warning(f"No se pudo eliminar la imagen {nombre_archivo}: {e}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=min(MAX_HILOS_ELIMINAR, len(nombres))) as executor:
+            return {nombre for nombre, eliminada in zip(nombres, executor.map(eliminar, nombres)) if eliminada}
+
+    def nombres(self) -> Set[str]:
+        """
+        Nombres de todas las imágenes del almacén
+
+        Returns:
+            Conjunto de nombres de archivo
+        """
+        return set(self.listar())
+
+    def listar(self) -> Dict[str, Path]:
+        """
+        Lista todas las imágenes del almacén (subdirectorios y ubicación antigua)
+
+        Returns:
+            Diccionario {nombre_archivo: ruta}
+        """
+        imagenes: Dict[str, Path] = {}
+        pendientes = [(self.directorio, 0)]
+        while pendientes:
+            directorio, nivel = pendientes.pop()
+            try:
+                entradas = os.scandir(directorio)
+            except FileNotFoundError:
+                continue
+            with entradas:
+                for entrada in entradas:
+                    if entrada.is_dir(follow_symlinks=False):
+                        if nivel < self.niveles and len(entrada.name) == ANCHO_NIVEL:
+                            pendientes.append((Path(entrada.path), nivel + 1))
+                    elif entrada.name.lower().endswith(EXTENSION_IMAGEN):
+                        imagenes[entrada.name] = Path(entrada.path)
+        return imagenes
+
+    def migrar(self) -> Tuple[int, int]:
+        """
+        Mueve las imágenes del directorio raíz a su subdirectorio (migración única)
+
+        Returns:
+            Tupla con (imagenes_movidas, errores)
+        """
+        if not self.niveles:
+            return 0, 0
+
+        movidas = 0
+        errores = 0
+        with os.scandir(self.directorio) as entradas:
+            planas = [
+                entrada.name for entrada in entradas
+                if entrada.is_file() and entrada.name.lower().endswith(EXTENSION_IMAGEN)
+            ]
+
+        for nombre_archivo in planas:
+            destino = self.ruta_destino(nombre_archivo)
+            try:
+                os.replace(self.directorio / nombre_archivo, destino)
+                movidas += 1
+            except OSError as e:
+                errores += 1
+                logger.error(f"No se pudo migrar la imagen {nombre_archivo}: {e}")
+
+        logger.info(f"Migración del almacén de imágenes: {movidas} movidas, {errores} errores")
+        return movidas, errores
+
+
+class PackedImageStore:
+    """
+    Almacén de imágenes en un único archivo SQLite (tabla de BLOBs)
+
+    Las lecturas usan E/S incremental de BLOBs sobre una conexión con mmap.
+    Quien necesita una ruta (PIL, Qt, plantillas HTML) recibe una copia
+    materializada en IMAGE_PACK_CACHE_DIR; esa caché está limitada a
+    IMAGE_PACK_CACHE_MAX_MB y expulsa las copias usadas hace más tiempo. Las
+    imágenes que aún están como archivos sueltos se siguen sirviendo desde el
+    almacén de archivos hasta migrarlas con migrar().
+    """
+
+    def __init__(
+        self,
+        ruta_pack: Optional[Path] = None,
+        directorio_cache: Optional[Path] = None,
+        respaldo: Optional[ImageStore] = None,
+        max_mb_cache: int = IMAGE_PACK_CACHE_MAX_MB
+    ):
+        """
+        Inicializa el almacén empaquetado
+
+        Args:
+            ruta_pack: Archivo SQLite del pack (por defecto IMAGE_PACK_PATH)
+            directorio_cache: Carpeta de copias materializadas (por defecto IMAGE_PACK_CACHE_DIR)
+            respaldo: Almacén de archivos con las imágenes aún no migradas
+            max_mb_cache: Tamaño máximo de las copias materializadas en MB
+        """
+        self.ruta_pack = Path(ruta_pack or IMAGE_PACK_PATH)
+        self.cache = ImageStore(directorio_cache or IMAGE_PACK_CACHE_DIR)
+        self.respaldo = respaldo or ImageStore()
+        self.max_bytes_cache = max(0, max_mb_cache) * 1024 * 1024
+        self._lock = threading.Lock()
+
+        # Copias materializadas de la más antigua a la más reciente: {nombre: bytes}
+        self._lock_cache = threading.Lock()
+        self._materializadas: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes_materializados = 0
+        self._indexar_cache()
+
+        self.ruta_pack.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.ruta_pack), timeout=10.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA mmap_size={int(IMAGE_PACK_MMAP_SIZE)}")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS imagenes (
+                nombre TEXT PRIMARY KEY,
+                datos BLOB NOT NULL,
+                tamano INTEGER NOT NULL,
+                fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self._conn.commit()
+
+    def _leer_pack(self, nombre_archivo: str) -> Optional[bytes]:
+        """Lee un BLOB del pack (None si no está)"""
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT rowid FROM imagenes WHERE nombre = ?", (nombre_archivo,)
+            ).fetchone()
+            if fila is None:
+                return None
+            if hasattr(self._conn, "blobopen"):  # Python 3.11+
+                with self._conn.blobopen("imagenes", "datos", fila[0], readonly=True) as blob:
+                    return blob.read()
+            return self._conn.execute(
+                "SELECT datos FROM imagenes WHERE rowid = ?", (fila[0],)
+            ).fetchone()[0]
+
+    def _escribir_pack(self, nombre_archivo: str, datos: bytes) -> None:
+        """Inserta o reemplaza un BLOB en el pack"""
+        with self._lock:
+            if hasattr(self._conn, "blobopen"):
+                cursor = self._conn.execute(
+                    "INSERT OR REPLACE INTO imagenes (nombre, datos, tamano) VALUES (?, zeroblob(?), ?)",
+                    (nombre_archivo, len(datos), len(datos))
+                )
+                with self._conn.blobopen("imagenes", "datos", cursor.lastrowid) as blob:
+                    blob.write(datos)
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO imagenes (nombre, datos, tamano) VALUES (?, ?, ?)",
+                    (nombre_archivo, sqlite3.Binary(datos), len(datos))
+                )
+            self._conn.commit()
+
+    def _indexar_cache(self) -> None:
+        """Registra las copias materializadas de sesiones anteriores y aplica el límite"""
+        pendientes = self.cache.directorio / DIRECTORIO_PENDIENTES
+        if pendientes.is_dir():
+            for archivo in pendientes.iterdir():
+                try:
+                    archivo.unlink()
+                except OSError:
+                    pass
+
+        copias = []
+        for nombre_archivo, ruta in self.cache.listar().items():
+            try:
+                estado = ruta.stat()
+            except OSError:
+                continue
+            copias.append((estado.st_mtime, nombre_archivo, estado.st_size))
+
+        with self._lock_cache:
+            for _, nombre_archivo, tamano in sorted(copias):
+                self._materializadas[nombre_archivo] = tamano
+                self._bytes_materializados += tamano
+            self._expulsar_si_excede()
+
+    def _expulsar_si_excede(self) -> None:
+        """Borra las copias menos usadas hasta quedar bajo el límite (con _lock_cache tomado)"""
+        if self._bytes_materializados <= self.max_bytes_cache:
+            return
+        objetivo = int(self.max_bytes_cache * FRACCION_TRAS_EXPULSION)
+        # La copia más reciente se conserva: su ruta se acaba de devolver
+        while self._bytes_materializados > objetivo and len(self._materializadas) > 1:
+            nombre_archivo, tamano = self._materializadas.popitem(last=False)
+            self._bytes_materializados -= tamano
+            try:
+                self.cache.eliminar(nombre_archivo)
+            except OSError as e:
+                logger.warning(f"No se pudo expulsar la copia de {nombre_archivo}: {e}")
+
+    def _olvidar_copias(self, nombres: Iterable[str]) -> None:
+        """Borra las copias materializadas de varias imágenes y las quita del índice"""
+        with self._lock_cache:
+            for nombre_archivo in nombres:
+                self._bytes_materializados -= self._materializadas.pop(nombre_archivo, 0)
+        self.cache.eliminar_varios(nombres)
+
+    def ruta_destino(self, nombre_archivo: str) -> Path:
+        """
+        Ruta temporal donde escribir una imagen nueva; se incorpora al pack con guardar()
+
+        Args:
+            nombre_archivo: Nombre del archivo
+
+        Returns:
+            Path de escritura (en la carpeta de pendientes de la caché)
+        """
+        pendientes = self.cache.directorio / DIRECTORIO_PENDIENTES
+        pendientes.mkdir(parents=True, exist_ok=True)
+        return pendientes / nombre_archivo
+
+    def guardar(self, nombre_archivo: str, ruta_origen: Path) -> bool:
+        """
+        Incorpora al pack una imagen escrita en disco y borra el archivo escrito.
+        La copia materializada anterior, si la había, se descarta.
+
+        Args:
+            nombre_archivo: Nombre del archivo
+            ruta_origen: Archivo escrito
+
+        Returns:
+            True si la imagen quedó almacenada
+        """
+        ruta_origen = Path(ruta_origen)
+        try:
+            self._escribir_pack(nombre_archivo, ruta_origen.read_bytes())
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"No se pudo guardar la imagen {nombre_archivo} en el pack: {e}")
+            return False
+
+        self._olvidar_copias([nombre_archivo])
+        try:
+            ruta_origen.unlink()
+        except OSError:
+            pass
+        return True
+
+    def leer_bytes(self, nombre_archivo: str) -> Optional[bytes]:
+        """
+        Lee el contenido de una imagen (pack o, si no está, archivo suelto)
+
+        Args:
+            nombre_archivo: Nombre del archivo
+
+        Returns:
+            Bytes del PNG o None si no existe
+        """
+        datos = self._leer_pack(nombre_archivo)
+        if datos is None:
+            datos = self.respaldo.leer_bytes(nombre_archivo)
+        return datos
+
+    def ruta(self, nombre_archivo: str) -> Path:
+        """
+        Ruta de lectura de una imagen, materializándola desde el pack si hace falta
+
+        Args:
+            nombre_archivo: Nombre del archivo
+
+        Returns:
+            Path de la imagen (puede no existir)
+        """
+        ruta_cache = self.cache.ruta(nombre_archivo)
+        with self._lock_cache:
+            if nombre_archivo in self._materializadas:
+                if ruta_cache.exists():
+                    self._materializadas.move_to_end(nombre_archivo)
+                    return ruta_cache
+                self._bytes_materializados -= self._materializadas.pop(nombre_archivo)
+
+        datos = self._leer_pack(nombre_archivo)
+        if datos is None:
+            return self.respaldo.ruta(nombre_archivo)
+
+        ruta_cache = self.cache.ruta_destino(nombre_archivo)
+        ruta_temporal = ruta_cache.with_name(f".{ruta_cache.name}.{threading.get_ident()}.tmp")
+        ruta_temporal.write_bytes(datos)
+        os.replace(ruta_temporal, ruta_cache)
+
+        with self._lock_cache:
+            self._bytes_materializados += len(datos) - self._materializadas.pop(nombre_archivo, 0)
+            self._materializadas[nombre_archivo] = len(datos)
+            self._expulsar_si_excede()
+        return ruta_cache
+
+    def existe(self, nombre_archivo: str) -> bool:
+        """
+        Indica si la imagen existe en el pack o como archivo suelto
+
+        Args:
+            nombre_archivo: Nombre del archivo
+
+        Returns:
+            True si existe
+        """
+        if not nombre_archivo:
+            return False
+        with self._lock:
+            en_pack = self._conn.execute(
+                "SELECT 1 FROM imagenes WHERE nombre = ? LIMIT 1", (nombre_archivo,)
+            ).fetchone() is not None
+        return en_pack or self.respaldo.existe(nombre_archivo)
+
+    def eliminar(self, nombre_archivo: str) -> bool:
+        """
+        Elimina una imagen (pack, copia materializada y archivo suelto)
+
+        Args:
+            nombre_archivo: Nombre del archivo
+
+        Returns:
+            True si se eliminó de alguna ubicación
+        """
+        return self.eliminar_varios([nombre_archivo]) > 0
+
+    def eliminar_varios(self, nombres_archivo: Iterable[str]) -> int:
+        """
+        Elimina varias imágenes con una sola transacción sobre el pack
+
+        Args:
+            nombres_archivo: Nombres de los archivos
+
+        Returns:
+            Número de imágenes eliminadas (cada nombre cuenta una vez aunque
+            estuviera a la vez en el pack y como archivo suelto)
+        """
+        nombres = list({nombre for nombre in nombres_archivo if nombre})
+        if not nombres:
+            return 0
+
+        eliminadas: Set[str] = set()
+        with self._lock:
+            for nombre_archivo in nombres:
+                cursor = self._conn.execute("DELETE FROM imagenes WHERE nombre = ?", (nombre_archivo,))
+                if cursor.rowcount:
+                    eliminadas.add(nombre_archivo)
+            self._conn.commit()
+
+        self._olvidar_copias(nombres)
+        eliminadas |= self.respaldo.eliminar_conjunto(nombres)
+        return len(eliminadas)
+
+    def nombres(self) -> Set[str]:
+        """
+        Nombres de todas las imágenes (pack y archivos sueltos)
+
+        Returns:
+            Conjunto de nombres de archivo
+        """
+        with self._lock:
+            en_pack = {fila[0] for fila in self._conn.execute("SELECT nombre FROM imagenes")}
+        return en_pack | self.respaldo.nombres()
+
+    def migrar(self) -> Tuple[int, int]:
+        """
+        Incorpora al pack los archivos sueltos del almacén de archivos y los elimina
+
+        Returns:
+            Tupla con (imagenes_movidas, errores)
+        """
+        movidas = 0
+        errores = 0
+        for nombre_archivo, ruta in self.respaldo.listar().items():
+            try:
+                self._escribir_pack(nombre_archivo, ruta.read_bytes())
+                ruta.unlink()
+                movidas += 1
+            except (OSError, sqlite3.Error) as e:
+                errores += 1
+                logger.error(f"No se pudo migrar la imagen {nombre_archivo} al pack: {e}")
+
+        logger.info(f"Migración al pack de imágenes: {movidas} movidas, {errores} errores")
+        return movidas, errores
+
+
+# Almacén compartido por la aplicación (se crea al primer uso)
+_store_compartido = None
+_lock_store = threading.Lock()
+
+
+def obtener_image_store():
+    """
+    Obtiene el almacén de imágenes compartido por la aplicación
+
+    Returns:
+        PackedImageStore si IMAGE_STORE_BACKEND es "pack", ImageStore sobre IMAGES_DIR en otro caso
+    """
+    global _store_compartido
+    with _lock_store:
+        if _store_compartido is None:
+            if IMAGE_STORE_BACKEND == "pack":
+                _store_compartido = PackedImageStore()
+            else:
+                _store_compartido = ImageStore()
+        return _store_compartido
+
+
+if __name__ == "__main__":
+    # Migración única al backend configurado: python -m src.services.image_store
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    movidas, errores = obtener_image_store().migrar()
+    print(f"Imágenes movidas: {movidas} - Errores: {errores}")
+    sys.exit(1 if errores else 0)
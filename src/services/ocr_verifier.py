@@ -4,34 +4,19 @@ Usa Tesseract OCR para verificar que el contenido de los carnets sea correcto
 """
 import logging
 import os
+import threading
 from pathlib import Path
 from typing import Optional, Dict, List, Tuple
 from PIL import Image
-from pdf2image import convert_from_path
 import re
 
 # Importar pytesseract de forma opcional
+# La búsqueda del ejecutable de Tesseract (lanza un subproceso) ya no se hace al importar:
+# la realiza OCRVerifier._verificar_tesseract, normalmente en segundo plano tras el login
 try:
     import pytesseract
     TESSERACT_DISPONIBLE = True
     import_error = None
-    
-    # Configurar ruta de Tesseract automáticamente si no está en PATH
-    rutas_comunes = [
-        r"C:\Program Files\Tesseract-OCR\tesseract.exe",
-        r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe",
-        r"C:\Users\{}\AppData\Local\Programs\Tesseract-OCR\tesseract.exe".format(os.getenv('USERNAME', '')),
-    ]
-    
-    # Verificar si Tesseract está en PATH, si no, buscar en rutas comunes
-    try:
-        pytesseract.get_tesseract_version()
-    except:
-        # Tesseract no está en PATH, buscar en rutas comunes
-        for ruta in rutas_comunes:
-            if os.path.exists(ruta):
-                pytesseract.pytesseract.tesseract_cmd = ruta
-                break
 except ImportError as e:
     pytesseract = None
     TESSERACT_DISPONIBLE = False
@@ -187,6 +172,9 @@ class OCRVerifier:
         if not TESSERACT_DISPONIBLE:
             raise RuntimeError("Tesseract OCR no está disponible. Instala Tesseract y pytesseract.")
         
+        # pdf2image solo se necesita para verificar PDFs, se carga al primer uso
+        from pdf2image import convert_from_path
+        
         try:
             # Convertir PDF a imágenes con ruta de Poppler si está disponible
             kwargs = {
@@ -548,3 +536,63 @@ class OCRVerifier:
             resultados[ruta] = (exito, mensaje, detalles)
         
         return resultados
+
+
+# Instancia compartida: la detección de Tesseract/Poppler se hace una sola vez por sesión
+_verificador_compartido: Optional[OCRVerifier] = None
+_hilo_sondeo: Optional[threading.Thread] = None
+_lock_sondeo = threading.Lock()
+
+
+def _crear_verificador_compartido():
+    """Crea la instancia compartida de OCRVerifier (ejecutado en segundo plano)"""
+    global _verificador_compartido
+    try:
+        verificador = OCRVerifier()
+        _verificador_compartido = verificador
+    except Exception as e:
+        logger.warning(f"No se pudo inicializar el verificador OCR: {e}")
+
+
+def iniciar_sondeo_ocr():
+    """
+    Inicia en un hilo de fondo la detección de Tesseract y Poppler.
+    Llamadas repetidas no lanzan sondeos adicionales.
+    """
+    global _hilo_sondeo
+    if not TESSERACT_DISPONIBLE:
+        return
+    with _lock_sondeo:
+        if _hilo_sondeo is not None or _verificador_compartido is not None:
+            return
+        _hilo_sondeo = threading.Thread(
+            target=_crear_verificador_compartido,
+            name="sondeo-ocr",
+            daemon=True
+        )
+        _hilo_sondeo.start()
+    logger.debug("Sondeo de OCR iniciado en segundo plano")
+
+
+def obtener_verificador_ocr(timeout: Optional[float] = None) -> Optional[OCRVerifier]:
+    """
+    Obtiene el verificador OCR compartido, esperando al sondeo si sigue en curso.
+    Si el sondeo no se inició, lo ejecuta de forma síncrona.
+    
+    Args:
+        timeout: Segundos máximos de espera del sondeo en segundo plano (None = sin límite)
+        
+    Returns:
+        Instancia de OCRVerifier o None si no está disponible
+    """
+    if not TESSERACT_DISPONIBLE:
+        return None
+    if _verificador_compartido is not None:
+        return _verificador_compartido
+    with _lock_sondeo:
+        hilo = _hilo_sondeo
+    if hilo is None:
+        _crear_verificador_compartido()
+    else:
+        hilo.join(timeout)
+    return _verificador_compartido
@@ -0,0 +1,149 @@
+"""
+Ingesta y normalización de fotos de empleados
+
+Las fotos llegan tal cual salen de la cámara (JPEG de varios megapíxeles, a menudo
+giradas mediante la etiqueta EXIF). Cada foto se decodifica, se orienta, se recorta
+y se reduce una sola vez a la caja del template para cada DPI, y el resultado se
+guarda en una caché direccionada por el hash de la foto original. El diseñador PIL,
+el PDF vectorial y los templates HTML usan la versión normalizada.
+"""
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from config.settings import (
+    PHOTO_CACHE_ENABLED, PHOTO_CACHE_DIR, PHOTO_CACHE_PATH, PHOTO_CACHE_MAX_MB
+)
+from src.services.cache_sqlite import InstanciaCompartida
+from src.services.carnet_cache import CarnetRenderCache
+
+logger = logging.getLogger(__name__)
+
+# Cambiar al modificar la normalización para invalidar las fotos antiguas
+VERSION_FOTO = 1
+
+# DPI al que están expresadas las medidas de los templates PIL
+DPI_TEMPLATE = 300
+
+# Centro del recorte: algo por encima de la mitad para no cortar la cabeza
+CENTRO_RECORTE = (0.5, 0.4)
+
+# Calidad de las fotos normalizadas sin transparencia
+CALIDAD_JPEG = 92
+
+# Formatos de imagen que se normalizan (los demás se usan tal cual)
+EXTENSIONES_FOTO = (".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".tif", ".tiff")
+
+
+def _tamano_caja(caja: Tuple[float, float], dpi: int) -> Tuple[int, int]:
+    """Convierte una caja en unidades del template (300 DPI) a píxeles al DPI indicado"""
+    factor = dpi / DPI_TEMPLATE
+    return max(1, int(round(caja[0] * factor))), max(1, int(round(caja[1] * factor)))
+
+
+def _normalizar(ruta: Path, destino_sin_extension: Path, tamano: Optional[Tuple[int, int]],
+                lado_maximo: Optional[int]) -> Path:
+    """
+    Decodifica, orienta, recorta y reduce una foto
+
+    Args:
+        ruta: Foto original
+        destino_sin_extension: Ruta del resultado sin extensión (.jpg o .png según la transparencia)
+        tamano: Caja exacta en píxeles (recorte centrado), o None
+        lado_maximo: Lado máximo en píxeles sin recortar, si no hay caja
+
+    Returns:
+        Ruta del archivo generado
+    """
+    with Image.open(ruta) as img:
+        lado = max(tamano) if tamano else lado_maximo
+        # Los JPEG se decodifican directamente a la menor escala que sigue cubriendo la caja
+        # (cuadrada, porque la orientación EXIF puede intercambiar ancho y alto)
+        img.draft("RGB", (lado, lado))
+        img = ImageOps.exif_transpose(img)
+
+        transparente = img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info)
+        img = img.convert("RGBA" if transparente else "RGB")
+        if tamano:
+            img = ImageOps.fit(img, tamano, Image.Resampling.LANCZOS, centering=CENTRO_RECORTE)
+        elif max(img.size) > lado_maximo:
+            img.thumbnail((lado_maximo, lado_maximo), Image.Resampling.LANCZOS)
+
+        if transparente:
+            destino = destino_sin_extension.with_suffix(".png")
+            img.save(destino, "PNG", optimize=True)
+        else:
+            destino = destino_sin_extension.with_suffix(".jpg")
+            img.save(destino, "JPEG", quality=CALIDAD_JPEG, optimize=True)
+    return destino
+
+
+def normalizar_foto(ruta: Path, caja: Optional[Tuple[float, float]] = None, dpi: int = DPI_TEMPLATE,
+                    lado_maximo: Optional[int] = None) -> Path:
+    """
+    Obtiene la versión normalizada de una foto de empleado, generándola si no está en caché
+
+    Args:
+        ruta: Foto original
+        caja: Ancho y alto de la foto en el template (unidades a 300 DPI); la foto se
+              recorta centrada para cubrirla sin deformarse
+        dpi: Resolución de salida de la caja
+        lado_maximo: Sin caja, lado máximo en píxeles (se conserva la proporción)
+
+    Returns:
+        Ruta de la foto normalizada, o la original si no se pudo normalizar
+    """
+    ruta = Path(ruta)
+    if (not PHOTO_CACHE_ENABLED or ruta.suffix.lower() not in EXTENSIONES_FOTO
+            or not ruta.is_file() or (caja is None and not lado_maximo)):
+        return ruta
+
+    tamano = _tamano_caja(caja, dpi) if caja else None
+    try:
+        cache = obtener_photo_cache()
+        clave = cache.calcular_clave(
+            tipo="foto", version_foto=VERSION_FOTO, foto=ruta,
+            tamano=list(tamano) if tamano else None, lado_maximo=None if tamano else lado_maximo
+        )
+        existente = cache.obtener(clave)
+        if existente is not None:
+            return existente
+
+        descriptor, temporal = tempfile.mkstemp(prefix="foto_", dir=str(cache.directorio))
+        os.close(descriptor)
+        temporal = Path(temporal)
+        generado = None
+        try:
+            generado = _normalizar(ruta, temporal, tamano, lado_maximo)
+            cache.guardar(clave, generado)
+        finally:
+            for archivo in {temporal, generado} - {None}:
+                try:
+                    archivo.unlink()
+                except OSError:
+                    pass
+        return cache.obtener(clave) or ruta
+    except Exception as e:
+        logger.warning(f"No se pudo normalizar la foto {ruta}: {e}")
+        return ruta
+
+
+# Caché compartida por la aplicación (se crea al primer uso)
+_cache_compartida: InstanciaCompartida[CarnetRenderCache] = InstanciaCompartida(
+    lambda: CarnetRenderCache(PHOTO_CACHE_DIR, PHOTO_CACHE_PATH, PHOTO_CACHE_MAX_MB)
+)
+
+
+def obtener_photo_cache() -> CarnetRenderCache:
+    """
+    Obtiene la caché de fotos normalizadas compartida por la aplicación. Usa el mismo
+    almacén direccionado por contenido que los carnets, en su propia carpeta e índice.
+
+    Returns:
+        Instancia única de CarnetRenderCache para las fotos
+    """
+    return _cache_compartida.obtener()
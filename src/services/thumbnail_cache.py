@@ -0,0 +1,196 @@
+"""
+Caché de miniaturas e información de imágenes de códigos
+
+Al seleccionar una fila de la tabla de códigos o de servicios se muestra una
+miniatura y la información de la imagen (dimensiones, tamaño, calidad). Ambas se
+calculan una sola vez por versión del archivo (ruta, fecha de modificación y
+tamaño) y se guardan en memoria (LRU) y en disco (SQLite), así recorrer la tabla
+con las flechas no vuelve a decodificar ni analizar la imagen completa.
+"""
+import hashlib
+import io
+import json
+import logging
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from PIL import Image
+
+from config.settings import THUMBNAIL_CACHE_PATH, THUMBNAIL_CACHE_MAX_MB
+from src.services.cache_sqlite import CacheSQLite, InstanciaCompartida
+
+logger = logging.getLogger(__name__)
+
+# Cambiar al modificar cómo se generan las miniaturas para invalidar las antiguas
+VERSION_MINIATURA = 1
+
+# Caja máxima de la miniatura: el doble de la vista previa (350 x 150) para pantallas HiDPI
+TAMANO_MINIATURA = (700, 300)
+
+# Miniaturas que se conservan en memoria
+MAX_MINIATURAS_MEMORIA = 256
+
+# Miniatura (PNG) e información de la imagen
+EntradaMiniatura = Tuple[bytes, Optional[Dict]]
+
+
+def crear_miniatura(ruta_imagen: Path,
+                    calcular_informacion: Optional[Callable[[Path], Optional[Dict]]] = None
+                    ) -> Optional[EntradaMiniatura]:
+    """
+    Decodifica una imagen y genera su miniatura y su información, sin usar la caché
+
+    Args:
+        ruta_imagen: Ruta de la imagen
+        calcular_informacion: Función que obtiene la información de la imagen
+                              (p. ej. BarcodeService.obtener_informacion_imagen)
+
+    Returns:
+        Tupla (PNG de la miniatura, información) o None si la imagen no se pudo leer
+    """
+    try:
+        with Image.open(ruta_imagen) as img:
+            # Los códigos se guardan en 1 bit: en gris la reducción se suaviza
+            miniatura = img.convert("L" if img.mode in ("1", "L", "P") else "RGB")
+            miniatura.thumbnail(TAMANO_MINIATURA, Image.Resampling.LANCZOS)
+        salida = io.BytesIO()
+        miniatura.save(salida, "PNG", optimize=True)
+    except Exception as e:
+        logger.warning(f"No se pudo generar la miniatura de {ruta_imagen}: {e}")
+        return None
+
+    informacion = calcular_informacion(ruta_imagen) if calcular_informacion else None
+    return salida.getvalue(), informacion
+
+
+class ThumbnailCache(CacheSQLite):
+    """Caché en memoria y en SQLite de miniaturas y su información de imagen"""
+
+    TABLA = "miniaturas"
+    COLUMNAS = """
+                png BLOB NOT NULL,
+                informacion TEXT"""
+    DESCRIPCION = "Caché de miniaturas"
+
+    def __init__(self, ruta: Optional[Path] = None, max_mb: int = THUMBNAIL_CACHE_MAX_MB):
+        """
+        Inicializa la caché
+
+        Args:
+            ruta: Archivo SQLite de la caché (por defecto THUMBNAIL_CACHE_PATH)
+            max_mb: Tamaño máximo de las miniaturas en disco, en MB
+        """
+        self._memoria: "OrderedDict[str, EntradaMiniatura]" = OrderedDict()
+        super().__init__(ruta or THUMBNAIL_CACHE_PATH, max_mb)
+
+    @staticmethod
+    def calcular_clave(ruta_imagen: Path) -> Optional[str]:
+        """
+        Calcula la clave de una versión concreta de un archivo
+
+        Args:
+            ruta_imagen: Ruta de la imagen
+
+        Returns:
+            Hash SHA-256 de ruta, fecha de modificación y tamaño, o None si no existe
+        """
+        try:
+            estado = ruta_imagen.stat()
+        except OSError:
+            return None
+        contenido = f"{VERSION_MINIATURA}|{ruta_imagen.resolve()}|{estado.st_mtime_ns}|{estado.st_size}"
+        return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+    def _recordar(self, clave: str, entrada: EntradaMiniatura) -> None:
+        """Guarda una entrada en la LRU de memoria (con el lock tomado)"""
+        self._memoria[clave] = entrada
+        self._memoria.move_to_end(clave)
+        while len(self._memoria) > MAX_MINIATURAS_MEMORIA:
+            self._memoria.popitem(last=False)
+
+    def obtener(self, ruta_imagen: Path) -> Optional[EntradaMiniatura]:
+        """
+        Obtiene la miniatura y la información de una imagen si ya están en caché.
+        No decodifica la imagen ni escribe en disco (el acceso se registra de forma
+        diferida): es seguro llamarlo desde la interfaz.
+
+        Args:
+            ruta_imagen: Ruta de la imagen
+
+        Returns:
+            Tupla (PNG de la miniatura, información) o None si no está en caché
+        """
+        clave = self.calcular_clave(ruta_imagen)
+        if clave is None:
+            return None
+        with self._lock:
+            entrada = self._memoria.get(clave)
+            if entrada is not None:
+                self._memoria.move_to_end(clave)
+                return entrada
+            try:
+                fila = self._conn.execute(
+                    "SELECT png, informacion FROM miniaturas WHERE clave = ?", (clave,)
+                ).fetchone()
+                if fila is None:
+                    return None
+            except sqlite3.Error as e:
+                logger.warning(f"No se pudo leer la miniatura en caché: {e}")
+                return None
+            self._marcar_acceso_diferido(clave)
+            entrada = (bytes(fila[0]), json.loads(fila[1]) if fila[1] else None)
+            self._recordar(clave, entrada)
+            return entrada
+
+    def generar(self, ruta_imagen: Path,
+                calcular_informacion: Optional[Callable[[Path], Optional[Dict]]] = None
+                ) -> Optional[EntradaMiniatura]:
+        """
+        Genera la miniatura y la información de una imagen y las guarda en caché
+
+        Args:
+            ruta_imagen: Ruta de la imagen
+            calcular_informacion: Función que obtiene la información de la imagen
+                                  (p. ej. BarcodeService.obtener_informacion_imagen)
+
+        Returns:
+            Tupla (PNG de la miniatura, información) o None si la imagen no se pudo leer
+        """
+        clave = self.calcular_clave(ruta_imagen)
+        if clave is None:
+            return None
+        entrada = crear_miniatura(ruta_imagen, calcular_informacion)
+        if entrada is None:
+            return None
+        with self._lock:
+            self._recordar(clave, entrada)
+            try:
+                self._insertar(
+                    clave, len(entrada[0]), png=sqlite3.Binary(entrada[0]),
+                    informacion=json.dumps(entrada[1], default=str) if entrada[1] else None
+                )
+            except sqlite3.Error as e:
+                logger.warning(f"No se pudo guardar la miniatura en caché: {e}")
+        return entrada
+
+    def limpiar(self) -> None:
+        """Vacía la caché (también las miniaturas en memoria)"""
+        with self._lock:
+            self._memoria.clear()
+        super().limpiar()
+
+
+# Caché compartida por la aplicación (se crea al primer uso)
+_cache_compartida: InstanciaCompartida[ThumbnailCache] = InstanciaCompartida(ThumbnailCache)
+
+
+def obtener_thumbnail_cache() -> ThumbnailCache:
+    """
+    Obtiene la caché de miniaturas compartida por la aplicación
+
+    Returns:
+        Instancia única de ThumbnailCache
+    """
+    return _cache_compartida.obtener()
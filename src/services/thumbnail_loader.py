@@ -0,0 +1,87 @@
+"""
+Carga en segundo plano de miniaturas para la vista previa de códigos y servicios
+"""
+import logging
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from config.settings import THUMBNAIL_CACHE_ENABLED
+from src.services.thumbnail_cache import (
+    EntradaMiniatura, ThumbnailCache, crear_miniatura, obtener_thumbnail_cache
+)
+from src.services.trabajador_segundo_plano import TrabajadorUltimaSolicitud
+
+logger = logging.getLogger(__name__)
+
+
+class CargadorMiniaturas(TrabajadorUltimaSolicitud):
+    """
+    Obtiene miniaturas desde la caché o las genera en un hilo de fondo.
+    Solo se publica el resultado de la última solicitud: al recorrer la tabla
+    rápidamente las selecciones intermedias se descartan. La señal terminado
+    publica el turno y la tupla (ruta de la imagen, entrada o None si falló).
+    """
+
+    def __init__(self, calcular_informacion: Optional[Callable[[Path], Optional[Dict]]] = None):
+        """
+        Inicializa el cargador con un único hilo
+
+        Args:
+            calcular_informacion: Función que obtiene la información de la imagen
+        """
+        super().__init__("miniaturas")
+        self.calcular_informacion = calcular_informacion
+        self._cache: Optional[ThumbnailCache] = None
+
+    def _obtener_cache(self) -> Optional[ThumbnailCache]:
+        """Obtiene la caché compartida (None si está desactivada o no se pudo abrir)"""
+        if not THUMBNAIL_CACHE_ENABLED:
+            return None
+        if self._cache is None:
+            try:
+                self._cache = obtener_thumbnail_cache()
+            except Exception as e:
+                logger.warning(f"No se pudo abrir la caché de miniaturas: {e}")
+                return None
+        return self._cache
+
+    def obtener_inmediata(self, ruta_imagen: Path) -> Optional[EntradaMiniatura]:
+        """
+        Devuelve la miniatura si ya está en caché, sin decodificar la imagen.
+        Invalida cualquier solicitud en curso.
+
+        Args:
+            ruta_imagen: Ruta de la imagen
+
+        Returns:
+            Tupla (PNG de la miniatura, información) o None si hay que generarla
+        """
+        self.cancelar()
+        cache = self._obtener_cache()
+        return cache.obtener(ruta_imagen) if cache else None
+
+    def solicitar(self, ruta_imagen: Path) -> int:
+        """
+        Encola la generación de una miniatura; las solicitudes anteriores se descartan
+
+        Args:
+            ruta_imagen: Ruta de la imagen
+
+        Returns:
+            Turno de la solicitud
+        """
+        ruta_imagen = Path(ruta_imagen)
+        return super().solicitar(lambda: self._cargar(ruta_imagen))
+
+    def _cargar(self, ruta_imagen: Path) -> Tuple[str, Optional[EntradaMiniatura]]:
+        """Genera la miniatura en el hilo de fondo (desde la caché si está activada)"""
+        try:
+            cache = self._obtener_cache()
+            if cache is not None:
+                entrada = cache.generar(ruta_imagen, self.calcular_informacion)
+            else:
+                entrada = crear_miniatura(ruta_imagen, self.calcular_informacion)
+        except Exception as e:
+            logger.warning(f"Error al cargar la miniatura de {ruta_imagen}: {e}")
+            entrada = None
+        return str(ruta_imagen), entrada
@@ -0,0 +1,68 @@
+"""
+Trabajo en segundo plano donde solo cuenta la última solicitud
+
+La vista previa de carnets y las miniaturas de la tabla de códigos encargan
+trabajos a un hilo de fondo mientras el usuario sigue escribiendo o moviéndose
+por la tabla. Cada solicitud recibe un turno; al empezar, un trabajo cuyo turno ya
+no es el último se descarta sin ejecutarse, y quien recibe el resultado comprueba
+con es_vigente() que sigue correspondiendo a la última solicitud.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+logger = logging.getLogger(__name__)
+
+
+class TrabajadorUltimaSolicitud(QObject):
+    """Ejecuta trabajos en un único hilo de fondo; solo el último solicitado es vigente"""
+
+    # Turno de la solicitud y resultado del trabajo (None si falló)
+    terminado = pyqtSignal(int, object)
+
+    def __init__(self, nombre_hilo: str):
+        """
+        Inicializa el trabajador con un único hilo: los trabajos no se solapan
+
+        Args:
+            nombre_hilo: Prefijo del nombre del hilo
+        """
+        super().__init__()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=nombre_hilo)
+        self._turno = 0
+
+    def solicitar(self, trabajo: Callable[[], Any]) -> int:
+        """
+        Encola un trabajo; las solicitudes anteriores que aún no empezaron se descartan
+
+        Args:
+            trabajo: Función sin argumentos que devuelve el resultado
+
+        Returns:
+            Turno de la solicitud
+        """
+        self._turno += 1
+        self._executor.submit(self._ejecutar, self._turno, trabajo)
+        return self._turno
+
+    def cancelar(self):
+        """Invalida la solicitud en curso: su resultado se ignorará"""
+        self._turno += 1
+
+    def es_vigente(self, turno: int) -> bool:
+        """Indica si un turno corresponde a la última solicitud"""
+        return turno == self._turno
+
+    def _ejecutar(self, turno: int, trabajo: Callable[[], Any]):
+        """Ejecuta un trabajo en el hilo de fondo y publica el resultado"""
+        if not self.es_vigente(turno):
+            return
+        try:
+            resultado = trabajo()
+        except Exception as e:
+            logger.warning(f"Error en el trabajo en segundo plano: {e}")
+            resultado = None
+        # La señal llega al hilo de la interfaz por una conexión en cola
+        self.terminado.emit(turno, resultado)
@@ -0,0 +1,196 @@
+"""
+Apoyo para la vista previa en vivo de carnets
+
+La vista previa de templates HTML se carga una vez con cada {{variable}} marcada
+(los textos envueltos en un elemento <carnet-var> y los atributos con un atributo
+data-carnet-a-*); al editar un campo solo se parchean los valores que cambiaron
+con JavaScript, sin volver a cargar la página. Las vistas previas recientes se
+conservan por empleado para que recorrer la lista de empleados sea inmediato.
+"""
+import json
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+from src.utils.html_parser import inyectar_valores
+
+# Variables que se pueden parchear (las demás obligan a recargar la página)
+PATRON_VARIABLE = re.compile(r"\{\{([\w\-]+)\}\}")
+PATRON_CUALQUIER_VARIABLE = re.compile(r"\{\{([^{}]+)\}\}")
+
+# Comentarios, elementos de texto sin marcado y etiquetas del HTML
+PATRON_BLOQUES = re.compile(
+    r"<!--.*?-->"
+    r"|<(script|style|title|textarea)\b.*?</\1\s*>"
+    r"|<[^<>]+>",
+    re.DOTALL | re.IGNORECASE
+)
+
+# Atributo cuyo valor completo es una única variable: src="{{logo}}"
+PATRON_ATRIBUTO = re.compile(r"([\w:\-]+)\s*=\s*([\"'])\{\{([\w\-]+)\}\}\2")
+
+# Elemento que envuelve las variables de texto; display: contents no altera el diseño
+ETIQUETA_TEXTO = "carnet-var"
+MARCA_TEXTO = '<carnet-var data-var="{0}" style="display:contents">{{{{{0}}}}}</carnet-var>'
+
+# Destino de las variables de texto en el mapa de destinos
+DESTINO_TEXTO = ""
+
+
+class PlantillaVistaPrevia:
+    """Template HTML preparado para la vista previa con parches por variable"""
+
+    def __init__(self, html_base: str):
+        """
+        Marca las variables del template
+
+        Args:
+            html_base: Contenido del template HTML
+        """
+        self.html_base = html_base
+        # Variable -> destinos ("" = texto, o nombre del atributo)
+        self.destinos: Dict[str, Set[str]] = {}
+        # Variables usadas donde no se pueden parchear (estilos, scripts, atributos parciales...)
+        self.no_parcheables: Set[str] = set()
+        self.html_marcado = self._marcar(html_base)
+
+    def _marcar(self, html: str) -> str:
+        """Devuelve el HTML con las variables parcheables marcadas"""
+        partes = []
+        posicion = 0
+        for bloque in PATRON_BLOQUES.finditer(html):
+            partes.append(self._marcar_texto(html[posicion:bloque.start()]))
+            contenido = bloque.group(0)
+            if contenido.startswith("<!--") or bloque.group(1):
+                self.no_parcheables.update(PATRON_CUALQUIER_VARIABLE.findall(contenido))
+                partes.append(contenido)
+            else:
+                partes.append(self._marcar_etiqueta(contenido))
+            posicion = bloque.end()
+        partes.append(self._marcar_texto(html[posicion:]))
+        return "".join(partes)
+
+    def _marcar_texto(self, texto: str) -> str:
+        """Envuelve las variables de un tramo de texto"""
+        self.no_parcheables.update(
+            nombre for nombre in PATRON_CUALQUIER_VARIABLE.findall(texto)
+            if not PATRON_VARIABLE.fullmatch(f"{{{{{nombre}}}}}")
+        )
+
+        def envolver(coincidencia):
+            nombre = coincidencia.group(1)
+            self.destinos.setdefault(nombre, set()).add(DESTINO_TEXTO)
+            return MARCA_TEXTO.format(nombre)
+
+        return PATRON_VARIABLE.sub(envolver, texto)
+
+    def _marcar_etiqueta(self, etiqueta: str) -> str:
+        """Añade un atributo de marca por cada atributo cuyo valor es una variable"""
+        marcas = []
+
+        def registrar(coincidencia):
+            atributo, nombre = coincidencia.group(1).lower(), coincidencia.group(3)
+            self.destinos.setdefault(nombre, set()).add(atributo)
+            marcas.append(f' data-carnet-a-{atributo}="{nombre}"')
+            return ""
+
+        # Cualquier otra variable dentro de la etiqueta no se puede parchear
+        self.no_parcheables.update(PATRON_CUALQUIER_VARIABLE.findall(PATRON_ATRIBUTO.sub(registrar, etiqueta)))
+        if not marcas:
+            return etiqueta
+        cierre = len(etiqueta) - (2 if etiqueta.endswith("/>") else 1)
+        return etiqueta[:cierre].rstrip() + "".join(marcas) + etiqueta[cierre:]
+
+    def generar_html(self, valores: Dict[str, str]) -> str:
+        """
+        Inyecta los valores en el HTML marcado
+
+        Args:
+            valores: Valores preparados con HTMLRenderer.preparar_valores()
+
+        Returns:
+            HTML listo para cargar en la vista previa
+        """
+        return inyectar_valores(self.html_marcado, valores)
+
+    def se_puede_parchear(self, cambios: Dict[str, str]) -> bool:
+        """
+        Indica si los cambios se pueden aplicar sin recargar la página
+
+        Args:
+            cambios: Variables que cambiaron y sus nuevos valores
+
+        Returns:
+            True si todas las variables se pueden parchear con JavaScript
+        """
+        return not (set(cambios) & self.no_parcheables)
+
+    def script_parche(self, cambios: Dict[str, str]) -> str:
+        """
+        Genera el JavaScript que aplica los cambios sobre la página cargada
+
+        Args:
+            cambios: Variables que cambiaron y sus nuevos valores
+
+        Returns:
+            Código JavaScript
+        """
+        operaciones: List[Tuple[str, Optional[str], str]] = []
+        for nombre, valor in cambios.items():
+            for destino in sorted(self.destinos.get(nombre, ())):
+                if destino == DESTINO_TEXTO:
+                    operaciones.append((f'{ETIQUETA_TEXTO}[data-var="{nombre}"]', None, valor))
+                else:
+                    operaciones.append((f'[data-carnet-a-{destino}="{nombre}"]', destino, valor))
+        return (
+            "(function(ops){ops.forEach(function(op){"
+            "document.querySelectorAll(op[0]).forEach(function(e){"
+            "if(op[1]===null){e.textContent=op[2];}else{e.setAttribute(op[1],op[2]);}"
+            "});});})(" + json.dumps(operaciones, ensure_ascii=False) + ");"
+        )
+
+
+class CacheVistasPrevias:
+    """Caché LRU en memoria de las últimas vistas previas generadas"""
+
+    def __init__(self, max_entradas: int):
+        """
+        Inicializa la caché
+
+        Args:
+            max_entradas: Número de vistas previas que se conservan
+        """
+        self.max_entradas = max(1, max_entradas)
+        self._entradas: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def obtener(self, clave: Hashable) -> Optional[Any]:
+        """
+        Obtiene una vista previa cacheada
+
+        Args:
+            clave: Empleado y firma de las entradas de la vista previa
+
+        Returns:
+            Vista previa o None si no está en caché
+        """
+        if clave not in self._entradas:
+            return None
+        self._entradas.move_to_end(clave)
+        return self._entradas[clave]
+
+    def guardar(self, clave: Hashable, vista_previa: Any) -> None:
+        """
+        Guarda una vista previa y descarta la menos usada si se supera el máximo
+
+        Args:
+            clave: Empleado y firma de las entradas de la vista previa
+            vista_previa: Valores HTML preparados o imagen PIL
+        """
+        self._entradas[clave] = vista_previa
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+
+    def limpiar(self) -> None:
+        """Vacía la caché"""
+        self._entradas.clear()
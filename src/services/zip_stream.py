@@ -0,0 +1,388 @@
+"""
+Escritor de archivos ZIP en streaming
+
+Las entradas se escriben en el ZIP en cuanto se agregan, desde memoria, sin
+pasar por un directorio temporal. Los formatos que ya están comprimidos (PNG,
+JPEG, PDF...) se guardan sin comprimir (ZIP_STORED): deflate no reduce su
+tamaño y solo consume CPU. El resto se comprime con deflate en un pool de
+hilos (zlib libera el GIL), y las extensiones ZIP64 se usan automáticamente
+cuando el archivo supera los límites de 4 GB o 65535 entradas.
+
+El archivo se escribe con extensión .part y se renombra al cerrar, de modo que
+una generación cancelada no deja un ZIP truncado ni sobrescribe uno anterior.
+Como cada cabecera local lleva ya el CRC y los tamaños, un .part interrumpido
+se puede reabrir (reanudar()) conservando todas sus entradas completas.
+"""
+import logging
+import os
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Deque, List, Optional, Tuple
+
+from config.settings import ZIP_COMPRESSION_WORKERS, ZIP_DEFLATE_LEVEL
+
+logger = logging.getLogger(__name__)
+
+# Métodos de compresión (mismos valores que zipfile.ZIP_STORED / ZIP_DEFLATED)
+METODO_STORED = 0
+METODO_DEFLATED = 8
+
+# Extensiones cuyo contenido ya está comprimido y se guarda tal cual
+EXTENSIONES_COMPRIMIDAS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".pdf", ".zip", ".gz", ".xlsx", ".docx"
+}
+
+# Por debajo de este tamaño la compresión se hace en el hilo que agrega la entrada
+MINIMO_PARALELO = 64 * 1024
+
+LIMITE_ZIP32 = 0xFFFFFFFF
+LIMITE_ENTRADAS_ZIP32 = 0xFFFF
+# Valores que indican en los campos de 32/16 bits que el dato real está en el registro ZIP64
+MARCA_ZIP64 = 0xFFFFFFFF
+MARCA_ENTRADAS_ZIP64 = 0xFFFF
+
+# Bit 11 de los flags: el nombre está en UTF-8
+FLAG_UTF8 = 0x0800
+VERSION_ZIP20 = 20
+VERSION_ZIP64 = 45
+
+
+def ruta_parcial(ruta_zip: Path) -> Path:
+    """
+    Obtiene la ruta del archivo en construcción de un ZIP
+
+    Args:
+        ruta_zip: Ruta final del ZIP
+
+    Returns:
+        Ruta con la extensión .part añadida
+    """
+    ruta_zip = Path(ruta_zip)
+    return ruta_zip.with_name(ruta_zip.name + ".part")
+
+
+def elegir_metodo(nombre: str) -> int:
+    """
+    Elige el método de compresión de una entrada según su extensión
+
+    Args:
+        nombre: Nombre de la entrada dentro del ZIP
+
+    Returns:
+        METODO_STORED para formatos ya comprimidos, METODO_DEFLATED para el resto
+    """
+    return METODO_STORED if Path(nombre).suffix.lower() in EXTENSIONES_COMPRIMIDAS else METODO_DEFLATED
+
+
+def _comprimir(datos: bytes, metodo: int, nivel: int) -> Tuple[bytes, int, int]:
+    """
+    Prepara el contenido de una entrada
+
+    Args:
+        datos: Contenido sin comprimir
+        metodo: METODO_STORED o METODO_DEFLATED
+        nivel: Nivel de deflate (1-9)
+
+    Returns:
+        Tupla con (datos a escribir, CRC-32, tamaño sin comprimir)
+    """
+    crc = zlib.crc32(datos) & 0xFFFFFFFF
+    if metodo == METODO_DEFLATED:
+        compresor = zlib.compressobj(nivel, zlib.DEFLATED, -zlib.MAX_WBITS)
+        return compresor.compress(datos) + compresor.flush(), crc, len(datos)
+    return datos, crc, len(datos)
+
+
+def _fecha_dos(instante: Optional[float] = None) -> Tuple[int, int]:
+    """Convierte un instante a la hora y fecha en formato MS-DOS que usa ZIP"""
+    t = time.localtime(instante)
+    anio = max(t.tm_year, 1980)
+    hora_dos = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    fecha_dos = ((anio - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return hora_dos, fecha_dos
+
+
+class ZipStreamWriter:
+    """Escribe un ZIP entrada a entrada, con compresión paralela y ZIP64 cuando hace falta"""
+
+    def __init__(self, ruta_zip: Path, nivel: int = ZIP_DEFLATE_LEVEL,
+                 hilos: int = ZIP_COMPRESSION_WORKERS, reanudar: bool = False):
+        """
+        Abre el archivo de salida
+
+        Args:
+            ruta_zip: Ruta final del ZIP
+            nivel: Nivel de deflate para las entradas que se comprimen
+            hilos: Hilos de compresión (0 = número de CPUs, 1 = sin pool)
+            reanudar: Reabrir el .part de una ejecución anterior y seguir agregando
+                      entradas tras la última completa (si no existe se empieza de cero)
+        """
+        self.ruta_zip = Path(ruta_zip)
+        self._ruta_parcial = ruta_parcial(self.ruta_zip)
+        if reanudar and self._ruta_parcial.exists():
+            self._archivo = open(self._ruta_parcial, "r+b")
+        else:
+            self._archivo = open(self._ruta_parcial, "wb")
+        self._nivel = nivel
+        hilos = hilos or os.cpu_count() or 1
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="zip") if hilos > 1 else None
+        # Entradas en compresión, en orden de llegada; se escriben en ese mismo orden
+        self._en_curso: Deque[Tuple[str, int, Tuple[int, int], Future]] = deque()
+        self._max_en_curso = 2 * hilos
+        # (nombre, método, hora, fecha, crc, tamaño comprimido, tamaño original, desplazamiento)
+        self._directorio: List[Tuple[bytes, int, int, int, int, int, int, int]] = []
+        self._nombres = set()
+        self.cerrado = False
+        if reanudar:
+            self._recuperar_entradas()
+
+    def __contains__(self, nombre: str) -> bool:
+        """Indica si ya hay una entrada con ese nombre"""
+        return nombre in self._nombres
+
+    @property
+    def entradas(self) -> int:
+        """Número de entradas agregadas (incluidas las que aún se están comprimiendo)"""
+        return len(self._directorio) + len(self._en_curso)
+
+    def agregar(self, nombre: str, datos: bytes, metodo: Optional[int] = None,
+                instante: Optional[float] = None) -> None:
+        """
+        Agrega una entrada desde memoria
+
+        Args:
+            nombre: Nombre dentro del ZIP
+            datos: Contenido
+            metodo: METODO_STORED o METODO_DEFLATED (por defecto según la extensión)
+            instante: Fecha de modificación (por defecto, ahora)
+
+        Raises:
+            ValueError: Si el ZIP ya está cerrado o el nombre está repetido
+        """
+        if self.cerrado:
+            raise ValueError("El ZIP ya está cerrado")
+        if nombre in self._nombres:
+            raise ValueError(f"Entrada duplicada en el ZIP: {nombre}")
+        self._nombres.add(nombre)
+
+        metodo = elegir_metodo(nombre) if metodo is None else metodo
+        fecha = _fecha_dos(instante)
+        if self._pool is not None and metodo == METODO_DEFLATED and len(datos) >= MINIMO_PARALELO:
+            futuro = self._pool.submit(_comprimir, datos, metodo, self._nivel)
+        else:
+            futuro = Future()
+            futuro.set_result(_comprimir(datos, metodo, self._nivel))
+        self._en_curso.append((nombre, metodo, fecha, futuro))
+        self._escribir_terminadas(bloquear=len(self._en_curso) > self._max_en_curso)
+
+    def agregar_archivo(self, ruta: Path, nombre: Optional[str] = None) -> None:
+        """
+        Agrega un archivo del disco
+
+        Args:
+            ruta: Archivo a agregar
+            nombre: Nombre dentro del ZIP (por defecto, el nombre del archivo)
+        """
+        ruta = Path(ruta)
+        self.agregar(nombre or ruta.name, ruta.read_bytes(), instante=ruta.stat().st_mtime)
+
+    def vaciar(self) -> None:
+        """Escribe todas las entradas pendientes y las pasa al sistema operativo"""
+        while self._en_curso:
+            self._escribir_terminadas(bloquear=True)
+        self._archivo.flush()
+
+    def _recuperar_entradas(self) -> None:
+        """
+        Recorre las cabeceras locales del .part, comprueba el CRC de cada entrada y
+        trunca el archivo tras la última entrada completa
+        """
+        self._archivo.seek(0, os.SEEK_END)
+        tamaño_archivo = self._archivo.tell()
+        posicion = 0
+        while posicion + 30 <= tamaño_archivo:
+            self._archivo.seek(posicion)
+            (firma, _, _, metodo, hora, fecha, crc, comprimido, tamaño,
+             largo_nombre, largo_extra) = struct.unpack("<IHHHHHIIIHH", self._archivo.read(30))
+            if firma != 0x04034B50:
+                break
+            nombre_bytes = self._archivo.read(largo_nombre)
+            extra = self._archivo.read(largo_extra)
+            if comprimido == MARCA_ZIP64 or tamaño == MARCA_ZIP64:
+                if len(extra) < 20:
+                    break
+                tamaño, comprimido = struct.unpack("<QQ", extra[4:20])
+            fin = posicion + 30 + largo_nombre + largo_extra + comprimido
+            if fin > tamaño_archivo:
+                break
+            datos = self._archivo.read(comprimido)
+            if metodo == METODO_DEFLATED:
+                try:
+                    datos = zlib.decompress(datos, -zlib.MAX_WBITS)
+                except zlib.error:
+                    break
+            if zlib.crc32(datos) & 0xFFFFFFFF != crc:
+                break
+
+            self._directorio.append((nombre_bytes, metodo, hora, fecha, crc, comprimido, tamaño, posicion))
+            self._nombres.add(nombre_bytes.decode("utf-8"))
+            posicion = fin
+
+        self._archivo.seek(posicion)
+        self._archivo.truncate()
+        logger.info(f"ZIP parcial reanudado: {self._ruta_parcial.name} ({len(self._directorio)} entradas)")
+
+    def _escribir_terminadas(self, bloquear: bool = False) -> None:
+        """
+        Escribe en orden las entradas cuya compresión ha terminado
+
+        Args:
+            bloquear: Esperar a la primera entrada pendiente aunque no haya terminado
+        """
+        while self._en_curso and (bloquear or self._en_curso[0][3].done()):
+            nombre, metodo, (hora, fecha), futuro = self._en_curso.popleft()
+            self._escribir_entrada(nombre, metodo, hora, fecha, *futuro.result())
+            bloquear = bloquear and len(self._en_curso) > self._max_en_curso
+
+    def _escribir_entrada(self, nombre: str, metodo: int, hora: int, fecha: int,
+                          datos: bytes, crc: int, tamaño: int) -> None:
+        """Escribe la cabecera local y el contenido de una entrada"""
+        nombre_bytes = nombre.encode("utf-8")
+        desplazamiento = self._archivo.tell()
+        zip64 = len(datos) >= LIMITE_ZIP32 or tamaño >= LIMITE_ZIP32
+        extra = struct.pack("<HHQQ", 0x0001, 16, tamaño, len(datos)) if zip64 else b""
+
+        self._archivo.write(struct.pack(
+            "<IHHHHHIIIHH",
+            0x04034B50,
+            VERSION_ZIP64 if zip64 else VERSION_ZIP20,
+            FLAG_UTF8,
+            metodo,
+            hora,
+            fecha,
+            crc,
+            MARCA_ZIP64 if zip64 else len(datos),
+            MARCA_ZIP64 if zip64 else tamaño,
+            len(nombre_bytes),
+            len(extra),
+        ))
+        self._archivo.write(nombre_bytes)
+        self._archivo.write(extra)
+        self._archivo.write(datos)
+        self._directorio.append((nombre_bytes, metodo, hora, fecha, crc, len(datos), tamaño, desplazamiento))
+
+    def _escribir_directorio(self) -> None:
+        """Escribe el directorio central y el registro de fin (ZIP64 si hace falta)"""
+        inicio = self._archivo.tell()
+        for nombre, metodo, hora, fecha, crc, comprimido, tamaño, desplazamiento in self._directorio:
+            # En el directorio central el extra ZIP64 solo lleva los campos desbordados, en este orden
+            campos = []
+            if tamaño >= LIMITE_ZIP32:
+                campos.append(tamaño)
+            if comprimido >= LIMITE_ZIP32:
+                campos.append(comprimido)
+            if desplazamiento >= LIMITE_ZIP32:
+                campos.append(desplazamiento)
+            extra = struct.pack(f"<HH{len(campos)}Q", 0x0001, 8 * len(campos), *campos) if campos else b""
+            version = VERSION_ZIP64 if campos else VERSION_ZIP20
+
+            self._archivo.write(struct.pack(
+                "<IHHHHHHIIIHHHHHII",
+                0x02014B50,
+                (3 << 8) | version,
+                version,
+                FLAG_UTF8,
+                metodo,
+                hora,
+                fecha,
+                crc,
+                MARCA_ZIP64 if comprimido >= LIMITE_ZIP32 else comprimido,
+                MARCA_ZIP64 if tamaño >= LIMITE_ZIP32 else tamaño,
+                len(nombre),
+                len(extra),
+                0,
+                0,
+                0,
+                0o100644 << 16,
+                MARCA_ZIP64 if desplazamiento >= LIMITE_ZIP32 else desplazamiento,
+            ))
+            self._archivo.write(nombre)
+            self._archivo.write(extra)
+
+        fin = self._archivo.tell()
+        total = len(self._directorio)
+        tamaño_directorio = fin - inicio
+        zip64 = total >= LIMITE_ENTRADAS_ZIP32 or inicio >= LIMITE_ZIP32 or tamaño_directorio >= LIMITE_ZIP32
+        if zip64:
+            # Registro de fin ZIP64 y su localizador
+            self._archivo.write(struct.pack(
+                "<IQHHIIQQQQ", 0x06064B50, 44, VERSION_ZIP64, VERSION_ZIP64,
+                0, 0, total, total, tamaño_directorio, inicio
+            ))
+            self._archivo.write(struct.pack("<IIQI", 0x07064B50, 0, fin, 1))
+
+        self._archivo.write(struct.pack(
+            "<IHHHHIIH", 0x06054B50, 0, 0,
+            MARCA_ENTRADAS_ZIP64 if zip64 else total,
+            MARCA_ENTRADAS_ZIP64 if zip64 else total,
+            MARCA_ZIP64 if zip64 else tamaño_directorio,
+            MARCA_ZIP64 if zip64 else inicio,
+            0
+        ))
+
+    def cerrar(self) -> None:
+        """Escribe las entradas pendientes y el directorio central, y publica el ZIP en su ruta final"""
+        if self.cerrado:
+            return
+        try:
+            while self._en_curso:
+                self._escribir_terminadas(bloquear=True)
+            self._escribir_directorio()
+            self._archivo.close()
+            os.replace(self._ruta_parcial, self.ruta_zip)
+        except Exception:
+            self.descartar()
+            raise
+        finally:
+            self.cerrado = True
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+        logger.debug(f"ZIP escrito: {self.ruta_zip.name} ({len(self._directorio)} entradas)")
+
+    def suspender(self) -> None:
+        """Escribe las entradas pendientes y cierra el .part sin terminarlo, para reanudarlo más tarde"""
+        if self.cerrado:
+            return
+        try:
+            self.vaciar()
+        finally:
+            self.cerrado = True
+            self._archivo.close()
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+
+    def descartar(self) -> None:
+        """Abandona el ZIP (p. ej. al cancelar) y elimina el archivo parcial"""
+        self.cerrado = True
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        self._en_curso.clear()
+        if not self._archivo.closed:
+            self._archivo.close()
+        try:
+            self._ruta_parcial.unlink()
+        except OSError:
+            pass
+
+    def __enter__(self) -> "ZipStreamWriter":
+        return self
+
+    def __exit__(self, tipo, valor, traza) -> None:
+        if tipo is None:
+            self.cerrar()
+        else:
+            self.descartar()
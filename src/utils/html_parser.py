@@ -1,8 +1,9 @@
 """
 Utilidades para parsear y analizar templates HTML
 """
+import html as html_escape
 import re
-from typing import List, Set
+from typing import Dict, List, Set
 from pathlib import Path
 
 
@@ -50,3 +51,24 @@ def obtener_variables_desde_archivo(ruta_html: Path) -> Set[str]:
         print(f"Error al leer archivo HTML: {e}")
         return set()
 
+
+def inyectar_valores(html: str, valores: Dict[str, str]) -> str:
+    """
+    Reemplaza cada {{variable}} del HTML por su valor ya preparado (preparar_valores)
+    
+    Args:
+        html: Contenido HTML
+        valores: Diccionario variable -> valor sin escapar
+        
+    Returns:
+        HTML con variables reemplazadas
+    """
+    for key, value in valores.items():
+        placeholder = f"{{{{{key}}}}}"
+        # Escapar HTML para evitar problemas con JavaScript
+        # Pero no escapar si es una URL de imagen base64
+        if value.startswith("data:image"):
+            html = html.replace(placeholder, value)
+        else:
+            html = html.replace(placeholder, html_escape.escape(value))
+    return html
@@ -0,0 +1,184 @@
+"""
+Comprobaciones rápidas de imágenes renderizadas (en blanco, contraste, estabilidad)
+
+Las comprobaciones trabajan sobre una muestra regular de la imagen: una vista con
+paso (strides) sobre el buffer de una QImage, sin copiarlo, o una reducción por
+vecino más cercano de una imagen PIL, que solo lee los píxeles muestreados. Así
+una captura de 1200 DPI se evalúa en microsegundos en lugar de recorrerla entera.
+El orden de los canales (RGB o BGRA) no afecta a ninguna de las métricas.
+"""
+from typing import Dict, Union
+
+import numpy as np
+from PIL import Image
+
+# Lado máximo de la muestra: hasta 256 x 256 píxeles evaluados
+LADO_MUESTRA = 256
+
+# Un canal por encima de este valor se considera blanco
+UMBRAL_BLANCO = 250
+
+# Fracción mínima de píxeles con contenido (no blancos) para no considerar la imagen en blanco
+FRACCION_CONTENIDO_MINIMA = 0.001
+
+# Diferencia media máxima (0-255) entre dos capturas para considerarlas iguales
+UMBRAL_ESTABILIDAD = 0.5
+
+
+def muestrear_array(array: np.ndarray, lado: int = LADO_MUESTRA) -> np.ndarray:
+    """
+    Obtiene una vista con paso de un array de imagen, sin copiarlo
+
+    Args:
+        array: Array alto x ancho (x canales)
+        lado: Lado máximo de la muestra
+
+    Returns:
+        Vista de como mucho lado x lado píxeles
+    """
+    paso_y = max(1, -(-array.shape[0] // lado))
+    paso_x = max(1, -(-array.shape[1] // lado))
+    return array[::paso_y, ::paso_x]
+
+
+def array_desde_buffer(buffer, ancho: int, alto: int, bytes_por_linea: int, canales: int = 4) -> np.ndarray:
+    """
+    Envuelve el buffer de una imagen (p. ej. QImage.constBits()) como array, sin copiarlo.
+    El array solo es válido mientras el buffer exista.
+
+    Args:
+        buffer: Objeto con protocolo de buffer
+        ancho: Ancho en píxeles
+        alto: Alto en píxeles
+        bytes_por_linea: Bytes por línea del buffer (incluye el relleno de alineación)
+        canales: Bytes por píxel
+
+    Returns:
+        Array alto x ancho x canales de uint8
+    """
+    datos = np.frombuffer(buffer, dtype=np.uint8, count=bytes_por_linea * alto)
+    return datos.reshape(alto, bytes_por_linea)[:, :ancho * canales].reshape(alto, ancho, canales)
+
+
+def muestrear(imagen: Union[Image.Image, np.ndarray], lado: int = LADO_MUESTRA) -> np.ndarray:
+    """
+    Obtiene la muestra de una imagen PIL o de un array como array de 3 canales
+
+    Args:
+        imagen: Imagen PIL o array alto x ancho (x canales)
+        lado: Lado máximo de la muestra
+
+    Returns:
+        Array de como mucho lado x lado x 3 (los canales de color, sin alfa)
+    """
+    if isinstance(imagen, Image.Image):
+        if imagen.mode not in ("RGB", "RGBA", "L"):
+            imagen = imagen.convert("RGB")
+        ancho, alto = imagen.size
+        escala = max(1, -(-max(ancho, alto) // lado))
+        if escala > 1:
+            # La reducción por vecino más cercano solo lee los píxeles que conserva
+            imagen = imagen.resize(
+                (max(1, ancho // escala), max(1, alto // escala)), Image.Resampling.NEAREST
+            )
+        array = np.asarray(imagen)
+    else:
+        array = muestrear_array(imagen, lado)
+    if array.ndim == 2:
+        array = array[:, :, np.newaxis]
+    return array[:, :, :3]
+
+
+def fraccion_contenido(muestra: np.ndarray, umbral: int = UMBRAL_BLANCO) -> float:
+    """
+    Calcula la fracción de píxeles de la muestra que no son blancos
+
+    Args:
+        muestra: Muestra obtenida con muestrear()
+        umbral: Valor a partir del cual un canal se considera blanco
+
+    Returns:
+        Fracción entre 0 y 1
+    """
+    if muestra.size == 0:
+        return 0.0
+    return float(np.count_nonzero((muestra <= umbral).any(axis=2))) / (muestra.shape[0] * muestra.shape[1])
+
+
+def esta_en_blanco(imagen: Union[Image.Image, np.ndarray]) -> bool:
+    """
+    Indica si una imagen está (prácticamente) en blanco
+
+    Args:
+        imagen: Imagen PIL o array
+
+    Returns:
+        True si casi ningún píxel muestreado tiene contenido
+    """
+    return fraccion_contenido(muestrear(imagen)) < FRACCION_CONTENIDO_MINIMA
+
+
+def diferencia_muestras(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Calcula la diferencia media entre dos muestras (estabilidad entre capturas)
+
+    Args:
+        a: Primera muestra
+        b: Segunda muestra
+
+    Returns:
+        Diferencia media absoluta (0-255), o 255 si las muestras no son comparables
+    """
+    if a.shape != b.shape:
+        return 255.0
+    return float(np.abs(a.astype(np.int16) - b).mean())
+
+
+def son_estables(a: np.ndarray, b: np.ndarray) -> bool:
+    """
+    Indica si dos capturas consecutivas son iguales (el render terminó)
+
+    Args:
+        a: Muestra de la primera captura
+        b: Muestra de la segunda captura
+
+    Returns:
+        True si la diferencia está por debajo de UMBRAL_ESTABILIDAD
+    """
+    return diferencia_muestras(a, b) <= UMBRAL_ESTABILIDAD
+
+
+def analizar_imagen(imagen: Union[Image.Image, np.ndarray]) -> Dict:
+    """
+    Calcula las métricas de salud de una imagen sobre su muestra
+
+    Args:
+        imagen: Imagen PIL o array
+
+    Returns:
+        Diccionario con:
+        {
+            'media': lista con la media de cada canal,
+            'contraste': desviación típica de la luminancia,
+            'diferencia_canales': diferencia media entre las medias de los canales,
+            'fraccion_contenido': fracción de píxeles no blancos,
+            'en_blanco': bool
+        }
+    """
+    muestra = muestrear(imagen)
+    media = muestra.reshape(-1, muestra.shape[2]).mean(axis=0) if muestra.size else np.zeros(muestra.shape[2])
+    if muestra.shape[2] >= 3:
+        diferencia_canales = (
+            abs(media[0] - media[1]) + abs(media[1] - media[2]) + abs(media[0] - media[2])
+        ) / 3
+    else:
+        diferencia_canales = 0.0
+    contraste = float(muestra.mean(axis=2).std()) if muestra.size else 0.0
+    fraccion = fraccion_contenido(muestra)
+    return {
+        'media': [float(valor) for valor in media],
+        'contraste': contraste,
+        'diferencia_canales': float(diferencia_canales),
+        'fraccion_contenido': fraccion,
+        'en_blanco': fraccion < FRACCION_CONTENIDO_MINIMA
+    }
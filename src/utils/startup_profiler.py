@@ -0,0 +1,127 @@
+"""
+Perfilado del arranque de la aplicación (opción --profile-startup)
+
+Mide el tiempo de importación de cada módulo y el tiempo hasta que la
+ventana de login es visible. No depende de config.settings para poder
+activarse antes de cualquier otra importación.
+"""
+import importlib.abc
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class _LoaderCronometrado(importlib.abc.Loader):
+    """Envuelve un loader para medir cuánto tarda en ejecutar el módulo"""
+
+    def __init__(self, loader, perfilador: "PerfiladorArranque"):
+        self._loader = loader
+        self._perfilador = perfilador
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._perfilador._entrar(module.__name__)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._perfilador._salir(module.__name__)
+
+    def __getattr__(self, nombre):
+        # Delegar el resto (get_resource_reader, is_package, etc.) al loader original
+        return getattr(self._loader, nombre)
+
+
+class _BuscadorCronometrado(importlib.abc.MetaPathFinder):
+    """Finder que delega en los demás y envuelve el loader resultante"""
+
+    def __init__(self, perfilador: "PerfiladorArranque"):
+        self._perfilador = perfilador
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _LoaderCronometrado(spec.loader, self._perfilador)
+                return spec
+        return None
+
+
+class PerfiladorArranque:
+    """Registra tiempos de importación y marcas del arranque"""
+
+    def __init__(self):
+        """Inicializa el perfilador (inactivo hasta llamar a activar)"""
+        self.activo = False
+        self.inicio = time.perf_counter()
+        self._buscador: Optional[_BuscadorCronometrado] = None
+        self._pila: List[Tuple[str, float, float]] = []
+        self.tiempos: Dict[str, Tuple[float, float]] = {}
+        self.marcas: List[Tuple[str, float]] = []
+
+    def activar(self, inicio: Optional[float] = None):
+        """
+        Instala el medidor de importaciones
+
+        Args:
+            inicio: Instante (time.perf_counter) considerado como arranque del proceso
+        """
+        if self.activo:
+            return
+        if inicio is not None:
+            self.inicio = inicio
+        self._buscador = _BuscadorCronometrado(self)
+        sys.meta_path.insert(0, self._buscador)
+        self.activo = True
+
+    def desactivar(self):
+        """Retira el medidor de importaciones"""
+        if self._buscador in sys.meta_path:
+            sys.meta_path.remove(self._buscador)
+        self.activo = False
+
+    def _entrar(self, modulo: str):
+        self._pila.append((modulo, time.perf_counter(), 0.0))
+
+    def _salir(self, modulo: str):
+        nombre, t_inicio, hijos = self._pila.pop()
+        total = time.perf_counter() - t_inicio
+        self.tiempos[nombre] = (total, total - hijos)
+        if self._pila:
+            padre, t_padre, hijos_padre = self._pila[-1]
+            self._pila[-1] = (padre, t_padre, hijos_padre + total)
+
+    def marcar(self, evento: str):
+        """Registra un hito del arranque (p. ej. 'ventana de login visible')"""
+        if self.activo:
+            self.marcas.append((evento, time.perf_counter() - self.inicio))
+
+    def generar_reporte(self, limite: int = 25) -> str:
+        """
+        Genera el reporte de tiempos
+
+        Args:
+            limite: Número de módulos a listar
+
+        Returns:
+            Texto con los módulos más lentos (tiempo propio y acumulado) y los hitos
+        """
+        lineas = ["=" * 70, "PERFIL DE ARRANQUE", "=" * 70]
+        for evento, segundos in self.marcas:
+            lineas.append(f"{evento}: {segundos * 1000:.1f} ms")
+        lineas.append("")
+        lineas.append(f"{'propio (ms)':>12} {'acumulado (ms)':>15}  módulo")
+        ordenados = sorted(self.tiempos.items(), key=lambda item: item[1][1], reverse=True)
+        for modulo, (total, propio) in ordenados[:limite]:
+            lineas.append(f"{propio * 1000:12.1f} {total * 1000:15.1f}  {modulo}")
+        lineas.append(f"Módulos importados y medidos: {len(self.tiempos)}")
+        lineas.append("=" * 70)
+        return "\n".join(lineas)
+
+
+# Instancia global del perfilador
+perfilador_arranque = PerfiladorArranque()
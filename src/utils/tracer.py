@@ -0,0 +1,191 @@
+"""
+Trazas de rendimiento en formato Chrome Trace Event
+
+Registra spans anidados (por ejemplo: cargar empleado → render → grab →
+codificar → OCR → agregar al ZIP) por hilo y proceso, y los escribe en un
+archivo trace.json que puede abrirse en chrome://tracing o en Perfetto.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config.settings import TRACE_ENABLED, TRACES_DIR
+
+logger = logging.getLogger(__name__)
+
+
+class Tracer:
+    """Recolector de eventos de traza para operaciones masivas"""
+
+    def __init__(self, habilitado: bool = TRACE_ENABLED, directorio: Optional[Path] = None):
+        """
+        Inicializa el recolector
+
+        Args:
+            habilitado: Si False, todas las operaciones son no-op
+            directorio: Directorio donde guardar las trazas (por defecto TRACES_DIR)
+        """
+        self.habilitado = habilitado
+        self.directorio = Path(directorio) if directorio else TRACES_DIR
+        self._lock = threading.Lock()
+        self._eventos: List[Dict[str, Any]] = []
+        self._hilos_registrados = set()
+        self._sesion: Optional[str] = None
+        self._profundidad_sesion = 0
+        self._t0 = 0.0
+
+    @property
+    def activo(self) -> bool:
+        """Indica si hay una sesión de traza en curso"""
+        return self.habilitado and self._sesion is not None
+
+    def _ahora_us(self) -> float:
+        """Microsegundos transcurridos desde el inicio de la sesión"""
+        return (time.perf_counter() - self._t0) * 1_000_000
+
+    def _registrar_hilo(self, pid: int, tid: int):
+        """Agrega el evento de metadatos con el nombre del hilo (una vez por hilo)"""
+        if tid in self._hilos_registrados:
+            return
+        self._hilos_registrados.add(tid)
+        self._eventos.append({
+            "name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+            "args": {"name": threading.current_thread().name}
+        })
+
+    def _agregar_evento(self, evento: Dict[str, Any]):
+        """Agrega un evento completando pid/tid del hilo actual"""
+        pid = os.getpid()
+        tid = threading.get_ident()
+        evento["pid"] = pid
+        evento["tid"] = tid
+        with self._lock:
+            self._registrar_hilo(pid, tid)
+            self._eventos.append(evento)
+
+    def iniciar_sesion(self, nombre: str) -> bool:
+        """
+        Inicia una sesión de traza. Las sesiones anidadas se integran en la actual.
+
+        Args:
+            nombre: Nombre de la operación (se usa en el nombre del archivo)
+
+        Returns:
+            True si la traza está habilitada
+        """
+        if not self.habilitado:
+            return False
+        with self._lock:
+            self._profundidad_sesion += 1
+            if self._profundidad_sesion > 1:
+                return True
+            self._sesion = nombre
+            self._eventos = []
+            self._hilos_registrados = set()
+            self._t0 = time.perf_counter()
+            self._eventos.append({
+                "name": "process_name", "ph": "M", "pid": os.getpid(), "tid": 0,
+                "args": {"name": nombre}
+            })
+        return True
+
+    def finalizar_sesion(self) -> Optional[Path]:
+        """
+        Finaliza la sesión y escribe el archivo de traza
+
+        Returns:
+            Ruta del archivo trace.json generado, o None si no se escribió
+        """
+        if not self.habilitado or self._sesion is None:
+            return None
+        with self._lock:
+            self._profundidad_sesion -= 1
+            if self._profundidad_sesion > 0:
+                return None
+            nombre = self._sesion
+            eventos = self._eventos
+            self._sesion = None
+            self._eventos = []
+
+        try:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            ruta = self.directorio / f"trace_{nombre}_{timestamp}.json"
+            with open(ruta, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": eventos, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+            logger.info(f"Traza de rendimiento guardada en: {ruta}")
+            return ruta
+        except Exception as e:
+            logger.error(f"Error al guardar traza de rendimiento: {e}")
+            return None
+
+    @contextmanager
+    def sesion(self, nombre: str):
+        """Context manager equivalente a iniciar_sesion/finalizar_sesion"""
+        self.iniciar_sesion(nombre)
+        try:
+            yield self
+        finally:
+            self.finalizar_sesion()
+
+    @contextmanager
+    def span(self, nombre: str, categoria: str = "app", **args):
+        """
+        Registra un span completo (evento "X") alrededor del bloque
+
+        Args:
+            nombre: Nombre del span
+            categoria: Categoría del evento (para filtrar en el visor)
+            **args: Datos adicionales visibles en el visor
+        """
+        if not self.activo:
+            yield
+            return
+        inicio = self._ahora_us()
+        try:
+            yield
+        finally:
+            evento = {
+                "name": nombre, "cat": categoria, "ph": "X",
+                "ts": inicio, "dur": self._ahora_us() - inicio
+            }
+            if args:
+                evento["args"] = {k: str(v) for k, v in args.items()}
+            self._agregar_evento(evento)
+
+    def inicio(self, nombre: str, categoria: str = "app", **args):
+        """
+        Abre un span (evento "B") que se cierra con fin(). Útil para bloques
+        con múltiples salidas donde un context manager no encaja.
+        """
+        if not self.activo:
+            return
+        evento = {"name": nombre, "cat": categoria, "ph": "B", "ts": self._ahora_us()}
+        if args:
+            evento["args"] = {k: str(v) for k, v in args.items()}
+        self._agregar_evento(evento)
+
+    def fin(self, nombre: str, categoria: str = "app"):
+        """Cierra el span abierto con inicio() en el mismo hilo"""
+        if not self.activo:
+            return
+        self._agregar_evento({"name": nombre, "cat": categoria, "ph": "E", "ts": self._ahora_us()})
+
+    def instante(self, nombre: str, categoria: str = "app", **args):
+        """Registra un evento instantáneo (cancelación, reintento, etc.)"""
+        if not self.activo:
+            return
+        evento = {"name": nombre, "cat": categoria, "ph": "i", "s": "t", "ts": self._ahora_us()}
+        if args:
+            evento["args"] = {k: str(v) for k, v in args.items()}
+        self._agregar_evento(evento)
+
+
+# Instancia global del tracer
+tracer = Tracer()
@@ -100,6 +100,11 @@ class CarnetEmployeesPanel(QWidget):
         self.boton_generar_masivo_pdf.setStyleSheet("background-color: #fd7e14; color: white;")
         layout_acciones.addWidget(self.boton_generar_masivo_pdf)
         
+        self.boton_generar_hojas_pdf = QPushButton("Generar Hojas de Impresión PDF")
+        self.boton_generar_hojas_pdf.setStyleSheet("background-color: #6f42c1; color: white;")
+        self.boton_generar_hojas_pdf.setToolTip("Varios carnets por hoja A4/Carta con marcas de corte, en un único PDF")
+        layout_acciones.addWidget(self.boton_generar_hojas_pdf)
+        
         layout_acciones.addStretch()
         layout.addWidget(grupo_acciones)
     
@@ -2,12 +2,10 @@
 Panel de vista previa del carnet
 """
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QScrollArea, QApplication, QPushButton, QHBoxLayout, QColorDialog
-from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QPixmap, QImage, QColor
 from PIL import Image
 from pathlib import Path
-import io
 
 
 class CarnetPreviewPanel(QWidget):
@@ -30,6 +28,9 @@ class CarnetPreviewPanel(QWidget):
         self.html_content_actual = None  # HTML actual para recargar con zoom
         self.html_ancho = None  # Ancho del HTML (a 300 DPI)
         self.html_alto = None  # Alto del HTML (a 300 DPI)
+        self.plantilla_actual = None  # PlantillaVistaPrevia cargada (permite parchear variables)
+        self.valores_html_actuales = {}  # Valores inyectados en la página cargada
+        self._pagina_cargada = False  # La página terminó de cargar y acepta parches JavaScript
         self.init_ui()
     
     def init_ui(self):
@@ -217,9 +218,11 @@ class CarnetPreviewPanel(QWidget):
         if self.web_view is None:
             return
         
-        # Si tenemos HTML guardado, recargarlo con el nuevo zoom
+        # Si tenemos HTML guardado, recargarlo con el nuevo zoom (sigue siendo la misma plantilla)
         if self.html_content_actual is not None and self.html_ancho is not None and self.html_alto is not None:
+            plantilla, valores = self.plantilla_actual, self.valores_html_actuales
             self.actualizar_preview_html(self.html_content_actual, self.html_ancho, self.html_alto)
+            self.plantilla_actual, self.valores_html_actuales = plantilla, valores
             return
         
         # Si no hay HTML guardado, solo ajustar el tamaño y zoom del web_view existente
@@ -267,13 +270,14 @@ class CarnetPreviewPanel(QWidget):
         ancho_zoom = int(ancho_base * self.zoom_actual)
         alto_zoom = int(alto_base * self.zoom_actual)
         
-        # Convertir PIL Image a QPixmap y escalar
+        # Convertir PIL Image a QImage sobre sus propios bytes (sin codificar un PNG) y escalar
         try:
-            img_bytes = io.BytesIO()
-            self.imagen_actual.save(img_bytes, format='PNG')
-            img_bytes.seek(0)
-            
-            qimage = QImage.fromData(img_bytes.getvalue())
+            imagen = self.imagen_actual
+            if imagen.mode not in ('RGB', 'RGBA'):
+                imagen = imagen.convert('RGB')
+            formato = QImage.Format.Format_RGB888 if imagen.mode == 'RGB' else QImage.Format.Format_RGBA8888
+            datos = imagen.tobytes()
+            qimage = QImage(datos, imagen.width, imagen.height, len(imagen.mode) * imagen.width, formato)
             if qimage.isNull():
                 return
             
@@ -292,12 +296,33 @@ class CarnetPreviewPanel(QWidget):
         except Exception as e:
             print(f"Error al aplicar zoom a imagen: {e}")
     
+    def escala_borrador(self, ancho_carnet: int) -> float:
+        """
+        Calcula la escala a la que renderizar un borrador del carnet para mostrarlo
+        con el zoom actual sin perder nitidez ni dibujar píxeles que no se ven
+        
+        Args:
+            ancho_carnet: Ancho del carnet en píxeles (a 300 DPI)
+            
+        Returns:
+            Factor sobre las medidas del template (como máximo 1.0)
+        """
+        screen = QApplication.primaryScreen()
+        if screen:
+            dpi_fisico = screen.physicalDotsPerInch()
+            proporcion = screen.devicePixelRatio()
+        else:
+            dpi_fisico = 96
+            proporcion = 1.0
+        ancho_pantalla = 54 * dpi_fisico / 25.4 * self.zoom_actual * proporcion
+        return min(1.0, ancho_pantalla / ancho_carnet)
+    
     def actualizar_preview(self, imagen_pil: Image.Image):
         """
         Actualiza la vista previa con una imagen PIL mostrándola a tamaño real
         
         Args:
-            imagen_pil: Imagen PIL del carnet (debe estar a 300 DPI)
+            imagen_pil: Imagen PIL del carnet (a 300 DPI o un borrador a menor escala)
         """
         # Ocultar web_view si está visible (modo HTML)
         if self.usando_html and self.web_view:
@@ -339,6 +364,9 @@ class CarnetPreviewPanel(QWidget):
         self.html_content_actual = html_content
         self.html_ancho = ancho
         self.html_alto = alto
+        # HTML cargado sin plantilla: los siguientes cambios no se pueden parchear
+        self.plantilla_actual = None
+        self.valores_html_actuales = {}
         # Ocultar label si está visible
         if not self.usando_html:
             self.label_preview.hide()
@@ -346,6 +374,7 @@ class CarnetPreviewPanel(QWidget):
         
         # Crear o reutilizar QWebEngineView
         if self.web_view is None:
+            from PyQt6.QtWebEngineWidgets import QWebEngineView
             self.web_view = QWebEngineView()
             self.web_view.settings().setAttribute(
                 self.web_view.settings().WebAttribute.LocalContentCanAccessRemoteUrls, True
@@ -376,6 +405,7 @@ class CarnetPreviewPanel(QWidget):
             # Establecer tamaño fijo exacto
             self.web_view.setFixedSize(ancho_real_px, alto_real_px)
             self.web_view.setStyleSheet("background-color: transparent; border: none;")
+            self.web_view.loadFinished.connect(self._on_carga_terminada)
             
             # Agregar al layout
             container_layout = self.container_widget.layout()
@@ -444,9 +474,49 @@ class CarnetPreviewPanel(QWidget):
         self.web_view.setZoomFactor(self.zoom_actual)
         
         # Cargar HTML
+        self._pagina_cargada = False
         self.web_view.setHtml(html_modificado)
         self.web_view.show()
     
+    def _on_carga_terminada(self, exito: bool):
+        """Se ejecuta cuando la página HTML de la vista previa termina de cargar"""
+        self._pagina_cargada = exito
+    
+    def mostrar_plantilla_html(self, plantilla, valores: dict, ancho: int, alto: int):
+        """
+        Muestra un template HTML en la vista previa. Si la misma plantilla ya está
+        cargada, solo se parchean con JavaScript las variables que cambiaron en lugar
+        de volver a cargar la página.
+        
+        Args:
+            plantilla: PlantillaVistaPrevia con las variables marcadas
+            valores: Valores preparados con HTMLRenderer.preparar_valores()
+            ancho: Ancho del carnet en píxeles (a 300 DPI)
+            alto: Alto del carnet en píxeles (a 300 DPI)
+        """
+        misma_pagina = (
+            self.usando_html and self.web_view is not None and self._pagina_cargada
+            and self.plantilla_actual is plantilla
+            and self.html_ancho == ancho and self.html_alto == alto
+        )
+        if misma_pagina:
+            cambios = {
+                var: valor for var, valor in valores.items()
+                if self.valores_html_actuales.get(var) != valor
+            }
+            if not cambios:
+                return
+            if plantilla.se_puede_parchear(cambios):
+                self.web_view.page().runJavaScript(plantilla.script_parche(cambios))
+                self.valores_html_actuales = dict(valores)
+                # HTML equivalente, por si hay que recargar al cambiar el zoom
+                self.html_content_actual = plantilla.generar_html(valores)
+                return
+        
+        self.actualizar_preview_html(plantilla.generar_html(valores), ancho, alto)
+        self.plantilla_actual = plantilla
+        self.valores_html_actuales = dict(valores)
+    
     def limpiar_preview(self):
         """Limpia la vista previa"""
         if self.web_view:
@@ -461,6 +531,9 @@ class CarnetPreviewPanel(QWidget):
         self.html_content_actual = None
         self.html_ancho = None
         self.html_alto = None
+        self.plantilla_actual = None
+        self.valores_html_actuales = {}
+        self._pagina_cargada = False
         self.zoom_actual = 1.0  # Resetear zoom a 100%
         self.label_zoom_porcentaje.setText("100%")
 
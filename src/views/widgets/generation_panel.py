@@ -338,9 +338,33 @@ class GenerationPanel(QWidget):
             informacion_imagen: Diccionario con información adicional de la imagen (opcional)
         """
         from PyQt6.QtGui import QPixmap
+        
+        self._mostrar_pixmap(QPixmap(ruta_imagen), informacion_imagen)
+    
+    def mostrar_miniatura(self, png: bytes, informacion_imagen: dict = None):
+        """
+        Muestra la vista previa a partir de una miniatura ya generada (caché de miniaturas)
+        
+        Args:
+            png: Miniatura codificada en PNG
+            informacion_imagen: Diccionario con información adicional de la imagen (opcional)
+        """
+        from PyQt6.QtGui import QPixmap
+        
+        pixmap = QPixmap()
+        pixmap.loadFromData(png, "PNG")
+        self._mostrar_pixmap(pixmap, informacion_imagen)
+    
+    def _mostrar_pixmap(self, pixmap, informacion_imagen: dict = None):
+        """
+        Escala y muestra una imagen en la vista previa
+        
+        Args:
+            pixmap: QPixmap a mostrar
+            informacion_imagen: Diccionario con información adicional de la imagen (opcional)
+        """
         from PyQt6.QtCore import Qt as QtCore
         
-        pixmap = QPixmap(ruta_imagen)
         if not pixmap.isNull():
             pixmap_escalado = pixmap.scaled(
                 350, 150,